@@ -0,0 +1,71 @@
+"""Measure how much collapsing repeated hunks shrinks a codemod.
+
+For every size, a throwaway repository is created with a staged codemod that
+renames an import and every call of it across all of its modules. The staged
+changes are read the way `genie-git suggest` reads them, and the benchmark
+reports their tokens before and after collapsing the repeated hunks, and the
+time collapsing took, which should grow linearly with the diff.
+
+Usage:
+    python benchmarks/bench_clustering.py --files 100 --files 1000 --files 5000
+    python benchmarks/bench_clustering.py --functions 10 --min-hunks 3
+"""
+
+import statistics
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+from synthetic import create_codemod_repository
+
+from genie_git.clustering import cluster_hunks
+from genie_git.exclusions import ExclusionRules
+from genie_git.git_handler import get_repository_changes, open_repo
+from genie_git.tokens import estimate_tokens
+
+
+def measure(directory: Path, min_hunks: int, runs: int) -> dict[str, float]:
+    """Collapse the staged changes and measure the result."""
+    diff = get_repository_changes(ExclusionRules(), open_repo(str(directory)))
+    durations = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        result = cluster_hunks(diff, min_hunks)
+        durations.append(time.perf_counter() - started_at)
+    return {
+        "diff_kib": len(diff.encode()) / 1024,
+        "tokens": estimate_tokens(diff),
+        "collapsed_tokens": estimate_tokens(result.diff),
+        "seconds": statistics.median(durations),
+    }
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, action="append", dest="sizes")
+    parser.add_argument("--functions", type=int, default=5)
+    parser.add_argument("--min-hunks", type=int, default=3)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'files':>6}  {'diff KiB':>9}  {'tokens':>9}  {'collapsed':>9}  "
+        f"{'ratio':>7}  {'seconds':>8}"
+    )
+    for files in args.sizes or [100, 1000, 5000]:
+        with tempfile.TemporaryDirectory() as directory:
+            repository = Path(directory)
+            create_codemod_repository(repository, files, args.functions)
+            metrics = measure(repository, args.min_hunks, args.runs)
+        ratio = metrics["tokens"] / max(metrics["collapsed_tokens"], 1)
+        print(
+            f"{files:>6}  {metrics['diff_kib']:>9.0f}  {metrics['tokens']:>9.0f}  "
+            f"{metrics['collapsed_tokens']:>9.0f}  {ratio:>6.0f}x  "
+            f"{metrics['seconds']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Compare the size of the staged changes in every diff encoding.
+
+Creates a throwaway repository with a staged refactoring of Python modules:
+edited lines, reindented blocks, functions moved to new modules and renamed
+files. For every encoding, the changes are read the way `genie-git suggest`
+reads them and encoded for the prompt, and the benchmark reports their bytes
+and estimated tokens, the saving against the unified diff and the time taken.
+
+Usage:
+    python benchmarks/bench_encodings.py --files 40 --functions 20
+    python benchmarks/bench_encodings.py --encoding context-1+moves+structured
+"""
+
+import statistics
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+from synthetic import create_refactored_repository
+
+from genie_git.diff_encoding import DEFAULT_ENCODING, ENCODINGS, encode_diff
+from genie_git.exclusions import ExclusionRules
+from genie_git.git_handler import get_repository_changes, open_repo
+from genie_git.tokens import estimate_tokens
+
+# Combinations worth comparing besides the single encodings.
+COMBINED_ENCODINGS = (
+    "context-1+structured",
+    "context-1+moves+structured",
+    "context-0+ignore-whitespace+moves+structured",
+)
+
+
+def measure(directory: Path, encoding: str, runs: int) -> dict[str, float]:
+    """Read and encode the staged changes, and measure the result."""
+    repo = open_repo(str(directory))
+    durations = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        diff = get_repository_changes(ExclusionRules(), repo, encoding)
+        diff = encode_diff(diff, encoding)
+        durations.append(time.perf_counter() - started_at)
+    return {
+        "bytes": len(diff.encode()),
+        "tokens": estimate_tokens(diff),
+        "seconds": statistics.median(durations),
+    }
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--functions", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument(
+        "--encoding",
+        action="append",
+        dest="encodings",
+        help="An encoding to measure, by default every single and some combined.",
+    )
+    args = parser.parse_args()
+    encodings = args.encodings or [*ENCODINGS, *COMBINED_ENCODINGS]
+
+    with tempfile.TemporaryDirectory() as directory:
+        repository = Path(directory)
+        create_refactored_repository(repository, args.files, args.functions)
+        baseline = measure(repository, DEFAULT_ENCODING, args.runs)
+        results = {
+            encoding: measure(repository, encoding, args.runs) for encoding in encodings
+        }
+
+    width = max(len(encoding) for encoding in results)
+    print(
+        f"{'encoding':<{width}}  {'bytes':>9}  {'tokens':>8}  "
+        f"{'saved':>6}  {'seconds':>8}"
+    )
+    for encoding, metrics in results.items():
+        saved = 1 - metrics["tokens"] / baseline["tokens"]
+        print(
+            f"{encoding:<{width}}  {metrics['bytes']:>9.0f}  "
+            f"{metrics['tokens']:>8.0f}  {saved:>6.0%}  {metrics['seconds']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
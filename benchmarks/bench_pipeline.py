@@ -0,0 +1,128 @@
+"""Compare the sequential and the concurrent suggest pipelines.
+
+Creates a throwaway repository with staged changes and measures how long a
+fresh process takes to collect the diff, the log and a ready-to-use genai
+client, including the import of the SDK, the way `suggest` does by default.
+With `--no-cache`, the client also warms up its connection, as `suggest
+--no-cache` does, against a local server that answers after
+`--connect-latency` seconds, standing in for the DNS lookup and TLS
+handshake, so the benchmark runs offline.
+
+Usage:
+    python benchmarks/bench_pipeline.py --files 200 --runs 10
+    python benchmarks/bench_pipeline.py --files 200 --runs 10 --no-cache
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+from synthetic import FakeGeminiServer, create_repository
+
+
+def run_sequential(base_url: str, connect: bool) -> dict[str, float]:
+    """Run the stages one after the other, as genie-git used to."""
+    from genie_git.git_handler import get_log, get_repository_changes
+
+    get_repository_changes()
+    get_log(5)
+
+    from genie_git.ai_handler import create_client, warm_up_client
+
+    client = create_client("bench-key", base_url)
+    if connect:
+        warm_up_client(client, "gemini-2.5-flash")
+    return {}
+
+
+def run_concurrent(base_url: str, connect: bool) -> dict[str, float]:
+    """Run the concurrent pipeline the way _generate_staged_message does."""
+    from genie_git.exclusions import ExclusionRules
+    from genie_git.pipeline import ClientWarmup, start_git_inputs
+
+    pending_git_inputs = start_git_inputs(ExclusionRules(), 5)
+    client_warmup = ClientWarmup("bench-key", "gemini-2.5-flash", base_url).start()
+    git_inputs = pending_git_inputs.result()
+    if connect:
+        client_warmup.connect()
+    client_warmup.result()
+    return git_inputs.timings | client_warmup.timings
+
+
+def measure(
+    mode: str, directory: str, base_url: str, connect: bool
+) -> tuple[float, dict[str, float]]:
+    """Run one pipeline in a fresh interpreter and return its wall time."""
+    started_at = time.perf_counter()
+    result = subprocess.run(
+        [
+            sys.executable,
+            __file__,
+            "--run",
+            mode,
+            f"--base-url={base_url}",
+            *(["--no-cache"] if connect else []),
+        ],
+        cwd=directory,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return time.perf_counter() - started_at, json.loads(result.stdout)
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--commits", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--connect-latency", type=float, default=0.15)
+    parser.add_argument("--run", choices=["sequential", "concurrent"])
+    parser.add_argument("--base-url")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Warm up the connection too, as a suggestion without the cache does.",
+    )
+    args = parser.parse_args()
+
+    if args.run:
+        run = run_sequential if args.run == "sequential" else run_concurrent
+        print(json.dumps(run(args.base_url, args.no_cache)))
+        return
+
+    server = FakeGeminiServer(connect_latency=args.connect_latency)
+    base_url = server.base_url
+    with tempfile.TemporaryDirectory() as directory:
+        create_repository(Path(directory), args.files, args.lines, args.commits)
+        results = {
+            mode: [
+                measure(mode, directory, base_url, args.no_cache)
+                for _ in range(args.runs)
+            ]
+            for mode in ("sequential", "concurrent")
+        }
+    server.shutdown()
+
+    medians = {
+        mode: statistics.median(duration for duration, _ in runs)
+        for mode, runs in results.items()
+    }
+    for mode, median in medians.items():
+        print(f"{mode + ':':<12}{median * 1000:8.1f} ms (median wall time)")
+    saved = medians["sequential"] - medians["concurrent"]
+    print(f"{'saved:':<12}{saved * 1000:8.1f} ms")
+    print("\nconcurrent stages of the last run:")
+    for stage, duration in results["concurrent"][-1][1].items():
+        print(f"  {stage:<14} {duration * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Measure the peak memory of reading staged changes of growing size.
+
+For every size, a throwaway repository is created with the given number of
+staged files, and the staged changes are read the way `genie-git suggest`
+reads them, once with every patch read and once with the read limit, which
+stops git once the patches reach it. Every read runs in a fresh process, so
+that its peak resident memory is its own.
+
+Usage:
+    python benchmarks/bench_streaming.py --files 200 --files 2000 --files 8000
+    python benchmarks/bench_streaming.py --lines 500 --max-read-tokens 32000
+"""
+
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import SUPPRESS, ArgumentParser
+from pathlib import Path
+
+from synthetic import create_repository
+
+
+def run_read(max_read_tokens: int) -> None:
+    """Read the staged changes in this process and report the peak memory."""
+    from genie_git.exclusions import ExclusionRules
+    from genie_git.git_handler import open_repo, start_repository_changes
+
+    started_at = time.perf_counter()
+    diff = start_repository_changes(
+        ExclusionRules(max_read_tokens=max_read_tokens), open_repo()
+    ).result()
+    print(
+        json.dumps(
+            {
+                "seconds": time.perf_counter() - started_at,
+                "diff_kib": len(diff.encode()) / 1024,
+                "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            }
+        )
+    )
+
+
+def measure(directory: Path, max_read_tokens: int) -> dict[str, float]:
+    """Read the staged changes in a fresh process."""
+    result = subprocess.run(
+        [sys.executable, __file__, "--run", "--max-read-tokens", str(max_read_tokens)],
+        cwd=directory,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(result.stdout)
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, action="append", dest="sizes")
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument(
+        "--max-read-tokens",
+        type=int,
+        default=32000,
+        help="The read limit, by default the prompt budget.",
+    )
+    parser.add_argument("--run", action="store_true", help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_read(args.max_read_tokens)
+        return
+
+    print(
+        f"{'files':>6}  {'limit':>8}  {'diff KiB':>10}  {'peak RSS KiB':>12}  "
+        f"{'seconds':>8}"
+    )
+    for files in args.sizes or [200, 2000, 8000]:
+        with tempfile.TemporaryDirectory() as directory:
+            repository = Path(directory)
+            create_repository(repository, files, args.lines, commits=1)
+            for limit in (0, args.max_read_tokens):
+                metrics = measure(repository, limit)
+                print(
+                    f"{files:>6}  {limit or 'none':>8}  {metrics['diff_kib']:>10.0f}  "
+                    f"{metrics['peak_rss_kib']:>12.0f}  {metrics['seconds']:>8.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Measure genie-git suggestions end to end on synthetic repositories.
+
+For every scenario, a throwaway repository is created with the configured
+number of staged files, lines per file and commits of history. The benchmark
+then measures:
+
+- the real `get_repository_changes` and `get_log` in-process, with the peak
+  of Python allocations;
+- the full `genie-git suggest` command in a fresh process against a local
+  stand-in for the Gemini API, with its peak resident memory and the size of
+  its prompt, taken from its GENIE_GIT_TRACE trace.
+
+Results can be saved as a baseline and later runs compared against it, which
+exits with status 1 when a metric regressed beyond the tolerance.
+
+Usage:
+    python benchmarks/bench_suggest.py --scenario small --scenario medium
+    python benchmarks/bench_suggest.py --files 500 --lines 100 --commits 2000
+    python benchmarks/bench_suggest.py --save-baseline baseline.json
+    python benchmarks/bench_suggest.py --compare baseline.json
+"""
+
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import SUPPRESS, ArgumentParser
+from pathlib import Path
+
+from synthetic import FakeGeminiServer, create_repository
+
+# The files, lines per file and commits of every scenario.
+SCENARIOS = {
+    "small": (10, 20, 20),
+    "medium": (200, 50, 500),
+    "large": (2000, 100, 5000),
+}
+# Metrics compared against the baseline, where larger values are worse.
+COMPARED_METRICS = ("git_seconds", "git_peak_kib", "suggest_seconds", "suggest_rss_kib")
+
+
+def run_suggest() -> None:
+    """Run `genie-git suggest` in this process and report its peak memory."""
+    from genie_git.main import main
+
+    sys.argv = ["genie-git", "suggest", "--no-cache"]
+    main()
+    peak_rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"peak_rss_kib": peak_rss_kib}), file=sys.stderr)
+
+
+def measure_git(directory: Path, runs: int) -> dict[str, float]:
+    """Measure reading the staged changes and the log in-process."""
+    from genie_git.git_handler import get_log, get_repository_changes, open_repo
+
+    repo = open_repo(str(directory))
+    durations = []
+    tracemalloc.start()
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        diff = get_repository_changes(repo=repo)
+        get_log(5, repo)
+        durations.append(time.perf_counter() - started_at)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "git_seconds": statistics.median(durations),
+        "git_peak_kib": peak / 1024,
+        "diff_bytes": len(diff.encode()),
+    }
+
+
+def measure_suggest(directory: Path, home: Path, runs: int) -> dict[str, float]:
+    """Measure the full suggest command in fresh processes."""
+    trace_file = home / "trace.jsonl"
+    durations = []
+    peak_rss = []
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, __file__, "--run"],
+            cwd=directory,
+            env=os.environ | {"HOME": str(home), "GENIE_GIT_TRACE": str(trace_file)},
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        durations.append(time.perf_counter() - started_at)
+        peak_rss.append(json.loads(result.stderr.splitlines()[-1])["peak_rss_kib"])
+
+    trace = json.loads(trace_file.read_text().splitlines()[-1])
+    prompt = next(s for s in trace["spans"] if s["name"] == "prompt_build")
+    return {
+        "suggest_seconds": statistics.median(durations),
+        "suggest_rss_kib": max(peak_rss),
+        "prompt_bytes": prompt["attributes"]["prompt_bytes"],
+        "prompt_tokens": prompt["attributes"]["prompt_tokens"],
+        "requests": sum(s["name"] in ("generate", "summarize") for s in trace["spans"]),
+    }
+
+
+def run_scenario(
+    files: int, lines: int, commits: int, runs: int, server: FakeGeminiServer
+) -> dict[str, float]:
+    """Create the repository of a scenario and measure it."""
+    with tempfile.TemporaryDirectory() as directory:
+        repository = Path(directory) / "repository"
+        repository.mkdir()
+        create_repository(repository, files, lines, commits)
+
+        home = Path(directory) / "home"
+        (home / ".genie-git").mkdir(parents=True)
+        config = {"api_key": "bench-key", "api_base_url": server.base_url}
+        (home / ".genie-git" / "config.json").write_text(json.dumps(config))
+
+        return measure_git(repository, runs) | measure_suggest(repository, home, runs)
+
+
+def compare(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    tolerance: float,
+) -> list[str]:
+    """Return a description of every metric that regressed."""
+    regressions = []
+    for scenario, metrics in results.items():
+        for metric in COMPARED_METRICS:
+            before = baseline.get(scenario, {}).get(metric)
+            if not before:
+                continue
+            change = metrics[metric] / before - 1
+            if change > tolerance:
+                regressions.append(f"{scenario} {metric}: {change:+.0%}")
+        before_tokens = baseline.get(scenario, {}).get("prompt_tokens")
+        if before_tokens is not None and metrics["prompt_tokens"] != before_tokens:
+            regressions.append(
+                f"{scenario} prompt_tokens: {before_tokens:.0f} -> "
+                f"{metrics['prompt_tokens']:.0f}"
+            )
+    return regressions
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenario", action="append", choices=SCENARIOS, dest="scenarios"
+    )
+    parser.add_argument("--files", type=int, help="Run a custom scenario.")
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--commits", type=int, default=100)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--connect-latency", type=float, default=0.05)
+    parser.add_argument("--response-latency", type=float, default=0.2)
+    parser.add_argument("--save-baseline", type=Path)
+    parser.add_argument("--compare", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--run", action="store_true", help=SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_suggest()
+        return
+
+    if args.files is not None:
+        scenarios = {"custom": (args.files, args.lines, args.commits)}
+    else:
+        names = args.scenarios or ["small", "medium"]
+        scenarios = {name: SCENARIOS[name] for name in names}
+
+    server = FakeGeminiServer(args.connect_latency, args.response_latency)
+    results = {}
+    try:
+        for name, (files, lines, commits) in scenarios.items():
+            results[name] = run_scenario(files, lines, commits, args.runs, server)
+    finally:
+        server.shutdown()
+
+    header = f"{'scenario':<10}" + "".join(f"{m:>16}" for m in results[name])
+    print(header)
+    for name, metrics in results.items():
+        print(f"{name:<10}" + "".join(f"{value:>16.3f}" for value in metrics.values()))
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nSaved the baseline to {args.save_baseline}.")
+
+    if args.compare:
+        regressions = compare(
+            results, json.loads(args.compare.read_text()), args.tolerance
+        )
+        if regressions:
+            print("\nRegressions against the baseline:", *regressions, sep="\n  ")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""Builds throwaway repositories and a local stand-in for the Gemini API.
+
+Shared by the benchmark scripts, which import it from their own directory.
+"""
+
+import json
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+RESPONSE_TEXT = "feat: add synthetic files\n\nGenerated by the fake model server."
+
+
+def create_repository(path: Path, files: int, lines: int, commits: int) -> None:
+    """Create a repository with history and staged changes.
+
+    The history is written with `git fast-import`, so that deep histories take
+    a fraction of a second. The staged changes add `files` files of `lines`
+    lines each.
+
+    Args:
+        path: An empty directory for the repository.
+        files: The number of staged files.
+        lines: The number of lines of every staged file.
+        commits: The depth of the history.
+
+    """
+
+    def git(*args: str, stdin: bytes | None = None) -> None:
+        subprocess.run(
+            ["git", *args], cwd=path, check=True, capture_output=True, input=stdin
+        )
+
+    git("init", "-q", "-b", "main")
+    git("config", "user.email", "bench@example.com")
+    git("config", "user.name", "bench")
+
+    stream = []
+    for number in range(commits):
+        message = f"chore: commit {number}".encode()
+        content = f"commit {number}\n".encode()
+        stream += [
+            b"commit refs/heads/main",
+            b"committer bench <bench@example.com> %d +0000" % (1_700_000_000 + number),
+            b"data %d" % len(message),
+            message,
+            b"M 644 inline history.txt",
+            b"data %d" % len(content),
+            content,
+        ]
+    if commits:
+        git("fast-import", "--quiet", stdin=b"\n".join(stream) + b"\n")
+        git("reset", "-q", "--hard", "main")
+
+    for number in range(files):
+        text = "".join(f"line {line} of file {number}\n" for line in range(lines))
+        (path / f"file_{number}.txt").write_text(text)
+    git("add", ".")
+
+
+def _module(number: int, functions: int) -> list[str]:
+    """Return the lines of a Python module with the given number of functions."""
+    lines = []
+    for function in range(functions):
+        lines += [
+            f"def handle_{number}_{function}(request, retries=3):\n",
+            f'    """Handle request {function} of module {number}."""\n',
+            "    for attempt in range(retries):\n",
+            f"        response = send(request, timeout={function + 1})\n",
+            "        if response.ok:\n",
+            "            return response.json()\n",
+            "    raise RuntimeError(request)\n",
+            "\n",
+        ]
+    return lines
+
+
+def create_refactored_repository(path: Path, files: int, functions: int) -> None:
+    """Create a repository with a staged refactoring of its Python modules.
+
+    Every module gets one of four typical changes in turn: a few edited
+    lines, a reindented block, a function moved to a new module, or a rename
+    with an edit. Unlike `create_repository`, which stages new files only,
+    the diff has context lines, moved blocks and whitespace changes, which
+    the diff encodings are meant to shrink.
+
+    Args:
+        path: An empty directory for the repository.
+        files: The number of modules.
+        functions: The number of functions of every module.
+
+    """
+
+    def git(*args: str) -> None:
+        subprocess.run(["git", *args], cwd=path, check=True, capture_output=True)
+
+    git("init", "-q", "-b", "main")
+    git("config", "user.email", "bench@example.com")
+    git("config", "user.name", "bench")
+    modules = {number: _module(number, functions) for number in range(files)}
+    for number, lines in modules.items():
+        (path / f"module_{number}.py").write_text("".join(lines))
+    git("add", ".")
+    git("commit", "-q", "-m", "feat: add the modules")
+
+    for number, lines in modules.items():
+        module = path / f"module_{number}.py"
+        middle = functions // 2 * 8
+        if number % 4 == 0:
+            lines[middle + 3] = lines[middle + 3].replace("timeout=", "deadline=")
+            lines[middle + 5] = lines[middle + 5].replace("json()", "text")
+        elif number % 4 == 1:
+            # Wrap a function in a class, reindenting it.
+            block = lines[middle : middle + 8]
+            lines[middle : middle + 8] = ["class Handler:\n"] + [
+                f"    {line}" if line.strip() else line for line in block
+            ]
+        elif number % 4 == 2:
+            moved = lines[middle : middle + 8]
+            del lines[middle : middle + 8]
+            (path / f"extracted_{number}.py").write_text("".join(moved))
+        else:
+            lines[1] = lines[1].replace("Handle", "Process")
+            module.unlink()
+            module = path / f"renamed_{number}.py"
+        module.write_text("".join(lines))
+    git("add", "--all")
+
+
+def create_codemod_repository(path: Path, files: int, functions: int) -> None:
+    """Create a repository with a staged codemod of its Python modules.
+
+    The import of `send` is renamed in every module, and every call of it is
+    renamed to `dispatch`, each call in code of its own, like the result of a
+    codemod or a search and replace across the repository.
+
+    Args:
+        path: An empty directory for the repository.
+        files: The number of modules.
+        functions: The number of functions of every module.
+
+    """
+
+    def git(*args: str) -> None:
+        subprocess.run(["git", *args], cwd=path, check=True, capture_output=True)
+
+    git("init", "-q", "-b", "main")
+    git("config", "user.email", "bench@example.com")
+    git("config", "user.name", "bench")
+    header = ["from old_package.client import send\n", "\n"]
+    for number in range(files):
+        content = "".join(header + _module(number, functions))
+        (path / f"module_{number}.py").write_text(content)
+    git("add", ".")
+    git("commit", "-q", "-m", "feat: add the modules")
+
+    for number in range(files):
+        module = path / f"module_{number}.py"
+        content = module.read_text().replace("old_package", "new_package")
+        module.write_text(content.replace("send(", "dispatch("))
+    git("add", "--all")
+
+
+class FakeGeminiServer:
+    """Answer Gemini API requests locally after a simulated latency.
+
+    Model metadata requests answer after `connect_latency` seconds, standing
+    in for the DNS lookup and TLS handshake of the first request, and content
+    requests after `response_latency` seconds. Cached contents are accepted
+    and the content requests using them are counted in `cached_requests`.
+    """
+
+    def __init__(self, connect_latency: float = 0.0, response_latency: float = 0.0):
+        """Start serving on a free local port.
+
+        Args:
+            connect_latency: The delay of model metadata requests in seconds.
+            response_latency: The delay of content requests in seconds.
+
+        """
+        self.connect_latency = connect_latency
+        self.response_latency = response_latency
+        self.request_bytes: list[int] = []
+        self.cached_contents: list[str] = []
+        self.cached_requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def base_url(self) -> str:
+        """Return the URL to configure as the API base URL."""
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def reply(self, body: bytes, content_type: str) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:  # noqa: N802 - name required by the base class
+                time.sleep(server.connect_latency)
+                name = self.path.rsplit("/", 1)[-1]
+                self.reply(json.dumps({"name": name}).encode(), "application/json")
+
+            def reply_cached_content(self, name: str) -> None:
+                expire_time = time.strftime(
+                    "%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 3600)
+                )
+                body = json.dumps({"name": name, "expireTime": expire_time})
+                self.reply(body.encode(), "application/json")
+
+            def do_PATCH(self) -> None:  # noqa: N802 - name required by the base class
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                path = self.path.split("?", 1)[0]
+                self.reply_cached_content(path.split("/v1beta/", 1)[-1])
+
+            def do_POST(self) -> None:  # noqa: N802 - name required by the base class
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                if self.path.split("?", 1)[0].endswith("/cachedContents"):
+                    name = f"cachedContents/{len(server.cached_contents) + 1}"
+                    server.cached_contents.append(name)
+                    self.reply_cached_content(name)
+                    return
+
+                server.request_bytes.append(len(body))
+                if "cachedContent" in json.loads(body):
+                    server.cached_requests += 1
+                time.sleep(server.response_latency)
+                response = json.dumps(
+                    {
+                        "candidates": [
+                            {
+                                "content": {
+                                    "parts": [{"text": RESPONSE_TEXT}],
+                                    "role": "model",
+                                },
+                                "finishReason": "STOP",
+                            }
+                        ]
+                    }
+                )
+                if ":streamGenerateContent" in self.path:
+                    body = f"data: {response}\r\n\r\n".encode()
+                    self.reply(body, "text/event-stream")
+                else:
+                    self.reply(response.encode(), "application/json")
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+        return Handler
+
+    def shutdown(self) -> None:
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
@@ -1,7 +1,547 @@
 """Uses google genai to generate a commit message."""
 
+import asyncio
+import json
+import threading
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+
 from google import genai
-from google.genai import types
+from google.genai import errors, types
+
+from .candidates import dedupe_messages
+from .compaction import compact_diff
+from .latency import LatencyHistory
+from .prefix_cache import PrefixCache
+from .prompt import build_prompt_prefix, build_prompt_suffix, build_summary_prompt
+from .resilience import (
+    MAX_RETRIES,
+    Deadline,
+    DeadlineExceededError,
+    backoff_delay,
+    circuit_breaker,
+    is_transient,
+)
+from .tokens import estimate_tokens
+from .tracing import Span, span
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+# The smallest diff, in tokens, that a prompt is shrunk to near its deadline.
+MIN_SHRUNK_DIFF_TOKENS = 1000
+
+
+def _http_options(timeout: float | None) -> types.HttpOptions | None:
+    # In milliseconds, so that a request abandoned at the deadline ends too.
+    if timeout is None:
+        return None
+    return types.HttpOptions(timeout=int(timeout * 1000) + 1)
+
+
+def _generate_content_config(
+    response_mime_type: str | None = None,
+    cached_content: str | None = None,
+    candidate_count: int | None = None,
+    timeout: float | None = None,
+) -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        thinking_config=types.ThinkingConfig(thinking_budget=0),  # Disables thinking
+        response_mime_type=response_mime_type,
+        cached_content=cached_content,
+        candidate_count=candidate_count,
+        http_options=_http_options(timeout),
+    )
+
+
+def _candidate_texts(response: types.GenerateContentResponse) -> list[str]:
+    """Return the text of every candidate of a response."""
+    texts = []
+    for candidate in response.candidates or []:
+        parts = candidate.content.parts if candidate.content else None
+        texts.append("".join(part.text for part in parts or [] if part.text))
+    return texts
+
+
+def _parse_file_summaries(text: str) -> dict[str, str]:
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {path: summary for path, summary in data.items() if isinstance(summary, str)}
+
+
+def _record_response(current: Span | None, text: str) -> None:
+    if current:
+        current.add_text("response", text)
+
+
+def _build_prompt(
+    git_logs: str, staged_changes: str, message_specifications: str, context: str
+) -> tuple[str, str]:
+    """Return the stable prefix and the volatile suffix of the prompt."""
+    with span("prompt_build") as current:
+        prefix = build_prompt_prefix(git_logs, message_specifications)
+        suffix = build_prompt_suffix(staged_changes, context)
+        if current:
+            current.add_text("prompt", prefix + suffix)
+            current.add_text("prefix", prefix)
+    return prefix, suffix
+
+
+@contextmanager
+def _maintaining_prefix(
+    prefix_cache: PrefixCache | None, model: str, prefix: str, deadline: Deadline
+) -> Iterator[None]:
+    """Register or refresh the cached prefix while the block sends the request.
+
+    The registration is not waited for past the deadline, and is then left
+    unsaved, to be registered again by a later run.
+    """
+    if prefix_cache is None:
+        yield
+        return
+    thread = threading.Thread(
+        target=prefix_cache.maintain,
+        args=(model, prefix, _http_options(deadline.remaining())),
+        daemon=True,
+    )
+    thread.start()
+    try:
+        yield
+    finally:
+        thread.join(deadline.remaining())
+        if not thread.is_alive():
+            prefix_cache.save()
+
+
+def _in_thread[T](func: Callable[[], T]) -> "asyncio.Future[T]":
+    """Run a blocking call in a daemon thread and return its future.
+
+    Unlike the default executor, an abandoned daemon thread never delays the
+    exit of the process, e.g. while the losing request of a race finishes.
+    """
+    loop = asyncio.get_running_loop()
+    future: asyncio.Future[T] = loop.create_future()
+
+    def succeed(result: T) -> None:
+        if not future.done():
+            future.set_result(result)
+
+    def fail(error: Exception) -> None:
+        if not future.done():
+            future.set_exception(error)
+
+    def run() -> None:
+        try:
+            try:
+                result = func()
+            except Exception as error:
+                loop.call_soon_threadsafe(fail, error)
+            else:
+                loop.call_soon_threadsafe(succeed, result)
+        except RuntimeError:  # The loop is closed, the result is not needed.
+            pass
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def _plan_attempts(
+    models: list[str],
+    hedge_quantile: float,
+    history: LatencyHistory,
+    prompt_tokens: int = 0,
+    time_left: float | None = None,
+) -> tuple[list[str], float | None]:
+    """Choose the models to try and when to hedge the first one.
+
+    The first model is the best ranked one. The second model, the hedge, is
+    the next ranked one. A single configured model is never hedged, as a
+    second request to it would only double the cost. Near a deadline, the
+    models predicted to answer in time come first.
+
+    Returns:
+        The models of the first and the second request, and the number of
+        seconds after which the second request is sent, or None to send it
+        only if the first one fails.
+
+    """
+    ranked = history.rank(models)
+    if time_left is not None:
+
+        def is_late(model: str) -> bool:
+            predicted = history.predict(model, prompt_tokens)
+            return predicted is not None and predicted > time_left
+
+        ranked.sort(key=is_late)
+    hedge_after = None
+    if 0 < hedge_quantile < 1 and len(ranked) > 1:
+        hedge_after = history.quantile(ranked[0], hedge_quantile)
+    return ranked[:2], hedge_after
+
+
+async def _race[T](
+    send: Callable[[str], Awaitable[T]],
+    attempts: list[str],
+    hedge_after: float | None,
+    history: LatencyHistory,
+    prompt_tokens: int,
+) -> tuple[str, T]:
+    """Send the request and hedge it if it is slower than usual.
+
+    The first model to answer wins and the other request is abandoned: its
+    thread cannot be stopped, so it still runs to the end and is billed in
+    full, only its answer is ignored. If a request fails, the next model is
+    tried right away.
+
+    Args:
+        send: Sends the request to a model and returns the response text.
+        attempts: The models of the first and the second request.
+        hedge_after: The number of seconds after which the second request is
+            sent, or None to send it only if the first one fails.
+        history: The latency history every outcome is recorded in.
+        prompt_tokens: The estimated size of the prompt, recorded with it.
+
+    Returns:
+        The model that answered and its response.
+
+    Raises:
+        Exception: The error of the last request if every request failed.
+
+    """
+    pending: dict[asyncio.Future[T], tuple[str, float]] = {}
+    remaining = list(attempts)
+
+    def start() -> None:
+        model = remaining.pop(0)
+        pending[asyncio.ensure_future(send(model))] = (model, time.perf_counter())
+
+    start()
+    error: BaseException | None = None
+    try:
+        while pending:
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=hedge_after if remaining else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:  # The request is slower than usual, hedge it.
+                start()
+                continue
+            for future in done:
+                model, started_at = pending.pop(future)
+                seconds = time.perf_counter() - started_at
+                error = future.exception()
+                history.record(model, seconds, prompt_tokens, ok=error is None)
+                if error is None:
+                    return model, future.result()
+            if remaining and not pending:
+                start()
+        # Every request failed, report the last error.
+        raise error or RuntimeError("No request was sent.")
+    finally:
+        for future, (model, started_at) in pending.items():
+            future.cancel()  # Ignores the answer, the request goes on.
+            # The loser took at least this long, which keeps the slow tail of
+            # the model in its history.
+            history.record(model, time.perf_counter() - started_at, prompt_tokens)
+
+
+def create_client(api_key: str, base_url: str = "") -> genai.Client:
+    """Create a client for the google genai API.
+
+    Args:
+        api_key: The API key to authenticate with.
+        base_url: The URL of the API (default: the Gemini API)
+
+    Returns:
+        The client.
+
+    """
+    if base_url:
+        return genai.Client(
+            api_key=api_key, http_options=types.HttpOptions(base_url=base_url)
+        )
+    return genai.Client(
+        api_key=api_key,
+    )
+
+
+def warm_up_client(
+    client: genai.Client, model: str, timeout: float | None = None
+) -> None:
+    """Open the connection of the client before the first real request.
+
+    Fetching the model metadata resolves the API host and completes the TLS
+    handshake, and the client keeps the connection alive for the request that
+    follows. Failures are ignored; the real request will report them.
+
+    Args:
+        client: The client to warm up.
+        model: The model the real request will use.
+        timeout: The seconds the request may take (default: no limit)
+
+    """
+    try:
+        client.models.get(
+            model=model,
+            config=types.GetModelConfig(http_options=_http_options(timeout)),
+        )
+    except Exception:  # Warming up is best effort
+        pass
+
+
+class _SuggestionRequest:
+    """Hold what every attempt of a suggestion shares."""
+
+    def __init__(
+        self,
+        client: genai.Client,
+        git_logs: str,
+        staged_changes: str,
+        message_specifications: str,
+        context: str,
+        models: list[str],
+        hedge_quantile: float,
+        prefix_cache_ttl: int,
+        deadline: Deadline | None = None,
+    ) -> None:
+        self.client = client
+        self.staged_changes = staged_changes
+        self.context = context
+        self.prefix, self.suffix = _build_prompt(
+            git_logs, staged_changes, message_specifications, context
+        )
+        self.prompt = self.prefix + self.suffix
+        self.prompt_tokens = estimate_tokens(self.prompt)
+        self.models = models
+        self.hedge_quantile = hedge_quantile
+        self.deadline = deadline or Deadline(0)
+        self.history = LatencyHistory.load()
+        self.attempts, self.hedge_after = _plan_attempts(
+            models, hedge_quantile, self.history
+        )
+        self.prefix_cache = None
+        if prefix_cache_ttl > 0 and PrefixCache.is_cacheable(self.prefix):
+            self.prefix_cache = PrefixCache.load(client, prefix_cache_ttl)
+        self.used_cached_prefix: set[str] = set()
+        self.shrunk_to: int | None = None  # The diff budget near the deadline.
+
+    def _fit_deadline(self) -> None:
+        """Pick the models and shrink the diff to answer within the deadline.
+
+        While the best model is predicted to miss the deadline, the diff is
+        compacted to half its size, down to MIN_SHRUNK_DIFF_TOKENS.
+        """
+        time_left = self.deadline.remaining()
+        if time_left is None:
+            return
+        self.attempts, self.hedge_after = _plan_attempts(
+            self.models,
+            self.hedge_quantile,
+            self.history,
+            self.prompt_tokens,
+            time_left,
+        )
+        while True:
+            predicted = self.history.predict(self.attempts[0], self.prompt_tokens)
+            budget = estimate_tokens(self.staged_changes) // 2
+            if predicted is None or predicted <= time_left:
+                return
+            if budget < MIN_SHRUNK_DIFF_TOKENS:
+                return
+            shrunk = compact_diff(self.staged_changes, budget).diff
+            if not shrunk or shrunk == self.staged_changes:
+                return  # E.g. summaries, which are not a diff.
+            self.staged_changes = shrunk
+            self.suffix = build_prompt_suffix(self.staged_changes, self.context)
+            self.prompt = self.prefix + self.suffix
+            self.prompt_tokens = estimate_tokens(self.prompt)
+            self.shrunk_to = budget
+
+    def generate(self, model: str, count: int = 1) -> list[str]:
+        """Send the prompt, with the cached prefix if there is one.
+
+        Args:
+            model: The model to send the prompt to.
+            count: The number of candidates to ask for.
+
+        Returns:
+            The text of every candidate, fewer than asked if the model
+            returned fewer.
+
+        """
+        candidate_count = count if count > 1 else None
+        cached_content = (
+            self.prefix_cache.lookup(model, self.prefix) if self.prefix_cache else None
+        )
+        if self.prefix_cache and cached_content:
+            try:
+                response = self.client.models.generate_content(
+                    model=model,
+                    contents=self.suffix,
+                    config=_generate_content_config(
+                        cached_content=cached_content,
+                        candidate_count=candidate_count,
+                        timeout=self.deadline.remaining(),
+                    ),
+                )
+                self.used_cached_prefix.add(model)
+                return self._texts(response, count)
+            except errors.ClientError:
+                # The cached prefix expired or was deleted by the API.
+                self.prefix_cache.forget(model, self.prefix)
+        response = self.client.models.generate_content(
+            model=model,
+            contents=self.prompt,
+            config=_generate_content_config(
+                candidate_count=candidate_count, timeout=self.deadline.remaining()
+            ),
+        )
+        return self._texts(response, count)
+
+    @staticmethod
+    def _texts(response: types.GenerateContentResponse, count: int) -> list[str]:
+        if count > 1:
+            return _candidate_texts(response)
+        return [response.text or ""]
+
+    def race(self, count: int = 1) -> tuple[str, list[str]]:
+        """Send the prompt to the best model, hedged, and return its candidates.
+
+        Transient errors are retried with exponential backoff while the
+        deadline allows.
+
+        Raises:
+            DeadlineExceededError: If no model answered before the deadline.
+
+        """
+        retry = 0
+        while True:
+            self._fit_deadline()
+            try:
+                return self._race_once(count)
+            except DeadlineExceededError:
+                raise
+            except Exception as error:
+                delay = backoff_delay(retry)
+                time_left = self.deadline.remaining()
+                if (
+                    not is_transient(error)
+                    or retry >= MAX_RETRIES
+                    or (time_left is not None and delay >= time_left)
+                ):
+                    raise
+            with span("retry_backoff") as current:
+                if current:
+                    current.attributes["retry"] = retry + 1
+                time.sleep(delay)
+            retry += 1
+
+    def _race_once(self, count: int) -> tuple[str, list[str]]:
+        def send(model: str) -> "asyncio.Future[list[str]]":
+            def generate() -> list[str]:
+                if count > 1:
+                    try:
+                        return self.generate(model, count)
+                    except errors.ClientError:
+                        pass  # The model does not support several candidates.
+                return self.generate(model)
+
+            return _in_thread(generate)
+
+        async def race() -> tuple[str, list[str]]:
+            try:
+                return await asyncio.wait_for(
+                    _race(
+                        send,
+                        self.attempts,
+                        self.hedge_after,
+                        self.history,
+                        self.prompt_tokens,
+                    ),
+                    timeout=self.deadline.remaining(),
+                )
+            except TimeoutError:
+                raise DeadlineExceededError(
+                    f"No answer within the {self.deadline.seconds:g}s deadline."
+                ) from None
+
+        with (
+            span("generate") as current,
+            _maintaining_prefix(
+                self.prefix_cache, self.attempts[0], self.prefix, self.deadline
+            ),
+        ):
+            try:
+                model, texts = asyncio.run(race())
+            finally:
+                self.history.save()
+            if current:
+                current.attributes["model"] = model
+                current.attributes["cached_prefix"] = model in self.used_cached_prefix
+                current.attributes["candidates"] = len(texts)
+                if self.shrunk_to is not None:
+                    current.attributes["shrunk_to_tokens"] = self.shrunk_to
+                _record_response(current, "\n\n".join(texts))
+        return model, texts
+
+    def stream(self, on_chunk: Callable[[str], None]) -> str:
+        """Stream the response of the best model, without hedging or retries."""
+        self._fit_deadline()
+        model = self.attempts[0]
+        chunks = []
+
+        def send(contents: str, cached_content: str | None = None) -> None:
+            for chunk in self.client.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=_generate_content_config(
+                    cached_content=cached_content, timeout=self.deadline.remaining()
+                ),
+            ):
+                if chunk.text:
+                    on_chunk(chunk.text)
+                    chunks.append(chunk.text)
+
+        cached_content = (
+            self.prefix_cache.lookup(model, self.prefix) if self.prefix_cache else None
+        )
+        started_at = time.perf_counter()
+        with (
+            span("generate_stream") as current,
+            _maintaining_prefix(self.prefix_cache, model, self.prefix, self.deadline),
+        ):
+            try:
+                if self.prefix_cache and cached_content:
+                    try:
+                        send(self.suffix, cached_content)
+                    except errors.ClientError:
+                        if chunks:
+                            raise
+                        self.prefix_cache.forget(model, self.prefix)
+                        send(self.prompt)
+                else:
+                    send(self.prompt)
+            except Exception:
+                self.history.record(
+                    model,
+                    time.perf_counter() - started_at,
+                    self.prompt_tokens,
+                    ok=False,
+                )
+                self.history.save()
+                raise
+            self.history.record(
+                model, time.perf_counter() - started_at, self.prompt_tokens
+            )
+            self.history.save()
+            if current:
+                current.attributes["model"] = model
+            _record_response(current, "".join(chunks))
+        return "".join(chunks)
 
 
 def suggest_commit_message(
@@ -10,41 +550,222 @@ def suggest_commit_message(
     staged_changes: str,
     message_specifications: str = "concise and clear",
     context: str = "",
+    on_chunk: Callable[[str], None] | None = None,
+    client: genai.Client | None = None,
+    models: list[str] | None = None,
+    hedge_quantile: float = 0.0,
+    prefix_cache_ttl: int = 0,
+    deadline: Deadline | None = None,
 ) -> str:
     """Suggests a commit message based on the changes in the repository.
 
+    The request goes to the fastest healthy model according to the latency
+    history. Unless the response is streamed, a second request is sent to the
+    next model if the first one takes longer than the `hedge_quantile` of its
+    past latencies or fails, and the first response wins.
+
     Args:
         api_key: The API key to use for generating the commit message.
         git_logs: The git logs to use as a reference.
         staged_changes: The staged changes to use as a reference.
         message_specifications: Additional specifications for the commit message.
         context: Additional context for the commit message.
+        on_chunk: If given, the response is streamed and every chunk of text is
+            passed to this callback as soon as it arrives.
+        client: The client to use, e.g. one that was warmed up in advance.
+        models: The models to choose from (default: gemini-2.5-flash)
+        hedge_quantile: The latency quantile after which the request is hedged,
+            e.g. 0.95; 0 disables hedging.
+        prefix_cache_ttl: The lifetime in seconds of the prompt prefix cached by
+            the API, which later requests reuse; 0 disables the prefix cache.
+        deadline: The latency budget of the suggestion. Transient errors are
+            retried within it, and near it a faster model or a smaller diff is
+            used.
 
     Returns:
         The suggested commit message.
 
+    Raises:
+        CircuitOpenError: If the recent suggestions failed.
+        DeadlineExceededError: If no model answered before the deadline.
+
     """
-    client = genai.Client(
-        api_key=api_key,
+    request = _SuggestionRequest(
+        client or create_client(api_key),
+        git_logs,
+        staged_changes,
+        message_specifications,
+        context,
+        models or [DEFAULT_MODEL],
+        hedge_quantile,
+        prefix_cache_ttl,
+        deadline,
     )
+    with circuit_breaker():
+        if on_chunk is None:
+            return request.race()[1][0]
+        return request.stream(on_chunk)
+
+
+def suggest_commit_messages(
+    api_key: str,
+    git_logs: str,
+    staged_changes: str,
+    count: int,
+    message_specifications: str = "concise and clear",
+    context: str = "",
+    client: genai.Client | None = None,
+    models: list[str] | None = None,
+    hedge_quantile: float = 0.0,
+    prefix_cache_ttl: int = 0,
+    deadline: Deadline | None = None,
+) -> list[str]:
+    """Suggest several distinct commit messages to choose from.
+
+    The candidates are asked for in a single request. If the model does not
+    support several candidates or returns fewer, the missing ones are asked
+    for by concurrent requests to the same model. Near-identical candidates are
+    dropped, so fewer than `count` messages may be returned.
+
+    Args:
+        api_key: The API key to use for generating the commit messages.
+        git_logs: The git logs to use as a reference.
+        staged_changes: The staged changes to use as a reference.
+        count: The number of candidates to ask for.
+        message_specifications: Additional specifications for the commit message.
+        context: Additional context for the commit message.
+        client: The client to use, e.g. one that was warmed up in advance.
+        models: The models to choose from (default: gemini-2.5-flash)
+        hedge_quantile: The latency quantile after which the request is hedged,
+            e.g. 0.95; 0 disables hedging.
+        prefix_cache_ttl: The lifetime in seconds of the prompt prefix cached by
+            the API, which later requests reuse; 0 disables the prefix cache.
+        deadline: The latency budget of the first request, see
+            `suggest_commit_message`.
 
-    prompt = f"""{
-        "Given the following git log:" if git_logs else "Given this new git repo:"
-    }
-    {git_logs}
-    and the following changes:
-    {staged_changes}
+    Returns:
+        The distinct suggested commit messages, the first one the best.
 
-    {f"Additional context: {context}" if context else ""}
-    suggest a {message_specifications} commit message.
-    ensure that you follow conventional commit message structure.
     """
+    request = _SuggestionRequest(
+        client or create_client(api_key),
+        git_logs,
+        staged_changes,
+        message_specifications,
+        context,
+        models or [DEFAULT_MODEL],
+        hedge_quantile,
+        prefix_cache_ttl,
+        deadline,
+    )
+    with circuit_breaker():
+        model, texts = request.race(count)
+    missing = count - len(texts)
+    if missing > 0:
+
+        async def top_up() -> list[list[str] | BaseException]:
+            return await asyncio.gather(
+                *(_in_thread(lambda: request.generate(model)) for _ in range(missing)),
+                return_exceptions=True,
+            )
+
+        with span("generate_more") as current:
+            results = asyncio.run(top_up())
+            if current:
+                current.attributes["requests"] = missing
+        # Candidates that failed are skipped, the first request succeeded.
+        texts += [text for r in results if isinstance(r, list) for text in r]
+    return dedupe_messages([text for text in texts if text.strip()])
+
+
+async def suggest_commit_message_async(
+    client: genai.Client,
+    git_logs: str,
+    staged_changes: str,
+    message_specifications: str = "concise and clear",
+    context: str = "",
+    models: list[str] | None = None,
+    hedge_quantile: float = 0.0,
+    history: LatencyHistory | None = None,
+) -> str:
+    """Suggests a commit message without blocking the event loop.
+
+    Args:
+        client: The client to use.
+        git_logs: The git logs to use as a reference.
+        staged_changes: The staged changes to use as a reference.
+        message_specifications: Additional specifications for the commit message.
+        context: Additional context for the commit message.
+        models: The models to choose from (default: gemini-2.5-flash)
+        hedge_quantile: The latency quantile after which the request is hedged,
+            e.g. 0.95; 0 disables hedging.
+        history: A latency history shared by concurrent calls, which the caller
+            saves (default: the history on disk, loaded and saved by this call)
+
+    Returns:
+        The suggested commit message.
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            thinking_config=types.ThinkingConfig(thinking_budget=0)  # Disables thinking
-        ),
+    """
+    prefix, suffix = _build_prompt(
+        git_logs, staged_changes, message_specifications, context
+    )
+    prompt = prefix + suffix
+    owns_history = history is None
+    history = history or LatencyHistory.load()
+    attempts, hedge_after = _plan_attempts(
+        models or [DEFAULT_MODEL], hedge_quantile, history
     )
-    return response.text
+
+    async def send(model: str) -> str:
+        response = await client.aio.models.generate_content(
+            model=model,
+            contents=prompt,
+            config=_generate_content_config(),
+        )
+        return response.text or ""
+
+    with span("generate") as current:
+        try:
+            model, text = await _race(
+                send, attempts, hedge_after, history, estimate_tokens(prompt)
+            )
+        finally:
+            if owns_history:
+                history.save()
+        if current:
+            current.attributes["model"] = model
+            _record_response(current, text)
+    return text
+
+
+async def summarize_files_async(
+    client: genai.Client,
+    changes: str,
+    model: str = DEFAULT_MODEL,
+    timeout: float | None = None,
+) -> dict[str, str]:
+    """Summarize every file of part of a change too large for a single prompt.
+
+    Args:
+        client: The client to use.
+        changes: The diff of a group of files.
+        model: The model to use.
+        timeout: The seconds the request may take (default: no limit)
+
+    Returns:
+        The summary of every file by path, without the files the model skipped.
+
+    """
+    with span("summarize") as current:
+        prompt = build_summary_prompt(changes)
+        if current:
+            current.add_text("prompt", prompt)
+        response = await client.aio.models.generate_content(
+            model=model,
+            contents=prompt,
+            config=_generate_content_config(
+                response_mime_type="application/json", timeout=timeout
+            ),
+        )
+        _record_response(current, response.text or "")
+    return _parse_file_summaries(response.text or "")
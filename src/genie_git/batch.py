@@ -0,0 +1,91 @@
+"""Suggests commit messages for many commits with bounded concurrency."""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import dataclass
+
+
+@dataclass
+class BatchItem:
+    """Represent a commit (or range of commits) to suggest a message for."""
+
+    commit: str
+    subject: str
+    git_logs: str
+    staged_changes: str
+    context: str = ""
+
+
+@dataclass
+class BatchResult:
+    """Represent the suggestion, or the error, for a batch item."""
+
+    item: BatchItem
+    message: str = ""
+    error: str = ""
+
+
+class RateLimiter:
+    """Space out the start of requests to stay under a rate limit."""
+
+    def __init__(self, requests_per_minute: int) -> None:
+        """Initialize the rate limiter.
+
+        Args:
+            requests_per_minute: The maximum request rate, 0 disables the limit.
+
+        """
+        self.interval = 60 / requests_per_minute if requests_per_minute > 0 else 0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        """Wait until the next request may start."""
+        if not self.interval:
+            return
+
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def suggest_in_order(
+    items: list[BatchItem],
+    suggest: Callable[[BatchItem], Awaitable[str]],
+    concurrency: int = 4,
+    requests_per_minute: int = 0,
+) -> AsyncIterator[BatchResult]:
+    """Suggest messages concurrently and yield them in the order of the items.
+
+    A result is yielded as soon as it and every result before it are done, so
+    output starts before the whole batch completes. A failing item yields its
+    error instead of aborting the batch.
+
+    Args:
+        items: The items to suggest messages for.
+        suggest: Returns the message for an item.
+        concurrency: The maximum number of requests in flight.
+        requests_per_minute: The maximum request rate, 0 disables the limit.
+
+    Yields:
+        The result of every item.
+
+    """
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    rate_limiter = RateLimiter(requests_per_minute)
+
+    async def run(item: BatchItem) -> BatchResult:
+        async with semaphore:
+            await rate_limiter.wait()
+            try:
+                return BatchResult(item=item, message=await suggest(item))
+            except Exception as error:  # Reported per item, the batch goes on
+                return BatchResult(item=item, error=str(error))
+
+    tasks = [asyncio.create_task(run(item)) for item in items]
+    for task in tasks:
+        yield await task
@@ -0,0 +1,169 @@
+"""Content-addressed on-disk cache with size and age limits."""
+
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .config import CONFIG_DIR, Config, write_atomically
+
+CACHE_DIR = CONFIG_DIR / "cache"
+RESPONSES_NAMESPACE = "responses"
+
+
+def make_key(*parts: str) -> str:
+    """Return a stable hash identifying the given parts.
+
+    Args:
+        parts: The values that together determine the cached result.
+
+    Returns:
+        The hex digest of the parts.
+
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        encoded = part.encode()
+        # Length-prefix every part so ("ab", "c") and ("a", "bc") differ.
+        digest.update(f"{len(encoded)}:".encode())
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+@dataclass
+class CacheStats:
+    """Represent the usage of a cache namespace."""
+
+    namespace: str
+    entries: int
+    size_bytes: int
+
+
+class DiskCache:
+    """Store text values as files named after their key.
+
+    The modification time of an entry doubles as its last access time, so a hit
+    costs a single read plus a timestamp update, and eviction removes the least
+    recently used entries first.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, max_age_seconds: float):
+        """Initialize the cache.
+
+        Args:
+            directory: The directory holding the cache entries.
+            max_bytes: The maximum total size of the entries.
+            max_age_seconds: The time after which an unused entry expires.
+
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key
+
+    def get(self, key: str) -> str | None:
+        """Return the cached value for the key or None on a miss."""
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.max_age_seconds:
+                path.unlink(missing_ok=True)
+                return None
+            value = path.read_text()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Store the value under the key and evict entries over the limits."""
+        self.set_many({key: value})
+
+    def set_many(self, items: dict[str, str]) -> None:
+        """Store every value under its key, then evict entries over the limits.
+
+        Eviction scans the whole directory, so storing many entries at once
+        scans it once rather than once per entry.
+        """
+        if not items:
+            return
+        for key, value in items.items():
+            write_atomically(self._path(key), value)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove expired entries, then the least recently used over the size."""
+        if not self.directory.exists():
+            return
+
+        now = time.time()
+        entries = []
+        for path in self.directory.iterdir():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.max_age_seconds:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total_size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+
+    def clear(self) -> int:
+        """Remove every entry and return the number of removed entries."""
+        if not self.directory.exists():
+            return 0
+
+        removed = 0
+        for path in self.directory.iterdir():
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def stats(self) -> CacheStats:
+        """Return the number of entries and their total size."""
+        sizes = (
+            [path.stat().st_size for path in self.directory.iterdir()]
+            if self.directory.exists()
+            else []
+        )
+        return CacheStats(
+            namespace=self.directory.name, entries=len(sizes), size_bytes=sum(sizes)
+        )
+
+
+def get_cache(namespace: str, config: Config) -> DiskCache:
+    """Return the cache namespace limited by the configured size and age.
+
+    Args:
+        namespace: The name of the cache, e.g. "responses".
+        config: The configuration holding the cache limits.
+
+    Returns:
+        The cache for the namespace.
+
+    """
+    return DiskCache(
+        CACHE_DIR / namespace,
+        max_bytes=config.cache_max_size_mb * 1024 * 1024,
+        max_age_seconds=config.cache_max_age_days * 24 * 60 * 60,
+    )
+
+
+def get_all_caches(config: Config) -> list[DiskCache]:
+    """Return every cache namespace that exists on disk."""
+    if not CACHE_DIR.exists():
+        return []
+    return [
+        get_cache(path.name, config)
+        for path in sorted(CACHE_DIR.iterdir())
+        if path.is_dir()
+    ]
@@ -0,0 +1,42 @@
+"""Compares candidate commit messages to offer only distinct ones."""
+
+import difflib
+import re
+
+# Candidates at least this similar after normalization count as duplicates.
+SIMILARITY_THRESHOLD = 0.9
+
+
+def _normalize(message: str) -> str:
+    return re.sub(r"\s+", " ", message).strip().rstrip(".").lower()
+
+
+def dedupe_messages(
+    messages: list[str], threshold: float = SIMILARITY_THRESHOLD
+) -> list[str]:
+    """Drop messages that are near-identical to an earlier one.
+
+    Messages differing only in case, whitespace or a final period are
+    duplicates, as are messages whose normalized texts are at least
+    `threshold` similar.
+
+    Args:
+        messages: The candidate messages, the preferred ones first.
+        threshold: The similarity ratio between 0 and 1 of duplicates.
+
+    Returns:
+        The distinct messages in their original order.
+
+    """
+    distinct: list[str] = []
+    normalized: list[str] = []
+    for message in messages:
+        text = _normalize(message)
+        if any(
+            difflib.SequenceMatcher(None, text, seen).ratio() >= threshold
+            for seen in normalized
+        ):
+            continue
+        distinct.append(message.strip())
+        normalized.append(text)
+    return distinct
@@ -2,7 +2,22 @@
 
 from argparse import ArgumentParser
 
-from .cli_handlers import handle_configure, handle_exclude_files, handle_suggest
+from .cli_handlers import (
+    handle_cache,
+    handle_circuit,
+    handle_configure,
+    handle_daemon,
+    handle_exclude_files,
+    handle_hooks,
+    handle_precompute,
+    handle_prepare_commit_msg,
+    handle_stats,
+    handle_suggest,
+    handle_watch,
+)
+from .precompute import DEFAULT_DEBOUNCE_SECONDS
+from .startup_profile import STARTUP_PROFILE_ENV, STARTUP_PROFILE_FLAG
+from .tracing import TRACE_ENV
 
 
 def create_parser() -> ArgumentParser:
@@ -17,12 +32,128 @@ def create_parser() -> ArgumentParser:
         action="store_true",
         help="Copy the commit message to the clipboard.",
     )
+    suggest_options_parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print the commit message while it is being generated.",
+    )
+    suggest_options_parser.add_argument(
+        "--range",
+        help=(
+            "Suggest a message for the combined changes of a range of commits, "
+            "e.g. main..HEAD, instead of the staged changes."
+        ),
+    )
+    suggest_options_parser.add_argument(
+        "--each-commit",
+        action="store_true",
+        help="With --range, suggest a message for every commit in the range.",
+    )
+    suggest_options_parser.add_argument(
+        "--jobs",
+        type=int,
+        help="The maximum number of concurrent requests for --each-commit.",
+    )
+    suggest_options_parser.add_argument(
+        "--json",
+        action="store_true",
+        help=(
+            "With --range or --split-scopes, print every suggestion as a line "
+            "of JSON. "
+            "With --dry-run, print the report as JSON."
+        ),
+    )
+    suggest_options_parser.add_argument(
+        "--split-scopes",
+        action="store_true",
+        help=(
+            "Suggest a message for every package the staged changes touch, "
+            "concurrently, each with the log of its package."
+        ),
+    )
+    suggest_options_parser.add_argument(
+        "--plan",
+        action="store_true",
+        help=(
+            "With --split-scopes, also print the git commands committing every "
+            "package on its own."
+        ),
+    )
+    suggest_options_parser.add_argument(
+        "--submodules",
+        action="store_true",
+        help=(
+            "Replace every staged submodule change with the subjects and line "
+            "counts of its range of commits."
+        ),
+    )
+    suggest_options_parser.add_argument(
+        "--candidates",
+        type=int,
+        metavar="N",
+        help=(
+            "Ask for N candidate messages in a single request and pick one of "
+            "them, which is copied to the clipboard."
+        ),
+    )
+    suggest_options_parser.add_argument(
+        "--diff-encoding",
+        metavar="ENCODING",
+        help=(
+            "How the changes are encoded in the prompt, e.g. context-1+structured "
+            "[Default: the configured encoding]."
+        ),
+    )
+    suggest_options_parser.add_argument(
+        "--deadline",
+        type=float,
+        metavar="SECONDS",
+        help=(
+            "The latency budget of the suggestion. Failed requests are retried "
+            "within it, and a faster model or a smaller diff is used near it "
+            "[Default: the configured deadline, 0 disables it]."
+        ),
+    )
+    suggest_options_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help=(
+            "Build the prompt without sending it and report its size by section "
+            "and its latency predicted from past requests."
+        ),
+    )
+    suggest_options_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore cached commit messages and always query the AI.",
+    )
+    suggest_options_parser.add_argument(
+        "--timings",
+        action="store_true",
+        help=(
+            "Print how long every stage took to stderr."
+            f"[Set {TRACE_ENV}=path to append a JSON trace of every run to a file]"
+        ),
+    )
+    suggest_options_parser.add_argument(
+        "--timings-json",
+        action="store_true",
+        help="Print the timings to stderr as a line of JSON.",
+    )
 
     parser = ArgumentParser(
         "genie-git",
         description="An AI-powered tool to suggest conventional git commit messages.",
         parents=[suggest_options_parser],
     )
+    parser.add_argument(
+        STARTUP_PROFILE_FLAG,
+        action="store_true",
+        help=(
+            "Print an import time breakdown of the command to stderr."
+            f"[Can also be enabled with the {STARTUP_PROFILE_ENV} variable]"
+        ),
+    )
     parser.set_defaults(func=handle_suggest)
 
     subparsers = parser.add_subparsers(dest="command")
@@ -44,6 +175,40 @@ def create_parser() -> ArgumentParser:
             "[Default: gemini-2.5-flash]."
         ),
     )
+    parser_configure.add_argument(
+        "--models",
+        nargs="*",
+        help=(
+            "Other models to choose from by latency and to hedge slow requests "
+            "with. Pass no model to clear the list."
+        ),
+    )
+    parser_configure.add_argument(
+        "--hedge-quantile",
+        type=float,
+        help=(
+            "Send a second request to the next model when the first one is "
+            "slower than this quantile of the past latencies, e.g. 0.95 "
+            "[Default: 0, disabled]."
+        ),
+    )
+    parser_configure.add_argument(
+        "--prefix-cache-ttl-minutes",
+        type=int,
+        help=(
+            "Cache the instructions and the git log of the prompt with the API "
+            "for this many minutes after their last use, when they are large "
+            "enough to be cached [Default: 10, 0 disables it]."
+        ),
+    )
+    parser_configure.add_argument(
+        "--deadline-seconds",
+        type=float,
+        help=(
+            "The default latency budget of a suggestion, also used by the git "
+            "hooks [Default: 0, disabled]."
+        ),
+    )
     parser_configure.add_argument(
         "--api-key",
         help=(
@@ -52,6 +217,10 @@ def create_parser() -> ArgumentParser:
             "https://aistudio.google.com/apikey]"
         ),
     )
+    parser_configure.add_argument(
+        "--api-base-url",
+        help="An alternative URL of the API, e.g. a proxy [Default: Gemini API].",
+    )
     parser_configure.add_argument(
         "--message-specifications",
         help="Additional specifications for the commit message.",
@@ -60,6 +229,14 @@ def create_parser() -> ArgumentParser:
         "--number-of-commits",
         help="The number of commits to include in the AI prompt as a reference.",
     )
+    parser_configure.add_argument(
+        "--max-prompt-tokens",
+        type=int,
+        help=(
+            "The estimated number of tokens the prompt may use. Larger staged "
+            "changes are trimmed to fit [Default: 32000, 0 disables the limit]."
+        ),
+    )
     parser_configure.add_argument(
         "--show",
         action="store_true",
@@ -75,14 +252,279 @@ def create_parser() -> ArgumentParser:
         action="store_true",
         help="Disable always copy the commit message to the clipboard.",
     )
+    parser_configure.add_argument(
+        "--always-stream",
+        action="store_true",
+        help="Always print the commit message while it is being generated.",
+    )
+    parser_configure.add_argument(
+        "--always-stream-off",
+        action="store_true",
+        help="Disable always streaming the commit message.",
+    )
+    parser_configure.add_argument(
+        "--relevant-commits",
+        action="store_true",
+        help=(
+            "Reference the past commits that changed the staged paths in the "
+            "prompt, found in an index of the history."
+        ),
+    )
+    parser_configure.add_argument(
+        "--relevant-commits-off",
+        action="store_true",
+        help="Reference the last commits in the prompt instead [Default].",
+    )
+    parser_configure.add_argument(
+        "--expand-submodules",
+        action="store_true",
+        help=(
+            "Always replace every staged submodule change with the subjects and "
+            "line counts of its range of commits."
+        ),
+    )
+    parser_configure.add_argument(
+        "--expand-submodules-off",
+        action="store_true",
+        help="Send staged submodule changes as their commit ids only [Default].",
+    )
+    parser_configure.add_argument(
+        "--map-reduce-threshold-tokens",
+        type=int,
+        help=(
+            "Staged changes estimated above this many tokens are summarized in "
+            "parts before suggesting a message [Default: 100000, 0 disables it]."
+        ),
+    )
+    parser_configure.add_argument(
+        "--map-reduce-chunk-tokens",
+        type=int,
+        help="The number of tokens of every summarized part [Default: 16000].",
+    )
+    parser_configure.add_argument(
+        "--max-concurrency",
+        type=int,
+        help="The maximum number of concurrent requests [Default: 4].",
+    )
+    parser_configure.add_argument(
+        "--requests-per-minute",
+        type=int,
+        help="The maximum request rate [Default: 0, unlimited].",
+    )
+    parser_configure.add_argument(
+        "--cache-max-size-mb",
+        type=int,
+        help="The maximum size of each cache in megabytes [Default: 50].",
+    )
+    parser_configure.add_argument(
+        "--cache-max-age-days",
+        type=int,
+        help="The number of days after which an unused cache entry expires.",
+    )
+    parser_configure.add_argument(
+        "--stat-only-files",
+        nargs="*",
+        help=(
+            "Files or glob patterns sent as line counts only, replacing the "
+            "default lockfiles and generated files. Pass none to send all patches."
+        ),
+    )
+    parser_configure.add_argument(
+        "--max-file-diff-lines",
+        type=int,
+        help=(
+            "Files changing more lines are sent as line counts only "
+            "[Default: 1000, 0 disables the limit]."
+        ),
+    )
+    parser_configure.add_argument(
+        "--max-diff-read-tokens",
+        type=int,
+        help=(
+            "The estimated tokens of patches read before git is stopped and the "
+            "files left are sent as line counts only "
+            "[Default: 1000000, 0 disables the limit]."
+        ),
+    )
+    parser_configure.add_argument(
+        "--scope-roots",
+        nargs="*",
+        help=(
+            "The package directories of a monorepo for --split-scopes, e.g. "
+            "'packages/*' 'services/*'. Pass none to treat every top-level "
+            "directory as a package."
+        ),
+    )
+    parser_configure.add_argument(
+        "--diff-encoding",
+        help=(
+            "How the changes are encoded in the prompt: unified, context-1, "
+            "context-0, ignore-whitespace, word-diff, moves or structured, or "
+            "several joined with '+' [Default: unified]."
+        ),
+    )
+    parser_configure.add_argument(
+        "--cluster-min-hunks",
+        type=int,
+        metavar="N",
+        help=(
+            "Send an edit repeated in at least N hunks, e.g. by a codemod, as "
+            "one hunk with the list of its files [Default: 3, 0 disables it]."
+        ),
+    )
+    parser_configure.add_argument(
+        "--daemon-idle-minutes",
+        type=int,
+        help="The daemon exits after this many idle minutes [Default: 30, 0 never].",
+    )
+    parser_configure.add_argument(
+        "--telemetry-max-records",
+        type=int,
+        help=(
+            "The number of suggest runs kept for `genie-git stats` "
+            "[Default: 10000, 0 disables recording them]."
+        ),
+    )
+    parser_configure.add_argument(
+        "--telemetry-max-age-days",
+        type=int,
+        help=(
+            "The number of days after which a recorded suggest run is dropped "
+            "[Default: 90, 0 keeps it until the record limit]."
+        ),
+    )
     parser_configure.set_defaults(func=handle_configure)
 
     parser_exclude_files = subparsers.add_parser(
-        "exclude-files", help="Add files to exclude from the diff."
+        "exclude-files", help="Add files or glob patterns to exclude from the diff."
     )
     parser_exclude_files.add_argument(
-        "files", nargs="+", help="The files to exclude from the diff."
+        "files",
+        nargs="+",
+        help=(
+            'The files, directories ending with "/" or glob patterns, e.g. '
+            '"*.snap", to exclude from the diff.'
+        ),
     )
     parser_exclude_files.set_defaults(func=handle_exclude_files)
 
+    parser_cache = subparsers.add_parser(
+        "cache", help="Show statistics about or clear the response cache."
+    )
+    parser_cache.add_argument(
+        "action", choices=["stats", "clear"], help="The cache action to perform."
+    )
+    parser_cache.set_defaults(func=handle_cache)
+
+    parser_stats = subparsers.add_parser(
+        "stats",
+        help=(
+            "Report the latency percentiles, prompt sizes, cache hits and errors "
+            "of the recorded suggest runs."
+        ),
+    )
+    parser_stats.add_argument(
+        "--days",
+        type=int,
+        default=30,
+        help="Only report the runs of this many last days [Default: 30, 0 all].",
+    )
+    parser_stats.add_argument(
+        "--top",
+        type=int,
+        default=5,
+        help="The number of repositories and slowest runs to list [Default: 5].",
+    )
+    parser_stats.add_argument(
+        "--json", action="store_true", help="Print the report as JSON."
+    )
+    parser_stats.set_defaults(func=handle_stats)
+
+    parser_circuit = subparsers.add_parser(
+        "circuit",
+        help=(
+            "Show or reset the circuit breaker that stops calling the API after "
+            "repeated failures."
+        ),
+    )
+    parser_circuit.add_argument(
+        "action",
+        nargs="?",
+        default="status",
+        choices=["status", "reset"],
+        help="Show the state of the circuit or close it [Default: status].",
+    )
+    parser_circuit.set_defaults(func=handle_circuit)
+
+    parser_daemon = subparsers.add_parser(
+        "daemon",
+        help=(
+            "Manage a background process that serves suggestions from "
+            "genie-git-client without the startup cost."
+        ),
+    )
+    parser_daemon.add_argument(
+        "action",
+        nargs="?",
+        default="start",
+        choices=["start", "run", "stop", "status"],
+        help=(
+            "Start the daemon in the background, run it in the foreground, "
+            "stop it or show its status [Default: start]."
+        ),
+    )
+    parser_daemon.set_defaults(func=handle_daemon)
+
+    debounce_parser = ArgumentParser(add_help=False)
+    debounce_parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE_SECONDS,
+        help=(
+            "The number of seconds the index must stay unchanged before the "
+            f"message is generated [Default: {DEFAULT_DEBOUNCE_SECONDS}]."
+        ),
+    )
+
+    parser_watch = subparsers.add_parser(
+        "watch",
+        parents=[debounce_parser],
+        help="Precompute the message whenever the staged changes settle.",
+    )
+    parser_watch.set_defaults(func=handle_watch)
+
+    parser_precompute = subparsers.add_parser(
+        "precompute",
+        parents=[debounce_parser],
+        help="Precompute the message for the staged changes, run by a git hook.",
+    )
+    parser_precompute.set_defaults(func=handle_precompute)
+
+    parser_prepare_commit_msg = subparsers.add_parser(
+        "prepare-commit-msg",
+        help="Fill in the precomputed message, run by the git hook.",
+    )
+    parser_prepare_commit_msg.add_argument(
+        "file", help="The file holding the commit message."
+    )
+    parser_prepare_commit_msg.add_argument(
+        "source", nargs="?", help="The source of the commit message."
+    )
+    parser_prepare_commit_msg.add_argument(
+        "sha", nargs="?", help="The commit being amended, if any."
+    )
+    parser_prepare_commit_msg.set_defaults(func=handle_prepare_commit_msg)
+
+    parser_hooks = subparsers.add_parser(
+        "hooks",
+        help=(
+            "Install or remove the git hooks that precompute the message and "
+            "fill it in on git commit."
+        ),
+    )
+    parser_hooks.add_argument(
+        "action", choices=["install", "uninstall"], help="The hooks action."
+    )
+    parser_hooks.set_defaults(func=handle_hooks)
+
     return parser
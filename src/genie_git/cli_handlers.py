@@ -1,13 +1,69 @@
 """Handles cli commands."""
 
+import os
+import sys
+import time
 from argparse import Namespace
+from collections.abc import Callable
+from dataclasses import replace
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-import pyperclip
-
-from .ai_handler import suggest_commit_message
+from .cache import RESPONSES_NAMESPACE, get_all_caches, get_cache, make_key
+from .compaction import compact_diff
 from .config import Config
-from .git_handler import get_log, get_repository_changes
+from .diff_encoding import encode_diff, parse_encoding
+from .exclusions import ExclusionRules, is_glob
+from .prompt import build_prompt
+from .resilience import (
+    CircuitBreaker,
+    Deadline,
+    DeadlineExceededError,
+    circuit_breaker,
+)
+from .tokens import estimate_tokens
+from .tracing import (
+    TRACE_ENV,
+    Tracer,
+    span,
+    start_tracing,
+    stop_tracing,
+    write_trace,
+)
+
+if TYPE_CHECKING:
+    from .batch import BatchItem, BatchResult
+    from .map_reduce import FileSummaries
+
+
+class StreamPrinter:
+    """Print streamed chunks as they arrive and measure the response latency."""
+
+    def __init__(self) -> None:
+        """Start measuring the latency."""
+        self.started_at = time.perf_counter()
+        self.first_chunk_at: float | None = None
+        self.ends_with_newline = False
+
+    def __call__(self, chunk: str) -> None:
+        """Write a chunk of the response to stdout."""
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.perf_counter()
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+        self.ends_with_newline = chunk.endswith("\n")
+
+    def finish(self) -> None:
+        """Terminate the streamed message and report the latency to stderr."""
+        total = time.perf_counter() - self.started_at
+        if not self.ends_with_newline:
+            print()
+        if self.first_chunk_at is not None:
+            first_token = self.first_chunk_at - self.started_at
+            print(
+                f"Time to first token: {first_token:.2f}s, total: {total:.2f}s",
+                file=sys.stderr,
+            )
 
 
 def handle_configure(args: Namespace) -> None:
@@ -18,8 +74,51 @@ def handle_configure(args: Namespace) -> None:
         config.model = args.model
     if args.api_key:
         config.api_key = args.api_key
+    if args.api_base_url is not None:
+        config.api_base_url = args.api_base_url
     if args.message_specifications:
         config.message_specifications = args.message_specifications
+    if args.max_prompt_tokens is not None:
+        config.max_prompt_tokens = args.max_prompt_tokens
+    if args.map_reduce_threshold_tokens is not None:
+        config.map_reduce_threshold_tokens = args.map_reduce_threshold_tokens
+    if args.map_reduce_chunk_tokens is not None:
+        config.map_reduce_chunk_tokens = args.map_reduce_chunk_tokens
+    if args.max_concurrency is not None:
+        config.max_concurrency = args.max_concurrency
+    if args.requests_per_minute is not None:
+        config.requests_per_minute = args.requests_per_minute
+    if args.cache_max_size_mb is not None:
+        config.cache_max_size_mb = args.cache_max_size_mb
+    if args.cache_max_age_days is not None:
+        config.cache_max_age_days = args.cache_max_age_days
+    if args.daemon_idle_minutes is not None:
+        config.daemon_idle_minutes = args.daemon_idle_minutes
+    if args.telemetry_max_records is not None:
+        config.telemetry_max_records = args.telemetry_max_records
+    if args.telemetry_max_age_days is not None:
+        config.telemetry_max_age_days = args.telemetry_max_age_days
+    if args.stat_only_files is not None:
+        config.stat_only_files = args.stat_only_files
+    if args.max_file_diff_lines is not None:
+        config.max_file_diff_lines = args.max_file_diff_lines
+    if args.max_diff_read_tokens is not None:
+        config.max_diff_read_tokens = args.max_diff_read_tokens
+    if args.models is not None:
+        config.models = args.models
+    if args.hedge_quantile is not None:
+        config.hedge_quantile = args.hedge_quantile
+    if args.prefix_cache_ttl_minutes is not None:
+        config.prefix_cache_ttl_minutes = args.prefix_cache_ttl_minutes
+    if args.deadline_seconds is not None:
+        config.deadline_seconds = args.deadline_seconds
+    if args.diff_encoding is not None:
+        parse_encoding(args.diff_encoding)
+        config.diff_encoding = args.diff_encoding
+    if args.scope_roots is not None:
+        config.scope_roots = args.scope_roots
+    if args.cluster_min_hunks is not None:
+        config.cluster_min_hunks = args.cluster_min_hunks
 
     # Check if both --always-copy and --always-copy-off are provided
     if args.always_copy and args.always_copy_off:
@@ -28,6 +127,33 @@ def handle_configure(args: Namespace) -> None:
         config.always_copy = True
     if args.always_copy_off:
         config.always_copy = False
+
+    if args.always_stream and args.always_stream_off:
+        raise ValueError(
+            "--always-stream and --always-stream-off cannot be used together."
+        )
+    if args.always_stream:
+        config.always_stream = True
+    if args.always_stream_off:
+        config.always_stream = False
+
+    if args.relevant_commits and args.relevant_commits_off:
+        raise ValueError(
+            "--relevant-commits and --relevant-commits-off cannot be used together."
+        )
+    if args.relevant_commits:
+        config.relevant_commits = True
+    if args.relevant_commits_off:
+        config.relevant_commits = False
+
+    if args.expand_submodules and args.expand_submodules_off:
+        raise ValueError(
+            "--expand-submodules and --expand-submodules-off cannot be used together."
+        )
+    if args.expand_submodules:
+        config.expand_submodules = True
+    if args.expand_submodules_off:
+        config.expand_submodules = False
     if args.show:
         config.show()
 
@@ -37,9 +163,9 @@ def handle_configure(args: Namespace) -> None:
 def handle_exclude_files(args: Namespace) -> None:
     """Exclude files from the diff."""
     files = args.files
-    # Verify if the files exist
+    # Verify if the files exist, glob patterns may match files added later
     for file in files:
-        if not Path(file).exists():
+        if not is_glob(file) and not Path(file).exists():
             raise FileNotFoundError(f"File {file} does not exist.")
 
     config = Config.load()
@@ -47,26 +173,935 @@ def handle_exclude_files(args: Namespace) -> None:
     config.save()
 
 
+def _collapse_repeated_hunks(changes: str, config: Config, label: str = "") -> str:
+    """Send every edit repeated across the changes once and report it."""
+    from .clustering import cluster_hunks
+
+    with span("hunk_clusters") as current:
+        result = cluster_hunks(changes, config.cluster_min_hunks)
+        if current:
+            current.attributes["collapsed_hunks"] = result.collapsed_hunks
+    if result.clusters:
+        print(
+            f"Collapsed {result.collapsed_hunks} repeated hunks of the "
+            f"{label or 'staged'} changes into {result.clusters} hunks.",
+            file=sys.stderr,
+        )
+    return result.diff
+
+
+def _fit_prompt_budget(
+    staged_changes: str, git_logs: str, context: str, config: Config, label: str = ""
+) -> str:
+    """Compact the changes to the prompt budget and report what was trimmed."""
+    if config.max_prompt_tokens <= 0:
+        return staged_changes
+
+    # Whatever the rest of the prompt leaves of the budget goes to the diff.
+    prompt_without_changes = build_prompt(
+        git_logs, "", config.message_specifications, context
+    )
+    compaction = compact_diff(
+        staged_changes,
+        max(config.max_prompt_tokens - estimate_tokens(prompt_without_changes), 0),
+    )
+    if compaction.trimmed:
+        print(
+            f"Trimmed the {label or 'staged'} changes to fit the "
+            f"{config.max_prompt_tokens}-token prompt budget:",
+            *(f"  - {note}" for note in compaction.trimmed),
+            sep="\n",
+            file=sys.stderr,
+        )
+    return compaction.diff
+
+
+def _response_key(
+    config: Config, git_logs: str, staged_changes: str, context: str
+) -> str:
+    """Return the key of the cached response to a prompt.
+
+    Any of the candidate models may answer, so the key holds all of them.
+    """
+    return make_key(
+        "\n".join(config.candidate_models()),
+        git_logs,
+        staged_changes,
+        config.message_specifications,
+        context,
+    )
+
+
+def _submodule_cache(config: Config, use_cache: bool) -> Any:
+    """Return the cache of the submodule ranges, if they are expanded and cached."""
+    if not (config.expand_submodules and use_cache):
+        return None
+    from .submodules import SUBMODULES_NAMESPACE
+
+    return get_cache(SUBMODULES_NAMESPACE, config)
+
+
+def _summarize_large_changes(
+    staged_changes: str,
+    config: Config,
+    client: Any,
+    use_cache: bool,
+    deadline: Deadline | None = None,
+) -> str:
+    """Replace changes too large for one prompt with summaries of their parts.
+
+    The summaries go through the circuit breaker, and every request and the
+    whole map step end with the deadline.
+
+    Raises:
+        CircuitOpenError: If the recent suggestions failed.
+        DeadlineExceededError: If the summaries were not done in time.
+
+    """
+    import asyncio
+
+    from .ai_handler import summarize_files_async
+    from .diff_parser import parse_diff
+    from .map_reduce import SUMMARIES_NAMESPACE, format_summaries, summarize_files
+
+    deadline = deadline or Deadline(0)
+
+    async def summarize() -> "FileSummaries":
+        return await asyncio.wait_for(
+            summarize_files(
+                parse_diff(staged_changes),
+                lambda chunk: summarize_files_async(
+                    client, chunk, config.model, timeout=deadline.remaining()
+                ),
+                cache=get_cache(SUMMARIES_NAMESPACE, config) if use_cache else None,
+                model=config.model,
+                max_chunk_tokens=config.map_reduce_chunk_tokens,
+                concurrency=config.max_concurrency,
+            ),
+            timeout=deadline.remaining(),
+        )
+
+    with circuit_breaker():
+        try:
+            result = asyncio.run(summarize())
+        except TimeoutError:
+            raise DeadlineExceededError(
+                f"No summaries within the {deadline.seconds:g}s deadline."
+            ) from None
+    print(
+        f"The staged changes exceed {config.map_reduce_threshold_tokens} tokens, "
+        f"summarized {result.summarized} files in "
+        f"{result.requests} requests and reused {result.reused} cached summaries.",
+        file=sys.stderr,
+    )
+    return format_summaries(result.summaries)
+
+
 def handle_suggest(args: Namespace) -> None:
     """Suggests a commit message based on the changes in the repository."""
+    if args.each_commit and not args.range:
+        raise ValueError("--each-commit requires --range.")
+
+    if args.dry_run and args.range:
+        raise ValueError("--dry-run does not support --range.")
+    if args.candidates and args.range:
+        raise ValueError("--candidates does not support --range.")
+    if args.diff_encoding:
+        parse_encoding(args.diff_encoding)
+    if args.split_scopes and (args.range or args.dry_run or args.candidates):
+        raise ValueError(
+            "--split-scopes does not support --range, --dry-run or --candidates."
+        )
+    if args.plan and not args.split_scopes:
+        raise ValueError("--plan requires --split-scopes.")
+    if args.submodules and args.range:
+        raise ValueError("--submodules does not support --range.")
+
+    mode = (
+        "range"
+        if args.range
+        else "dry-run"
+        if args.dry_run
+        else "scopes"
+        if args.split_scopes
+        else "staged"
+    )
+    suggest = {
+        "range": _suggest_range,
+        "dry-run": _estimate_staged,
+        "scopes": _suggest_scopes,
+        "staged": _suggest_staged,
+    }[mode]
+    output_format = "json" if args.timings_json else "text" if args.timings else None
+    trace_path = os.environ.get(TRACE_ENV)
+
+    started_at = time.perf_counter()
     config = Config.load()
-    staged_changes = get_repository_changes(config.exclude_files)
+    # Only traced when the timings are shown or the run is recorded, so that
+    # spans cost nothing otherwise.
+    if not (output_format or trace_path or config.telemetry_max_records > 0):
+        suggest(args, config)
+        return
+
+    tracer = start_tracing("suggest", started_at)
+    tracer.record("config_load", started_at)
+    outcome = "ok"
+    try:
+        suggest(args, config)
+    except BaseException as error:
+        outcome = type(error).__name__
+        raise
+    finally:
+        stop_tracing()
+        if output_format or trace_path:
+            write_trace(tracer, output_format, trace_path)
+        _record_telemetry(tracer, config, mode, outcome)
+
+
+def _record_telemetry(tracer: Tracer, config: Config, mode: str, outcome: str) -> None:
+    """Append the run to the telemetry, never failing the command."""
+    from .telemetry import RunRecord, record_run, repository_root
+
+    if config.telemetry_max_records <= 0:
+        return
+    try:
+        record_run(
+            RunRecord.from_trace(tracer, mode, repository_root(Path.cwd()), outcome),
+            config.telemetry_max_records,
+            config.telemetry_max_age_days,
+        )
+    except (OSError, ValueError, TypeError):
+        pass  # E.g. a read-only home directory, the suggestion still succeeded.
+
+
+def _suggest_staged(args: Namespace, config: Config) -> None:
+    """Suggest a message for the staged changes."""
+    # Imported lazily so that commands which never reach the network do not pay
+    # for loading google.genai, GitPython and pyperclip at startup.
+    import pyperclip
+
+    if args.diff_encoding:
+        config.diff_encoding = args.diff_encoding
+    if args.submodules:
+        config.expand_submodules = True
+    deadline = Deadline(
+        config.deadline_seconds if args.deadline is None else args.deadline
+    )
+    candidates = max(args.candidates or 1, 1)
+    generated = _generate_staged_message(
+        config,
+        args.context or "",
+        use_cache=not args.no_cache,
+        stream=(args.stream or config.always_stream) and candidates == 1,
+        candidates=candidates,
+        deadline=deadline,
+    )
+    if generated is None:
+        print("No staged changes found in the repository.")
+        return
+    messages, stream_printer = generated
+    message, picked = _pick_message(messages)
+
+    if config.always_copy or args.copy or picked:
+        with span("clipboard"):
+            pyperclip.copy(message)
+
+    if stream_printer is None:
+        print(message)
+    else:
+        stream_printer.finish()
+
+
+def _pick_message(messages: list[str]) -> tuple[str, bool]:
+    """Let the user pick one of several candidate messages.
+
+    The candidates are listed on stderr, so that stdout only holds the pick.
+    Without a terminal to ask on, the first candidate is picked.
+
+    Returns:
+        The picked message and whether the user picked it.
+
+    """
+    if len(messages) < 2:
+        return (messages[0] if messages else ""), False
+
+    for number, message in enumerate(messages, 1):
+        indented = message.replace("\n", "\n   ")
+        print(f"{number}) {indented}\n", file=sys.stderr)
+    if not sys.stdin.isatty():
+        return messages[0], False
+
+    while True:
+        print(
+            f"Pick a message [1-{len(messages)}, default 1]: ", end="", file=sys.stderr
+        )
+        sys.stderr.flush()
+        try:
+            answer = input().strip()
+        except EOFError:
+            return messages[0], False
+        if not answer:
+            return messages[0], True
+        if answer.isdigit() and 1 <= int(answer) <= len(messages):
+            return messages[int(answer) - 1], True
+
+
+def _generate_staged_message(
+    config: Config,
+    context: str,
+    use_cache: bool,
+    stream: bool = False,
+    candidates: int = 1,
+    deadline: Deadline | None = None,
+) -> tuple[list[str], StreamPrinter | None] | None:
+    """Generate messages for the staged changes.
+
+    Args:
+        config: The configuration.
+        context: Additional context for the commit message.
+        use_cache: Whether to reuse and store cached responses and summaries.
+        stream: Whether to print the message while it is generated.
+        candidates: The number of candidate messages to ask for in one
+            request. Candidates are never taken from or stored in the cache.
+        deadline: The latency budget, started before the git inputs are read.
+
+    Returns:
+        The distinct messages, the best first, and the printer that streamed
+        the message, if it was streamed, or None if nothing is staged.
+
+    """
+    from .pipeline import ClientWarmup, start_git_inputs
+
+    # The git processes run while the SDK is imported and the client created.
+    pending_git_inputs = start_git_inputs(
+        ExclusionRules.from_config(config),
+        config.number_of_commits,
+        relevant_commits=config.relevant_commits,
+        diff_encoding=config.diff_encoding,
+        expand_submodules=config.expand_submodules,
+        submodule_cache=_submodule_cache(config, use_cache),
+    )
+    client_warmup = ClientWarmup(
+        config.api_key, config.model, config.api_base_url, deadline
+    ).start()
+    git_inputs = pending_git_inputs.result()
+    staged_changes = git_inputs.staged_changes
+
+    if not staged_changes:
+        return None
+    if candidates > 1 or not use_cache:
+        # The client is needed, it connects to the API while the prompt is
+        # prepared. With the cache, nothing reaches the API before a miss.
+        client_warmup.connect()
+
+    git_logs = git_inputs.git_logs
+    staged_changes = _collapse_repeated_hunks(staged_changes, config)
+
+    if 0 < config.map_reduce_threshold_tokens < estimate_tokens(staged_changes):
+        with span("map_reduce"):
+            staged_changes = _summarize_large_changes(
+                staged_changes,
+                config,
+                client_warmup.result(),
+                use_cache=use_cache,
+                deadline=deadline,
+            )
+
+    with span("prompt_fit") as current:
+        staged_changes = _fit_prompt_budget(staged_changes, git_logs, context, config)
+        staged_changes = encode_diff(staged_changes, config.diff_encoding)
+        if current:
+            current.add_text("diff", staged_changes)
+
+    if candidates > 1:
+        from .ai_handler import suggest_commit_messages
+
+        messages = suggest_commit_messages(
+            api_key=config.api_key,
+            git_logs=git_logs,
+            staged_changes=staged_changes,
+            count=candidates,
+            message_specifications=config.message_specifications,
+            context=context,
+            client=client_warmup.result(),
+            models=config.candidate_models(),
+            hedge_quantile=config.hedge_quantile,
+            prefix_cache_ttl=config.prefix_cache_ttl_minutes * 60,
+            deadline=deadline,
+        )
+        return messages, None
+
+    with span("cache_lookup") as current:
+        cache = get_cache(RESPONSES_NAMESPACE, config) if use_cache else None
+        cache_key = _response_key(config, git_logs, staged_changes, context)
+        message = cache.get(cache_key) if cache else None
+        if current:
+            current.attributes["hit"] = message is not None
+
+    stream_printer = None
+    if message is None:
+        from .ai_handler import suggest_commit_message
+
+        if stream:
+            stream_printer = StreamPrinter()
+
+        message = suggest_commit_message(
+            api_key=config.api_key,
+            git_logs=git_logs,
+            staged_changes=staged_changes,
+            message_specifications=config.message_specifications,
+            context=context,
+            on_chunk=stream_printer,
+            client=client_warmup.result(),
+            models=config.candidate_models(),
+            hedge_quantile=config.hedge_quantile,
+            prefix_cache_ttl=config.prefix_cache_ttl_minutes * 60,
+            deadline=deadline,
+        )
+        if cache and message:
+            cache.set(cache_key, message)
+    return [message], stream_printer
+
+
+def _estimate_staged(args: Namespace, config: Config) -> None:
+    """Report the size and predicted latency of the prompt without sending it."""
+    import json
+
+    from .estimate import estimate_prompt, predict_latency
+    from .latency import LatencyHistory
+    from .pipeline import start_git_inputs
+
+    if args.diff_encoding:
+        config.diff_encoding = args.diff_encoding
+    if args.submodules:
+        config.expand_submodules = True
+    use_cache = not args.no_cache
+    git_inputs = start_git_inputs(
+        ExclusionRules.from_config(config),
+        config.number_of_commits,
+        relevant_commits=config.relevant_commits,
+        diff_encoding=config.diff_encoding,
+        expand_submodules=config.expand_submodules,
+        submodule_cache=_submodule_cache(config, use_cache),
+    ).result()
+    staged_changes = git_inputs.staged_changes
+    if not staged_changes:
+        print("No staged changes found in the repository.")
+        return
+
+    git_logs = git_inputs.git_logs
+    context = args.context or ""
+    staged_changes = _collapse_repeated_hunks(staged_changes, config)
+    summary_requests: list[int] = []
+    if 0 < config.map_reduce_threshold_tokens < estimate_tokens(staged_changes):
+        staged_changes, summary_requests = _plan_large_changes(
+            staged_changes, config, use_cache
+        )
+    staged_changes = _fit_prompt_budget(staged_changes, git_logs, context, config)
+
+    history = LatencyHistory.load()
+    estimate = estimate_prompt(
+        history.rank(config.candidate_models())[0],
+        git_logs,
+        staged_changes,
+        config.message_specifications,
+        context,
+        encoding=config.diff_encoding,
+    )
+    estimate.summary_requests = summary_requests
+    if use_cache:
+        cache_key = _response_key(
+            config, git_logs, encode_diff(staged_changes, config.diff_encoding), context
+        )
+        cache = get_cache(RESPONSES_NAMESPACE, config)
+        estimate.cached_response = cache.get(cache_key) is not None
+    estimate.predicted_seconds = predict_latency(
+        history, estimate, config.max_concurrency
+    )
+
+    if args.json:
+        print(json.dumps(estimate.to_dict()))
+    else:
+        print(estimate.format())
+
+
+def _plan_large_changes(
+    staged_changes: str, config: Config, use_cache: bool
+) -> tuple[str, list[int]]:
+    """Estimate the requests of map-reduce mode without sending them.
+
+    Returns:
+        The changes of the final prompt, with line counts standing in for the
+        summaries still to request, and the tokens of every summary request.
+
+    """
+    from .diff_parser import parse_diff
+    from .map_reduce import (
+        SUMMARIES_NAMESPACE,
+        format_summaries,
+        plan_summaries,
+        split_into_chunks,
+    )
+    from .prompt import build_summary_prompt
+
+    file_diffs = parse_diff(staged_changes)
+    plan = plan_summaries(
+        file_diffs,
+        get_cache(SUMMARIES_NAMESPACE, config) if use_cache else None,
+        config.model,
+    )
+    for file_diff in plan.pending:
+        plan.summaries[file_diff.path] = file_diff.stat_summary("summary").strip()
+    chunks = split_into_chunks(plan.pending, config.map_reduce_chunk_tokens)
+    summary_requests = [
+        estimate_tokens(build_summary_prompt("".join(f.text for f in chunk)))
+        for chunk in chunks
+    ]
+    summaries = [(f.path, plan.summaries[f.path]) for f in file_diffs]
+    return format_summaries(summaries), summary_requests
+
+
+def _suggest_range(args: Namespace, config: Config) -> None:
+    """Suggest messages for a range of commits, concurrently and in order."""
+    import json
+
+    import pyperclip
 
+    from .batch import BatchItem, BatchResult
+    from .git_handler import (
+        get_commit_changes,
+        get_log,
+        get_range_changes,
+        list_commits,
+        open_repo,
+    )
+
+    if args.diff_encoding:
+        config.diff_encoding = args.diff_encoding
     context = args.context or ""
+    rules = ExclusionRules.from_config(config)
+    repo = open_repo()
+
+    commits = list_commits(args.range, repo)
+    if not commits:
+        print(f"No commits found in {args.range}.")
+        return
+
+    if args.each_commit:
+        items = []
+        for commit, subject in commits:
+            git_logs = get_log(config.number_of_commits, repo, commit)
+            staged_changes = _collapse_repeated_hunks(
+                get_commit_changes(commit, rules, repo, config.diff_encoding),
+                config,
+                label=commit[:7],
+            )
+            staged_changes = _fit_prompt_budget(
+                staged_changes,
+                git_logs,
+                context,
+                config,
+                label=commit[:7],
+            )
+            items.append(
+                BatchItem(
+                    commit=commit,
+                    subject=subject,
+                    git_logs=git_logs,
+                    staged_changes=encode_diff(staged_changes, config.diff_encoding),
+                    context=context,
+                )
+            )
+    else:
+        git_logs = get_log(config.number_of_commits, repo, commits[0][0])
+        staged_changes = _collapse_repeated_hunks(
+            get_range_changes(args.range, rules, repo, config.diff_encoding),
+            config,
+            label=args.range,
+        )
+        staged_changes = _fit_prompt_budget(
+            staged_changes,
+            git_logs,
+            context,
+            config,
+            label=args.range,
+        )
+        items = [
+            BatchItem(
+                commit=args.range,
+                subject="",
+                git_logs=git_logs,
+                staged_changes=encode_diff(staged_changes, config.diff_encoding),
+                context=context,
+            )
+        ]
 
+    def print_result(result: BatchResult) -> None:
+        if args.json:
+            record = {"commit": result.item.commit, "subject": result.item.subject}
+            if result.error:
+                record["error"] = result.error
+            else:
+                record["message"] = result.message
+            print(json.dumps(record), flush=True)
+        elif result.error:
+            print(f"{result.item.commit[:7]}: {result.error}", file=sys.stderr)
+        elif args.each_commit:
+            print(f"{result.item.commit[:7]} {result.item.subject}")
+            print(f"{result.message.strip()}\n", flush=True)
+        else:
+            print(result.message)
+
+        if not args.each_commit and result.message:
+            if config.always_copy or args.copy:
+                pyperclip.copy(result.message)
+
+    _suggest_items(config, items, not args.no_cache, args.jobs, print_result)
+
+
+def _suggest_items(
+    config: Config,
+    items: "list[BatchItem]",
+    use_cache: bool,
+    jobs: int | None,
+    on_result: "Callable[[BatchResult], None]",
+) -> None:
+    """Suggest messages for the items concurrently and pass them on in order.
+
+    Args:
+        config: The configuration.
+        items: The changes to suggest messages for, each with its own context.
+        use_cache: Whether to reuse and store cached responses.
+        jobs: The maximum number of concurrent requests (default: the
+            configured concurrency)
+        on_result: Called with the result of every item, in the item order.
+
+    """
+    import asyncio
+
+    from .batch import suggest_in_order
+    from .latency import LatencyHistory
+
+    client: Any = None
+    cache = get_cache(RESPONSES_NAMESPACE, config) if use_cache else None
+    # Shared by the concurrent requests and saved once they are done.
+    history = LatencyHistory.load()
+
+    async def suggest(item: "BatchItem") -> str:
+        nonlocal client
+        cache_key = _response_key(
+            config, item.git_logs, item.staged_changes, item.context
+        )
+        message = cache.get(cache_key) if cache else None
+        if message is None:
+            from .ai_handler import create_client, suggest_commit_message_async
+
+            # Created on the first miss, so that a cached range never loads
+            # the SDK.
+            if client is None:
+                client = create_client(config.api_key, config.api_base_url)
+            message = await suggest_commit_message_async(
+                client,
+                item.git_logs,
+                item.staged_changes,
+                config.message_specifications,
+                item.context,
+                models=config.candidate_models(),
+                hedge_quantile=config.hedge_quantile,
+                history=history,
+            )
+            if cache and message:
+                cache.set(cache_key, message)
+        return message
+
+    async def handle_results() -> None:
+        async for result in suggest_in_order(
+            items,
+            suggest,
+            concurrency=jobs or config.max_concurrency,
+            requests_per_minute=config.requests_per_minute,
+        ):
+            on_result(result)
+
+    try:
+        asyncio.run(handle_results())
+    finally:
+        history.save()
+
+
+def _suggest_scopes(args: Namespace, config: Config) -> None:
+    """Suggest a message for every package of the staged changes concurrently."""
+    import json
+
+    from .batch import BatchItem, BatchResult
+    from .git_handler import (
+        get_log,
+        get_repository_changes,
+        get_unstaged_paths,
+        open_repo,
+    )
+    from .scopes import format_plan, split_by_scope
+
+    if args.diff_encoding:
+        config.diff_encoding = args.diff_encoding
+    if args.submodules:
+        config.expand_submodules = True
+    repo = open_repo()
+    # Every scope has a prompt budget of its own, only the read limit applies.
+    rules = replace(
+        ExclusionRules.from_config(config),
+        max_read_tokens=config.max_diff_read_tokens,
+    )
+    submodules = None
+    if config.expand_submodules:
+        from .submodules import start_submodule_changes
+
+        submodules = start_submodule_changes(
+            repo, rules, _submodule_cache(config, not args.no_cache)
+        )
+    staged_changes = get_repository_changes(rules, repo, config.diff_encoding)
+    if submodules is not None and staged_changes:
+        staged_changes = submodules.expand(staged_changes)
     if not staged_changes:
         print("No staged changes found in the repository.")
         return
 
-    git_logs = get_log(config.number_of_commits)
+    scopes = split_by_scope(staged_changes, config.scope_roots)
+    items = []
+    for scope in scopes:
+        # A new package has no history of its own yet.
+        git_logs = get_log(
+            config.number_of_commits, repo, paths=[scope.root] if scope.root else []
+        ) or get_log(config.number_of_commits, repo)
+        context = "\n".join(part for part in [args.context, scope.context()] if part)
+        scope_changes = _collapse_repeated_hunks(scope.diff, config, label=scope.label)
+        scope_changes = _fit_prompt_budget(
+            scope_changes, git_logs, context, config, label=scope.label
+        )
+        items.append(
+            BatchItem(
+                commit=scope.label,
+                subject=scope.root,
+                git_logs=git_logs,
+                staged_changes=encode_diff(scope_changes, config.diff_encoding),
+                context=context,
+            )
+        )
+
+    messages: list[str] = []
+
+    def print_result(result: BatchResult) -> None:
+        scope = scopes[len(messages)]
+        messages.append(result.message)
+        if args.json:
+            record = {"scope": scope.label, "paths": scope.paths}
+            if result.error:
+                record["error"] = result.error
+            else:
+                record["message"] = result.message
+            print(json.dumps(record), flush=True)
+        elif result.error:
+            print(f"{scope.label}: {result.error}", file=sys.stderr)
+        else:
+            print(scope.label)
+            print(f"{result.message.strip()}\n", flush=True)
 
-    message = suggest_commit_message(
-        api_key=config.api_key,
-        git_logs=git_logs,
-        staged_changes=staged_changes,
-        message_specifications=config.message_specifications,
-        context=context,
+    _suggest_items(config, items, not args.no_cache, args.jobs, print_result)
+
+    if args.plan and not args.json:
+        succeeded = [
+            (scope, message) for scope, message in zip(scopes, messages) if message
+        ]
+        print(format_plan(succeeded, get_unstaged_paths(repo)))
+
+
+def _precompute_message(config: Config) -> bool:
+    """Generate and store the message for the staged tree unless it is stored.
+
+    Returns:
+        Whether a message was generated.
+
+    """
+    from .git_handler import open_repo
+    from .precompute import PRECOMPUTED_NAMESPACE, staged_tree_key
+
+    repo = open_repo()
+    cache = get_cache(PRECOMPUTED_NAMESPACE, config)
+    key = staged_tree_key(repo, config)
+    if cache.get(key) is not None:
+        return False
+    generated = _generate_staged_message(config, "", use_cache=True)
+    if generated is None or not generated[0][0]:
+        return False
+    # The index may have changed while the message was generated.
+    if staged_tree_key(repo, config) == key:
+        cache.set(key, generated[0][0])
+    return True
+
+
+def handle_precompute(args: Namespace) -> None:
+    """Precompute the message once the index settles, run by a git hook."""
+    from .git_handler import open_repo
+    from .precompute import index_path, precompute_lock, wait_until_quiet
+
+    repo = open_repo()
+    # Queued behind a running precomputation, which often stores the message.
+    with precompute_lock(repo):
+        wait_until_quiet(index_path(repo), args.debounce)
+        _precompute_message(Config.load())
+
+
+def handle_watch(args: Namespace) -> None:
+    """Precompute the message whenever the index settles after a change."""
+    from .git_handler import open_repo
+    from .precompute import index_path, precompute_lock, watch
+
+    repo = open_repo()
+
+    def on_change() -> None:
+        with precompute_lock(repo):
+            try:
+                if _precompute_message(Config.load()):
+                    print("Precomputed the message.", file=sys.stderr)
+            except Exception as e:  # Keep watching after a failed request
+                print(f"Could not precompute the message: {e}", file=sys.stderr)
+
+    print(f"Watching {index_path(repo)}, press Ctrl+C to stop.", file=sys.stderr)
+    try:
+        watch(index_path(repo), on_change, args.debounce)
+    except KeyboardInterrupt:
+        pass
+
+
+def handle_prepare_commit_msg(args: Namespace) -> None:
+    """Fill in the precomputed message, run by the prepare-commit-msg hook."""
+    # Messages given with -m, -F, a merge, a squash or an amend are kept.
+    if args.source not in (None, "", "template"):
+        return
+
+    from .git_handler import open_repo
+    from .precompute import (
+        HOOK_DEADLINE_SECONDS,
+        PRECOMPUTED_NAMESPACE,
+        fill_in_message,
+        staged_tree_key,
     )
-    if config.always_copy or args.copy:
-        pyperclip.copy(message)
-    print(message)
+
+    try:
+        config = Config.load()
+        repo = open_repo()
+        cache = get_cache(PRECOMPUTED_NAMESPACE, config)
+        key = staged_tree_key(repo, config)
+        message = cache.get(key)
+        if message is None:
+            deadline = Deadline(config.deadline_seconds or HOOK_DEADLINE_SECONDS)
+            generated = _generate_staged_message(
+                config, "", use_cache=True, deadline=deadline
+            )
+            message = generated[0][0] if generated else None
+            if message:
+                cache.set(key, message)
+    except Exception as e:  # Never block the commit
+        print(f"genie-git: could not suggest a message: {e}", file=sys.stderr)
+        return
+    if message:
+        fill_in_message(Path(args.file), message)
+
+
+def handle_hooks(args: Namespace) -> None:
+    """Install or remove the git hooks that precompute the message."""
+    from .git_handler import open_repo
+    from .precompute import install_hooks, uninstall_hooks
+
+    repo = open_repo()
+    if args.action == "install":
+        for path in install_hooks(repo):
+            print(f"Installed {path}.")
+        return
+    removed = uninstall_hooks(repo)
+    for path in removed:
+        print(f"Removed {path}.")
+    if not removed:
+        print("No genie-git hooks are installed.")
+
+
+def handle_cache(args: Namespace) -> None:
+    """Show statistics about or clear the response caches."""
+    config = Config.load()
+    caches = get_all_caches(config)
+
+    if args.action == "clear":
+        removed = sum(cache.clear() for cache in caches)
+        print(f"Removed {removed} cache entries.")
+        return
+
+    if not caches:
+        print("The cache is empty.")
+        return
+    for cache in caches:
+        stats = cache.stats()
+        print(
+            f"{stats.namespace}: {stats.entries} entries, "
+            f"{stats.size_bytes / 1024:.1f} KiB "
+            f"(limit {config.cache_max_size_mb} MiB, "
+            f"{config.cache_max_age_days} days)"
+        )
+
+
+def handle_stats(args: Namespace) -> None:
+    """Report the percentiles and top offenders of the recorded suggest runs."""
+    import json
+
+    from .telemetry import build_report, load_records
+
+    records = load_records(args.days)
+    if not records:
+        print("No suggest runs recorded yet.")
+        return
+    report = build_report(records, args.top)
+    if args.json:
+        print(json.dumps(report.to_dict()))
+    else:
+        print(report.format())
+
+
+def handle_circuit(args: Namespace) -> None:
+    """Show or reset the circuit breaker of the API."""
+    breaker = CircuitBreaker.load()
+    if args.action == "reset":
+        CircuitBreaker().save()
+        print("Closed the circuit.")
+        return
+    wait = breaker.opened_until - time.time()
+    if wait > 0:
+        print(
+            f"The circuit is open for another {wait:.0f}s after "
+            f"{breaker.failures} failed suggestions."
+        )
+    else:
+        print(f"The circuit is closed ({breaker.failures} recent failures).")
+
+
+def handle_daemon(args: Namespace) -> None:
+    """Start, stop or report on the background daemon."""
+    from . import daemon
+
+    if args.action == "run":
+        daemon.serve()
+    elif args.action == "start":
+        print(f"Started the daemon (pid {daemon.start()}).")
+    elif args.action == "stop":
+        if daemon.stop():
+            print("Stopped the daemon.")
+        else:
+            print("The daemon is not running.")
+    else:
+        status = daemon.status()
+        if status is None:
+            print("The daemon is not running.")
+        else:
+            print(
+                f"The daemon is running (pid {status['pid']}, "
+                f"up {status['uptime']:.0f}s, "
+                f"{status['repositories']} warm repositories)."
+            )
@@ -0,0 +1,121 @@
+"""Forwards suggestions to a running genie-git daemon.
+
+This entry point imports almost nothing, so a suggestion served by the daemon
+skips the startup of genie-git. When no daemon is running, or the command is
+not a suggestion, genie-git runs in-process as usual.
+"""
+
+import json
+import os
+import socket
+import sys
+from collections.abc import Iterator
+
+# The same directory as genie_git.config.CONFIG_DIR, which is not imported here
+# to keep the client light.
+SOCKET_PATH = os.path.join(os.path.expanduser("~"), ".genie-git", "daemon.sock")
+
+# Options that need the in-process startup of genie-git, or a terminal the
+# daemon cannot read from, like the picker of --candidates.
+IN_PROCESS_OPTIONS = {"-h", "--help", "--startup-profile", "--candidates"}
+IN_PROCESS_ENV = "GENIE_GIT_STARTUP_PROFILE"
+# Variables of the client that apply to the command run by the daemon.
+FORWARDED_ENV = ("GENIE_GIT_TRACE",)
+
+
+def connect(socket_path: str = SOCKET_PATH) -> socket.socket | None:
+    """Connect to the daemon.
+
+    Args:
+        socket_path: The socket the daemon listens on.
+
+    Returns:
+        The connection, or None if no daemon is running.
+
+    """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except OSError:
+        connection.close()
+        return None
+    return connection
+
+
+def send_request(connection: socket.socket, request: dict) -> Iterator[dict]:
+    """Send a request to the daemon and yield its reply messages.
+
+    Args:
+        connection: The connection to the daemon, closed when the reply ends.
+        request: The request, a JSON object.
+
+    Yields:
+        Every message of the reply, a JSON object per line.
+
+    """
+    with connection, connection.makefile("rb") as reply:
+        connection.sendall(json.dumps(request).encode() + b"\n")
+        for line in reply:
+            yield json.loads(line)
+
+
+def is_suggestion(argv: list[str]) -> bool:
+    """Return whether the arguments run a suggestion the daemon can serve."""
+    options = {arg.split("=", 1)[0] for arg in argv}
+    if os.environ.get(IN_PROCESS_ENV) or IN_PROCESS_OPTIONS.intersection(options):
+        return False
+    # A suggestion has no subcommand or the "suggest" subcommand. The value of
+    # an option also counts as a subcommand, which falls back to in-process.
+    for arg in argv:
+        if not arg.startswith("-"):
+            return arg == "suggest"
+    return True
+
+
+def forward(argv: list[str], cwd: str, socket_path: str = SOCKET_PATH) -> int | None:
+    """Run the command in the daemon and print its output.
+
+    Args:
+        argv: The command-line arguments.
+        cwd: The directory to run the command in.
+        socket_path: The socket the daemon listens on.
+
+    Returns:
+        The exit code of the command, or None if no daemon is running.
+
+    """
+    connection = connect(socket_path)
+    if connection is None:
+        return None
+
+    # The daemon replies with an exit code last, unless it dies first.
+    exit_code = 1
+    env = {name: os.environ[name] for name in FORWARDED_ENV if name in os.environ}
+    request = {"command": "run", "argv": argv, "cwd": cwd, "env": env}
+    for message in send_request(connection, request):
+        if "stdout" in message:
+            sys.stdout.write(message["stdout"])
+            sys.stdout.flush()
+        elif "stderr" in message:
+            sys.stderr.write(message["stderr"])
+            sys.stderr.flush()
+        elif "exit" in message:
+            exit_code = message["exit"]
+    return exit_code
+
+
+def main() -> None:
+    """Forward the command to the daemon, or run it in-process."""
+    argv = sys.argv[1:]
+    if is_suggestion(argv):
+        exit_code = forward(argv, os.getcwd())
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    from .main import main as run_in_process
+
+    run_in_process()
+
+
+if __name__ == "__main__":
+    main()
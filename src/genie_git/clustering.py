@@ -0,0 +1,139 @@
+"""Collapses the hunks a mechanical change repeats across the staged changes.
+
+A codemod, or renaming an import across hundreds of files, produces the same
+edit over and over, each time in different surrounding code. Every hunk is
+reduced to the tokens its changed lines remove and add, leaving out the
+tokens common to both, so that the edit has the same signature wherever it
+is made. Hunks with the same signature form a cluster, and a cluster of at
+least the minimum size is sent as its first hunk followed by the number of
+hunks it stands for and their files. Hunks changing only a few tokens, like
+an added `return None` or a closing brace, are never clustered, as the same
+small edit in unrelated places is a coincidence rather than a codemod.
+Signatures are computed in a single pass over the changed lines, so the work
+grows linearly with the diff.
+"""
+
+import hashlib
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from .diff_parser import parse_diff
+
+TOKEN = re.compile(r"\w+|[^\w\s]")
+# The tokens the changed lines of a hunk need for it to be clustered.
+MIN_CHANGED_TOKENS = 8
+# The files of a cluster listed after its representative hunk.
+MAX_LISTED_FILES = 20
+
+# A file and the index of one of its hunks.
+HunkPosition = tuple[int, int]
+
+
+@dataclass
+class ClusteringResult:
+    """Represent the changes after collapsing the repeated hunks."""
+
+    diff: str
+    clusters: int = 0  # The collapsed clusters.
+    collapsed_hunks: int = 0  # The hunks left out for a representative.
+
+
+def hunk_signature(hunk: str) -> str | None:
+    """Return the signature of the edit of a hunk.
+
+    The signature covers the tokens the hunk removes but does not add back,
+    the tokens it adds but did not remove, and its numbers of removed and
+    added lines. Changes of whitespace alone leave the tokens unchanged, so
+    the tokens themselves are used instead.
+
+    Args:
+        hunk: A hunk, starting with its "@@ ... @@" header line.
+
+    Returns:
+        The hash of the edit, or None for a hunk whose changed lines have
+        fewer than MIN_CHANGED_TOKENS tokens.
+
+    """
+    removed: Counter[str] = Counter()
+    added: Counter[str] = Counter()
+    removed_lines = added_lines = 0
+    for line in hunk.splitlines()[1:]:
+        if line.startswith("-"):
+            removed.update(TOKEN.findall(line, 1))
+            removed_lines += 1
+        elif line.startswith("+"):
+            added.update(TOKEN.findall(line, 1))
+            added_lines += 1
+    if removed.total() + added.total() < MIN_CHANGED_TOKENS:
+        return None
+    edit = (sorted((removed - added).items()), sorted((added - removed).items()))
+    if not edit[0] and not edit[1]:
+        edit = (sorted(removed.items()), [])
+    signature = repr((edit, removed_lines, added_lines))
+    return hashlib.blake2b(signature.encode(), digest_size=16).hexdigest()
+
+
+def _note(paths: list[str]) -> str:
+    files = list(dict.fromkeys(paths))
+    listed = ", ".join(files[:MAX_LISTED_FILES])
+    if len(files) > MAX_LISTED_FILES:
+        listed += f" and {len(files) - MAX_LISTED_FILES} more"
+    return (
+        f"[The same edit in {len(paths)} more hunks, in {len(files)} files: {listed}]\n"
+    )
+
+
+def cluster_hunks(diff: str, min_hunks: int) -> ClusteringResult:
+    """Send every edit repeated in at least the given number of hunks once.
+
+    The first hunk of a cluster stays where it is, followed by a note listing
+    the files of the others, which are left out. A file all of whose hunks
+    are left out is left out too.
+
+    Args:
+        diff: The staged changes.
+        min_hunks: The hunks an edit needs to be collapsed, below 2 disables
+            collapsing.
+
+    Returns:
+        The changes and the number of collapsed clusters and hunks.
+
+    """
+    # Counting the hunk headers is much cheaper than parsing a small diff.
+    if min_hunks < 2 or diff.count("\n@@") + diff.startswith("@@") < min_hunks:
+        return ClusteringResult(diff)
+
+    file_diffs = parse_diff(diff)
+    members: dict[str, list[HunkPosition]] = {}
+    for f, file_diff in enumerate(file_diffs):
+        for h, hunk in enumerate(file_diff.hunks):
+            signature = hunk_signature(hunk)
+            if signature is not None:
+                members.setdefault(signature, []).append((f, h))
+
+    notes: dict[HunkPosition, str] = {}
+    left_out: set[HunkPosition] = set()
+    for positions in members.values():
+        if len(positions) < min_hunks:
+            continue
+        first, *others = positions
+        notes[first] = _note([file_diffs[f].path for f, _ in others])
+        left_out.update(others)
+    if not notes:
+        return ClusteringResult(diff)
+
+    texts = []
+    for f, file_diff in enumerate(file_diffs):
+        hunks = []
+        for h, hunk in enumerate(file_diff.hunks):
+            if (f, h) in left_out:
+                continue
+            if (f, h) in notes:
+                hunk = hunk.removesuffix("\n") + "\n" + notes[f, h]
+            hunks.append(hunk)
+        if hunks or not file_diff.hunks:
+            texts.append(file_diff.header + "".join(hunks))
+    return ClusteringResult(
+        diff="".join(texts), clusters=len(notes), collapsed_hunks=len(left_out)
+    )
@@ -0,0 +1,116 @@
+"""Fits the staged changes into a token budget."""
+
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+
+from .diff_parser import FileDiff, parse_diff
+from .tokens import estimate_tokens
+
+LOW_PRIORITY_NAMES = {
+    "Cargo.lock",
+    "Gemfile.lock",
+    "composer.lock",
+    "package-lock.json",
+    "pnpm-lock.yaml",
+    "poetry.lock",
+    "uv.lock",
+    "yarn.lock",
+}
+LOW_PRIORITY_SUFFIXES = (".lock", ".min.js", ".min.css", ".map", ".svg")
+
+
+@dataclass
+class CompactionResult:
+    """Represent the staged changes after fitting them into the budget."""
+
+    diff: str
+    trimmed: list[str] = field(default_factory=list)
+
+
+def is_low_priority(path: str) -> bool:
+    """Return whether the file rarely explains the intent of a change."""
+    name = PurePosixPath(path).name
+    return name in LOW_PRIORITY_NAMES or name.endswith(LOW_PRIORITY_SUFFIXES)
+
+
+def _fit_hunks(file_diff: FileDiff, budget: int) -> tuple[str, int, int] | None:
+    """Return the file with as many hunks as fit the budget.
+
+    The text is returned along with its cost and the number of kept hunks.
+    """
+    total = len(file_diff.hunks)
+    # Reserve room for the note listing the omitted hunks.
+    cost = estimate_tokens(file_diff.header + f"[{total} of {total} hunks omitted]\n")
+    kept = set()
+    # Small hunks first, so the most hunks survive.
+    for index, hunk in sorted(
+        enumerate(file_diff.hunks), key=lambda item: len(item[1])
+    ):
+        hunk_cost = estimate_tokens(hunk)
+        if cost + hunk_cost > budget:
+            break
+        kept.add(index)
+        cost += hunk_cost
+
+    if not kept:
+        return None
+
+    text = (
+        file_diff.header
+        + "".join(h for i, h in enumerate(file_diff.hunks) if i in kept)
+        + f"[{total - len(kept)} of {total} hunks omitted]\n"
+    )
+    return text, cost, len(kept)
+
+
+def compact_diff(diff: str, max_tokens: int) -> CompactionResult:
+    """Fit the diff into the token budget.
+
+    Every file is represented by at least a stat summary. The remaining budget
+    is spent on the full content of the files, ranked so that source files come
+    before lockfiles and generated files, and smaller changes come before larger
+    ones. A file that does not fit entirely keeps as many of its hunks as fit.
+
+    Args:
+        diff: The staged changes.
+        max_tokens: The number of tokens the diff may use; 0 disables the limit.
+
+    Returns:
+        The compacted diff and a description of every trimmed file.
+
+    """
+    if max_tokens <= 0 or estimate_tokens(diff) <= max_tokens:
+        return CompactionResult(diff=diff)
+
+    file_diffs = parse_diff(diff)
+    texts = [file_diff.stat_summary() for file_diff in file_diffs]
+    trimmed = [f"{file_diff.path} (stat summary only)" for file_diff in file_diffs]
+    remaining = max_tokens - sum(estimate_tokens(text) for text in texts)
+
+    ranked = sorted(
+        range(len(file_diffs)),
+        key=lambda i: (is_low_priority(file_diffs[i].path), len(file_diffs[i].text)),
+    )
+    for index in ranked:
+        file_diff = file_diffs[index]
+        summary_cost = estimate_tokens(texts[index])
+        budget = remaining + summary_cost
+
+        full_cost = estimate_tokens(file_diff.text)
+        if full_cost <= budget:
+            texts[index] = file_diff.text
+            trimmed[index] = ""
+            remaining -= full_cost - summary_cost
+            continue
+
+        partial = _fit_hunks(file_diff, budget)
+        if partial is not None:
+            texts[index], partial_cost, kept = partial
+            trimmed[index] = (
+                f"{file_diff.path} ({kept} of {len(file_diff.hunks)} hunks kept)"
+            )
+            remaining -= partial_cost - summary_cost
+
+    return CompactionResult(
+        diff="".join(texts), trimmed=[note for note in trimmed if note]
+    )
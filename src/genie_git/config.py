@@ -1,9 +1,17 @@
 """Configuration dataclass."""
 
 import json
+import os
+import threading
 from dataclasses import asdict, dataclass, field
 from pathlib import Path
 
+from .exclusions import (
+    DEFAULT_MAX_DIFF_READ_TOKENS,
+    DEFAULT_MAX_FILE_DIFF_LINES,
+    DEFAULT_STAT_ONLY_FILES,
+)
+
 CONFIG_DIR = Path.home() / ".genie-git"
 CONFIG_FILE = CONFIG_DIR / "config.json"
 
@@ -14,12 +22,59 @@ class Config:
 
     model: str = "gemini-2.5-flash"
     api_key: str = ""
+    api_base_url: str = ""  # An alternative API endpoint, e.g. a proxy.
+    # Other models to pick by latency and to hedge slow requests with.
+    models: list[str] = field(default_factory=list)
+    # The latency quantile to hedge after, 0 disables. Off by default, as the
+    # abandoned request is billed too.
+    hedge_quantile: float = 0.0
+    # The lifetime of the prompt prefix cached by the API, 0 disables caching it.
+    prefix_cache_ttl_minutes: int = 10
+    # The latency budget of a suggestion in seconds, 0 disables it.
+    deadline_seconds: float = 0.0
     exclude_files: list[str] = field(default_factory=list)
+    # Files sent as line counts only, e.g. lockfiles and generated code.
+    stat_only_files: list[str] = field(
+        default_factory=lambda: list(DEFAULT_STAT_ONLY_FILES)
+    )
+    # Files changing more lines are sent as line counts, 0 disables the limit.
+    max_file_diff_lines: int = DEFAULT_MAX_FILE_DIFF_LINES
+    # Files past this many estimated tokens of patches are sent as line counts
+    # and git is stopped, 0 disables the limit.
+    max_diff_read_tokens: int = DEFAULT_MAX_DIFF_READ_TOKENS
+    # The package directories of a monorepo, e.g. "packages/*", for
+    # --split-scopes; without any, every top-level directory is a package.
+    scope_roots: list[str] = field(default_factory=list)
+    # How the changes are encoded, e.g. "context-1+structured".
+    diff_encoding: str = "unified"
+    # An edit repeated in this many hunks is sent once, 0 disables collapsing.
+    cluster_min_hunks: int = 3
     message_specifications: str = "concise and clear"
     number_of_commits: int = (
         5  # The number of commits to include in the AI prompt as a reference.
     )
+    # Reference the commits that changed the staged paths, not the last ones.
+    # Off by default, as the first run indexes the history before answering.
+    relevant_commits: bool = False
+    # Expand staged submodule changes into the commits they bring in.
+    expand_submodules: bool = False
     always_copy: bool = False
+    always_stream: bool = False
+    max_prompt_tokens: int = (
+        32000  # The estimated token budget of the prompt, 0 disables the limit.
+    )
+    map_reduce_threshold_tokens: int = (
+        100000  # Larger staged changes are summarized in parts, 0 disables it.
+    )
+    map_reduce_chunk_tokens: int = 16000  # The size of every summarized part.
+    max_concurrency: int = 4  # The maximum number of requests in flight.
+    requests_per_minute: int = 0  # The maximum request rate, 0 disables the limit.
+    cache_max_size_mb: int = 50
+    cache_max_age_days: int = 30
+    daemon_idle_minutes: int = 30  # The daemon exits when idle, 0 keeps it running.
+    # The suggest runs kept for `genie-git stats`, 0 disables recording them.
+    telemetry_max_records: int = 10000
+    telemetry_max_age_days: int = 90  # 0 keeps the runs until the record limit.
 
     def save(self) -> None:
         """Save the configurations to a JSON file."""
@@ -38,6 +93,35 @@ class Config:
             data = json.load(f)
             return cls(**data)
 
+    def candidate_models(self) -> list[str]:
+        """Return the configured model followed by the other models."""
+        return list(dict.fromkeys([self.model, *self.models]))
+
+    @staticmethod
+    def last_modified() -> int | None:
+        """Return the modification time of the config file in nanoseconds."""
+        if not CONFIG_FILE.exists():
+            return None
+        return CONFIG_FILE.stat().st_mtime_ns
+
     def show(self) -> None:
         """Show the current configurations."""
         print(json.dumps(asdict(self), indent=2))
+
+
+def write_atomically(path: Path, text: str, encoding: str | None = None) -> None:
+    """Write a file through a temporary file, so that readers never see it half.
+
+    Args:
+        path: The file to replace.
+        text: The new content of the file.
+        encoding: The encoding of the file (default: the locale encoding)
+
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Unique per thread too, so that two threads never share a temporary file.
+    temporary_path = path.with_name(
+        f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    temporary_path.write_text(text, encoding=encoding)
+    temporary_path.replace(path)
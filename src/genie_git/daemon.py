@@ -0,0 +1,289 @@
+"""Serves suggestions from a long-running process over a Unix socket."""
+
+import importlib
+import io
+import json
+import os
+import socketserver
+import subprocess
+import sys
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+
+from .client import FORWARDED_ENV, SOCKET_PATH, connect, send_request
+from .config import Config
+from .pipeline import ClientWarmup, WarmState, keep_warm
+
+# Imported when the daemon starts, so that no suggestion pays for them.
+PRELOADED_MODULES = (
+    "genie_git.ai_handler",
+    "genie_git.batch",
+    "genie_git.git_handler",
+    "genie_git.map_reduce",
+    "pyperclip",
+)
+START_TIMEOUT_SECONDS = 10
+
+
+class _ReplyWriter(io.TextIOBase):
+    """Send everything written to a stream to the client as JSON lines."""
+
+    def __init__(self, reply: io.BufferedIOBase, stream: str) -> None:
+        self._reply = reply
+        self._stream = stream
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text:
+            self._reply.write(json.dumps({self._stream: text}).encode() + b"\n")
+        return len(text)
+
+    def flush(self) -> None:
+        self._reply.flush()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    server: "DaemonServer"
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            return  # A connection that only checks whether the daemon runs.
+        try:
+            request = json.loads(line)
+            exit_code = self.server.handle_message(request, self.wfile)
+            self.wfile.write(json.dumps({"exit": exit_code}).encode() + b"\n")
+        except BrokenPipeError:
+            pass  # The client went away, e.g. on Ctrl+C.
+
+
+def run_command(argv: list[str]) -> int:
+    """Run a genie-git command and return its exit code."""
+    from .cli import create_parser
+
+    try:
+        args = create_parser().parse_args(argv)
+        args.func(args)
+    except SystemExit as error:
+        if error.code is None or isinstance(error.code, int):
+            return error.code or 0
+        print(error.code, file=sys.stderr)
+        return 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """Serve one request at a time with warm clients and repositories.
+
+    Requests are handled sequentially, so a command may change the working
+    directory and redirect stdout and stderr while it runs.
+    """
+
+    def __init__(self, socket_path: str, idle_timeout: float | None = None) -> None:
+        """Listen on the socket.
+
+        Args:
+            socket_path: The socket to listen on.
+            idle_timeout: Exit after this many idle seconds; 0 never exits
+                (default: the daemon_idle_minutes setting)
+
+        """
+        self.warm_state = WarmState()
+        self.idle_timeout_override = idle_timeout
+        self.idle_timeout = 0.0
+        self.config_modified: int | None = None
+        self.started_at = self.last_request_at = time.monotonic()
+        self.stopping = False
+        super().__init__(socket_path, _RequestHandler)
+        keep_warm(self.warm_state)
+        self.load_config()
+
+    def server_bind(self) -> None:
+        """Bind the socket so that only the current user can connect."""
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def server_close(self) -> None:
+        """Stop listening and stop keeping objects warm."""
+        keep_warm(None)
+        super().server_close()
+
+    def reload_config_if_changed(self) -> None:
+        """Reload the config if the config file changed since it was loaded."""
+        if Config.last_modified() != self.config_modified:
+            self.load_config()
+
+    def load_config(self) -> None:
+        """Load the config and warm up a client for it."""
+        self.config_modified = Config.last_modified()
+        config = Config.load()
+        if self.idle_timeout_override is None:
+            self.idle_timeout = config.daemon_idle_minutes * 60
+        else:
+            self.idle_timeout = self.idle_timeout_override
+        # The API key or the URL may have changed, so warm up a fresh client.
+        self.warm_state.clients.clear()
+        if config.api_key:
+            ClientWarmup(config.api_key, config.model, config.api_base_url).connect()
+
+    def handle_message(self, request: dict, reply: io.BufferedIOBase) -> int:
+        """Handle a request and return its exit code.
+
+        Args:
+            request: The request, whose "command" is "run", "status" or "stop".
+            reply: The stream the output of the request is written to.
+
+        Returns:
+            The exit code of the request.
+
+        """
+        self.last_request_at = time.monotonic()
+        command = request.get("command")
+        if command == "status":
+            status = {
+                "pid": os.getpid(),
+                "uptime": time.monotonic() - self.started_at,
+                "repositories": len(self.warm_state.repos),
+            }
+            reply.write(json.dumps({"status": status}).encode() + b"\n")
+            return 0
+        if command == "stop":
+            self.stopping = True
+            return 0
+        if command != "run":
+            _ReplyWriter(reply, "stderr").write(f"Unknown command: {command}\n")
+            return 1
+
+        self.reload_config_if_changed()
+        cwd = os.getcwd()
+        env = request.get("env", {})
+        try:
+            os.chdir(request["cwd"])
+            for name in FORWARDED_ENV:
+                if name in env:
+                    os.environ[name] = env[name]
+                else:
+                    os.environ.pop(name, None)
+            with (
+                redirect_stdout(_ReplyWriter(reply, "stdout")),
+                redirect_stderr(_ReplyWriter(reply, "stderr")),
+            ):
+                return run_command(request["argv"])
+        finally:
+            os.chdir(cwd)
+
+    def serve_until_idle(self) -> None:
+        """Handle requests until a stop request or the idle timeout."""
+        while not self.stopping:
+            if not self.idle_timeout:
+                self.timeout = None
+            else:
+                idle = time.monotonic() - self.last_request_at
+                if idle >= self.idle_timeout:
+                    return
+                self.timeout = self.idle_timeout - idle
+            self.handle_request()
+
+
+def serve(socket_path: str = SOCKET_PATH, idle_timeout: float | None = None) -> None:
+    """Run the daemon in the foreground until it is stopped or idle.
+
+    Args:
+        socket_path: The socket to listen on.
+        idle_timeout: Exit after this many idle seconds; 0 never exits
+            (default: the daemon_idle_minutes setting)
+
+    Raises:
+        RuntimeError: If a daemon is already running.
+
+    """
+    if is_running(socket_path):
+        raise RuntimeError(f"A daemon is already listening on {socket_path}.")
+
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+    # A daemon that crashed leaves its socket behind.
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    for module in PRELOADED_MODULES:
+        importlib.import_module(module)
+
+    server = DaemonServer(socket_path, idle_timeout)
+    try:
+        server.serve_until_idle()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def start(socket_path: str = SOCKET_PATH) -> int:
+    """Start the daemon in the background and wait until it listens.
+
+    Args:
+        socket_path: The socket to listen on.
+
+    Returns:
+        The process ID of the daemon.
+
+    Raises:
+        RuntimeError: If the daemon is already running or does not start.
+
+    """
+    if is_running(socket_path):
+        raise RuntimeError(f"A daemon is already listening on {socket_path}.")
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "genie_git.main", "daemon", "run"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + START_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if is_running(socket_path):
+            return process.pid
+        if process.poll() is not None:
+            break
+        time.sleep(0.05)
+    raise RuntimeError("The daemon did not start.")
+
+
+def is_running(socket_path: str = SOCKET_PATH) -> bool:
+    """Return whether a daemon is listening on the socket."""
+    connection = connect(socket_path)
+    if connection is None:
+        return False
+    connection.close()
+    return True
+
+
+def status(socket_path: str = SOCKET_PATH) -> dict | None:
+    """Return the status of the daemon, or None if it is not running."""
+    connection = connect(socket_path)
+    if connection is None:
+        return None
+    for message in send_request(connection, {"command": "status"}):
+        if "status" in message:
+            return message["status"]
+    return None
+
+
+def stop(socket_path: str = SOCKET_PATH) -> bool:
+    """Stop the daemon and return whether it was running."""
+    connection = connect(socket_path)
+    if connection is None:
+        return False
+    for _ in send_request(connection, {"command": "stop"}):
+        pass
+    return True
@@ -0,0 +1,278 @@
+"""Encodes the staged changes more compactly than the default unified diff.
+
+An encoding is one or more of the names below joined with "+", e.g.
+"context-1+structured". Most of them are git options of the patch pass,
+while "moves" and "structured" rewrite the diff right before it becomes part
+of the prompt, after compaction and map-reduce have parsed it.
+
+- unified: The default patch with 3 lines of context.
+- context-1, context-0: 1 or no line of context around every change.
+- ignore-whitespace: Leave out changes of indentation and blank lines.
+- word-diff: Mark the changed words of a line instead of repeating the line.
+- moves: Detect renamed and copied files, and replace blocks of lines moved
+  elsewhere in the diff with a single line naming where they went.
+- structured: Replace the header lines of every file with a single title and
+  shorten the hunk headers to the first changed line.
+"""
+
+import re
+
+from .diff_parser import FileDiff, parse_diff
+
+DEFAULT_ENCODING = "unified"
+ENCODINGS: dict[str, tuple[str, ...]] = {
+    "unified": (),
+    "context-1": ("--unified=1",),
+    "context-0": ("--unified=0",),
+    "ignore-whitespace": ("--ignore-all-space", "--ignore-blank-lines"),
+    "word-diff": ("--word-diff=plain",),
+    "moves": ("--find-renames", "--find-copies"),
+    "structured": (),
+}
+CONTEXT_ENCODINGS = ("context-1", "context-0")
+# Encodings applied to the text of the diff rather than by git.
+REWRITING_ENCODINGS = ("moves", "structured")
+MIN_MOVED_LINES = 3  # The non-blank lines a block needs to be collapsed.
+# The removed positions compared with every added line, which bounds the work
+# on lines that occur everywhere, like a closing bracket.
+MAX_MOVE_CANDIDATES = 100
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@ ?(.*)$")
+# Header lines that only repeat the path or identify the blobs.
+REDUNDANT_HEADER_PREFIXES = (
+    "index ",
+    "--- ",
+    "+++ ",
+    "similarity index ",
+    "dissimilarity index ",
+    "rename to ",
+    "copy to ",
+)
+
+
+def parse_encoding(encoding: str) -> tuple[str, ...]:
+    """Split an encoding into the names it combines.
+
+    Raises:
+        ValueError: If a name is unknown or several context sizes are combined.
+
+    """
+    names = tuple(name.strip() for name in encoding.split("+") if name.strip())
+    for name in names:
+        if name not in ENCODINGS:
+            raise ValueError(
+                f"Unknown diff encoding {name!r}, expected some of "
+                f"{', '.join(ENCODINGS)} joined with '+'."
+            )
+    if sum(name in CONTEXT_ENCODINGS for name in names) > 1:
+        raise ValueError("Only one of context-1 and context-0 can be used.")
+    return names or (DEFAULT_ENCODING,)
+
+
+def git_arguments(encoding: str) -> list[str]:
+    """Return the options of the git patch pass for the encoding."""
+    return [option for name in parse_encoding(encoding) for option in ENCODINGS[name]]
+
+
+def _hunk_lines(hunk: str) -> list[str]:
+    # Without the "@@ ... @@" header line.
+    return hunk.splitlines(keepends=True)[1:]
+
+
+def _runs(lines: list[str], prefix: str) -> list[tuple[int, int]]:
+    """Return the start and the end of every run of lines with the prefix."""
+    runs = []
+    start = None
+    for index, line in enumerate([*lines, ""]):
+        if line.startswith(prefix) and start is None:
+            start = index
+        elif not line.startswith(prefix) and start is not None:
+            runs.append((start, index))
+            start = None
+    return runs
+
+
+def _content(line: str) -> str:
+    return line[1:].rstrip()
+
+
+def _is_move(lines: list[str]) -> bool:
+    return sum(bool(_content(line)) for line in lines) >= MIN_MOVED_LINES
+
+
+# The file, the hunk and the line of a changed line.
+Position = tuple[int, int, int]
+
+
+def find_moves(file_diffs: list[FileDiff]) -> dict[Position, tuple[int, Position]]:
+    """Find the blocks of added lines that were removed elsewhere in the diff.
+
+    Lines match when they are equal but for trailing whitespace, so that a
+    reindented block is not a move.
+
+    Args:
+        file_diffs: The files of the diff.
+
+    Returns:
+        The length of every moved block by the position of its first removed
+        and of its first added line, mapped to the position of the other end.
+
+    """
+    lines_of = [
+        [_hunk_lines(hunk) for hunk in file_diff.hunks] for file_diff in file_diffs
+    ]
+    removed: dict[str, list[Position]] = {}
+    for f, hunks in enumerate(lines_of):
+        for h, lines in enumerate(hunks):
+            for start, end in _runs(lines, "-"):
+                for i in range(start, end):
+                    removed.setdefault(_content(lines[i]), []).append((f, h, i))
+
+    def matches(position: Position, line: str) -> bool:
+        f, h, i = position
+        lines = lines_of[f][h]
+        return (
+            i < len(lines)
+            and lines[i].startswith("-")
+            and position not in used
+            and _content(lines[i]) == _content(line)
+        )
+
+    moves: dict[Position, tuple[int, Position]] = {}
+    used: set[Position] = set()
+    for f, hunks in enumerate(lines_of):
+        for h, lines in enumerate(hunks):
+            for start, end in _runs(lines, "+"):
+                i = start
+                while i < end:
+                    best_length, best_start = 0, (0, 0, 0)
+                    candidates = removed.get(_content(lines[i]), [])
+                    for rf, rh, ri in candidates[:MAX_MOVE_CANDIDATES]:
+                        length = 0
+                        while i + length < end and matches(
+                            (rf, rh, ri + length), lines[i + length]
+                        ):
+                            length += 1
+                        if length > best_length:
+                            best_length, best_start = length, (rf, rh, ri)
+                    if not _is_move(lines[i : i + best_length]):
+                        i += 1
+                        continue
+                    rf, rh, ri = best_start
+                    used.update((rf, rh, ri + k) for k in range(best_length))
+                    moves[best_start] = (best_length, (f, h, i))
+                    moves[f, h, i] = (best_length, best_start)
+                    i += best_length
+    return moves
+
+
+def _collapse_moves(
+    file_diffs: list[FileDiff], moves: dict[Position, tuple[int, Position]]
+) -> list[FileDiff]:
+    """Replace every moved block with a line naming the other end."""
+    collapsed = []
+    for f, file_diff in enumerate(file_diffs):
+        hunks = []
+        for h, hunk in enumerate(file_diff.hunks):
+            header, *_ = hunk.splitlines(keepends=True)
+            lines = _hunk_lines(hunk)
+            output = [header]
+            i = 0
+            while i < len(lines):
+                move = moves.get((f, h, i))
+                if move is None:
+                    output.append(lines[i])
+                    i += 1
+                    continue
+                length, (other, _, _) = move
+                where = (
+                    "within the file"
+                    if other == f
+                    else ("to " if lines[i][0] == "-" else "from ")
+                    + file_diffs[other].path
+                )
+                first_line = _content(lines[i]).strip()
+                output.append(
+                    f"{lines[i][0]}[{length} lines moved {where}: {first_line} ...]\n"
+                )
+                i += length
+            hunks.append("".join(output))
+        collapsed.append(FileDiff(file_diff.path, file_diff.header, hunks))
+    return collapsed
+
+
+def _structured_title(file_diff: FileDiff) -> str:
+    """Return the title of a file and the header lines worth keeping."""
+    notes = []
+    kept = []
+    for line in file_diff.header.splitlines()[1:]:
+        if line.startswith(REDUNDANT_HEADER_PREFIXES):
+            continue
+        if line.startswith("new file mode"):
+            notes.append("added")
+        elif line.startswith("deleted file mode"):
+            notes.append("deleted")
+        elif line.startswith("rename from "):
+            notes.append(f"renamed from {line.removeprefix('rename from ')}")
+        elif line.startswith("copy from "):
+            notes.append(f"copied from {line.removeprefix('copy from ')}")
+        else:
+            kept.append(f"{line}\n")  # E.g. mode changes and line counts.
+    title = f"## {file_diff.path}"
+    if notes:
+        title += f" ({', '.join(notes)})"
+    return f"{title}\n" + "".join(kept)
+
+
+def _structured_hunk(hunk: str) -> str:
+    header, _, body = hunk.partition("\n")
+    match = HUNK_HEADER.match(header)
+    if match is None:
+        return hunk
+    line, section = match.groups()
+    return f"@@ {line} {section}".rstrip() + f"\n{body}"
+
+
+def encode_files(file_diffs: list[FileDiff], encoding: str) -> list[str]:
+    """Rewrite the diff of every file as the encoding asks.
+
+    Args:
+        file_diffs: The files of a diff read with the git arguments of the
+            encoding.
+        encoding: The encoding.
+
+    Returns:
+        The text of every file.
+
+    """
+    names = parse_encoding(encoding)
+    if "moves" in names:
+        file_diffs = _collapse_moves(file_diffs, find_moves(file_diffs))
+    if "structured" not in names:
+        return [file_diff.text for file_diff in file_diffs]
+    return [
+        _structured_title(file_diff)
+        + "".join(_structured_hunk(hunk) for hunk in file_diff.hunks)
+        for file_diff in file_diffs
+    ]
+
+
+def encode_diff(diff: str, encoding: str) -> str:
+    """Rewrite a diff as the encoding asks, e.g. before it is sent.
+
+    Changes that are not a diff, e.g. the summaries of map-reduce mode, and
+    encodings applied by git alone are returned unchanged.
+
+    Args:
+        diff: A diff read with the git arguments of the encoding.
+        encoding: The encoding.
+
+    Returns:
+        The encoded diff.
+
+    """
+    if not any(name in REWRITING_ENCODINGS for name in parse_encoding(encoding)):
+        return diff
+    file_diffs = parse_diff(diff)
+    if not file_diffs:
+        return diff
+    return "".join(encode_files(file_diffs, encoding))
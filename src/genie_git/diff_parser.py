@@ -0,0 +1,151 @@
+"""Parses unified git diffs into per-file records."""
+
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
+DIFF_HEADER_PREFIX = "diff --git "
+INDEX_PREFIX = "index "
+
+
+@dataclass
+class FileDiff:
+    """Represent the changes of a single file in a unified diff."""
+
+    path: str
+    header: str
+    hunks: list[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        """Return the diff of the file."""
+        return self.header + "".join(self.hunks)
+
+    @property
+    def old_path(self) -> str:
+        """Return the path before the change, which differs for a rename."""
+        for line in self.header.splitlines():
+            if line.startswith("rename from "):
+                return line.removeprefix("rename from ")
+        first_line = self.header.split("\n", 1)[0]
+        return first_line.removeprefix(f"{DIFF_HEADER_PREFIX}a/").partition(" b/")[0]
+
+    @property
+    def additions(self) -> int:
+        """Return the number of added lines."""
+        return sum(_count_lines(hunk, "+") for hunk in self.hunks)
+
+    @property
+    def deletions(self) -> int:
+        """Return the number of deleted lines."""
+        return sum(_count_lines(hunk, "-") for hunk in self.hunks)
+
+    @property
+    def blob_ids(self) -> tuple[str, str] | None:
+        """Return the abbreviated blob ids before and after the change.
+
+        They identify the content of the change, e.g. the base and the staged
+        version of a file, without hashing the diff. None if the header has no
+        "index" line, e.g. for a pure rename or a mode change.
+        """
+        for line in self.header.splitlines():
+            if line.startswith(INDEX_PREFIX):
+                blobs = line[len(INDEX_PREFIX) :].split(" ", 1)[0]
+                before, separator, after = blobs.partition("..")
+                if separator:
+                    return before, after
+        return None
+
+    def stat_summary(self, note: str = "content omitted") -> str:
+        """Return the header line of the file followed by its line counts.
+
+        Args:
+            note: Why the content is not included.
+
+        Returns:
+            A short replacement for the diff of the file.
+
+        """
+        first_line = self.header.split("\n", 1)[0]
+        return (
+            f"{first_line}\n"
+            f"[{self.path}: +{self.additions} -{self.deletions} lines, {note}]\n"
+        )
+
+
+def _count_lines(hunk: str, prefix: str) -> int:
+    # The first line of a hunk is its "@@ ... @@" range header.
+    return sum(line.startswith(prefix) for line in hunk.splitlines()[1:])
+
+
+def _parse_path(header_lines: list[str]) -> str:
+    for line in header_lines:
+        if line.startswith("+++ b/"):
+            return line[len("+++ b/") :].rstrip("\n")
+    for line in header_lines:
+        if line.startswith("--- a/"):
+            return line[len("--- a/") :].rstrip("\n")
+    first_line = header_lines[0][len(DIFF_HEADER_PREFIX) :].rstrip("\n")
+    return first_line.rsplit(" b/", 1)[-1]
+
+
+def iter_file_diffs(lines: Iterable[str]) -> Iterator[FileDiff]:
+    """Parse a unified diff file by file as its lines arrive.
+
+    Only the lines of the current file are held, so a diff read from a pipe
+    is parsed without ever holding all of it.
+
+    Args:
+        lines: The lines of the output of `git diff`, with their line endings.
+
+    Yields:
+        The changes of each file in the order they appear in the diff.
+
+    """
+    header_lines: list[str] = []
+    hunk_lines: list[str] = []
+    hunks: list[str] = []
+
+    def take() -> FileDiff:
+        if hunk_lines:
+            hunks.append("".join(hunk_lines))
+            hunk_lines.clear()
+        file_diff = FileDiff(
+            path=_parse_path(header_lines),
+            header="".join(header_lines),
+            hunks=list(hunks),
+        )
+        header_lines.clear()
+        hunks.clear()
+        return file_diff
+
+    for line in lines:
+        if line.startswith(DIFF_HEADER_PREFIX):
+            if header_lines:
+                yield take()
+            header_lines.append(line)
+        elif line.startswith("@@") and header_lines:
+            if hunk_lines:
+                hunks.append("".join(hunk_lines))
+                hunk_lines.clear()
+            hunk_lines.append(line)
+        elif hunk_lines:
+            hunk_lines.append(line)
+        elif header_lines:
+            header_lines.append(line)
+    if header_lines:
+        yield take()
+
+
+def parse_diff(diff: str) -> list[FileDiff]:
+    """Split a unified diff into the changes of each file.
+
+    Args:
+        diff: The output of `git diff`.
+
+    Returns:
+        The changes of each file in the order they appear in the diff.
+
+    """
+    if diff and not diff.endswith("\n"):
+        diff += "\n"
+    return list(iter_file_diffs(diff.splitlines(keepends=True)))
@@ -0,0 +1,160 @@
+"""Reports the size of a prompt and predicts its latency without the network.
+
+The report breaks the prompt down into the instructions, the git log, every
+file of the diff and the context, so that a slow or oversized suggestion can
+be traced back to the part responsible, e.g. in CI before any request.
+"""
+
+from dataclasses import asdict, dataclass, field
+
+from .diff_encoding import DEFAULT_ENCODING, encode_files
+from .diff_parser import parse_diff
+from .latency import LatencyHistory
+from .prompt import build_prompt
+from .tokens import estimate_tokens
+
+
+@dataclass
+class PromptSection:
+    """Represent the size of a part of the prompt."""
+
+    name: str
+    size_bytes: int
+    tokens: int
+
+    @classmethod
+    def measure(cls, name: str, text: str) -> "PromptSection":
+        """Measure the text of a part of the prompt."""
+        return cls(name, len(text.encode()), estimate_tokens(text))
+
+
+@dataclass
+class PromptEstimate:
+    """Represent the estimated cost of the requests of a suggestion."""
+
+    model: str
+    size_bytes: int
+    tokens: int
+    sections: list[PromptSection] = field(default_factory=list)
+    # The estimated tokens of every map-reduce summary request, sent first.
+    summary_requests: list[int] = field(default_factory=list)
+    cached_response: bool = False  # No request is sent at all.
+    predicted_seconds: float | None = None
+
+    @property
+    def total_tokens(self) -> int:
+        """Return the tokens of every request, unless the response is cached."""
+        if self.cached_response:
+            return 0
+        return self.tokens + sum(self.summary_requests)
+
+    def to_dict(self) -> dict:
+        """Return the estimate as a JSON-serializable dictionary."""
+        return {**asdict(self), "total_tokens": self.total_tokens}
+
+    def format(self) -> str:
+        """Return the estimate as a human-readable report."""
+        width = max(len(section.name) for section in self.sections)
+        lines = [
+            f"Prompt for {self.model}: {self.size_bytes} bytes, ~{self.tokens} tokens"
+        ]
+        lines += [
+            f"  {section.name:<{width}}  {section.size_bytes:>9} bytes  "
+            f"{f'~{section.tokens}':>8} tokens"
+            for section in self.sections
+        ]
+        if self.summary_requests:
+            lines.append(
+                f"Map-reduce: {len(self.summary_requests)} summary requests, "
+                f"~{sum(self.summary_requests)} tokens"
+            )
+        if self.cached_response:
+            lines.append("The response is cached, no request would be sent.")
+        elif self.predicted_seconds is None:
+            lines.append("Predicted latency: unknown, too few recorded requests.")
+        else:
+            lines.append(f"Predicted latency: {self.predicted_seconds:.1f}s")
+        return "\n".join(lines)
+
+
+def estimate_prompt(
+    model: str,
+    git_logs: str,
+    staged_changes: str,
+    message_specifications: str,
+    context: str = "",
+    encoding: str = DEFAULT_ENCODING,
+) -> PromptEstimate:
+    """Measure the prompt of a suggestion and every part of it.
+
+    Args:
+        model: The model the prompt is sent to.
+        git_logs: The git logs of the prompt.
+        staged_changes: The changes of the prompt, after any compaction and
+            before the encoding rewrote them.
+        message_specifications: Additional specifications for the commit message.
+        context: Additional context for the commit message.
+        encoding: The diff encoding of the changes.
+
+    Returns:
+        The size of the prompt, without latency predictions.
+
+    """
+    parts = [PromptSection.measure("log", git_logs)]
+    file_diffs = parse_diff(staged_changes)
+    file_texts = encode_files(file_diffs, encoding)
+    if file_diffs:
+        staged_changes = "".join(file_texts)
+    prompt = build_prompt(git_logs, staged_changes, message_specifications, context)
+    parts += [
+        PromptSection.measure(file_diff.path, text)
+        for file_diff, text in zip(file_diffs, file_texts, strict=True)
+    ]
+    if not file_diffs and staged_changes:
+        # E.g. the summaries of map-reduce mode, which are not a diff.
+        parts.append(PromptSection.measure("changes", staged_changes))
+    if context:
+        parts.append(PromptSection.measure("context", context))
+    total = PromptSection.measure("", prompt)
+    # Whatever the measured parts leave is the wording around them.
+    instructions = PromptSection(
+        "instructions",
+        total.size_bytes - sum(part.size_bytes for part in parts),
+        max(total.tokens - sum(part.tokens for part in parts), 0),
+    )
+    return PromptEstimate(
+        model=model,
+        size_bytes=total.size_bytes,
+        tokens=total.tokens,
+        sections=[instructions, *parts],
+    )
+
+
+def predict_latency(
+    history: LatencyHistory, estimate: PromptEstimate, concurrency: int
+) -> float | None:
+    """Predict the wall time of the requests from the recorded latencies.
+
+    Summary requests run in waves of the concurrency limit, each as slow as its
+    largest request, before the final request.
+
+    Args:
+        history: The recorded latencies.
+        estimate: The estimated prompts.
+        concurrency: The maximum number of summary requests in flight.
+
+    Returns:
+        The latency in seconds, or None with too few samples.
+
+    """
+    seconds = history.predict(estimate.model, estimate.tokens)
+    if seconds is None:
+        return None
+    concurrency = max(concurrency, 1)
+    requests = estimate.summary_requests
+    for start in range(0, len(requests), concurrency):
+        wave = history.predict(
+            estimate.model, max(requests[start : start + concurrency])
+        )
+        seconds += wave or 0.0
+    return seconds
@@ -0,0 +1,227 @@
+"""Decides which changed files are left out or sent as line counts only.
+
+Excluded files never reach git's output. Binary files, generated files and
+files with too many changed lines are listed by `git diff --numstat`, which
+is cheap, and their patches are never requested.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .config import Config
+
+# Files whose changes rarely explain a commit, sent as line counts only.
+DEFAULT_STAT_ONLY_FILES = (
+    "*.lock",
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "pnpm-lock.yaml",
+    "go.sum",
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    "*.svg",
+    "*_pb2.py",
+    "*.pb.go",
+    "*.generated.*",
+)
+DEFAULT_MAX_FILE_DIFF_LINES = 1000
+# The patches read before the files left are sent as line counts only, which
+# bounds the memory used on huge staged changes, e.g. vendored dependencies.
+DEFAULT_MAX_DIFF_READ_TOKENS = 1_000_000
+GLOB_CHARACTERS = "*?["
+
+
+@cache
+def _pattern_regex(pattern: str) -> re.Pattern[str]:
+    """Translate a pattern to a regular expression with git's glob rules.
+
+    "*" and "?" do not match a slash, "**/" matches any directories and a
+    trailing slash matches everything inside a directory.
+    """
+    pattern = pattern.removeprefix("/")
+    if pattern.endswith("/"):
+        pattern += "**"
+    regex = ""
+    index = 0
+    while index < len(pattern):
+        if pattern.startswith("**/", index):
+            regex += "(?:.*/)?"
+            index += 3
+        elif pattern.startswith("**", index):
+            regex += ".*"
+            index += 2
+        elif pattern[index] == "*":
+            regex += "[^/]*"
+            index += 1
+        elif pattern[index] == "?":
+            regex += "[^/]"
+            index += 1
+        elif pattern[index] == "[" and "]" in pattern[index + 2 :]:
+            end = pattern.index("]", index + 2)
+            regex += "[" + pattern[index + 1 : end].replace("!", "^", 1) + "]"
+            index = end + 1
+        else:
+            regex += re.escape(pattern[index])
+            index += 1
+    return re.compile(regex)
+
+
+def _anchored(pattern: str) -> str:
+    # Like .gitignore, a pattern without a slash matches in any directory.
+    if "/" not in pattern.rstrip("/"):
+        return "**/" + pattern
+    return pattern
+
+
+def matches(path: str, pattern: str) -> bool:
+    """Return whether the path matches an exclusion pattern.
+
+    Args:
+        path: A path relative to the repository root.
+        pattern: A file, directory or glob pattern, e.g. "*.lock" or "dist/".
+
+    Returns:
+        Whether the path matches.
+
+    """
+    return _pattern_regex(_anchored(pattern)).fullmatch(path) is not None
+
+
+def to_pathspec(pattern: str) -> str:
+    """Return the git pathspec excluding the files matched by the pattern."""
+    pattern = _anchored(pattern).removeprefix("/")
+    if pattern.endswith("/"):
+        pattern += "**"
+    return f":(exclude,glob){pattern}"
+
+
+def is_glob(pattern: str) -> bool:
+    """Return whether the pattern matches files by a glob rather than a path."""
+    return any(character in pattern for character in GLOB_CHARACTERS)
+
+
+@dataclass
+class NumstatEntry:
+    """Represent the line counts of a changed file."""
+
+    path: str
+    additions: int | None  # None for binary files.
+    deletions: int | None
+    old_path: str = ""  # The path before a rename.
+
+    @property
+    def binary(self) -> bool:
+        """Return whether git considers the file binary."""
+        return self.additions is None
+
+    @property
+    def changed_lines(self) -> int:
+        """Return the number of added and deleted lines."""
+        return (self.additions or 0) + (self.deletions or 0)
+
+    def stat_summary(self, note: str) -> str:
+        """Return a diff header of the file followed by its line counts.
+
+        The summary has the shape of `FileDiff.stat_summary`, so the diff
+        parser and the compaction treat it like any other file.
+        """
+        header = f"diff --git a/{self.old_path or self.path} b/{self.path}"
+        if self.binary:
+            return f"{header}\n[{self.path}: binary file, {note}]\n"
+        return (
+            f"{header}\n"
+            f"[{self.path}: +{self.additions} -{self.deletions} lines, {note}]\n"
+        )
+
+
+def parse_numstat(output: str) -> list[NumstatEntry]:
+    """Parse the output of `git diff --numstat -z`.
+
+    Args:
+        output: The NUL-separated line counts of every changed file.
+
+    Returns:
+        The line counts of every file in the order git listed them.
+
+    """
+    fields = output.split("\0")
+    entries = []
+    index = 0
+    while index < len(fields):
+        field = fields[index]
+        index += 1
+        if not field:
+            continue
+        additions, deletions, path = field.split("\t", 2)
+        old_path = ""
+        if not path:
+            # A rename lists the old and the new path as the next fields.
+            old_path, path = fields[index], fields[index + 1]
+            index += 2
+        entries.append(
+            NumstatEntry(
+                path=path,
+                additions=None if additions == "-" else int(additions),
+                deletions=None if deletions == "-" else int(deletions),
+                old_path=old_path,
+            )
+        )
+    return entries
+
+
+@dataclass(frozen=True)
+class ExclusionRules:
+    """Represent which files are left out of the diff or sent as line counts."""
+
+    exclude: tuple[str, ...] = ()
+    stat_only: tuple[str, ...] = DEFAULT_STAT_ONLY_FILES
+    max_file_lines: int = DEFAULT_MAX_FILE_DIFF_LINES  # 0 disables the limit.
+    # The estimated tokens of patches to read, 0 reads them all.
+    max_read_tokens: int = 0
+
+    @classmethod
+    def from_config(cls, config: "Config") -> "ExclusionRules":
+        """Return the rules of the configuration.
+
+        Without map-reduce, no more of the changes than the prompt budget is
+        ever sent, so no more is read either.
+        """
+        limits = [config.max_diff_read_tokens]
+        if config.map_reduce_threshold_tokens <= 0:
+            limits.append(config.max_prompt_tokens)
+        return cls(
+            exclude=tuple(config.exclude_files),
+            stat_only=tuple(config.stat_only_files),
+            max_file_lines=config.max_file_diff_lines,
+            max_read_tokens=min((limit for limit in limits if limit > 0), default=0),
+        )
+
+    def pathspecs(self, excluded_paths: list[str] | None = None) -> list[str]:
+        """Return the git arguments excluding the files.
+
+        Args:
+            excluded_paths: Exact paths to exclude besides the excluded patterns.
+
+        Returns:
+            The pathspecs after a "--" separator, or nothing to exclude.
+
+        """
+        pathspecs = [to_pathspec(pattern) for pattern in self.exclude]
+        pathspecs += [f":(exclude,literal){path}" for path in excluded_paths or []]
+        if not pathspecs:
+            return []
+        return ["--", *pathspecs]
+
+    def stat_only_reason(self, entry: NumstatEntry) -> str | None:
+        """Return why only the line counts of the file are sent, if they are."""
+        if entry.binary:
+            return "content omitted"
+        if any(matches(entry.path, pattern) for pattern in self.stat_only):
+            return "generated or lock file, content omitted"
+        if self.max_file_lines and entry.changed_lines > self.max_file_lines:
+            return f"over the {self.max_file_lines}-line limit, content omitted"
+        return None
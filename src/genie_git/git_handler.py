@@ -1,45 +1,557 @@
 """Handles git operations."""
 
+import math
+import subprocess
+import tempfile
+import time
+from collections.abc import Callable, Iterable, Iterator, Sequence
+
 import git
 
+from .diff_encoding import DEFAULT_ENCODING, git_arguments
+from .diff_parser import DIFF_HEADER_PREFIX, iter_file_diffs
+from .exclusions import ExclusionRules, parse_numstat
+from .tokens import CHARACTERS_PER_TOKEN
+from .tracing import current_tracer, span
+
+NO_COMMITS_ERROR = "does not have any commits yet"
+# The summarized paths excluded on the command line, past which they are left
+# out of the output instead: `git diff` has no `--pathspec-from-file`, and the
+# command line is limited to 32K characters on Windows.
+MAX_PATHSPEC_CHARACTERS = 30_000
+
+
+class GitProcess:
+    """Run a git command in the background.
+
+    The output is buffered in temporary files rather than pipes, so git never
+    waits for Python to read it and collecting the output takes a single read.
+    """
+
+    def __init__(self, repo: git.Repo, *args: str, empty_on_error: str = "") -> None:
+        """Start the git command.
+
+        Args:
+            repo: The repository to run the command in.
+            args: The git subcommand and its arguments.
+            empty_on_error: An error message that means the output is empty.
+
+        """
+        self.command = [repo.git.GIT_PYTHON_GIT_EXECUTABLE or "git", *args]
+        self.empty_on_error = empty_on_error
+        self._subcommand = args[0]
+        self._started_at = time.perf_counter()
+        self._stdout = tempfile.TemporaryFile()
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            self.command,
+            cwd=repo.working_dir,
+            stdin=subprocess.DEVNULL,
+            stdout=self._stdout,
+            stderr=self._stderr,
+        )
+
+    def result(self) -> str:
+        """Wait for the command and return its output.
+
+        Raises:
+            git.GitCommandError: If the command failed.
+
+        """
+        status = self._process.wait()
+        with self._stdout, self._stderr:
+            self._stdout.seek(0)
+            self._stderr.seek(0)
+            output = self._stdout.read().decode(errors="replace")
+            error = self._stderr.read().decode(errors="replace")
+
+        tracer = current_tracer()
+        if tracer:
+            # The span covers the whole run of the process, not only the wait.
+            tracer.record(f"git_{self._subcommand}", self._started_at).add_text(
+                self._subcommand, output
+            )
+
+        if status != 0:
+            if self.empty_on_error and self.empty_on_error in error:
+                return ""
+            raise git.GitCommandError(self.command, status, error)
+        # Match GitPython, which strips the trailing newline of the output.
+        return output.removesuffix("\n")
+
+
+class GitStream:
+    """Run a git command in the background and read its output as it comes.
+
+    Unlike GitProcess, the output goes through a pipe, so only the lines read
+    so far are held and git can be stopped once enough of the output is read.
+    """
+
+    def __init__(self, repo: git.Repo, *args: str) -> None:
+        """Start the git command.
+
+        Args:
+            repo: The repository to run the command in.
+            args: The git subcommand and its arguments.
+
+        """
+        self.command = [repo.git.GIT_PYTHON_GIT_EXECUTABLE or "git", *args]
+        self.bytes_read = 0
+        self._subcommand = args[0]
+        self._started_at = time.perf_counter()
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            self.command,
+            cwd=repo.working_dir,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=self._stderr,
+        )
+
+    def lines(self) -> Iterator[str]:
+        """Yield the lines of the output with their line endings."""
+        assert self._process.stdout is not None
+        for line in self._process.stdout:
+            self.bytes_read += len(line)
+            yield line.decode(errors="replace")
+
+    def close(self, stop: bool = False) -> None:
+        """Wait for the command, or stop it if the rest of its output is unused.
+
+        Args:
+            stop: Whether to terminate git rather than wait for it.
+
+        Raises:
+            git.GitCommandError: If the command failed before it was stopped.
+
+        """
+        if stop:
+            self._process.terminate()
+        assert self._process.stdout is not None
+        self._process.stdout.close()
+        status = self._process.wait()
+        with self._stderr:
+            self._stderr.seek(0)
+            error = self._stderr.read().decode(errors="replace")
+
+        tracer = current_tracer()
+        if tracer:
+            tracer.record(
+                f"git_{self._subcommand}",
+                self._started_at,
+                **{f"{self._subcommand}_bytes": self.bytes_read, "stopped": stop},
+            )
+
+        if status != 0 and not stop:
+            raise git.GitCommandError(self.command, status, error)
+
+
+def _without_files(lines: Iterable[str], paths: set[str]) -> Iterator[str]:
+    """Leave the files with the given paths out of the lines of a diff.
+
+    The header of every file is held until its first hunk, where its paths
+    are known, and the lines of a left out file are dropped as they arrive.
+    """
+    header: list[str] = []
+    keep = True
+    for line in lines:
+        starts_file = line.startswith(DIFF_HEADER_PREFIX)
+        if header and (starts_file or line.startswith("@@")):
+            file_diff = next(iter_file_diffs(header))
+            keep = not {file_diff.path, file_diff.old_path} & paths
+            if keep:
+                yield from header
+            header = []
+        if starts_file:
+            header = [line]
+        elif header:
+            header.append(line)
+        elif keep:
+            yield line
+    if header:
+        file_diff = next(iter_file_diffs(header))
+        if not {file_diff.path, file_diff.old_path} & paths:
+            yield from header
+
+
+def _read_patches_within(
+    stream: GitStream, max_tokens: int, skipped_paths: set[str] | None = None
+) -> tuple[str, set[str] | None]:
+    """Read whole files of the patches until the next would pass the limit.
+
+    Git is stopped as soon as the limit is reached, so a huge diff is never
+    held in memory, nor even fully written by git.
+
+    Args:
+        stream: The patch pass.
+        max_tokens: The estimated tokens the patches may use, 0 for no limit.
+        skipped_paths: The paths of the files to leave out of the patches.
+
+    Returns:
+        The patches, and the paths of the files read if git was stopped
+        before the end, or None if every file was read.
+
+    """
+    max_characters = max_tokens * CHARACTERS_PER_TOKEN if max_tokens else math.inf
+    characters = 0
+    stopped = False
+    # Whether the limit was reached inside a file rather than at its start.
+    partial = False
+
+    def within_limit(lines: Iterator[str]) -> Iterator[str]:
+        nonlocal characters, stopped, partial
+        for line in lines:
+            characters += len(line)
+            if characters > max_characters:
+                stopped = True
+                partial = not line.startswith(DIFF_HEADER_PREFIX)
+                return
+            yield line
+
+    try:
+        lines = stream.lines()
+        if skipped_paths:
+            lines = _without_files(lines, skipped_paths)
+        file_diffs = list(iter_file_diffs(within_limit(lines)))
+    except BaseException:
+        stream.close(stop=True)
+        raise
+    stream.close(stop=stopped)
+
+    if partial and file_diffs:
+        file_diffs.pop()
+    # Match GitPython, which strips the trailing newline of the output.
+    patches = "".join(file_diff.text for file_diff in file_diffs).removesuffix("\n")
+    if not stopped:
+        return patches, None
+    return patches, {
+        path
+        for file_diff in file_diffs
+        for path in (file_diff.path, file_diff.old_path)
+    }
+
+
+def open_repo(path: str = ".") -> git.Repo:
+    """Open the repository containing the path.
+
+    Args:
+        path: A path inside the repository (default: the current directory)
+
+    Returns:
+        The repository
+
+    """
+    with span("open_repo"):
+        return git.Repo(path, search_parent_directories=True)
+
+
+def _collect_changes(
+    numstat: str,
+    rules: ExclusionRules,
+    read_patches: Callable[[list[str]], str],
+    stream_patches: Callable[[list[str]], GitStream],
+) -> str:
+    """Return the patches of the files under the limits and the counts of the rest.
+
+    Args:
+        numstat: The output of the `--numstat -z` pass.
+        rules: The exclusion rules.
+        read_patches: Reads the patches, excluding the given pathspecs.
+        stream_patches: Starts streaming the patches instead, used with a
+            read limit or too many summarized paths for the command line.
+
+    Returns:
+        String containing the diff
+
+    """
+    entries = parse_numstat(numstat)
+    summaries = []
+    summarized_paths = []
+    for entry in entries:
+        reason = rules.stat_only_reason(entry)
+        if reason:
+            summaries.append(entry.stat_summary(reason).removesuffix("\n"))
+            # A renamed file is excluded by both paths, or its old path would
+            # show up as a deletion.
+            summarized_paths.append(entry.path)
+            if entry.old_path:
+                summarized_paths.append(entry.old_path)
+
+    skipped_paths = None
+    if sum(map(len, summarized_paths)) > MAX_PATHSPEC_CHARACTERS:
+        skipped_paths = set(summarized_paths)
+        summarized_paths = []
+
+    patches = ""
+    if len(summaries) < len(entries) and not (rules.max_read_tokens or skipped_paths):
+        patches = read_patches(rules.pathspecs(summarized_paths))
+    elif len(summaries) < len(entries):
+        patches, read_paths = _read_patches_within(
+            stream_patches(rules.pathspecs(summarized_paths)),
+            rules.max_read_tokens,
+            skipped_paths,
+        )
+        if read_paths is not None:
+            note = f"past the {rules.max_read_tokens}-token read limit, content omitted"
+            summaries += [
+                entry.stat_summary(note).removesuffix("\n")
+                for entry in entries
+                if rules.stat_only_reason(entry) is None
+                and entry.path not in read_paths
+            ]
+    return "\n".join(part for part in [patches, *summaries] if part)
+
+
+def _read_changes(
+    repo: git.Repo,
+    rules: ExclusionRules,
+    subcommand: str,
+    *arguments: str,
+    encoding: str = DEFAULT_ENCODING,
+) -> str:
+    """Read the changes with a cheap numstat pass before the patches."""
+    git_command = getattr(repo.git, subcommand)
+    numstat = git_command(*arguments, "--numstat", "-z", *rules.pathspecs())
+    options = git_arguments(encoding)
+    return _collect_changes(
+        numstat,
+        rules,
+        lambda pathspecs: git_command(*arguments, *options, *pathspecs),
+        lambda pathspecs: GitStream(repo, subcommand, *arguments, *options, *pathspecs),
+    )
+
+
+class PendingChanges:
+    """Read changes in the background, the line counts first, then the patches."""
+
+    def __init__(
+        self,
+        repo: git.Repo,
+        rules: ExclusionRules,
+        *arguments: str,
+        encoding: str = DEFAULT_ENCODING,
+    ) -> None:
+        """Start the numstat pass.
+
+        Args:
+            repo: The repository to use.
+            rules: The exclusion rules.
+            arguments: The git subcommand and its revision arguments.
+            encoding: The diff encoding whose git options the patches use.
+
+        """
+        self._repo = repo
+        self._rules = rules
+        self._arguments = arguments
+        self._options = git_arguments(encoding)
+        self.paths: list[str] = []  # The changed paths, known after `result()`.
+        self._numstat = GitProcess(
+            repo, *arguments, "--numstat", "-z", *rules.pathspecs()
+        )
+
+    def result(self) -> str:
+        """Wait for the line counts, then read the patches and return the diff.
+
+        Raises:
+            git.GitCommandError: If a git command failed.
+
+        """
+        numstat = self._numstat.result()
+        self.paths = [entry.path for entry in parse_numstat(numstat)]
+        return _collect_changes(
+            numstat,
+            self._rules,
+            lambda pathspecs: GitProcess(
+                self._repo, *self._arguments, *self._options, *pathspecs
+            ).result(),
+            lambda pathspecs: GitStream(
+                self._repo, *self._arguments, *self._options, *pathspecs
+            ),
+        )
+
+
+def _log_arguments(
+    number_of_commits: int, before: str = "", paths: Sequence[str] = ()
+) -> list[str]:
+    arguments = [f"-{number_of_commits}", "--pretty=format:%s"]
+    if before:
+        arguments += ["--skip=1", before]
+    if paths:
+        arguments += ["--", *paths]
+    return arguments
 
-def get_repository_changes(exclude_files: list[str] = []) -> str:
+
+def get_repository_changes(
+    rules: ExclusionRules = ExclusionRules(),
+    repo: git.Repo | None = None,
+    encoding: str = DEFAULT_ENCODING,
+) -> str:
     """Get the staged changes in the repository.
 
     Args:
-        exclude_files: List of files to exclude from the diff.
+        rules: The files to exclude or send as line counts only.
+        repo: The repository to use (default: the current repository)
+        encoding: The diff encoding whose git options to use (default: unified)
 
     Returns:
         String containing the diff
 
     """
-    repo = git.Repo(".", search_parent_directories=True)
+    repo = repo or open_repo()
+    with span("git_diff") as current:
+        diff = _read_changes(repo, rules, "diff", "--staged", encoding=encoding)
+        if current:
+            current.add_text("diff", diff)
+    return diff
+
 
-    exclude_files_argument = " ".join([f":(exclude){file}" for file in exclude_files])
+def start_repository_changes(
+    rules: ExclusionRules, repo: git.Repo, encoding: str = DEFAULT_ENCODING
+) -> PendingChanges:
+    """Start reading the staged changes in the background.
+
+    Args:
+        rules: The files to exclude or send as line counts only.
+        repo: The repository to use.
+        encoding: The diff encoding whose git options to use (default: unified)
 
-    if not exclude_files_argument:
-        staged_diff = repo.git.diff("--staged")
-    else:
-        staged_diff = repo.git.diff("--staged", exclude_files_argument)
+    Returns:
+        The pending changes whose result is the diff
 
-    return staged_diff
+    """
+    return PendingChanges(repo, rules, "diff", "--staged", encoding=encoding)
 
 
-def get_log(number_of_commits: int = 5) -> str:
+def get_log(
+    number_of_commits: int = 5,
+    repo: git.Repo | None = None,
+    before: str = "",
+    paths: Sequence[str] = (),
+) -> str:
     """Return the last n commit messages.
 
     Args:
         number_of_commits: Number of commit messages to return (default: 5)
+        repo: The repository to use (default: the current repository)
+        before: Only return the commits preceding this commit (default: HEAD)
+        paths: Only return the commits changing these paths (default: all)
 
     Returns:
         String containing the commit messages
 
     """
-    repo = git.Repo(".", search_parent_directories=True)
+    repo = repo or open_repo()
 
-    try:
-        return repo.git.log(f"-{number_of_commits}", "--pretty=format:%s")
-    except git.GitCommandError as e:  # If there are no commits
-        if "does not have any commits yet" in str(e):
-            return ""
-        raise
+    with span("git_log") as current:
+        try:
+            log = repo.git.log(*_log_arguments(number_of_commits, before, paths))
+        except git.GitCommandError as e:  # If there are no commits
+            if NO_COMMITS_ERROR in str(e):
+                return ""
+            raise
+        if current:
+            current.add_text("log", log)
+    return log
+
+
+def start_log(number_of_commits: int, repo: git.Repo) -> GitProcess:
+    """Start reading the last n commit messages in the background.
+
+    Args:
+        number_of_commits: Number of commit messages to return.
+        repo: The repository to use.
+
+    Returns:
+        The process whose result is the commit messages
+
+    """
+    return GitProcess(
+        repo, "log", *_log_arguments(number_of_commits), empty_on_error=NO_COMMITS_ERROR
+    )
+
+
+def get_unstaged_paths(repo: git.Repo) -> set[str]:
+    """Return the paths whose working tree version differs from the index."""
+    output = repo.git.diff("--name-only", "-z")
+    return {path for path in output.split("\0") if path}
+
+
+def list_commits(revision_range: str, repo: git.Repo) -> list[tuple[str, str]]:
+    """Return the commits of a range from the oldest to the newest.
+
+    Args:
+        revision_range: The range of commits, e.g. "main..HEAD".
+        repo: The repository to use.
+
+    Returns:
+        The hash and the subject of every commit
+
+    """
+    output = repo.git.log("--reverse", "--pretty=format:%H %s", revision_range)
+    commits = []
+    for line in output.splitlines():
+        commit, _, subject = line.partition(" ")
+        commits.append((commit, subject))
+    return commits
+
+
+def get_commit_changes(
+    commit: str,
+    rules: ExclusionRules,
+    repo: git.Repo,
+    encoding: str = DEFAULT_ENCODING,
+) -> str:
+    """Return the changes introduced by a commit.
+
+    The changes of a merge are those against its first parent, i.e. what it
+    brought into the branch, rather than a combined diff.
+
+    Args:
+        commit: The commit to show.
+        rules: The files to exclude or send as line counts only.
+        repo: The repository to use.
+        encoding: The diff encoding whose git options to use (default: unified)
+
+    Returns:
+        String containing the diff
+
+    """
+    with span("git_show") as current:
+        diff = _read_changes(
+            repo,
+            rules,
+            "show",
+            "--format=",
+            "-m",
+            "--first-parent",
+            commit,
+            encoding=encoding,
+        )
+        if current:
+            current.add_text("diff", diff)
+    return diff
+
+
+def get_range_changes(
+    revision_range: str,
+    rules: ExclusionRules,
+    repo: git.Repo,
+    encoding: str = DEFAULT_ENCODING,
+) -> str:
+    """Return the combined changes of a range of commits.
+
+    Args:
+        revision_range: The range of commits, e.g. "main..HEAD".
+        rules: The files to exclude or send as line counts only.
+        repo: The repository to use.
+        encoding: The diff encoding whose git options to use (default: unified)
+
+    Returns:
+        String containing the diff
+
+    """
+    with span("git_diff") as current:
+        diff = _read_changes(repo, rules, "diff", revision_range, encoding=encoding)
+        if current:
+            current.add_text("diff", diff)
+    return diff
@@ -0,0 +1,289 @@
+"""Picks the reference commits of the prompt by the paths they changed.
+
+The subjects and changed paths of past commits are kept in a SQLite database
+in the git directory, shared by the worktrees of the repository. Every run
+indexes only the commits made since the last indexed one, so that finding the
+commits which changed the staged paths never walks the whole history.
+"""
+
+import posixpath
+import re
+import sqlite3
+from collections import Counter
+from pathlib import Path
+
+import git
+
+from .git_handler import NO_COMMITS_ERROR, GitProcess, get_log
+from .tracing import span
+
+INDEX_FILE = "genie-git-history.sqlite"
+# The commits indexed on the first run, the newest first; later runs only add
+# the commits made since.
+MAX_INITIAL_COMMITS = 20000
+# The most recent changes of the staged paths considered when ranking, which
+# bounds the work on paths changed by a large part of the history.
+MAX_CANDIDATE_CHANGES = 10000
+RECORD_SEPARATOR = "\x1e"
+FIELD_SEPARATOR = "\x1f"
+LOG_FORMAT = "--format=%x1e%H%x1f%s"
+CONVENTIONAL_TYPE = re.compile(r"^(\w+)(?:\([^)]*\))?!?:")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commits (
+    id INTEGER PRIMARY KEY,
+    sha TEXT UNIQUE NOT NULL,
+    subject TEXT NOT NULL,
+    type TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    commit_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    directory TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_by_path ON changes (path, commit_id);
+CREATE INDEX IF NOT EXISTS changes_by_directory ON changes (directory, commit_id);
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def commit_type(subject: str) -> str:
+    """Return the conventional commit type of a subject, e.g. "feat", or ""."""
+    match = CONVENTIONAL_TYPE.match(subject)
+    return match.group(1).lower() if match else ""
+
+
+def parse_log(output: str) -> list[tuple[str, str, list[str]]]:
+    """Parse the output of `git log --name-only -z` with LOG_FORMAT.
+
+    Args:
+        output: The commits, the newest first.
+
+    Returns:
+        The hash, the subject and the changed paths of every commit.
+
+    """
+    commits = []
+    for record in output.split(RECORD_SEPARATOR):
+        header, _, names = record.partition("\0")
+        if not header:
+            continue
+        sha, _, subject = header.partition(FIELD_SEPARATOR)
+        paths = [name.strip("\n") for name in names.split("\0")]
+        commits.append((sha, subject, [path for path in paths if path]))
+    return commits
+
+
+class HistoryIndex:
+    """Store the subjects and changed paths of the commits of a repository."""
+
+    def __init__(self, path: Path | str) -> None:
+        """Open the index, creating it if it does not exist.
+
+        Args:
+            path: The database file, or ":memory:".
+
+        """
+        self.connection = sqlite3.connect(path, timeout=5)
+        self.connection.executescript(SCHEMA)
+
+    @classmethod
+    def for_repo(cls, repo: git.Repo) -> "HistoryIndex":
+        """Open the index of the repository, shared by its worktrees."""
+        return cls(Path(repo.common_dir) / INDEX_FILE)
+
+    def close(self) -> None:
+        """Close the database."""
+        self.connection.close()
+
+    @property
+    def last_indexed(self) -> str:
+        """Return the hash of the newest indexed commit, or "" before indexing."""
+        row = self.connection.execute(
+            "SELECT value FROM state WHERE key = 'last_indexed'"
+        ).fetchone()
+        return row[0] if row else ""
+
+    def add(self, log_output: str) -> int:
+        """Index the commits of a `git log` output and remember the newest one.
+
+        Args:
+            log_output: The output of the log arguments of `log_arguments`.
+
+        Returns:
+            The number of commits that were not indexed yet.
+
+        """
+        commits = parse_log(log_output)
+        added = 0
+        with self.connection:
+            # The oldest first, so that ids grow with recency.
+            for sha, subject, paths in reversed(commits):
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO commits (sha, subject, type) "
+                    "VALUES (?, ?, ?)",
+                    (sha, subject, commit_type(subject)),
+                )
+                if not cursor.rowcount:
+                    continue
+                added += 1
+                self.connection.executemany(
+                    "INSERT INTO changes (commit_id, path, directory) VALUES (?, ?, ?)",
+                    [
+                        (cursor.lastrowid, path, posixpath.dirname(path))
+                        for path in paths
+                    ],
+                )
+            if commits:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO state (key, value) "
+                    "VALUES ('last_indexed', ?)",
+                    (commits[0][0],),
+                )
+        return added
+
+    def _recent_changes(self, column: str, values: list[str]) -> list[int]:
+        """Return the commit of every recent change of a path or directory.
+
+        A commit is listed once for every distinct value it changed.
+        """
+        commit_ids = []
+        # SQLite limits the number of parameters of a query.
+        for start in range(0, len(values), 500):
+            batch = values[start : start + 500]
+            placeholders = ", ".join("?" * len(batch))
+            commit_ids += [
+                row[0]
+                for row in self.connection.execute(
+                    f"SELECT DISTINCT commit_id, {column} FROM changes "
+                    f"WHERE {column} IN ({placeholders}) "
+                    "ORDER BY commit_id DESC LIMIT ?",
+                    (*batch, MAX_CANDIDATE_CHANGES),
+                )
+            ]
+        return commit_ids
+
+    def relevant_subjects(self, paths: list[str], limit: int) -> list[str]:
+        """Return the subjects of the commits that changed the most of the paths.
+
+        A commit scores two points for every staged path it changed and one
+        for every directory of a staged path it changed. Ties go to the newest
+        commit, and the newest commits fill the places left.
+
+        Args:
+            paths: The staged paths.
+            limit: The number of subjects to return.
+
+        Returns:
+            The subjects, the newest first like `git log`.
+
+        """
+        if limit <= 0:
+            return []
+        scores: Counter[int] = Counter()
+        exact = self._recent_changes("path", sorted(set(paths)))
+        scores.update(exact + exact)
+        directories = {posixpath.dirname(path) for path in paths} - {""}
+        scores.update(self._recent_changes("directory", sorted(directories)))
+        chosen = sorted(scores, key=lambda c: (-scores[c], -c))[:limit]
+        if len(chosen) < limit:
+            placeholders = ", ".join("?" * len(chosen))
+            chosen += [
+                row[0]
+                for row in self.connection.execute(
+                    f"SELECT id FROM commits WHERE id NOT IN ({placeholders}) "
+                    "ORDER BY id DESC LIMIT ?",
+                    (*chosen, limit - len(chosen)),
+                )
+            ]
+        placeholders = ", ".join("?" * len(chosen))
+        return [
+            row[0]
+            for row in self.connection.execute(
+                f"SELECT subject FROM commits WHERE id IN ({placeholders}) "
+                "ORDER BY id DESC",
+                chosen,
+            )
+        ]
+
+
+def log_arguments(last_indexed: str) -> list[str]:
+    """Return the `git log` arguments listing the commits still to index."""
+    arguments = ["log", "--no-merges", "--name-only", "-z", LOG_FORMAT]
+    if last_indexed:
+        return [*arguments, f"{last_indexed}..HEAD"]
+    return [*arguments, f"--max-count={MAX_INITIAL_COMMITS}"]
+
+
+class PendingReferenceLog:
+    """Update the history index in the background and pick reference commits."""
+
+    def __init__(self, repo: git.Repo) -> None:
+        """Start listing the commits made since the last indexed one.
+
+        Args:
+            repo: The repository to use.
+
+        """
+        self._repo = repo
+        self._index: HistoryIndex | None = None
+        self._process: GitProcess | None = None
+        try:
+            self._index = HistoryIndex.for_repo(repo)
+            self._process = GitProcess(
+                repo,
+                *log_arguments(self._index.last_indexed),
+                empty_on_error=NO_COMMITS_ERROR,
+            )
+        except sqlite3.Error:
+            pass  # E.g. a read-only git directory, the plain log is used.
+
+    def _update(self, index: HistoryIndex, process: GitProcess) -> None:
+        try:
+            output = process.result()
+        except git.GitCommandError:
+            # The last indexed commit is gone, e.g. after a rebase and a gc.
+            output = GitProcess(
+                self._repo, *log_arguments(""), empty_on_error=NO_COMMITS_ERROR
+            ).result()
+        index.add(output)
+
+    def result(self, paths: list[str], number_of_commits: int) -> str:
+        """Return the subjects of the commits most related to the staged paths.
+
+        Args:
+            paths: The staged paths.
+            number_of_commits: The number of subjects to return.
+
+        Returns:
+            The subjects, one per line, the newest first.
+
+        """
+        index, process = self._index, self._process
+        if index is None or process is None:
+            return get_log(number_of_commits, self._repo)
+        with span("history_index") as current:
+            try:
+                self._update(index, process)
+                subjects = index.relevant_subjects(paths, number_of_commits)
+            except sqlite3.Error:
+                return get_log(number_of_commits, self._repo)
+            finally:
+                index.close()
+            log = "\n".join(subjects)
+            if current:
+                current.add_text("log", log)
+        return log
+
+
+def start_reference_log(repo: git.Repo) -> PendingReferenceLog:
+    """Start updating the history index of the repository in the background.
+
+    Args:
+        repo: The repository to use.
+
+    Returns:
+        The pending log whose result are the subjects of the reference commits.
+
+    """
+    return PendingReferenceLog(repo)
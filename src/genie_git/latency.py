@@ -0,0 +1,146 @@
+"""Keeps a rolling history of model latencies on disk."""
+
+import json
+import math
+import time
+from dataclasses import asdict, dataclass
+
+from .config import CONFIG_DIR, write_atomically
+
+LATENCY_FILE = CONFIG_DIR / "latency.json"
+MAX_SAMPLES = 50  # The number of samples kept per model.
+MIN_SAMPLES = 5  # The number of successful samples before quantiles are used.
+HEALTH_WINDOW = 10  # The number of recent samples that decide the health.
+MAX_FAILURE_RATE = 0.5  # A model failing more of its recent requests is unhealthy.
+
+
+@dataclass
+class LatencySample:
+    """Represent the outcome of a single request to a model."""
+
+    seconds: float
+    prompt_tokens: int
+    ok: bool = True
+    timestamp: float = 0.0
+
+
+class LatencyHistory:
+    """Track how long every model takes to answer and how often it fails."""
+
+    def __init__(self, samples: dict[str, list[LatencySample]] | None = None):
+        """Initialize the history.
+
+        Args:
+            samples: The recent samples of every model, oldest first.
+
+        """
+        self.samples = samples or {}
+
+    @classmethod
+    def load(cls) -> "LatencyHistory":
+        """Load the history, or return an empty one if it is missing or invalid."""
+        try:
+            with open(LATENCY_FILE) as f:
+                data = json.load(f)
+            return cls(
+                {
+                    model: [LatencySample(**sample) for sample in samples]
+                    for model, samples in data.items()
+                }
+            )
+        except (OSError, ValueError, TypeError):
+            return cls()
+
+    def save(self) -> None:
+        """Save the history, replacing the file atomically."""
+        data = {
+            model: [asdict(sample) for sample in samples]
+            for model, samples in self.samples.items()
+        }
+        write_atomically(LATENCY_FILE, json.dumps(data))
+
+    def record(
+        self, model: str, seconds: float, prompt_tokens: int, ok: bool = True
+    ) -> None:
+        """Add a sample and drop the oldest samples over the limit."""
+        samples = self.samples.setdefault(model, [])
+        samples.append(LatencySample(seconds, prompt_tokens, ok, time.time()))
+        del samples[:-MAX_SAMPLES]
+
+    def quantile(self, model: str, q: float) -> float | None:
+        """Return the latency quantile of the model's successful requests.
+
+        Args:
+            model: The model.
+            q: The quantile between 0 and 1, e.g. 0.95.
+
+        Returns:
+            The latency in seconds, or None with too few samples.
+
+        """
+        latencies = sorted(s.seconds for s in self.samples.get(model, []) if s.ok)
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        # The nearest-rank quantile.
+        return latencies[max(math.ceil(q * len(latencies)) - 1, 0)]
+
+    def predict(self, model: str, prompt_tokens: int) -> float | None:
+        """Predict the latency of a prompt from the model's successful requests.
+
+        The latency grows linearly with the prompt size, fitted by least
+        squares, or is the median when all prompts had the same size.
+
+        Args:
+            model: The model.
+            prompt_tokens: The estimated number of tokens of the prompt.
+
+        Returns:
+            The latency in seconds, or None with too few samples.
+
+        """
+        samples = [s for s in self.samples.get(model, []) if s.ok]
+        if len(samples) < MIN_SAMPLES:
+            return None
+        mean_tokens = sum(s.prompt_tokens for s in samples) / len(samples)
+        mean_seconds = sum(s.seconds for s in samples) / len(samples)
+        variance = sum((s.prompt_tokens - mean_tokens) ** 2 for s in samples)
+        if not variance:
+            return self.quantile(model, 0.5)
+        slope = (
+            sum(
+                (s.prompt_tokens - mean_tokens) * (s.seconds - mean_seconds)
+                for s in samples
+            )
+            / variance
+        )
+        # A negative slope is noise, larger prompts are never faster.
+        slope = max(slope, 0.0)
+        intercept = mean_seconds - slope * mean_tokens
+        return max(intercept + slope * prompt_tokens, 0.0)
+
+    def is_healthy(self, model: str) -> bool:
+        """Return whether the model answered most of its recent requests."""
+        recent = self.samples.get(model, [])[-HEALTH_WINDOW:]
+        if not recent:
+            return True
+        failures = sum(not sample.ok for sample in recent)
+        return failures / len(recent) <= MAX_FAILURE_RATE
+
+    def rank(self, models: list[str]) -> list[str]:
+        """Order the models from the best to the worst pick.
+
+        Healthy models come first, the fastest median latency first. Models
+        without enough samples follow in their configured order, so that they
+        are measured when they are used as a hedge.
+        """
+
+        def key(item: tuple[int, str]) -> tuple[bool, float, int]:
+            index, model = item
+            median = self.quantile(model, 0.5)
+            return (
+                not self.is_healthy(model),
+                math.inf if median is None else median,
+                index,
+            )
+
+        return [model for _, model in sorted(enumerate(models), key=key)]
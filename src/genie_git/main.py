@@ -1,12 +1,25 @@
 """Cli tool to suggest conventional git commit messages."""
 
+import os
+import sys
+
 from .cli import create_parser
+from .startup_profile import (
+    STARTUP_PROFILE_ENV,
+    STARTUP_PROFILE_FLAG,
+    profile_startup,
+)
 
 
 def main() -> None:
     """Parse command-line arguments and execute the corresponding handler."""
     parser = create_parser()
     args = parser.parse_args()
+
+    if args.startup_profile or os.environ.get(STARTUP_PROFILE_ENV):
+        argv = [arg for arg in sys.argv[1:] if arg != STARTUP_PROFILE_FLAG]
+        sys.exit(profile_startup(argv))
+
     args.func(args)
 
 
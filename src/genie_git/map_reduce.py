@@ -0,0 +1,181 @@
+"""Summarizes staged changes that are too large for a single prompt.
+
+Every file is summarized on its own and its summary is cached under the blob
+ids of the change, so that re-running a suggestion after staging more files
+only summarizes the files whose staged content changed. The files still to
+summarize are grouped into chunks, each summarized by a single request.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+from .cache import DiskCache, make_key
+from .compaction import compact_diff
+from .diff_parser import FileDiff, parse_diff
+from .tokens import estimate_tokens
+
+SUMMARIES_NAMESPACE = "file_summaries"
+
+
+@dataclass
+class FileSummaries:
+    """Represent the summary of every file of the changes."""
+
+    summaries: list[tuple[str, str]] = field(default_factory=list)
+    reused: int = 0  # The number of summaries taken from the cache.
+    summarized: int = 0  # The number of files sent to the model.
+    requests: int = 0
+
+
+def split_into_chunks(
+    file_diffs: list[FileDiff], max_chunk_tokens: int
+) -> list[list[FileDiff]]:
+    """Group the files into chunks that fit the token limit.
+
+    Files stay in diff order, so neighbouring files of a directory usually end
+    up in the same chunk. A file larger than the limit is compacted on its own.
+
+    Args:
+        file_diffs: The files of the changes.
+        max_chunk_tokens: The number of tokens a chunk may use.
+
+    Returns:
+        The files of every chunk.
+
+    """
+    chunks: list[list[FileDiff]] = []
+    current: list[FileDiff] = []
+    current_tokens = 0
+    for file_diff in file_diffs:
+        tokens = estimate_tokens(file_diff.text)
+        if tokens > max_chunk_tokens:
+            compacted = parse_diff(compact_diff(file_diff.text, max_chunk_tokens).diff)
+            if compacted:
+                file_diff = compacted[0]
+                tokens = estimate_tokens(file_diff.text)
+        if current and current_tokens + tokens > max_chunk_tokens:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(file_diff)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def summary_key(model: str, file_diff: FileDiff) -> str:
+    """Return the cache key of the summary of a file's change.
+
+    The key is made of the path and the blob ids of the change when the diff
+    has them, so it stays the same while the staged content does not change.
+    """
+    blob_ids = file_diff.blob_ids
+    if blob_ids is None:
+        return make_key(model, file_diff.path, file_diff.text)
+    return make_key(model, file_diff.path, *blob_ids)
+
+
+@dataclass
+class SummaryPlan:
+    """Represent the cached summaries and the files still to summarize."""
+
+    summaries: dict[str, str] = field(default_factory=dict)
+    keys: dict[str, str] = field(default_factory=dict)  # The cache key by path.
+    pending: list[FileDiff] = field(default_factory=list)
+    reused: int = 0
+
+
+def plan_summaries(
+    file_diffs: list[FileDiff], cache: DiskCache | None, model: str
+) -> SummaryPlan:
+    """Find the cached summaries and the files that need a request.
+
+    Args:
+        file_diffs: The files of the changes.
+        cache: The cache of summaries, or None to disable caching.
+        model: The model producing the summaries, part of the cache key.
+
+    Returns:
+        The summaries known without a request and the files still to summarize.
+
+    """
+    plan = SummaryPlan()
+    for file_diff in file_diffs:
+        if not file_diff.hunks:
+            # A header or line counts are already shorter than a summary.
+            plan.summaries[file_diff.path] = file_diff.text.strip()
+            continue
+        plan.keys[file_diff.path] = summary_key(model, file_diff)
+        cached = cache.get(plan.keys[file_diff.path]) if cache else None
+        if cached is None:
+            plan.pending.append(file_diff)
+        else:
+            plan.summaries[file_diff.path] = cached
+            plan.reused += 1
+    return plan
+
+
+async def summarize_files(
+    file_diffs: list[FileDiff],
+    summarize: Callable[[str], Awaitable[dict[str, str]]],
+    cache: DiskCache | None,
+    model: str,
+    max_chunk_tokens: int,
+    concurrency: int = 4,
+) -> FileSummaries:
+    """Summarize every file concurrently, reusing the cached summaries.
+
+    Args:
+        file_diffs: The files of the changes.
+        summarize: Returns the summary of every file of a chunk by path.
+        cache: The cache of summaries, or None to disable caching.
+        model: The model producing the summaries, part of the cache key.
+        max_chunk_tokens: The number of tokens of every summarized chunk.
+        concurrency: The maximum number of requests in flight.
+
+    Returns:
+        The summary of every file, in diff order.
+
+    """
+    plan = plan_summaries(file_diffs, cache, model)
+    summaries = plan.summaries
+    keys = plan.keys
+    originals = {file_diff.path: file_diff for file_diff in plan.pending}
+    fresh: dict[str, str] = {}
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run(chunk: list[FileDiff]) -> None:
+        async with semaphore:
+            chunk_summaries = await summarize("".join(f.text for f in chunk))
+        for file_diff in chunk:
+            summary = chunk_summaries.get(file_diff.path, "").strip()
+            if summary:
+                summaries[file_diff.path] = fresh[keys[file_diff.path]] = summary
+            else:
+                # Not cached, so that the next run asks for the summary again.
+                summaries[file_diff.path] = (
+                    originals[file_diff.path].stat_summary("no summary").strip()
+                )
+
+    chunks = split_into_chunks(plan.pending, max_chunk_tokens)
+    await asyncio.gather(*(run(chunk) for chunk in chunks))
+    if cache:
+        cache.set_many(fresh)
+
+    return FileSummaries(
+        summaries=[(f.path, summaries[f.path]) for f in file_diffs],
+        reused=plan.reused,
+        summarized=len(plan.pending),
+        requests=len(chunks),
+    )
+
+
+def format_summaries(summaries: list[tuple[str, str]]) -> str:
+    """Combine the file summaries into the changes of the final prompt."""
+    parts = [f"{path}:\n{summary}" for path, summary in summaries]
+    return (
+        "The changes are too large to show in full. "
+        "Here is a summary of each file:\n\n" + "\n\n".join(parts)
+    )
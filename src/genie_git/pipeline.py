@@ -0,0 +1,288 @@
+"""Collects the inputs of a suggestion concurrently."""
+
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+from .exclusions import ExclusionRules
+from .resilience import Deadline, DeadlineExceededError
+from .tracing import span
+
+
+@dataclass
+class GitInputs:
+    """Represent the repository state a suggestion is based on."""
+
+    staged_changes: str
+    git_logs: str
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class WarmState:
+    """Keep clients and repositories alive between suggestions.
+
+    A long-running process, i.e. the daemon, installs it with `keep_warm` so
+    that later suggestions skip creating the client and opening the repository.
+    """
+
+    clients: dict[tuple[str, str], Any] = field(default_factory=dict)
+    repos: dict[str, Any] = field(default_factory=dict)
+
+
+_warm_state: WarmState | None = None
+
+
+def keep_warm(state: WarmState | None) -> None:
+    """Reuse the objects of the state in the following suggestions.
+
+    Args:
+        state: The state to reuse, or None to stop reusing objects.
+
+    """
+    global _warm_state
+    _warm_state = state
+
+
+@contextmanager
+def timed(timings: dict[str, float], stage: str) -> Iterator[None]:
+    """Record the wall-clock duration of a stage in seconds."""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = time.perf_counter() - started_at
+
+
+class ClientWarmup:
+    """Create the genai client and warm up its connection in the background.
+
+    Starting the warmup imports the SDK and creates the client, which sends
+    nothing, so it runs alongside git on every suggestion. Connecting then
+    fetches the model to open the connection to the API, and is left to the
+    caller once the client is known to be needed, so that nothing reaches the
+    API on a cache hit or with nothing staged. The threads are daemons, so a
+    run that ends without needing the client exits without waiting for them.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: str = "",
+        deadline: Deadline | None = None,
+    ) -> None:
+        """Initialize the warmup.
+
+        Args:
+            api_key: The API key to create the client with.
+            model: The model whose endpoint is warmed up.
+            base_url: The URL of the API (default: the Gemini API)
+            deadline: The latency budget of the suggestion, which bounds the
+                warmup and the wait for the client (default: none)
+
+        """
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.deadline = deadline or Deadline(0)
+        self.timings: dict[str, float] = {}
+        self._client: Any = None
+        self._error: BaseException | None = None
+        self._create_thread = threading.Thread(target=self._create, daemon=True)
+        self._connect_thread = threading.Thread(target=self._connect, daemon=True)
+
+    def _create(self) -> None:
+        try:
+            with span("import_sdk"):
+                from .ai_handler import create_client
+
+            with timed(self.timings, "client_create"), span("client_create"):
+                self._client = create_client(self.api_key, self.base_url)
+            if _warm_state is not None:
+                _warm_state.clients[self.api_key, self.base_url] = self._client
+        except BaseException as error:
+            self._error = error
+
+    def _connect(self) -> None:
+        self._create_thread.join()
+        if self._client is None:
+            return  # Creating the client failed, result() raises the error.
+        from .ai_handler import warm_up_client
+
+        with timed(self.timings, "client_warmup"), span("client_warmup"):
+            warm_up_client(self._client, self.model, self.deadline.remaining())
+
+    def start(self) -> "ClientWarmup":
+        """Start creating the client in the background, unless it is warm.
+
+        Starting the warmup again does nothing.
+        """
+        if self._client is None and _warm_state is not None:
+            self._client = _warm_state.clients.get((self.api_key, self.base_url))
+        if self._client is None and self._create_thread.ident is None:
+            self._create_thread.start()
+        return self
+
+    def connect(self) -> "ClientWarmup":
+        """Start warming up the connection of the client, once it is created.
+
+        A client kept warm by a long-running process is connected already.
+        """
+        self.start()
+        if self._create_thread.ident is not None and self._connect_thread.ident is None:
+            self._connect_thread.start()
+        return self
+
+    def result(self) -> Any:
+        """Wait for the client, starting the warmup if it was not, and return it.
+
+        The connection is not waited for past the deadline, the request then
+        connects on its own.
+
+        Raises:
+            DeadlineExceededError: If the client was not created in time.
+            Exception: Whatever creating the client raised.
+
+        """
+        self.start()
+        with timed(self.timings, "client_wait"), span("client_wait"):
+            if self._create_thread.ident is not None:
+                self._create_thread.join(self.deadline.remaining())
+                if self._create_thread.is_alive():
+                    raise DeadlineExceededError(
+                        f"No client within the {self.deadline.seconds:g}s deadline."
+                    )
+            if self._connect_thread.ident is not None:
+                self._connect_thread.join(self.deadline.remaining())
+        if self._error is not None:
+            raise self._error
+        return self._client
+
+
+def _open_repo(path: str) -> Any:
+    from .git_handler import open_repo
+
+    if _warm_state is None:
+        return open_repo(path)
+
+    key = os.path.abspath(path)
+    repo = _warm_state.repos.get(key)
+    # The repository may have been deleted since it was opened.
+    if repo is None or not os.path.isdir(repo.working_dir):
+        repo = _warm_state.repos[key] = open_repo(path)
+    return repo
+
+
+class PendingGitInputs:
+    """Read the staged changes and the git log with concurrent git processes."""
+
+    def __init__(
+        self,
+        rules: ExclusionRules,
+        number_of_commits: int,
+        path: str = ".",
+        relevant_commits: bool = False,
+        diff_encoding: str = "unified",
+        expand_submodules: bool = False,
+        submodule_cache: Any = None,
+    ) -> None:
+        """Open the repository and start both git processes.
+
+        Args:
+            rules: The files to exclude or send as line counts only.
+            number_of_commits: Number of commit messages to use as a reference.
+            path: A path inside the repository.
+            relevant_commits: Whether to reference the commits that changed the
+                staged paths, found in the history index, rather than the last
+                commits.
+            diff_encoding: The diff encoding whose git options to use.
+            expand_submodules: Whether to replace the staged submodule changes
+                with their ranges of commits.
+            submodule_cache: The cache of the submodule ranges, None reads
+                every range.
+
+        """
+        from .git_handler import start_log, start_repository_changes
+
+        self.timings: dict[str, float] = {}
+        self._number_of_commits = number_of_commits
+        self._started_at = time.perf_counter()
+        with timed(self.timings, "open_repo"):
+            repo = _open_repo(path)
+        self._diff_process = start_repository_changes(rules, repo, diff_encoding)
+        self._submodules: Any = None
+        if expand_submodules:
+            from .submodules import start_submodule_changes
+
+            self._submodules = start_submodule_changes(repo, rules, submodule_cache)
+        self._log_process: Any = None
+        self._reference_log: Any = None
+        if relevant_commits:
+            from .history_index import start_reference_log
+
+            self._reference_log = start_reference_log(repo)
+        else:
+            self._log_process = start_log(number_of_commits, repo)
+
+    def result(self) -> GitInputs:
+        """Wait for both git processes and return their output."""
+        staged_changes = self._diff_process.result()
+        if self._submodules is not None and staged_changes:
+            staged_changes = self._submodules.expand(staged_changes)
+        self.timings["git_diff"] = time.perf_counter() - self._started_at
+        if self._reference_log is not None:
+            git_logs = self._reference_log.result(
+                self._diff_process.paths, self._number_of_commits
+            )
+        else:
+            git_logs = self._log_process.result()
+        self.timings["git_log"] = time.perf_counter() - self._started_at
+        return GitInputs(
+            staged_changes=staged_changes, git_logs=git_logs, timings=self.timings
+        )
+
+
+def start_git_inputs(
+    rules: ExclusionRules,
+    number_of_commits: int,
+    path: str = ".",
+    relevant_commits: bool = False,
+    diff_encoding: str = "unified",
+    expand_submodules: bool = False,
+    submodule_cache: Any = None,
+) -> PendingGitInputs:
+    """Start reading the staged changes and the git log.
+
+    The git processes run while the caller does other work, e.g. importing and
+    warming up the genai client, and `result()` collects their output.
+
+    Args:
+        rules: The files to exclude or send as line counts only.
+        number_of_commits: Number of commit messages to use as a reference.
+        path: A path inside the repository.
+        relevant_commits: Whether to reference the commits that changed the
+            staged paths rather than the last commits.
+        diff_encoding: The diff encoding whose git options to use.
+        expand_submodules: Whether to replace the staged submodule changes
+            with their ranges of commits.
+        submodule_cache: The cache of the submodule ranges, None reads every
+            range.
+
+    Returns:
+        The pending inputs.
+
+    """
+    return PendingGitInputs(
+        rules,
+        number_of_commits,
+        path,
+        relevant_commits,
+        diff_encoding,
+        expand_submodules,
+        submodule_cache,
+    )
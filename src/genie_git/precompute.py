@@ -0,0 +1,204 @@
+"""Generates commit messages in the background before `git commit` needs them.
+
+A `post-index-change` hook, or `genie-git watch`, generates the message once
+the index stops changing and stores it under the staged tree. The
+`prepare-commit-msg` hook then finds it with two cheap git commands, or
+generates the message within a short deadline if the staged tree changed
+since.
+"""
+
+import os
+import stat
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .cache import make_key
+from .config import Config
+
+if TYPE_CHECKING:
+    import git
+
+PRECOMPUTED_NAMESPACE = "precomputed"
+DEFAULT_DEBOUNCE_SECONDS = 2.0
+# The latency budget of a message generated by the prepare-commit-msg hook
+# without a configured deadline, so that `git commit` never hangs on the API.
+HOOK_DEADLINE_SECONDS = 10.0
+POLL_SECONDS = 0.25
+LOCK_FILE = "genie-git-precompute.lock"
+HOOK_MARKER = "# Installed by genie-git"
+HOOKS = {
+    # Detached, so that `git add` never waits for the suggestion.
+    "post-index-change": "genie-git precompute >/dev/null 2>&1 </dev/null &",
+    "prepare-commit-msg": 'genie-git prepare-commit-msg "$@"',
+}
+
+
+def staged_tree_key(repo: "git.Repo", config: Config) -> str:
+    """Return the key of the message for the staged tree on top of HEAD.
+
+    HEAD and the modes, blob ids and paths of the staged changes determine
+    the tree `git commit` is about to record. Unlike `git write-tree`, which
+    may write the index, `git diff --staged` only reads it, honouring
+    GIT_INDEX_FILE, so the key never triggers the post-index-change hook.
+
+    Args:
+        repo: The repository.
+        config: The configuration, whose candidate models and specifications
+            shape the message.
+
+    Returns:
+        The key of the precomputed message.
+
+    """
+    import git
+
+    changes = repo.git.diff("--staged", "--raw", "-z", "--no-abbrev", "--no-renames")
+    try:
+        head = repo.git.rev_parse("--verify", "--quiet", "HEAD")
+    except git.GitCommandError:  # A repository without commits
+        head = ""
+    return make_key(
+        head,
+        changes,
+        "\n".join(config.candidate_models()),
+        config.message_specifications,
+    )
+
+
+def index_path(repo: "git.Repo") -> Path:
+    """Return the path of the index of the repository or worktree."""
+    return Path(os.environ.get("GIT_INDEX_FILE") or Path(repo.git_dir) / "index")
+
+
+def _modified_at(path: Path) -> int | None:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def wait_until_quiet(
+    path: Path, debounce: float, poll: float = POLL_SECONDS
+) -> int | None:
+    """Wait until the file has not changed for the debounce period.
+
+    Args:
+        path: The watched file, e.g. the index.
+        debounce: The number of seconds without changes to wait for.
+        poll: The number of seconds between checks.
+
+    Returns:
+        The modification time of the file once it is quiet.
+
+    """
+    modified_at = _modified_at(path)
+    quiet_since = time.monotonic()
+    while time.monotonic() - quiet_since < debounce:
+        time.sleep(poll)
+        current = _modified_at(path)
+        if current != modified_at:
+            modified_at = current
+            quiet_since = time.monotonic()
+    return modified_at
+
+
+def watch(
+    path: Path,
+    on_change: Callable[[], None],
+    debounce: float = DEFAULT_DEBOUNCE_SECONDS,
+    poll: float = POLL_SECONDS,
+    should_stop: Callable[[], bool] = lambda: False,
+) -> None:
+    """Call `on_change` whenever the file changed and then stayed quiet.
+
+    The file is polled rather than watched with inotify or FSEvents, which
+    costs a stat call per poll and needs no dependency.
+
+    Args:
+        path: The watched file, e.g. the index.
+        on_change: Called once the file settled after a change.
+        debounce: The number of seconds without changes to wait for.
+        poll: The number of seconds between checks.
+        should_stop: Checked on every poll, ends the watch when it is true.
+
+    """
+    handled = None
+    while not should_stop():
+        if _modified_at(path) == handled:
+            time.sleep(poll)
+            continue
+        handled = wait_until_quiet(path, debounce, poll)
+        on_change()
+
+
+@contextmanager
+def precompute_lock(repo: "git.Repo") -> Iterator[None]:
+    """Hold the lock that lets one precomputation run per repository at a time.
+
+    Waiters queue behind the running precomputation and then find its result,
+    so that a burst of `git add` commands sends a single request. Without
+    fcntl, e.g. on Windows, precomputations are not serialized.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    with open(Path(repo.git_dir) / LOCK_FILE, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _hooks_directory(repo: "git.Repo") -> Path:
+    # Resolves core.hooksPath and the common directory of worktrees.
+    return Path(repo.working_dir) / repo.git.rev_parse("--git-path", "hooks")
+
+
+def install_hooks(repo: "git.Repo") -> list[Path]:
+    """Install the hooks that precompute and fill in the commit message.
+
+    Args:
+        repo: The repository.
+
+    Returns:
+        The installed hooks.
+
+    Raises:
+        FileExistsError: If a hook not installed by genie-git exists.
+
+    """
+    directory = _hooks_directory(repo)
+    paths = [directory / name for name in HOOKS]
+    for path in paths:
+        if path.exists() and HOOK_MARKER not in path.read_text():
+            raise FileExistsError(f"The hook {path} exists already.")
+
+    directory.mkdir(parents=True, exist_ok=True)
+    for path in paths:
+        path.write_text(f"#!/bin/sh\n{HOOK_MARKER}\n{HOOKS[path.name]}\n")
+        path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return paths
+
+
+def uninstall_hooks(repo: "git.Repo") -> list[Path]:
+    """Remove the hooks installed by genie-git and return their paths."""
+    removed = []
+    for name in HOOKS:
+        path = _hooks_directory(repo) / name
+        if path.exists() and HOOK_MARKER in path.read_text():
+            path.unlink()
+            removed.append(path)
+    return removed
+
+
+def fill_in_message(path: Path, message: str) -> None:
+    """Put the message above the template git wrote to the message file."""
+    template = path.read_text() if path.exists() else ""
+    path.write_text(f"{message.rstrip()}\n{template}")
@@ -0,0 +1,150 @@
+"""Registers the stable start of the prompt with the Gemini context cache.
+
+The instructions and the git log change far less often than the staged
+changes, so they are uploaded once as cached content and later requests only
+send the staged changes. The names of the cached contents are kept on disk
+with their expiry, keyed by the model and the prefix text, so that a new log
+head or new message specifications register a new prefix.
+"""
+
+import json
+import time
+from dataclasses import asdict, dataclass
+
+from google import genai
+from google.genai import types
+
+from .cache import make_key
+from .config import CONFIG_DIR, write_atomically
+from .tokens import estimate_tokens
+
+REGISTRY_FILE = CONFIG_DIR / "prefix_caches.json"
+# The smallest prefix the API caches, the limit of Gemini 2.5 Flash.
+MIN_CACHED_TOKENS = 1024
+EXPIRY_MARGIN_SECONDS = 30  # Unused this close to its expiry.
+FAILURE_RETRY_SECONDS = 60 * 60  # Wait before retrying a failed registration.
+
+
+@dataclass
+class CachedPrefix:
+    """Represent a prompt prefix registered with the API."""
+
+    name: str  # Empty if the registration failed.
+    expires_at: float
+
+
+class PrefixCache:
+    """Find, register and refresh the cached prompt prefixes."""
+
+    def __init__(
+        self,
+        client: genai.Client,
+        ttl_seconds: int,
+        entries: dict[str, CachedPrefix] | None = None,
+    ) -> None:
+        """Initialize the prefix cache.
+
+        Args:
+            client: The client registering the prefixes.
+            ttl_seconds: The lifetime of a prefix, extended whenever it is used.
+            entries: The registered prefixes by key.
+
+        """
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls, client: genai.Client, ttl_seconds: int) -> "PrefixCache":
+        """Load the registered prefixes, ignoring a missing or invalid file."""
+        try:
+            with open(REGISTRY_FILE) as f:
+                data = json.load(f)
+            entries = {key: CachedPrefix(**entry) for key, entry in data.items()}
+        except (OSError, ValueError, TypeError):
+            entries = {}
+        return cls(client, ttl_seconds, entries)
+
+    def save(self) -> None:
+        """Save the unexpired prefixes, replacing the file atomically."""
+        now = time.time()
+        data = {
+            key: asdict(entry)
+            for key, entry in self.entries.items()
+            if entry.expires_at > now
+        }
+        write_atomically(REGISTRY_FILE, json.dumps(data))
+
+    @staticmethod
+    def is_cacheable(prefix: str) -> bool:
+        """Return whether the prefix is large enough for the API to cache."""
+        return estimate_tokens(prefix) >= MIN_CACHED_TOKENS
+
+    def lookup(self, model: str, prefix: str) -> str | None:
+        """Return the name of the registered prefix, or None if there is none."""
+        entry = self.entries.get(make_key(model, prefix))
+        if entry is None or not entry.name:
+            return None
+        if entry.expires_at - time.time() < EXPIRY_MARGIN_SECONDS:
+            return None
+        return entry.name
+
+    def forget(self, model: str, prefix: str) -> None:
+        """Drop a prefix the API no longer knows, e.g. after a failed request."""
+        self.entries.pop(make_key(model, prefix), None)
+
+    def maintain(
+        self,
+        model: str,
+        prefix: str,
+        http_options: types.HttpOptions | None = None,
+    ) -> None:
+        """Register the prefix, or extend its lifetime once half of it passed.
+
+        Failures are recorded, so that a prefix the API rejects is not sent
+        again on every run. The requests that use the prefix are unaffected.
+
+        Args:
+            model: The model the prefix is cached for.
+            prefix: The prefix of the prompt.
+            http_options: The options of the requests, e.g. their timeout.
+
+        """
+        key = make_key(model, prefix)
+        entry = self.entries.get(key)
+        now = time.time()
+        if entry and entry.expires_at <= now:
+            entry = None
+        if entry and (not entry.name or entry.expires_at - now > self.ttl_seconds / 2):
+            return
+
+        ttl = f"{self.ttl_seconds}s"
+        if entry and entry.expires_at - now > EXPIRY_MARGIN_SECONDS:
+            try:
+                self.client.caches.update(
+                    name=entry.name,
+                    config=types.UpdateCachedContentConfig(
+                        ttl=ttl, http_options=http_options
+                    ),
+                )
+                self.entries[key] = CachedPrefix(entry.name, now + self.ttl_seconds)
+                return
+            except Exception:  # E.g. deleted by the API, registered again below
+                pass
+
+        try:
+            cached_content = self.client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    contents=prefix,
+                    ttl=ttl,
+                    display_name="genie-git prompt",
+                    http_options=http_options,
+                ),
+            )
+        except Exception:  # Caching is best effort
+            self.entries[key] = CachedPrefix("", now + FAILURE_RETRY_SECONDS)
+            return
+        self.entries[key] = CachedPrefix(
+            cached_content.name or "", now + self.ttl_seconds
+        )
@@ -0,0 +1,88 @@
+"""Builds the prompt sent to the AI."""
+
+
+def build_prompt_prefix(
+    git_logs: str, message_specifications: str = "concise and clear"
+) -> str:
+    """Build the start of the prompt, which rarely changes between runs.
+
+    Args:
+        git_logs: The git logs to use as a reference.
+        message_specifications: Additional specifications for the commit message.
+
+    Returns:
+        The instructions and the git logs.
+
+    """
+    return f"""Suggest a {message_specifications} commit message for the changes below.
+    Ensure that you follow conventional commit message structure.
+    {
+        "Use the following git log as a reference:"
+        if git_logs
+        else "The changes are the first of a new git repo."
+    }
+    {git_logs}
+    """
+
+
+def build_prompt_suffix(staged_changes: str, context: str = "") -> str:
+    """Build the end of the prompt, which changes with every change.
+
+    Args:
+        staged_changes: The staged changes to use as a reference.
+        context: Additional context for the commit message.
+
+    Returns:
+        The staged changes and the context.
+
+    """
+    return f"""The changes:
+    {staged_changes}
+
+    {f"Additional context: {context}" if context else ""}
+    """
+
+
+def build_prompt(
+    git_logs: str,
+    staged_changes: str,
+    message_specifications: str = "concise and clear",
+    context: str = "",
+) -> str:
+    """Build the prompt asking for a commit message.
+
+    The stable prefix comes first, so that it can be cached by the API.
+
+    Args:
+        git_logs: The git logs to use as a reference.
+        staged_changes: The staged changes to use as a reference.
+        message_specifications: Additional specifications for the commit message.
+        context: Additional context for the commit message.
+
+    Returns:
+        The prompt.
+
+    """
+    return build_prompt_prefix(git_logs, message_specifications) + build_prompt_suffix(
+        staged_changes, context
+    )
+
+
+def build_summary_prompt(changes: str) -> str:
+    """Build the prompt asking for a summary of every file of a large change.
+
+    Args:
+        changes: The diff of a group of files.
+
+    Returns:
+        The prompt.
+
+    """
+    return f"""The following diff is one part of a larger commit:
+    {changes}
+
+    Summarize what the change of every file does and why, in at most three short
+    bullet points per file. Do not write a commit message.
+    Answer with a JSON object mapping the path of every file, as written after
+    "b/" in its diff header, to its summary.
+    """
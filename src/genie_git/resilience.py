@@ -0,0 +1,150 @@
+"""Bounds how long a suggestion may take and stops calling a failing API.
+
+A deadline is the latency budget of a whole suggestion. Transient errors are
+retried with exponential backoff while the budget lasts. The circuit breaker
+is kept on disk, so that after repeated failures the following runs, e.g.
+git hooks, fail at once instead of waiting for the API every time.
+"""
+
+import json
+import random
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+from .config import CONFIG_DIR, write_atomically
+
+CIRCUIT_FILE = CONFIG_DIR / "circuit.json"
+FAILURE_THRESHOLD = 3  # Consecutive failed suggestions that open the circuit.
+COOLDOWN_SECONDS = 5 * 60  # How long an open circuit rejects suggestions.
+MAX_RETRIES = 3
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+# HTTP statuses worth retrying: timeouts, rate limits and server errors.
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a suggestion did not finish within its deadline."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the API after repeated failures."""
+
+
+class Deadline:
+    """Track the time left of a latency budget."""
+
+    def __init__(self, seconds: float) -> None:
+        """Start the budget.
+
+        Args:
+            seconds: The budget in seconds, 0 for no deadline.
+
+        """
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds > 0 else None
+
+    def remaining(self) -> float | None:
+        """Return the seconds left, never negative, or None without a deadline."""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        """Return whether the budget is spent."""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+
+def is_transient(error: BaseException) -> bool:
+    """Return whether a failed request may succeed when sent again."""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in TRANSIENT_STATUSES
+    # Connection failures and timeouts of the HTTP client, e.g. httpx.ReadTimeout.
+    return isinstance(error, TimeoutError | ConnectionError) or any(
+        cls.__name__ in ("TransportError", "TimeoutException")
+        for cls in type(error).__mro__
+    )
+
+
+def backoff_delay(retry: int) -> float:
+    """Return the delay before a retry, exponential with full jitter."""
+    return random.uniform(0, min(BACKOFF_BASE_SECONDS * 2**retry, BACKOFF_MAX_SECONDS))
+
+
+@dataclass
+class CircuitBreaker:
+    """Count consecutive failures and reject calls while the circuit is open."""
+
+    failures: int = 0
+    opened_until: float = 0.0
+
+    @classmethod
+    def load(cls) -> "CircuitBreaker":
+        """Load the state, or return a closed circuit if it is missing or invalid."""
+        try:
+            with open(CIRCUIT_FILE) as f:
+                return cls(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return cls()
+
+    def save(self) -> None:
+        """Save the state, replacing the file atomically."""
+        write_atomically(CIRCUIT_FILE, json.dumps(asdict(self)))
+
+    def check(self) -> None:
+        """Raise if the circuit is open.
+
+        Once the cooldown passed, the circuit lets a single suggestion through,
+        which closes it on success or opens it again on failure.
+
+        Raises:
+            CircuitOpenError: If the recent suggestions failed.
+
+        """
+        wait = self.opened_until - time.time()
+        if wait > 0:
+            raise CircuitOpenError(
+                f"The last {self.failures} suggestions failed, not calling the "
+                f"API for another {wait:.0f}s. Run `genie-git circuit reset` "
+                "to try again now."
+            )
+
+    def record_success(self) -> None:
+        """Close the circuit."""
+        self.failures = 0
+        self.opened_until = 0.0
+
+    def record_failure(self) -> None:
+        """Count a failed suggestion and open the circuit after too many."""
+        self.failures += 1
+        if self.failures >= FAILURE_THRESHOLD:
+            self.opened_until = time.time() + COOLDOWN_SECONDS
+
+
+@contextmanager
+def circuit_breaker() -> Iterator[None]:
+    """Reject the call while the circuit is open and record how it ended.
+
+    Only transient errors and exceeded deadlines count as failures, an invalid
+    API key or prompt fails the same way however often it is sent.
+
+    Raises:
+        CircuitOpenError: If the recent suggestions failed.
+
+    """
+    breaker = CircuitBreaker.load()
+    breaker.check()
+    try:
+        yield
+    except Exception as error:
+        if is_transient(error):
+            breaker.record_failure()
+            breaker.save()
+        raise
+    if breaker.failures:
+        breaker.record_success()
+        breaker.save()
@@ -0,0 +1,125 @@
+"""Splits the staged changes of a monorepo by the package they belong to.
+
+A scope is the directory of a package, found by matching the directories of
+a changed path against the configured roots, e.g. "packages/*". Every scope
+gets its own, smaller prompt, with the log of its own directory, and the
+suggestions can be turned into a plan committing every scope on its own.
+"""
+
+import posixpath
+import shlex
+from dataclasses import dataclass, field
+
+from .diff_parser import FileDiff, parse_diff
+from .exclusions import matches
+
+ROOT_SCOPE = ""  # The scope of the files outside every package.
+
+
+@dataclass
+class Scope:
+    """Represent the changes of a single package."""
+
+    root: str
+    file_diffs: list[FileDiff] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        """Return the name of the package, e.g. "api" for "packages/api"."""
+        return posixpath.basename(self.root)
+
+    @property
+    def label(self) -> str:
+        """Return the root of the scope, or "(root)" outside every package."""
+        return self.root or "(root)"
+
+    @property
+    def diff(self) -> str:
+        """Return the diff of the files of the scope."""
+        return "".join(file_diff.text for file_diff in self.file_diffs)
+
+    @property
+    def paths(self) -> list[str]:
+        """Return the changed paths, with the old path of renamed files."""
+        paths = []
+        for file_diff in self.file_diffs:
+            if file_diff.old_path and file_diff.old_path != file_diff.path:
+                paths.append(file_diff.old_path)
+            paths.append(file_diff.path)
+        return paths
+
+    def context(self) -> str:
+        """Return the context telling the model which package changed."""
+        if not self.root:
+            return "These changes are outside of every package of the repository."
+        return (
+            f"These changes belong to the {self.name} package in {self.root}/. "
+            f'Use "{self.name}" as the scope of the conventional commit message.'
+        )
+
+
+def scope_root(path: str, roots: list[str]) -> str:
+    """Return the root of the package a path belongs to.
+
+    Args:
+        path: A path relative to the repository root.
+        roots: The patterns of the package directories, e.g. "packages/*".
+            Without any, every top-level directory is a package.
+
+    Returns:
+        The deepest directory of the path matching a root, or ROOT_SCOPE.
+
+    """
+    directories = path.split("/")[:-1]
+    if not roots:
+        return directories[0] if directories else ROOT_SCOPE
+    for depth in range(len(directories), 0, -1):
+        directory = "/".join(directories[:depth])
+        if any(matches(directory, root.rstrip("/")) for root in roots):
+            return directory
+    return ROOT_SCOPE
+
+
+def split_by_scope(diff: str, roots: list[str]) -> list[Scope]:
+    """Group the files of a diff by their package.
+
+    Args:
+        diff: The staged changes.
+        roots: The patterns of the package directories.
+
+    Returns:
+        The scopes in the order their first file appears in the diff.
+
+    """
+    scopes: dict[str, Scope] = {}
+    for file_diff in parse_diff(diff):
+        root = scope_root(file_diff.path, roots)
+        scopes.setdefault(root, Scope(root)).file_diffs.append(file_diff)
+    return list(scopes.values())
+
+
+def format_plan(commits: list[tuple[Scope, str]], unstaged_paths: set[str]) -> str:
+    """Return the shell commands committing every scope on its own.
+
+    `git commit -- <paths>` commits the working tree version of the paths, so
+    paths with unstaged changes are pointed out first.
+
+    Args:
+        commits: Every scope and its message.
+        unstaged_paths: The paths whose working tree differs from the index.
+
+    Returns:
+        The plan, one commit per scope.
+
+    """
+    lines = ["# Commit every scope of the staged changes on its own:"]
+    for path in sorted(
+        {path for scope, _ in commits for path in scope.paths} & unstaged_paths
+    ):
+        lines.append(
+            f"# Warning: {path} has unstaged changes, which are committed too."
+        )
+    for scope, message in commits:
+        paths = " ".join(shlex.quote(path) for path in scope.paths)
+        lines.append(f"git commit -m {shlex.quote(message.strip())} -- {paths}")
+    return "\n".join(lines)
@@ -0,0 +1,113 @@
+"""Reports where genie-git spends its startup time on imports."""
+
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+
+STARTUP_PROFILE_FLAG = "--startup-profile"
+STARTUP_PROFILE_ENV = "GENIE_GIT_STARTUP_PROFILE"
+
+_IMPORT_TIME_LINE = re.compile(
+    r"^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| (?P<name>.+)$"
+)
+
+
+@dataclass
+class ImportTiming:
+    """Represent the import time of a single module in microseconds."""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_import_times(output: str) -> tuple[list[ImportTiming], str]:
+    """Parse the output of `python -X importtime`.
+
+    Args:
+        output: The stderr output of the profiled process.
+
+    Returns:
+        The parsed import timings and the remaining stderr lines that were not
+        produced by `-X importtime`.
+
+    """
+    timings = []
+    remaining = []
+    for line in output.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if not match:
+            if not line.startswith("import time:"):
+                remaining.append(line)
+            continue
+        name = match["name"]
+        module = name.lstrip()
+        timings.append(
+            ImportTiming(
+                module=module,
+                self_us=int(match["self"]),
+                cumulative_us=int(match["cumulative"]),
+                depth=(len(name) - len(module)) // 2,
+            )
+        )
+    return timings, "\n".join(remaining)
+
+
+def format_breakdown(timings: list[ImportTiming], top: int = 10) -> str:
+    """Format an import time breakdown grouped by top-level package.
+
+    Args:
+        timings: The parsed import timings.
+        top: The number of packages and modules to list.
+
+    Returns:
+        A human-readable report.
+
+    """
+    by_package: dict[str, int] = {}
+    for timing in timings:
+        package = timing.module.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + timing.self_us
+
+    total_us = sum(timing.self_us for timing in timings)
+    lines = [f"Total import time: {total_us / 1000:.1f} ms", "", "By package:"]
+    for package, self_us in sorted(
+        by_package.items(), key=lambda item: item[1], reverse=True
+    )[:top]:
+        lines.append(f"  {self_us / 1000:8.1f} ms  {package}")
+
+    lines.extend(["", "Slowest genie_git imports (cumulative):"])
+    own_modules = [t for t in timings if t.module.startswith("genie_git")]
+    for timing in sorted(own_modules, key=lambda t: t.cumulative_us, reverse=True)[
+        :top
+    ]:
+        lines.append(f"  {timing.cumulative_us / 1000:8.1f} ms  {timing.module}")
+    return "\n".join(lines)
+
+
+def profile_startup(argv: list[str]) -> int:
+    """Run genie-git with `-X importtime` and print an import time breakdown.
+
+    Args:
+        argv: The command-line arguments to profile, without the profile flag.
+
+    Returns:
+        The exit code of the profiled command.
+
+    """
+    env = dict(os.environ)
+    env.pop(STARTUP_PROFILE_ENV, None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "genie_git.main", *argv],
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env,
+    )
+    timings, remaining = parse_import_times(result.stderr)
+    if remaining:
+        print(remaining, file=sys.stderr)
+    print(format_breakdown(timings), file=sys.stderr)
+    return result.returncode
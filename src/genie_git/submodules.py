@@ -0,0 +1,307 @@
+"""Expands staged submodule changes into the commits they bring in.
+
+In the diff of the superproject, moving a submodule to another commit is only
+a pair of commit ids. With the option enabled, the entry of every changed
+submodule is replaced by the subjects and the line counts of its range of
+commits, read from the submodules concurrently, one thread each. The ranges
+are cached under their pair of commit ids in the shared cache directory, so
+they are read once for all the worktrees of a repository, and a worktree whose
+submodules were never checked out reads them from the clones of the main one.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import git
+
+from .cache import DiskCache, make_key
+from .diff_parser import DIFF_HEADER_PREFIX, parse_diff
+from .exclusions import ExclusionRules
+from .git_handler import GitProcess
+from .tracing import span
+
+SUBMODULES_NAMESPACE = "submodules"
+SUBMODULE_MODE = "160000"
+# The subjects listed for a range, the newest first.
+MAX_SUBJECTS = 20
+# The submodules whose range is read at the same time.
+MAX_THREADS = 8
+
+
+@dataclass
+class SubmoduleChange:
+    """Represent a staged change of a submodule commit."""
+
+    path: str
+    old: str  # "" for an added submodule.
+    new: str  # "" for a removed submodule.
+
+    @property
+    def key(self) -> str:
+        """Return the cache key of the range, shared by every path and worktree."""
+        return make_key(self.old, self.new, str(MAX_SUBJECTS))
+
+
+def parse_raw(output: str) -> list[SubmoduleChange]:
+    """Parse the submodule changes of `git diff --raw -z --no-abbrev`.
+
+    Args:
+        output: Every changed path, as ":old_mode new_mode old new status",
+            followed by one path, or two for a rename or a copy.
+
+    Returns:
+        The changes of the paths whose old or new mode is a submodule.
+
+    """
+    fields = output.split("\0")
+    changes = []
+    index = 0
+    while index < len(fields) - 1:
+        old_mode, new_mode, old, new, status = fields[index].lstrip(":").split(" ")
+        paths = 2 if status[0] in "RC" else 1
+        path = fields[index + paths]
+        index += paths + 1
+        if SUBMODULE_MODE not in (old_mode, new_mode):
+            continue
+        changes.append(
+            SubmoduleChange(
+                path,
+                old if old_mode == SUBMODULE_MODE else "",
+                new if new_mode == SUBMODULE_MODE else "",
+            )
+        )
+    return changes
+
+
+def submodule_git_dirs(repo: git.Repo, path: str) -> list[Path]:
+    """Return the git directories of the clones of a submodule.
+
+    The clone of the checkout comes first, then the clone of the main
+    worktree, which a linked worktree falls back on when its own submodules
+    were never updated. The commands name the git directory rather than run
+    in the checkout, which without a clone would be the superproject.
+    """
+    checkout = Path(repo.working_dir) / path / ".git"
+    directories = []
+    if checkout.is_file():
+        # A "gitdir: <path>" link to the clone in the superproject.
+        link = checkout.read_text().strip().removeprefix("gitdir: ")
+        directories.append(checkout.parent / link)
+    elif checkout.is_dir():
+        directories.append(checkout)
+    directories += [
+        Path(repo.git_dir) / "modules" / path,
+        Path(repo.common_dir) / "modules" / path,
+    ]
+    resolved = dict.fromkeys(directory.resolve() for directory in directories)
+    return [directory for directory in resolved if directory.is_dir()]
+
+
+def _short(commit: str) -> str:
+    return commit[:7]
+
+
+def describe_range(change: SubmoduleChange, log: str, shortstat: str) -> str:
+    """Return the summary of a submodule change, without its path.
+
+    Args:
+        change: The change.
+        log: The `git log --left-right --format=%m%s` output of the range,
+            or the subjects of the last commits of an added submodule.
+        shortstat: The `git diff --shortstat` output of the range.
+
+    Returns:
+        The range and its counts on the first line, then the subjects.
+
+    """
+    lines = log.splitlines()
+    if not change.old:
+        facts = [f"added at {_short(change.new)}"]
+        subjects = [f"  {line}" for line in lines[:MAX_SUBJECTS]]
+    else:
+        added = [line[1:] for line in lines if line.startswith(">")]
+        removed = [line[1:] for line in lines if line.startswith("<")]
+        facts = [f"{_short(change.old)}..{_short(change.new)}"]
+        if added:
+            facts.append(f"{len(added)} new commits")
+        if removed:
+            facts.append(f"{len(removed)} commits dropped")
+        if shortstat.strip():
+            facts.append(shortstat.strip())
+        subjects = [f"+ {subject}" for subject in added]
+        subjects += [f"- {subject}" for subject in removed]
+        omitted = len(subjects) - MAX_SUBJECTS
+        subjects = subjects[:MAX_SUBJECTS]
+        if omitted > 0:
+            subjects.append(f"[{omitted} more commits]")
+    return "\n".join([", ".join(facts), *subjects])
+
+
+def _git(git_dir: Path, *args: str) -> str:
+    # A Git instance per command, as the options of the shared one of the
+    # repository apply to whichever thread runs the next command.
+    runner = git.Git(git_dir)
+    return runner.execute(
+        [runner.GIT_PYTHON_GIT_EXECUTABLE or "git", f"--git-dir={git_dir}", *args]
+    )
+
+
+def read_range(repo: git.Repo, change: SubmoduleChange) -> str | None:
+    """Read the commits of a submodule change.
+
+    Args:
+        repo: The superproject.
+        change: The change of an added or moved submodule.
+
+    Returns:
+        The summary of the range, or None if no clone holds its commits.
+
+    """
+    for git_dir in submodule_git_dirs(repo, change.path):
+        try:
+            if not change.old:
+                log = _git(
+                    git_dir, "log", f"-{MAX_SUBJECTS}", "--format=%s", change.new, "--"
+                )
+                return describe_range(change, log, "")
+            log = _git(
+                git_dir,
+                "log",
+                "--left-right",
+                "--format=%m%s",
+                f"{change.old}...{change.new}",
+                "--",
+            )
+            shortstat = _git(
+                git_dir, "diff", "--shortstat", change.old, change.new, "--"
+            )
+        except git.GitCommandError:
+            continue  # E.g. a clone not fetched since the change.
+        return describe_range(change, log, shortstat)
+    return None
+
+
+def format_entry(change: SubmoduleChange, summary: str | None) -> str:
+    """Return the summary of a submodule change in the shape of a file diff."""
+    path = change.path
+    header = f"{DIFF_HEADER_PREFIX}a/{path} b/{path}\n"
+    if not change.new:
+        return f"{header}[{path}: submodule removed, was at {_short(change.old)}]\n"
+    if summary is None:
+        commits = f"{_short(change.old)}..{_short(change.new)}" if change.old else ""
+        return (
+            f"{header}[{path}: submodule {commits or _short(change.new)}, "
+            f"commits not available locally]\n"
+        )
+    first_line, _, subjects = summary.partition("\n")
+    text = f"{header}[{path}: submodule {first_line}]\n"
+    return text + (f"{subjects}\n" if subjects else "")
+
+
+def summarize_changes(
+    repo: git.Repo, changes: list[SubmoduleChange], cache: DiskCache | None
+) -> dict[str, str]:
+    """Summarize the submodule changes, reading the uncached ranges concurrently.
+
+    Args:
+        repo: The superproject.
+        changes: The submodule changes.
+        cache: The cache of the summaries, None reads every range.
+
+    Returns:
+        The entry replacing the diff of every changed submodule, by path.
+
+    """
+    summaries: dict[str, str | None] = {}
+    missing = []
+    for change in changes:
+        cached = cache.get(change.key) if cache and change.new else None
+        if cached is not None:
+            summaries[change.path] = cached
+        elif change.new:
+            missing.append(change)
+
+    if missing:
+        with ThreadPoolExecutor(min(len(missing), MAX_THREADS)) as executor:
+            read = list(executor.map(lambda c: read_range(repo, c), missing))
+        for change, summary in zip(missing, read, strict=True):
+            summaries[change.path] = summary
+        if cache:
+            cache.set_many(
+                {
+                    change.key: summary
+                    for change, summary in zip(missing, read, strict=True)
+                    if summary is not None
+                }
+            )
+    return {
+        change.path: format_entry(change, summaries.get(change.path))
+        for change in changes
+    }
+
+
+def expand_submodules(diff: str, entries: dict[str, str]) -> str:
+    """Replace the diff of every changed submodule with its entry."""
+    if not entries:
+        return diff
+    return "".join(
+        entries.get(file_diff.path, file_diff.text) for file_diff in parse_diff(diff)
+    ).removesuffix("\n")
+
+
+class PendingSubmodules:
+    """List the staged submodule changes in the background."""
+
+    def __init__(
+        self, repo: git.Repo, rules: ExclusionRules, cache: DiskCache | None
+    ) -> None:
+        """Start listing the staged changes with their modes.
+
+        Args:
+            repo: The superproject.
+            rules: The exclusion rules, which apply to submodules too.
+            cache: The cache of the summaries, None reads every range.
+
+        """
+        self._repo = repo
+        self._cache = cache
+        self._raw = GitProcess(
+            repo, "diff", "--staged", "--raw", "-z", "--no-abbrev", *rules.pathspecs()
+        )
+
+    def expand(self, diff: str) -> str:
+        """Return the diff with every changed submodule expanded.
+
+        Raises:
+            git.GitCommandError: If listing the changes failed.
+
+        """
+        changes = parse_raw(self._raw.result())
+        if not changes:
+            return diff
+        with span("submodules") as current:
+            expanded = expand_submodules(
+                diff, summarize_changes(self._repo, changes, self._cache)
+            )
+            if current:
+                current.attributes["submodules"] = len(changes)
+                current.add_text("diff", expanded)
+        return expanded
+
+
+def start_submodule_changes(
+    repo: git.Repo, rules: ExclusionRules, cache: DiskCache | None
+) -> PendingSubmodules:
+    """Start listing the staged submodule changes in the background.
+
+    Args:
+        repo: The superproject.
+        rules: The exclusion rules.
+        cache: The cache of the summaries, None reads every range.
+
+    Returns:
+        The pending changes, which expand the staged diff.
+
+    """
+    return PendingSubmodules(repo, rules, cache)
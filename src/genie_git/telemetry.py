@@ -0,0 +1,302 @@
+"""Keeps a local record of every suggest run for `genie-git stats`.
+
+Every `suggest` run is traced, and once it ends its spans are condensed into
+a single line of JSON appended to a file under ~/.genie-git: the timings of
+its stages, the size of its prompts and responses, the model, whether the
+response was cached and how the run ended. Recording a run is one small
+append; the records past the retention limits are only dropped once the file
+has grown well beyond them.
+"""
+
+import json
+import math
+import time
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime
+from pathlib import Path
+
+from .config import CONFIG_DIR, write_atomically
+from .tracing import Tracer
+
+TELEMETRY_FILE = CONFIG_DIR / "telemetry.jsonl"
+# A generous size of a record. The file is compacted once it could hold twice
+# the records to keep, so that compaction is rare.
+RECORD_BYTES = 512
+# The spans of a request to the model, and of those the suggestion requests.
+REQUEST_SPANS = ("generate", "generate_stream", "summarize")
+SUGGESTION_SPANS = ("generate", "generate_stream")
+# The spans measuring the prompts sent.
+PROMPT_SPANS = ("prompt_build", "summarize")
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+@dataclass
+class RunRecord:
+    """Represent a single suggest run."""
+
+    timestamp: float
+    mode: str  # "staged", "range", "scopes" or "dry-run".
+    repo: str
+    outcome: str  # "ok", or the name of the exception that ended the run.
+    seconds: float
+    model: str = ""
+    cache_hit: bool | None = None  # None if no cached response was looked up.
+    requests: int = 0
+    prompt_tokens: int = 0  # The estimated tokens of every prompt sent.
+    response_tokens: int = 0
+    stages: dict[str, float] = field(default_factory=dict)  # Seconds by span name.
+
+    @classmethod
+    def from_trace(
+        cls, tracer: Tracer, mode: str, repo: str, outcome: str
+    ) -> "RunRecord":
+        """Condense the spans of a finished run."""
+        record = cls(
+            timestamp=tracer.timestamp,
+            mode=mode,
+            repo=repo,
+            outcome=outcome,
+            seconds=round(tracer.total or 0.0, 4),
+        )
+        for span in tracer.spans:
+            stage = record.stages.get(span.name, 0.0) + span.duration
+            record.stages[span.name] = round(stage, 4)
+            attributes = span.attributes
+            if span.name in REQUEST_SPANS:
+                record.requests += 1
+                record.response_tokens += int(attributes.get("response_tokens", 0))
+            if span.name in PROMPT_SPANS:
+                record.prompt_tokens += int(attributes.get("prompt_tokens", 0))
+            if span.name in SUGGESTION_SPANS and "model" in attributes:
+                record.model = str(attributes["model"])
+            if span.name == "cache_lookup" and "hit" in attributes:
+                record.cache_hit = bool(attributes["hit"])
+        return record
+
+
+def repository_root(path: Path) -> str:
+    """Return the top directory of the repository containing the path.
+
+    Found by looking for ".git" rather than with GitPython, so that recording
+    a run never loads it. Outside of a repository, the path itself.
+    """
+    for directory in [path, *path.parents]:
+        if (directory / ".git").exists():
+            return str(directory)
+    return str(path)
+
+
+def load_records(max_age_days: int = 0) -> list[RunRecord]:
+    """Load the recorded runs, the oldest first.
+
+    Args:
+        max_age_days: Only load the runs of this many last days, 0 loads all.
+
+    Returns:
+        The runs, without the lines that are not a valid record.
+
+    """
+    since = time.time() - max_age_days * 86400 if max_age_days > 0 else 0.0
+    names = {f.name for f in fields(RunRecord)}
+    records = []
+    try:
+        with open(TELEMETRY_FILE) as f:
+            for line in f:
+                try:
+                    data = json.loads(line)
+                    record = RunRecord(**{k: v for k, v in data.items() if k in names})
+                except (ValueError, TypeError, AttributeError):
+                    continue  # E.g. a line cut short by a full disk.
+                if record.timestamp >= since:
+                    records.append(record)
+    except OSError:
+        return []
+    return records
+
+
+def compact(max_records: int, max_age_days: int) -> None:
+    """Drop the runs past the retention limits, replacing the file atomically."""
+    records = load_records(max_age_days)[-max_records:]
+    write_atomically(
+        TELEMETRY_FILE,
+        "".join(_to_line(record) for record in records),
+        encoding="utf-8",
+    )
+
+
+def _to_line(record: RunRecord) -> str:
+    return json.dumps(asdict(record), separators=(",", ":")) + "\n"
+
+
+def record_run(record: RunRecord, max_records: int, max_age_days: int) -> None:
+    """Append a run, and drop old runs once the file grew past the limits.
+
+    Args:
+        record: The run.
+        max_records: The number of runs to keep.
+        max_age_days: The days after which a run is dropped, 0 keeps it.
+
+    """
+    TELEMETRY_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(TELEMETRY_FILE, "a", encoding="utf-8") as f:
+        f.write(_to_line(record))
+        size = f.tell()
+    if size > 2 * max_records * RECORD_BYTES:
+        compact(max_records, max_age_days)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Return the nearest-rank quantile of non-empty values."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    return {f"p{round(q * 100)}": percentile(values, q) for q in PERCENTILES}
+
+
+@dataclass
+class UsageReport:
+    """Represent the percentiles and top offenders of the recorded runs."""
+
+    runs: int
+    since: float
+    outcomes: dict[str, int]
+    cache_hits: int
+    cache_lookups: int
+    # The wall time of successful runs, by percentile, e.g. "p95".
+    latency: dict[str, float]
+    prompt_tokens_per_request: dict[str, float]
+    stage_p95: dict[str, float]  # The slowest stages first.
+    models: list[dict] = field(default_factory=list)
+    repos: list[dict] = field(default_factory=list)  # The largest prompts first.
+    slowest: list[dict] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        """Return the report as a JSON-serializable dictionary."""
+        return asdict(self)
+
+    def format(self) -> str:
+        """Return the report as human-readable text."""
+        started = datetime.fromtimestamp(self.since).strftime("%Y-%m-%d")
+        outcomes = ", ".join(f"{count} {name}" for name, count in self.outcomes.items())
+        lines = [f"{self.runs} suggest runs since {started}: {outcomes}"]
+        if self.latency:
+            lines.append(
+                "Latency of successful runs: "
+                + ", ".join(f"{q} {s:.2f}s" for q, s in self.latency.items())
+            )
+        if self.prompt_tokens_per_request:
+            lines.append(
+                "Prompt tokens per request: "
+                + ", ".join(
+                    f"{q} {tokens:.0f}"
+                    for q, tokens in self.prompt_tokens_per_request.items()
+                )
+            )
+        if self.cache_lookups:
+            lines.append(
+                f"Cached responses: {self.cache_hits} of {self.cache_lookups} "
+                f"lookups ({self.cache_hits / self.cache_lookups:.0%})"
+            )
+        if self.stage_p95:
+            lines.append(
+                "Slowest stages (p95): "
+                + ", ".join(f"{name} {s:.2f}s" for name, s in self.stage_p95.items())
+            )
+        if self.models:
+            lines.append("Models:")
+            lines += [
+                f"  {m['model']}  {m['runs']} runs  p95 {m['p95']:.2f}s"
+                for m in self.models
+            ]
+        if self.repos:
+            lines.append("Largest prompts by repository:")
+            lines += [
+                f"  {r['repo']}  {r['runs']} runs  p95 {r['p95_tokens']:.0f} tokens"
+                f"  max {r['max_tokens']} tokens  {r['errors']} errors"
+                for r in self.repos
+            ]
+        if self.slowest:
+            lines.append("Slowest runs:")
+            lines += [
+                f"  {datetime.fromtimestamp(r['timestamp']):%Y-%m-%d %H:%M}  "
+                f"{r['repo']}  {r['mode']}  {r['seconds']:.2f}s  {r['outcome']}"
+                for r in self.slowest
+            ]
+        return "\n".join(lines)
+
+
+def build_report(records: list[RunRecord], top: int = 5) -> UsageReport:
+    """Compute the percentiles and the top offenders of the runs.
+
+    Args:
+        records: The runs, at least one.
+        top: The number of repositories and slowest runs to list.
+
+    Returns:
+        The report.
+
+    """
+    outcomes: dict[str, int] = {}
+    for record in records:
+        outcomes[record.outcome] = outcomes.get(record.outcome, 0) + 1
+    succeeded = [record for record in records if record.outcome == "ok"]
+    stages: dict[str, list[float]] = {}
+    for record in succeeded:
+        for name, seconds in record.stages.items():
+            stages.setdefault(name, []).append(seconds)
+    stage_p95 = {name: percentile(values, 0.95) for name, values in stages.items()}
+
+    by_model: dict[str, list[float]] = {}
+    for record in succeeded:
+        if record.model:
+            by_model.setdefault(record.model, []).append(record.seconds)
+    by_repo: dict[str, list[RunRecord]] = {}
+    for record in records:
+        by_repo.setdefault(record.repo, []).append(record)
+    prompt_p95 = {
+        repo: percentile([run.prompt_tokens for run in runs], 0.95)
+        for repo, runs in by_repo.items()
+    }
+    repos = [
+        {
+            "repo": repo,
+            "runs": len(by_repo[repo]),
+            "p95_tokens": prompt_p95[repo],
+            "max_tokens": max(run.prompt_tokens for run in by_repo[repo]),
+            "errors": sum(run.outcome != "ok" for run in by_repo[repo]),
+        }
+        for repo in sorted(prompt_p95, key=lambda repo: -prompt_p95[repo])[:top]
+    ]
+
+    lookups = [record for record in records if record.cache_hit is not None]
+    return UsageReport(
+        runs=len(records),
+        since=min(record.timestamp for record in records),
+        outcomes=dict(sorted(outcomes.items(), key=lambda item: -item[1])),
+        cache_hits=sum(bool(record.cache_hit) for record in lookups),
+        cache_lookups=len(lookups),
+        latency=_percentiles([record.seconds for record in succeeded]),
+        prompt_tokens_per_request=_percentiles(
+            [r.prompt_tokens / r.requests for r in records if r.requests]
+        ),
+        stage_p95=dict(sorted(stage_p95.items(), key=lambda item: -item[1])[:top]),
+        models=[
+            {"model": model, "runs": len(seconds), "p95": percentile(seconds, 0.95)}
+            for model, seconds in sorted(by_model.items(), key=lambda i: -len(i[1]))
+        ],
+        repos=repos,
+        slowest=[
+            {
+                "timestamp": r.timestamp,
+                "repo": r.repo,
+                "mode": r.mode,
+                "seconds": r.seconds,
+                "outcome": r.outcome,
+            }
+            for r in sorted(records, key=lambda r: -r.seconds)[:top]
+        ],
+    )
@@ -0,0 +1,17 @@
+"""Estimates token counts locally without calling the API."""
+
+# Gemini models average about four characters per token.
+CHARACTERS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens the model will count for the text.
+
+    Args:
+        text: The text to estimate.
+
+    Returns:
+        The estimated number of tokens.
+
+    """
+    return -(-len(text) // CHARACTERS_PER_TOKEN)
@@ -0,0 +1,173 @@
+"""Records how long every stage of a command takes.
+
+Tracing is off unless a command enables it, and `span` then returns a shared
+no-op context manager, so instrumented code costs a function call.
+"""
+
+import json
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+
+from .tokens import estimate_tokens
+
+TRACE_ENV = "GENIE_GIT_TRACE"
+
+_DISABLED: AbstractContextManager[None] = nullcontext()
+
+
+@dataclass
+class Span:
+    """Represent a stage of a command, timed relative to the trace start."""
+
+    name: str
+    start: float
+    duration: float = 0.0
+    attributes: dict[str, int | str | bool] = field(default_factory=dict)
+
+    def add_text(self, label: str, text: str) -> None:
+        """Record the size of a text in bytes and estimated tokens."""
+        self.attributes[f"{label}_bytes"] = len(text.encode())
+        self.attributes[f"{label}_tokens"] = estimate_tokens(text)
+
+
+class Tracer:
+    """Collect the spans of a command."""
+
+    def __init__(self, command: str, started_at: float | None = None) -> None:
+        """Start the trace.
+
+        Args:
+            command: The name of the traced command.
+            started_at: When the command started, as returned by perf_counter
+                (default: now)
+
+        """
+        self.command = command
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.timestamp = time.time()
+        self.total: float | None = None
+        self.spans: list[Span] = []
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[Span]:
+        """Time the enclosed block as a span."""
+        started_at = time.perf_counter()
+        current = Span(name=name, start=started_at - self.started_at)
+        try:
+            yield current
+        finally:
+            current.duration = time.perf_counter() - started_at
+            # list.append is atomic, so spans may end on any thread.
+            self.spans.append(current)
+
+    def record(self, name: str, started_at: float, **attributes: int | str) -> Span:
+        """Record a span that started earlier and ends now.
+
+        Args:
+            name: The name of the span.
+            started_at: When the span started, as returned by perf_counter.
+            attributes: Attributes of the span.
+
+        Returns:
+            The recorded span.
+
+        """
+        current = Span(
+            name=name,
+            start=started_at - self.started_at,
+            duration=time.perf_counter() - started_at,
+            attributes=dict(attributes),
+        )
+        self.spans.append(current)
+        return current
+
+    def to_dict(self) -> dict:
+        """Return the trace as a JSON-serializable dictionary."""
+        return {
+            "command": self.command,
+            "timestamp": self.timestamp,
+            "total": self.total,
+            "spans": [
+                asdict(span) for span in sorted(self.spans, key=lambda s: s.start)
+            ],
+        }
+
+    def finish(self) -> None:
+        """Record the total duration of the command."""
+        self.total = time.perf_counter() - self.started_at
+
+    def format(self) -> str:
+        """Return the trace as a table of spans in milliseconds."""
+        trace = self.to_dict()
+        total = (trace["total"] or 0) * 1000
+        lines = [f"Timings of {self.command} (total {total:.1f} ms):"]
+        for span in trace["spans"]:
+            attributes = " ".join(f"{k}={v}" for k, v in span["attributes"].items())
+            lines.append(
+                f"  {span['name']:<16} {span['start'] * 1000:8.1f} ms "
+                f"+{span['duration'] * 1000:8.1f} ms  {attributes}".rstrip()
+            )
+        return "\n".join(lines)
+
+
+_tracer: Tracer | None = None
+
+
+def start_tracing(command: str, started_at: float | None = None) -> Tracer:
+    """Start recording the spans of a command."""
+    global _tracer
+    _tracer = Tracer(command, started_at)
+    return _tracer
+
+
+def stop_tracing() -> Tracer | None:
+    """Stop recording spans and return the finished trace, if any."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.finish()
+    return tracer
+
+
+def current_tracer() -> Tracer | None:
+    """Return the active tracer, or None if tracing is off."""
+    return _tracer
+
+
+def span(name: str) -> AbstractContextManager[Span | None]:
+    """Time the enclosed block if tracing is on.
+
+    The context manager yields the span, or None if tracing is off, so that
+    attributes are only computed when they are recorded:
+
+        with span("git_diff") as current:
+            diff = ...
+            if current:
+                current.add_text("diff", diff)
+    """
+    if _tracer is None:
+        return _DISABLED
+    return _tracer.span(name)
+
+
+def write_trace(tracer: Tracer, output_format: str | None, path: str | None) -> None:
+    """Print the trace to stderr and append it to a JSON lines file.
+
+    Args:
+        tracer: The finished trace.
+        output_format: "text" or "json" to print the trace, or None.
+        path: A file the trace is appended to as a line of JSON, or None.
+
+    """
+    if output_format == "json":
+        print(json.dumps(tracer.to_dict()), file=sys.stderr)
+    elif output_format:
+        print(tracer.format(), file=sys.stderr)
+
+    if path:
+        # One line per run, so that hook wrappers can collect percentiles.
+        with open(path, "a") as f:
+            f.write(json.dumps(tracer.to_dict()) + "\n")
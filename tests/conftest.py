@@ -1,14 +1,102 @@
 """Conftest file for pytest."""
 
+import subprocess
+from argparse import Namespace
+from collections.abc import Callable
+from dataclasses import fields
+from pathlib import Path
+from typing import Any
 from unittest.mock import MagicMock
 
 import pytest
 from pytest_mock import MockerFixture
 
+from genie_git.cli import create_parser
+from genie_git.config import Config
+from genie_git.pipeline import GitInputs
+
+
+@pytest.fixture(autouse=True)
+def isolated_storage(tmp_path: Path, mocker: MockerFixture) -> Path:
+    """Keep every file genie-git writes under a temporary directory."""
+    storage_dir = tmp_path / ".genie-git"
+    mocker.patch("genie_git.cache.CACHE_DIR", storage_dir / "cache")
+    mocker.patch("genie_git.config.CONFIG_DIR", storage_dir)
+    mocker.patch("genie_git.config.CONFIG_FILE", storage_dir / "config.json")
+    mocker.patch("genie_git.latency.LATENCY_FILE", storage_dir / "latency.json")
+    mocker.patch("genie_git.resilience.CIRCUIT_FILE", storage_dir / "circuit.json")
+    mocker.patch("genie_git.telemetry.TELEMETRY_FILE", storage_dir / "telemetry.jsonl")
+    mocker.patch(
+        "genie_git.prefix_cache.REGISTRY_FILE", storage_dir / "prefix_caches.json"
+    )
+    return storage_dir
+
 
 @pytest.fixture
 def mock_config_instance(mocker: MockerFixture) -> MagicMock:
-    """Mock the Config instance."""
+    """Mock the Config instance.
+
+    Scalar settings keep their real defaults so that handlers can compute with
+    them, while list settings stay mocks to allow asserting on their usage.
+    """
     mock_instance = mocker.MagicMock()
+    defaults = Config()
+    for config_field in fields(Config):
+        value = getattr(defaults, config_field.name)
+        if not isinstance(value, list):
+            setattr(mock_instance, config_field.name, value)
     mocker.patch("genie_git.cli_handlers.Config.load", return_value=mock_instance)
     return mock_instance
+
+
+@pytest.fixture
+def mock_git_inputs(mocker: MockerFixture) -> GitInputs:
+    """Mock reading the staged changes and the git log."""
+    git_inputs = GitInputs(staged_changes="test_changes", git_logs="test_log")
+    mock_start_git_inputs = mocker.patch("genie_git.pipeline.start_git_inputs")
+    mock_start_git_inputs.return_value.result.return_value = git_inputs
+    return git_inputs
+
+
+@pytest.fixture
+def mock_client_warmup(mocker: MockerFixture) -> MagicMock:
+    """Mock creating the genai client in the background."""
+    mock_warmup_class = mocker.patch("genie_git.pipeline.ClientWarmup")
+    return mock_warmup_class.return_value.start.return_value
+
+
+@pytest.fixture
+def make_args() -> Callable[..., Namespace]:
+    """Return a factory building the parsed arguments of a command."""
+
+    def _make_args(command: str, **overrides: Any) -> Namespace:
+        args = create_parser().parse_args([command])
+        for name, value in overrides.items():
+            setattr(args, name, value)
+        return args
+
+    return _make_args
+
+
+@pytest.fixture
+def commit_file() -> Callable[..., str]:
+    """Return a function committing a file and returning the commit id."""
+
+    def _commit_file(
+        directory: str | Path, name: str, content: str, message: str
+    ) -> str:
+        path = Path(directory) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        git = ["git", "-c", "user.name=test", "-c", "user.email=test@example.com"]
+        subprocess.run([*git, "add", name], cwd=directory, check=True)
+        subprocess.run([*git, "commit", "-q", "-m", message], cwd=directory, check=True)
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=directory,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+
+    return _commit_file
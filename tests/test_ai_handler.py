@@ -1,8 +1,31 @@
 """Test the AI handler module."""
 
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from google.genai import errors, types
 from pytest_mock import MockerFixture
 
-from genie_git.ai_handler import suggest_commit_message
+from genie_git.ai_handler import (
+    create_client,
+    suggest_commit_message,
+    suggest_commit_message_async,
+    suggest_commit_messages,
+    summarize_files_async,
+    warm_up_client,
+)
+from genie_git.latency import LatencyHistory
+from genie_git.prefix_cache import MIN_CACHED_TOKENS
+from genie_git.resilience import (
+    FAILURE_THRESHOLD,
+    CircuitBreaker,
+    CircuitOpenError,
+    Deadline,
+    DeadlineExceededError,
+)
 
 
 def test_generate_commit_message(mocker: MockerFixture) -> None:
@@ -40,3 +63,470 @@ def test_generate_commit_message(mocker: MockerFixture) -> None:
 
     # To assure that the API key is used
     assert mock_client_instance.is_called_with(api_key=api_key)
+
+
+def test_generate_commit_message_with_streaming(mocker: MockerFixture) -> None:
+    """Test that the chunks are passed to on_chunk and assembled."""
+    mock_client_instance = mocker.MagicMock()
+    chunks = [mocker.MagicMock(text=text) for text in ["feat: ", None, "streamed"]]
+    mock_client_instance.models.generate_content_stream.return_value = iter(chunks)
+    mocker.patch("genie_git.ai_handler.genai.Client", return_value=mock_client_instance)
+    received: list[str] = []
+
+    response_text = suggest_commit_message(
+        "test_key", "test_logs", "test_changes", on_chunk=received.append
+    )
+
+    assert response_text == "feat: streamed"
+    assert received == ["feat: ", "streamed"]
+    mock_client_instance.models.generate_content.assert_not_called()
+
+
+def test_suggest_commit_message_with_client(mocker: MockerFixture) -> None:
+    """Test that a given client is used instead of creating one."""
+    mock_client_class = mocker.patch("genie_git.ai_handler.genai.Client")
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.models.generate_content.return_value.text = "feat: reuse"
+
+    response_text = suggest_commit_message(
+        "test_key", "test_logs", "test_changes", client=mock_client_instance
+    )
+
+    assert response_text == "feat: reuse"
+    mock_client_class.assert_not_called()
+
+
+def test_suggest_commit_message_reuses_the_cached_prefix(
+    mocker: MockerFixture,
+) -> None:
+    """Test that later requests only send the changes after the cached prefix."""
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.caches.create.return_value.name = "cachedContents/1"
+    mock_client_instance.models.generate_content.return_value.text = "feat: cached"
+    git_logs = "feat: old\n" * MIN_CACHED_TOKENS
+
+    for _ in range(2):
+        suggest_commit_message(
+            "key",
+            git_logs,
+            "test_changes",
+            client=mock_client_instance,
+            prefix_cache_ttl=600,
+        )
+
+    mock_client_instance.caches.create.assert_called_once()
+    first, second = mock_client_instance.models.generate_content.call_args_list
+    assert git_logs in first.kwargs["contents"]
+    assert first.kwargs["config"].cached_content is None
+    assert git_logs not in second.kwargs["contents"]
+    assert "test_changes" in second.kwargs["contents"]
+    assert second.kwargs["config"].cached_content == "cachedContents/1"
+
+
+def test_suggest_commit_message_without_the_cached_prefix(
+    mocker: MockerFixture,
+) -> None:
+    """Test that the full prompt is sent when the cached prefix is gone."""
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.caches.create.return_value.name = "cachedContents/1"
+    mock_client_instance.models.generate_content.return_value.text = "feat: full"
+    git_logs = "feat: old\n" * MIN_CACHED_TOKENS
+    suggest_commit_message(
+        "key", git_logs, "changes", client=mock_client_instance, prefix_cache_ttl=600
+    )
+    mock_client_instance.models.generate_content.side_effect = [
+        errors.ClientError(404, {"error": {"message": "not found"}}),
+        mocker.MagicMock(text="feat: full"),
+    ]
+
+    response_text = suggest_commit_message(
+        "key", git_logs, "changes", client=mock_client_instance, prefix_cache_ttl=600
+    )
+
+    assert response_text == "feat: full"
+    last = mock_client_instance.models.generate_content.call_args
+    assert git_logs in last.kwargs["contents"]
+    assert last.kwargs["config"].cached_content is None
+
+
+def make_candidates_response(*texts: str) -> types.GenerateContentResponse:
+    """Return a response holding a candidate of every text."""
+    return types.GenerateContentResponse(
+        candidates=[
+            types.Candidate(
+                content=types.Content(role="model", parts=[types.Part(text=text)])
+            )
+            for text in texts
+        ]
+    )
+
+
+def test_suggest_commit_messages_in_one_request(mocker: MockerFixture) -> None:
+    """Test that the candidates come from a single request, deduplicated."""
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.models.generate_content.return_value = (
+        make_candidates_response("feat: add a", "feat: add a.", "fix: repair b")
+    )
+
+    messages = suggest_commit_messages(
+        "key", "logs", "changes", count=3, client=mock_client_instance
+    )
+
+    assert messages == ["feat: add a", "fix: repair b"]
+    mock_client_instance.models.generate_content.assert_called_once()
+    config = mock_client_instance.models.generate_content.call_args.kwargs["config"]
+    assert config.candidate_count == 3
+
+
+def test_suggest_commit_messages_falls_back_to_parallel_requests(
+    mocker: MockerFixture,
+) -> None:
+    """Test that models without candidate support get one request per message."""
+    mock_client_instance = mocker.MagicMock()
+    texts = iter(["feat: one", "feat: a different two"])
+
+    def generate_content(config: types.GenerateContentConfig, **_: object) -> object:
+        if config.candidate_count:
+            raise errors.ClientError(
+                400, {"error": {"message": "candidateCount is not supported"}}
+            )
+        return mocker.MagicMock(text=next(texts))
+
+    mock_client_instance.models.generate_content.side_effect = generate_content
+
+    messages = suggest_commit_messages(
+        "key", "logs", "changes", count=2, client=mock_client_instance
+    )
+
+    assert messages == ["feat: one", "feat: a different two"]
+    assert mock_client_instance.models.generate_content.call_count == 3
+
+
+def test_create_client(mocker: MockerFixture) -> None:
+    """Test that create_client authenticates with the API key."""
+    mock_client_class = mocker.patch("genie_git.ai_handler.genai.Client")
+
+    assert create_client("test_key") == mock_client_class.return_value
+    mock_client_class.assert_called_once_with(api_key="test_key")
+
+
+def test_create_client_with_base_url(mocker: MockerFixture) -> None:
+    """Test that create_client points the client at the given URL."""
+    mock_client_class = mocker.patch("genie_git.ai_handler.genai.Client")
+
+    create_client("test_key", "http://localhost:8080")
+
+    http_options = mock_client_class.call_args.kwargs["http_options"]
+    assert http_options.base_url == "http://localhost:8080"
+
+
+def test_warm_up_client_ignores_errors(mocker: MockerFixture) -> None:
+    """Test that warm_up_client fetches the model and ignores failures."""
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.models.get.side_effect = ConnectionError
+
+    warm_up_client(mock_client_instance, "test_model")
+
+    mock_client_instance.models.get.assert_called_once()
+    assert mock_client_instance.models.get.call_args.kwargs["model"] == "test_model"
+
+
+def test_warm_up_client_ends_with_the_timeout(mocker: MockerFixture) -> None:
+    """Test that warm_up_client gives the request the remaining time."""
+    mock_client_instance = mocker.MagicMock()
+
+    warm_up_client(mock_client_instance, "test_model", timeout=2.5)
+
+    config = mock_client_instance.models.get.call_args.kwargs["config"]
+    assert config.http_options.timeout == 2501
+
+
+def test_suggest_commit_message_async(mocker: MockerFixture) -> None:
+    """Test that the async variant uses the async client."""
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.aio.models.generate_content = mocker.AsyncMock(
+        return_value=mocker.MagicMock(text="feat: async")
+    )
+
+    response_text = asyncio.run(
+        suggest_commit_message_async(
+            mock_client_instance, "test_logs", "test_changes", context="test_context"
+        )
+    )
+
+    assert response_text == "feat: async"
+    prompt = mock_client_instance.aio.models.generate_content.call_args.kwargs[
+        "contents"
+    ]
+    assert "test_changes" in prompt
+    assert "test_context" in prompt
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ('{"a.py": "- adds a", "b.py": ["not", "text"]}', {"a.py": "- adds a"}),
+        ('["- adds a"]', {}),
+        ("- adds a", {}),
+    ],
+)
+def test_summarize_files_async(
+    mocker: MockerFixture, text: str, expected: dict[str, str]
+) -> None:
+    """Test that the JSON summaries are parsed, ignoring malformed answers."""
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.aio.models.generate_content = mocker.AsyncMock(
+        return_value=mocker.MagicMock(text=text)
+    )
+
+    summaries = asyncio.run(summarize_files_async(mock_client_instance, "a diff"))
+
+    assert summaries == expected
+    config = mock_client_instance.aio.models.generate_content.call_args.kwargs["config"]
+    assert config.response_mime_type == "application/json"
+
+
+def test_suggest_commit_message_hedges_slow_requests(mocker: MockerFixture) -> None:
+    """Test that a slow request is hedged with the next model, which wins."""
+    history = LatencyHistory()
+    for _ in range(5):
+        history.record("slow-model", 0.01, prompt_tokens=10)
+        history.record("fast-model", 0.02, prompt_tokens=10)
+    mocker.patch("genie_git.ai_handler.LatencyHistory.load", return_value=history)
+    released = threading.Event()
+
+    def generate_content(model: str, **_: object) -> MagicMock:
+        if model == "slow-model":
+            released.wait(timeout=5)
+        return MagicMock(text=f"feat: from {model}")
+
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.models.generate_content.side_effect = generate_content
+
+    response_text = suggest_commit_message(
+        "test_key",
+        "test_logs",
+        "test_changes",
+        client=mock_client_instance,
+        models=["slow-model", "fast-model"],
+        hedge_quantile=0.95,
+    )
+    released.set()
+
+    assert response_text == "feat: from fast-model"
+    calls = mock_client_instance.models.generate_content.call_args_list
+    assert [call.kwargs["model"] for call in calls] == ["slow-model", "fast-model"]
+    # Both outcomes are recorded, the loser with the time it took until then
+    assert len(history.samples["slow-model"]) == 6
+    assert len(history.samples["fast-model"]) == 6
+
+
+def test_suggest_commit_message_never_hedges_a_single_model(
+    mocker: MockerFixture,
+) -> None:
+    """Test that a slow request to the only model is not sent twice."""
+    history = LatencyHistory()
+    for _ in range(5):
+        history.record("only-model", 0.001, prompt_tokens=10)
+    mocker.patch("genie_git.ai_handler.LatencyHistory.load", return_value=history)
+
+    def generate_content(model: str, **_: object) -> MagicMock:
+        time.sleep(0.05)
+        return MagicMock(text=f"feat: from {model}")
+
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.models.generate_content.side_effect = generate_content
+
+    response_text = suggest_commit_message(
+        "test_key",
+        "test_logs",
+        "test_changes",
+        client=mock_client_instance,
+        models=["only-model"],
+        hedge_quantile=0.95,
+    )
+
+    assert response_text == "feat: from only-model"
+    mock_client_instance.models.generate_content.assert_called_once()
+
+
+def test_suggest_commit_message_fails_over(mocker: MockerFixture) -> None:
+    """Test that a failed request is retried with the next model right away."""
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.models.generate_content.side_effect = [
+        RuntimeError("overloaded"),
+        MagicMock(text="feat: fallback"),
+    ]
+
+    response_text = suggest_commit_message(
+        "test_key",
+        "test_logs",
+        "test_changes",
+        client=mock_client_instance,
+        models=["first-model", "second-model"],
+    )
+
+    assert response_text == "feat: fallback"
+    history = LatencyHistory.load()
+    assert [s.ok for s in history.samples["first-model"]] == [False]
+    assert [s.ok for s in history.samples["second-model"]] == [True]
+
+
+def test_suggest_commit_message_raises_when_every_model_fails(
+    mocker: MockerFixture,
+) -> None:
+    """Test that the last error is raised when no model answers."""
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.models.generate_content.side_effect = RuntimeError("down")
+
+    with pytest.raises(RuntimeError, match="down"):
+        suggest_commit_message(
+            "test_key", "test_logs", "test_changes", client=mock_client_instance
+        )
+
+
+def test_suggest_commit_message_retries_transient_errors(
+    mocker: MockerFixture,
+) -> None:
+    """Test that a rate limited request is retried after a backoff."""
+    sleep = mocker.patch("genie_git.ai_handler.time.sleep")
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.models.generate_content.side_effect = [
+        errors.APIError(429, {}),
+        errors.APIError(503, {}),
+        MagicMock(text="feat: retried"),
+    ]
+
+    response_text = suggest_commit_message(
+        "test_key", "test_logs", "test_changes", client=mock_client_instance
+    )
+
+    assert response_text == "feat: retried"
+    assert sleep.call_count == 2
+
+
+def test_suggest_commit_message_does_not_retry_permanent_errors(
+    mocker: MockerFixture,
+) -> None:
+    """Test that a rejected request fails at once and leaves the circuit closed."""
+    sleep = mocker.patch("genie_git.ai_handler.time.sleep")
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.models.generate_content.side_effect = errors.APIError(400, {})
+
+    with pytest.raises(errors.APIError):
+        suggest_commit_message(
+            "test_key", "test_logs", "test_changes", client=mock_client_instance
+        )
+
+    sleep.assert_not_called()
+    assert CircuitBreaker.load().failures == 0
+
+
+def test_suggest_commit_message_gives_up_at_the_deadline(
+    mocker: MockerFixture,
+) -> None:
+    """Test that a request slower than the deadline raises and is counted."""
+    released = threading.Event()
+
+    def generate_content(**_: object) -> MagicMock:
+        released.wait(timeout=5)
+        return MagicMock(text="feat: too late")
+
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.models.generate_content.side_effect = generate_content
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        suggest_commit_message(
+            "test_key",
+            "test_logs",
+            "test_changes",
+            client=mock_client_instance,
+            deadline=Deadline(0.1),
+        )
+    released.set()
+
+    assert time.monotonic() - started < 2
+    assert CircuitBreaker.load().failures == 1
+    config = mock_client_instance.models.generate_content.call_args.kwargs["config"]
+    assert 0 < config.http_options.timeout <= 101
+
+
+def test_suggest_commit_message_does_not_wait_for_the_prefix_past_the_deadline(
+    mocker: MockerFixture,
+) -> None:
+    """Test that a slow prefix registration ends with the deadline."""
+    released = threading.Event()
+
+    def create(**_: object) -> MagicMock:
+        released.wait(timeout=5)
+        return MagicMock(name="cachedContents/1")
+
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.caches.create.side_effect = create
+    mock_client_instance.models.generate_content.return_value.text = "feat: fast"
+
+    started = time.monotonic()
+    response_text = suggest_commit_message(
+        "test_key",
+        "feat: old\n" * MIN_CACHED_TOKENS,
+        "test_changes",
+        client=mock_client_instance,
+        prefix_cache_ttl=600,
+        deadline=Deadline(0.1),
+    )
+    released.set()
+
+    assert response_text == "feat: fast"
+    assert time.monotonic() - started < 2
+    config = mock_client_instance.caches.create.call_args.kwargs["config"]
+    assert 0 < config.http_options.timeout <= 101
+
+
+def test_suggest_commit_message_skips_the_call_while_the_circuit_is_open(
+    mocker: MockerFixture,
+) -> None:
+    """Test that an open circuit fails without calling the API."""
+    CircuitBreaker(FAILURE_THRESHOLD, opened_until=time.time() + 60).save()
+    mock_client_instance = mocker.MagicMock()
+
+    with pytest.raises(CircuitOpenError):
+        suggest_commit_message(
+            "test_key", "test_logs", "test_changes", client=mock_client_instance
+        )
+
+    mock_client_instance.models.generate_content.assert_not_called()
+
+
+def test_suggest_commit_message_degrades_near_the_deadline(
+    mocker: MockerFixture,
+) -> None:
+    """Test that a faster model and a smaller diff are used to fit the deadline."""
+    history = LatencyHistory()
+    for tokens in (1000, 2000, 3000, 4000, 5000):
+        history.record("slow-model", tokens / 100, prompt_tokens=tokens)
+        history.record("small-model", tokens / 1000, prompt_tokens=tokens)
+    mocker.patch("genie_git.ai_handler.LatencyHistory.load", return_value=history)
+    mock_client_instance = mocker.MagicMock()
+    mock_client_instance.models.generate_content.return_value = MagicMock(
+        text="feat: degraded"
+    )
+    staged_changes = "".join(
+        f"diff --git a/f{i}.py b/f{i}.py\n--- a/f{i}.py\n+++ b/f{i}.py\n"
+        f"@@ -1 +1 @@\n-{'old ' * 400}\n+{'new ' * 400}\n"
+        for i in range(10)
+    )
+
+    response_text = suggest_commit_message(
+        "test_key",
+        "test_logs",
+        staged_changes,
+        client=mock_client_instance,
+        models=["slow-model", "small-model"],
+        deadline=Deadline(2),
+    )
+
+    assert response_text == "feat: degraded"
+    call_kwargs = mock_client_instance.models.generate_content.call_args.kwargs
+    assert call_kwargs["model"] == "small-model"
+    assert len(call_kwargs["contents"]) < len(staged_changes)
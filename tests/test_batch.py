@@ -0,0 +1,93 @@
+"""Test the batch module."""
+
+import asyncio
+import time
+
+from genie_git.batch import BatchItem, RateLimiter, suggest_in_order
+
+
+def make_items(count: int) -> list[BatchItem]:
+    """Build batch items named after their position."""
+    return [
+        BatchItem(commit=str(i), subject="", git_logs="", staged_changes="")
+        for i in range(count)
+    ]
+
+
+def collect(*args, **kwargs) -> list:
+    """Run suggest_in_order and collect its results."""
+
+    async def run() -> list:
+        return [result async for result in suggest_in_order(*args, **kwargs)]
+
+    return asyncio.run(run())
+
+
+def test_suggest_in_order_keeps_the_order_of_the_items() -> None:
+    """Test that results come in item order even when they finish out of order."""
+
+    async def suggest(item: BatchItem) -> str:
+        # Later items finish first
+        await asyncio.sleep(0.01 * (3 - int(item.commit)))
+        return f"message {item.commit}"
+
+    results = collect(make_items(3), suggest, concurrency=3)
+
+    assert [result.message for result in results] == [
+        "message 0",
+        "message 1",
+        "message 2",
+    ]
+
+
+def test_suggest_in_order_bounds_the_concurrency() -> None:
+    """Test that no more than `concurrency` suggestions run at once."""
+    running = 0
+    peak = 0
+
+    async def suggest(item: BatchItem) -> str:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return ""
+
+    collect(make_items(6), suggest, concurrency=2)
+
+    assert peak == 2
+
+
+def test_suggest_in_order_reports_errors_per_item() -> None:
+    """Test that a failing item does not abort the batch."""
+
+    async def suggest(item: BatchItem) -> str:
+        if item.commit == "1":
+            raise RuntimeError("quota exceeded")
+        return "ok"
+
+    results = collect(make_items(3), suggest)
+
+    assert [(result.message, result.error) for result in results] == [
+        ("ok", ""),
+        ("", "quota exceeded"),
+        ("ok", ""),
+    ]
+
+
+def test_rate_limiter_spaces_out_requests() -> None:
+    """Test that the rate limiter waits between request starts."""
+
+    async def run() -> float:
+        rate_limiter = RateLimiter(requests_per_minute=3000)  # every 20 ms
+        started_at = time.monotonic()
+        for _ in range(3):
+            await rate_limiter.wait()
+        return time.monotonic() - started_at
+
+    assert asyncio.run(run()) >= 0.04
+
+
+def test_rate_limiter_without_limit() -> None:
+    """Test that a limit of 0 never waits."""
+    assert RateLimiter(requests_per_minute=0).interval == 0
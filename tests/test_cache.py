@@ -0,0 +1,103 @@
+"""Test the cache module."""
+
+import os
+import time
+from pathlib import Path
+
+from pytest_mock import MockerFixture
+
+from genie_git.cache import DiskCache, get_all_caches, get_cache, make_key
+from genie_git.config import Config
+
+
+def test_make_key_depends_on_part_boundaries() -> None:
+    """Test that make_key is stable and distinguishes part boundaries."""
+    assert make_key("ab", "c") == make_key("ab", "c")
+    assert make_key("ab", "c") != make_key("a", "bc")
+
+
+def test_disk_cache_get_and_set(tmp_path: Path) -> None:
+    """Test that a stored value can be read back."""
+    cache = DiskCache(tmp_path, max_bytes=1024, max_age_seconds=60)
+
+    assert cache.get("key") is None
+
+    cache.set("key", "feat: cached")
+
+    assert cache.get("key") == "feat: cached"
+
+
+def test_disk_cache_expires_unused_entries(tmp_path: Path) -> None:
+    """Test that entries unused for longer than the max age are dropped."""
+    cache = DiskCache(tmp_path, max_bytes=1024, max_age_seconds=60)
+    cache.set("key", "feat: cached")
+    old = time.time() - 120
+    os.utime(tmp_path / "key", (old, old))
+
+    assert cache.get("key") is None
+    assert not (tmp_path / "key").exists()
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    """Test that the least recently used entries are evicted over the size."""
+    cache = DiskCache(tmp_path, max_bytes=10, max_age_seconds=60)
+    cache.set("first", "aaaa")
+    cache.set("second", "bbbb")
+    os.utime(tmp_path / "first", (time.time() - 10, time.time() - 10))
+    os.utime(tmp_path / "second", (time.time() - 5, time.time() - 5))
+
+    # Reading "first" makes "second" the least recently used entry.
+    assert cache.get("first") == "aaaa"
+    cache.set("third", "cccc")
+
+    assert cache.get("second") is None
+    assert cache.get("first") == "aaaa"
+    assert cache.get("third") == "cccc"
+
+
+def test_disk_cache_set_many_evicts_once(tmp_path: Path, mocker: MockerFixture) -> None:
+    """Test that storing many entries scans the directory once."""
+    cache = DiskCache(tmp_path, max_bytes=1024, max_age_seconds=60)
+    evict = mocker.spy(cache, "evict")
+
+    cache.set_many({"first": "a", "second": "b"})
+
+    assert cache.get("first") == "a"
+    assert cache.get("second") == "b"
+    evict.assert_called_once()
+
+
+def test_disk_cache_stats_and_clear(tmp_path: Path) -> None:
+    """Test that stats reports the entries and clear removes them."""
+    cache = DiskCache(tmp_path / "responses", max_bytes=1024, max_age_seconds=60)
+    cache.set("first", "aaaa")
+    cache.set("second", "bb")
+
+    stats = cache.stats()
+    assert stats.namespace == "responses"
+    assert stats.entries == 2
+    assert stats.size_bytes == 6
+
+    assert cache.clear() == 2
+    assert cache.stats().entries == 0
+
+
+def test_get_cache_uses_configured_limits(isolated_storage: Path) -> None:
+    """Test that get_cache applies the configured limits."""
+    config = Config(cache_max_size_mb=2, cache_max_age_days=1)
+
+    cache = get_cache("responses", config)
+
+    assert cache.directory == isolated_storage / "cache" / "responses"
+    assert cache.max_bytes == 2 * 1024 * 1024
+    assert cache.max_age_seconds == 24 * 60 * 60
+
+
+def test_get_all_caches_lists_existing_namespaces() -> None:
+    """Test that get_all_caches only returns namespaces present on disk."""
+    config = Config()
+    assert get_all_caches(config) == []
+
+    get_cache("responses", config).set("key", "value")
+
+    assert [cache.directory.name for cache in get_all_caches(config)] == ["responses"]
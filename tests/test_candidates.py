@@ -0,0 +1,23 @@
+"""Test the comparison of candidate messages."""
+
+from genie_git.candidates import dedupe_messages
+
+
+def test_dedupe_messages_drops_near_identical_messages() -> None:
+    """Test that only the first of near-identical messages is kept."""
+    messages = [
+        "feat: add the login page\n",
+        "Feat: add the  login page.",
+        "feat: add the login pages",
+        "fix: handle expired sessions",
+    ]
+
+    assert dedupe_messages(messages) == [
+        "feat: add the login page",
+        "fix: handle expired sessions",
+    ]
+    assert dedupe_messages(messages, threshold=1.0) == [
+        "feat: add the login page",
+        "feat: add the login pages",
+        "fix: handle expired sessions",
+    ]
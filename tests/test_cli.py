@@ -2,6 +2,7 @@
 
 from genie_git.cli import create_parser
 from genie_git.cli_handlers import (
+    handle_cache,
     handle_configure,
     handle_exclude_files,
     handle_suggest,
@@ -42,3 +43,11 @@ def parser_calls_exclude_files_handler() -> None:
     args = parser.parse_args(["exclude-files", "test_file1", "test_file2"])
     assert args.func == handle_exclude_files
     assert args.files == ["test_file1", "test_file2"]
+
+
+def test_parser_calls_cache_handler() -> None:
+    """Test that the parser calls the cache handler correctly."""
+    parser = create_parser()
+    args = parser.parse_args(["cache", "stats"])
+    assert args.func == handle_cache
+    assert args.action == "stats"
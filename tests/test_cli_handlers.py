@@ -1,29 +1,53 @@
 """Test the CLI commands."""
 
+import asyncio
+import json
+import subprocess
+import time
 from argparse import Namespace
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
 from unittest.mock import MagicMock
 
 import pytest
 from pytest_mock import MockerFixture
 
+from genie_git.cache import get_cache
+from genie_git.cli import create_parser
 from genie_git.cli_handlers import (
+    handle_cache,
+    handle_circuit,
     handle_configure,
     handle_exclude_files,
+    handle_precompute,
+    handle_prepare_commit_msg,
+    handle_stats,
     handle_suggest,
 )
+from genie_git.config import Config
+from genie_git.exclusions import ExclusionRules
+from genie_git.pipeline import GitInputs
+from genie_git.precompute import HOOK_DEADLINE_SECONDS, PRECOMPUTED_NAMESPACE
+from genie_git.resilience import (
+    FAILURE_THRESHOLD,
+    CircuitBreaker,
+    DeadlineExceededError,
+)
+from genie_git.telemetry import load_records
 
 
 def test_handle_configure(
-    mock_config_instance: MagicMock, mocker: MockerFixture
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
 ) -> None:
     """Test that handle_configure updates the configurations file."""
-    args = Namespace(
+    args = make_args(
+        "configure",
         model="test_model",
         api_key="test_api_key",
         message_specifications="test_message_specifications",
-        show=False,
-        always_copy=False,
-        always_copy_off=False,
     )
 
     handle_configure(args)
@@ -37,33 +61,74 @@ def test_handle_configure(
     mock_config_instance.show.assert_not_called()
 
 
+def test_handle_configure_with_always_stream(
+    mock_config_instance: MagicMock,
+    make_args: Callable[..., Namespace],
+) -> None:
+    """Test that handle_configure toggles always_stream."""
+    handle_configure(make_args("configure", always_stream=True))
+    assert mock_config_instance.always_stream is True
+
+    handle_configure(make_args("configure", always_stream_off=True))
+    assert mock_config_instance.always_stream is False
+
+    with pytest.raises(
+        ValueError,
+        match="--always-stream and --always-stream-off cannot be used together.",
+    ):
+        handle_configure(
+            make_args("configure", always_stream=True, always_stream_off=True)
+        )
+
+
+def test_handle_configure_with_limits(
+    mock_config_instance: MagicMock,
+    make_args: Callable[..., Namespace],
+) -> None:
+    """Test that handle_configure updates the prompt and cache limits."""
+    handle_configure(make_args("configure", cache_max_size_mb=10, cache_max_age_days=7))
+
+    assert mock_config_instance.cache_max_size_mb == 10
+    assert mock_config_instance.cache_max_age_days == 7
+    mock_config_instance.save.assert_called_once()
+
+
+def test_handle_configure_with_diff_encoding(
+    mock_config_instance: MagicMock,
+    make_args: Callable[..., Namespace],
+) -> None:
+    """Test that handle_configure validates and stores the diff encoding."""
+    handle_configure(make_args("configure", diff_encoding="context-1+structured"))
+    assert mock_config_instance.diff_encoding == "context-1+structured"
+
+    with pytest.raises(ValueError, match="Unknown diff encoding"):
+        handle_configure(make_args("configure", diff_encoding="tiny"))
+    mock_config_instance.save.assert_called_once()
+
+
 def test_handle_configure_with_show(
-    mock_config_instance: MagicMock, mocker: MockerFixture
-):
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+) -> None:
     """Test that handle_configure shows the configurations file."""
-    args = Namespace(
+    args = make_args(
+        "configure",
         show=True,
-        model=None,
-        api_key=None,
-        message_specifications=None,
-        always_copy=False,
-        always_copy_off=False,
     )
     handle_configure(args)
     mock_config_instance.show.assert_called_once()
 
 
 def test_handle_configure_with_always_copy(
-    mock_config_instance: MagicMock, mocker: MockerFixture
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
 ) -> None:
     """Test that handle_configure sets always_copy to True."""
-    args = Namespace(
-        model=None,
-        api_key=None,
-        message_specifications=None,
-        show=False,
+    args = make_args(
+        "configure",
         always_copy=True,
-        always_copy_off=False,
     )
 
     handle_configure(args)
@@ -73,15 +138,13 @@ def test_handle_configure_with_always_copy(
 
 
 def test_handle_configure_with_always_copy_off(
-    mock_config_instance: MagicMock, mocker: MockerFixture
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
 ) -> None:
     """Test that handle_configure sets always_copy to False."""
-    args = Namespace(
-        model=None,
-        api_key=None,
-        message_specifications=None,
-        show=False,
-        always_copy=False,
+    args = make_args(
+        "configure",
         always_copy_off=True,
     )
 
@@ -92,14 +155,13 @@ def test_handle_configure_with_always_copy_off(
 
 
 def test_handle_configure_with_conflicting_copy_flags(
-    mock_config_instance: MagicMock, mocker: MockerFixture
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
 ) -> None:
     """Test that handle_configure raises Error when both copy flags are provided."""
-    args = Namespace(
-        model=None,
-        api_key=None,
-        message_specifications=None,
-        show=False,
+    args = make_args(
+        "configure",
         always_copy=True,
         always_copy_off=True,
     )
@@ -110,95 +172,671 @@ def test_handle_configure_with_conflicting_copy_flags(
         handle_configure(args)
 
 
-def test_handle_suggest(mock_config_instance: MagicMock, mocker: MockerFixture) -> None:
+def test_handle_suggest(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+) -> None:
     """Test that handle_suggest calls all it's dependencies."""
-    mock_get_log = mocker.patch(
-        "genie_git.cli_handlers.get_log", return_value="test_log"
-    )
-    mock_get_repository_changes = mocker.patch(
-        "genie_git.cli_handlers.get_repository_changes", return_value="test_changes"
+    mock_start_git_inputs = mocker.patch(
+        "genie_git.pipeline.start_git_inputs",
+        return_value=mocker.MagicMock(**{"result.return_value": mock_git_inputs}),
     )
     mock_suggest_commit_message = mocker.patch(
-        "genie_git.cli_handlers.suggest_commit_message", return_value="test_message"
+        "genie_git.ai_handler.suggest_commit_message", return_value="test_message"
     )
-    mock_pyperclip = mocker.patch("genie_git.cli_handlers.pyperclip")
+    mock_copy = mocker.patch("pyperclip.copy")
 
     # Set always_copy to False by default
     mock_config_instance.always_copy = False
 
-    handle_suggest(Namespace(context="test_context", copy=False))
+    handle_suggest(make_args("suggest", context="test_context"))
 
-    mock_get_repository_changes.assert_called_once_with(
-        mock_config_instance.exclude_files
+    mock_start_git_inputs.assert_called_once_with(
+        ExclusionRules.from_config(mock_config_instance),
+        mock_config_instance.number_of_commits,
+        relevant_commits=mock_config_instance.relevant_commits,
+        diff_encoding=mock_config_instance.diff_encoding,
+        expand_submodules=False,
+        submodule_cache=None,
     )
 
-    mock_get_log.assert_called_once_with(mock_config_instance.number_of_commits)
-
     mock_suggest_commit_message.assert_called_once_with(
         api_key=mock_config_instance.api_key,
         git_logs="test_log",
         staged_changes="test_changes",
         message_specifications=mock_config_instance.message_specifications,
         context="test_context",
+        on_chunk=None,
+        client=mock_client_warmup.result.return_value,
+        models=mock_config_instance.candidate_models.return_value,
+        hedge_quantile=mock_config_instance.hedge_quantile,
+        prefix_cache_ttl=mock_config_instance.prefix_cache_ttl_minutes * 60,
+        deadline=mocker.ANY,
     )
 
     # Should not copy to clipboard when both always_copy and copy are False
-    mock_pyperclip.copy.assert_not_called()
+    mock_copy.assert_not_called()
 
 
 def test_handle_suggest_with_copy_flag(
-    mock_config_instance: MagicMock, mocker: MockerFixture
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
 ) -> None:
     """Test that handle_suggest copies to clipboard when --copy flag is used."""
-    mocker.patch("genie_git.cli_handlers.get_log", return_value="test_log")
     mocker.patch(
-        "genie_git.cli_handlers.get_repository_changes", return_value="test_changes"
+        "genie_git.ai_handler.suggest_commit_message", return_value="test_message"
     )
-    mocker.patch(
-        "genie_git.cli_handlers.suggest_commit_message", return_value="test_message"
-    )
-    mock_pyperclip = mocker.patch("genie_git.cli_handlers.pyperclip")
+    mock_copy = mocker.patch("pyperclip.copy")
 
     # Set always_copy to False
     mock_config_instance.always_copy = False
 
-    handle_suggest(Namespace(context="test_context", copy=True))
+    handle_suggest(make_args("suggest", context="test_context", copy=True))
 
     # Should copy to clipboard when copy flag is True
-    mock_pyperclip.copy.assert_called_once_with("test_message")
+    mock_copy.assert_called_once_with("test_message")
 
 
 def test_handle_suggest_with_always_copy_config(
-    mock_config_instance: MagicMock, mocker: MockerFixture
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
 ) -> None:
     """Test that handle_suggest copies to clipboard when always_copy is configured."""
-    mocker.patch("genie_git.cli_handlers.get_log", return_value="test_log")
-    mocker.patch(
-        "genie_git.cli_handlers.get_repository_changes", return_value="test_changes"
-    )
     mocker.patch(
-        "genie_git.cli_handlers.suggest_commit_message", return_value="test_message"
+        "genie_git.ai_handler.suggest_commit_message", return_value="test_message"
     )
-    mock_pyperclip = mocker.patch("genie_git.cli_handlers.pyperclip")
+    mock_copy = mocker.patch("pyperclip.copy")
 
     # Set always_copy to True
     mock_config_instance.always_copy = True
 
-    handle_suggest(Namespace(context="test_context", copy=False))
+    handle_suggest(make_args("suggest", context="test_context"))
 
     # Should copy to clipboard when always_copy is True
-    mock_pyperclip.copy.assert_called_once_with("test_message")
+    mock_copy.assert_called_once_with("test_message")
 
 
-def test_handle_suggest_with_no_staged_changes(mocker: MockerFixture) -> None:
+def test_handle_suggest_with_no_staged_changes(
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+) -> None:
     """Test that handle_suggest handles empty staged changes gracefully."""
-    mocker.patch("genie_git.cli_handlers.get_repository_changes", return_value="")
+    mock_git_inputs.staged_changes = ""
     mock_print = mocker.patch("builtins.print")
 
-    handle_suggest(Namespace(context="test_context", copy=False))
+    handle_suggest(make_args("suggest", context="test_context"))
     mock_print.assert_called_once_with("No staged changes found in the repository.")
 
 
+def test_handle_suggest_with_stream_flag(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    capsys: pytest.CaptureFixture[str],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+) -> None:
+    """Test that handle_suggest prints the chunks and copies the whole message."""
+
+    def fake_suggest_commit_message(**kwargs: Any) -> str:
+        kwargs["on_chunk"]("feat: ")
+        kwargs["on_chunk"]("streamed")
+        return "feat: streamed"
+
+    mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message",
+        side_effect=fake_suggest_commit_message,
+    )
+    mock_copy = mocker.patch("pyperclip.copy")
+    mock_config_instance.always_copy = False
+
+    handle_suggest(make_args("suggest", stream=True, copy=True))
+
+    captured = capsys.readouterr()
+    assert captured.out == "feat: streamed\n"
+    assert "Time to first token:" in captured.err
+    mock_copy.assert_called_once_with("feat: streamed")
+
+
+def test_handle_suggest_trims_changes_over_the_budget(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    capsys: pytest.CaptureFixture[str],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+) -> None:
+    """Test that handle_suggest fits the staged changes into the token budget."""
+    lockfile_diff = "diff --git a/uv.lock b/uv.lock\n@@ -1 +1,2000 @@\n" + (
+        "+locked\n" * 2000
+    )
+    mock_git_inputs.staged_changes = lockfile_diff
+    mock_suggest_commit_message = mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message", return_value="test_message"
+    )
+    mocker.patch("pyperclip.copy")
+    mock_config_instance.max_prompt_tokens = 1000
+
+    handle_suggest(make_args("suggest"))
+
+    staged_changes = mock_suggest_commit_message.call_args.kwargs["staged_changes"]
+    assert "[uv.lock: +2000 -0 lines, content omitted]" in staged_changes
+    assert "uv.lock (stat summary only)" in capsys.readouterr().err
+
+
+def test_handle_suggest_summarizes_very_large_changes(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+) -> None:
+    """Test that changes over the threshold are summarized file by file."""
+    mock_git_inputs.staged_changes = "".join(
+        f"diff --git a/f{n}.py b/f{n}.py\nindex 000000{n}..111111{n} 100644\n"
+        "@@ -1 +1,100 @@\n" + "+code\n" * 100
+        for n in range(4)
+    )
+    mock_config_instance.map_reduce_threshold_tokens = 500
+    mock_config_instance.map_reduce_chunk_tokens = 400
+    # The files are identical, which would send a single one.
+    mock_config_instance.cluster_min_hunks = 0
+    mock_summarize = mocker.patch(
+        "genie_git.ai_handler.summarize_files_async",
+        side_effect=lambda client, changes, model, timeout: {
+            f"f{n}.py": f"- summary {n}" for n in range(4) if f"f{n}.py" in changes
+        },
+    )
+    mock_suggest_commit_message = mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message", return_value="test_message"
+    )
+    mocker.patch("builtins.print")
+
+    handle_suggest(make_args("suggest"))
+
+    assert mock_summarize.call_count == 2
+    assert mock_summarize.call_args.args[0] == mock_client_warmup.result.return_value
+    staged_changes = mock_suggest_commit_message.call_args.kwargs["staged_changes"]
+    assert "f3.py:\n- summary 3" in staged_changes
+    assert "+code" not in staged_changes
+
+    # Staging another file only summarizes the new file
+    mock_git_inputs.staged_changes += (
+        "diff --git a/f4.py b/f4.py\nindex 0000004..1111114 100644\n@@ -1 +1 @@\n+new\n"
+    )
+    mock_summarize.side_effect = lambda client, changes, model, timeout: {
+        "f4.py": "- new"
+    }
+
+    handle_suggest(make_args("suggest"))
+
+    assert mock_summarize.call_count == 3
+    staged_changes = mock_suggest_commit_message.call_args.kwargs["staged_changes"]
+    assert "f0.py:\n- summary 0" in staged_changes
+    assert "f4.py:\n- new" in staged_changes
+
+
+def test_handle_suggest_ends_the_summaries_with_the_deadline(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+) -> None:
+    """Test that slow summaries fail at the deadline and count as failures."""
+    mock_git_inputs.staged_changes = (
+        "diff --git a/f.py b/f.py\nindex 0000000..1111111 100644\n"
+        "@@ -1 +1,100 @@\n" + "+code\n" * 100
+    )
+    mock_config_instance.map_reduce_threshold_tokens = 100
+
+    async def summarize(*args: Any, timeout: float | None) -> dict[str, str]:
+        assert timeout is not None and timeout <= 0.05
+        await asyncio.sleep(1)
+        return {}
+
+    mocker.patch("genie_git.ai_handler.summarize_files_async", side_effect=summarize)
+    mock_suggest_commit_message = mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message"
+    )
+
+    with pytest.raises(DeadlineExceededError):
+        handle_suggest(make_args("suggest", deadline=0.05, no_cache=True))
+
+    mock_suggest_commit_message.assert_not_called()
+    assert CircuitBreaker.load().failures == 1
+
+
+def test_handle_suggest_uses_cached_message(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+) -> None:
+    """Test that handle_suggest skips the AI when the inputs were seen before."""
+    mock_suggest_commit_message = mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message", return_value="test_message"
+    )
+    mock_print = mocker.patch("builtins.print")
+    mock_config_instance.always_copy = False
+
+    handle_suggest(make_args("suggest", context="test_context"))
+    mock_client_warmup.reset_mock()
+    handle_suggest(make_args("suggest", context="test_context"))
+
+    mock_suggest_commit_message.assert_called_once()
+    # A cache hit never reaches the API.
+    mock_client_warmup.connect.assert_not_called()
+    mock_client_warmup.result.assert_not_called()
+    assert mock_print.call_args_list == [
+        mocker.call("test_message"),
+        mocker.call("test_message"),
+    ]
+
+    # A different context is a different prompt
+    handle_suggest(make_args("suggest", context="other_context"))
+    assert mock_suggest_commit_message.call_count == 2
+
+    # Another candidate model may answer the same prompt differently
+    mock_config_instance.candidate_models.return_value = ["test_model", "other"]
+    handle_suggest(make_args("suggest", context="other_context"))
+    assert mock_suggest_commit_message.call_count == 3
+
+
+def test_handle_suggest_with_no_cache_flag(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+) -> None:
+    """Test that handle_suggest always queries the AI with --no-cache."""
+    mock_suggest_commit_message = mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message", return_value="test_message"
+    )
+    mocker.patch("builtins.print")
+    mock_config_instance.always_copy = False
+
+    handle_suggest(make_args("suggest", no_cache=True))
+    handle_suggest(make_args("suggest", no_cache=True))
+
+    assert mock_suggest_commit_message.call_count == 2
+    # Without the cache, the client is needed, so it connects early.
+    assert mock_client_warmup.connect.call_count == 2
+
+
+def test_handle_suggest_each_commit_requires_range(
+    make_args: Callable[..., Namespace],
+) -> None:
+    """Test that --each-commit without --range is rejected."""
+    with pytest.raises(ValueError, match="--each-commit requires --range."):
+        handle_suggest(make_args("suggest", each_commit=True))
+
+
+def test_handle_suggest_with_range_each_commit(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that every commit of the range gets a suggestion, in order."""
+    mocker.patch("genie_git.git_handler.open_repo")
+    mocker.patch(
+        "genie_git.git_handler.list_commits",
+        return_value=[("a" * 40, "wip"), ("b" * 40, "fix stuff")],
+    )
+    mocker.patch(
+        "genie_git.git_handler.get_commit_changes",
+        side_effect=lambda commit, *_: f"changes of {commit[0]}",
+    )
+    mocker.patch("genie_git.git_handler.get_log", return_value="test_log")
+    mocker.patch("genie_git.ai_handler.create_client")
+
+    async def fake_suggest(
+        client: Any, git_logs: str, staged_changes: str, *_: Any, **__: Any
+    ):
+        if staged_changes == "changes of b":
+            raise RuntimeError("quota exceeded")
+        return f"feat: {staged_changes}"
+
+    mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message_async", side_effect=fake_suggest
+    )
+
+    handle_suggest(
+        make_args("suggest", range="main..HEAD", each_commit=True, json=True)
+    )
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"commit": "a" * 40, "subject": "wip", "message": "feat: changes of a"},
+        {"commit": "b" * 40, "subject": "fix stuff", "error": "quota exceeded"},
+    ]
+
+
+def test_handle_suggest_with_cached_range_creates_no_client(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+) -> None:
+    """Test that the client is only created once a commit misses the cache."""
+    mocker.patch("genie_git.git_handler.open_repo")
+    mocker.patch(
+        "genie_git.git_handler.list_commits",
+        return_value=[("a" * 40, "wip"), ("b" * 40, "fix stuff")],
+    )
+    mocker.patch(
+        "genie_git.git_handler.get_commit_changes",
+        side_effect=lambda commit, *_: f"changes of {commit[0]}",
+    )
+    mocker.patch("genie_git.git_handler.get_log", return_value="test_log")
+    mock_create_client = mocker.patch("genie_git.ai_handler.create_client")
+    mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message_async", return_value="feat: x"
+    )
+    mocker.patch("builtins.print")
+    args = make_args("suggest", range="main..HEAD", each_commit=True)
+
+    handle_suggest(args)
+    mock_create_client.assert_called_once()
+
+    handle_suggest(args)
+    mock_create_client.assert_called_once()
+
+
+def test_handle_suggest_with_range(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+) -> None:
+    """Test that a range without --each-commit gets a single suggestion."""
+    mocker.patch("genie_git.git_handler.open_repo")
+    mocker.patch(
+        "genie_git.git_handler.list_commits",
+        return_value=[("a" * 40, "wip"), ("b" * 40, "wip")],
+    )
+    mock_get_range_changes = mocker.patch(
+        "genie_git.git_handler.get_range_changes", return_value="range_changes"
+    )
+    mock_get_log = mocker.patch("genie_git.git_handler.get_log", return_value="")
+    mocker.patch("genie_git.ai_handler.create_client")
+    mock_suggest = mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message_async",
+        return_value="feat: squashed",
+    )
+    mock_copy = mocker.patch("pyperclip.copy")
+    mock_print = mocker.patch("builtins.print")
+
+    handle_suggest(make_args("suggest", range="main..HEAD", copy=True))
+
+    mock_get_range_changes.assert_called_once_with(
+        "main..HEAD",
+        ExclusionRules.from_config(mock_config_instance),
+        mocker.ANY,
+        "unified",
+    )
+    # The reference log ends right before the first commit of the range
+    assert mock_get_log.call_args.args[2] == "a" * 40
+    assert mock_suggest.call_args.args[2] == "range_changes"
+    mock_print.assert_called_once_with("feat: squashed")
+    mock_copy.assert_called_once_with("feat: squashed")
+
+
+SCOPED_CHANGES = """\
+diff --git a/packages/api/app.py b/packages/api/app.py
+--- a/packages/api/app.py
++++ b/packages/api/app.py
+@@ -1 +1 @@
+-a
++b
+diff --git a/README.md b/README.md
+--- a/README.md
++++ b/README.md
+@@ -1 +1 @@
+-old
++new
+"""
+
+
+@pytest.mark.parametrize(
+    ("overrides", "error"),
+    [
+        ({"split_scopes": True, "range": "main..HEAD"}, "--split-scopes does not"),
+        ({"split_scopes": True, "candidates": 3}, "--split-scopes does not"),
+        ({"plan": True}, "--plan requires --split-scopes."),
+    ],
+)
+def test_handle_suggest_split_scopes_conflicts(
+    make_args: Callable[..., Namespace], overrides: dict[str, Any], error: str
+) -> None:
+    """Test that --split-scopes and --plan reject conflicting options."""
+    with pytest.raises(ValueError, match=error):
+        handle_suggest(make_args("suggest", **overrides))
+
+
+def test_handle_suggest_split_scopes(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that every package gets a suggestion with its own log and a plan."""
+    mock_config_instance.scope_roots = ["packages/*"]
+    mocker.patch("genie_git.git_handler.open_repo")
+    mocker.patch(
+        "genie_git.git_handler.get_repository_changes", return_value=SCOPED_CHANGES
+    )
+    mock_get_log = mocker.patch(
+        "genie_git.git_handler.get_log",
+        side_effect=lambda n, repo, paths=(): "\n".join(paths),
+    )
+    mocker.patch("genie_git.git_handler.get_unstaged_paths", return_value={"README.md"})
+    mocker.patch("genie_git.ai_handler.create_client")
+
+    async def fake_suggest(
+        client: Any, git_logs: str, staged_changes: str, *_: Any, **__: Any
+    ):
+        return "feat(api): b" if "app.py" in staged_changes else "docs: new"
+
+    mock_suggest = mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message_async", side_effect=fake_suggest
+    )
+
+    handle_suggest(make_args("suggest", split_scopes=True, plan=True))
+
+    # The scope outside every package falls back to the log of the repository.
+    assert mock_get_log.call_args_list == [
+        mocker.call(
+            mock_config_instance.number_of_commits, mocker.ANY, paths=["packages/api"]
+        ),
+        mocker.call(mock_config_instance.number_of_commits, mocker.ANY, paths=[]),
+        mocker.call(mock_config_instance.number_of_commits, mocker.ANY),
+    ]
+    contexts = [call.args[4] for call in mock_suggest.call_args_list]
+    assert 'Use "api" as the scope' in contexts[0]
+    assert capsys.readouterr().out.splitlines() == [
+        "packages/api",
+        "feat(api): b",
+        "",
+        "(root)",
+        "docs: new",
+        "",
+        "# Commit every scope of the staged changes on its own:",
+        "# Warning: README.md has unstaged changes, which are committed too.",
+        "git commit -m 'feat(api): b' -- packages/api/app.py",
+        "git commit -m 'docs: new' -- README.md",
+    ]
+
+
+def test_handle_suggest_submodules(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+) -> None:
+    """Test that --submodules expands the staged submodules with a cache."""
+    mock_start_git_inputs = mocker.patch(
+        "genie_git.pipeline.start_git_inputs",
+        return_value=mocker.MagicMock(**{"result.return_value": mock_git_inputs}),
+    )
+    mocker.patch("genie_git.ai_handler.suggest_commit_message", return_value="msg")
+
+    handle_suggest(make_args("suggest", submodules=True))
+
+    kwargs = mock_start_git_inputs.call_args.kwargs
+    assert kwargs["expand_submodules"] is True
+    assert kwargs["submodule_cache"].directory.name == "submodules"
+
+    with pytest.raises(ValueError, match="--submodules does not support --range."):
+        handle_suggest(make_args("suggest", submodules=True, range="main..HEAD"))
+
+
+def test_handle_suggest_records_telemetry(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that every run is recorded, failed ones with their error."""
+    mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message",
+        side_effect=["feat: first", TimeoutError("slow"), "feat: third"],
+    )
+
+    handle_suggest(make_args("suggest", no_cache=True))
+    with pytest.raises(TimeoutError):
+        handle_suggest(make_args("suggest", no_cache=True))
+
+    first, second = load_records()
+    assert (first.mode, first.outcome) == ("staged", "ok")
+    assert first.prompt_tokens == 0  # The request was mocked.
+    assert "prompt_fit" in first.stages
+    assert second.outcome == "TimeoutError"
+    # Recording does not print the trace.
+    assert capsys.readouterr().err == ""
+
+    mock_config_instance.telemetry_max_records = 0
+    handle_suggest(make_args("suggest", no_cache=True))
+    assert len(load_records()) == 2
+
+
+def test_handle_suggest_is_untraced_without_timings_and_telemetry(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+) -> None:
+    """Test that spans stay no-ops unless something reads the trace."""
+    mock_config_instance.telemetry_max_records = 0
+    mock_load = mocker.patch(
+        "genie_git.cli_handlers.Config.load", return_value=mock_config_instance
+    )
+    mock_start_tracing = mocker.patch("genie_git.cli_handlers.start_tracing")
+    mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message", return_value="test_message"
+    )
+    mocker.patch("builtins.print")
+
+    handle_suggest(make_args("suggest", no_cache=True))
+
+    mock_start_tracing.assert_not_called()
+    assert load_records() == []
+    mock_load.assert_called_once()
+
+
+def test_handle_stats(
+    make_args: Callable[..., Namespace],
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that handle_stats reports the recorded runs."""
+    handle_stats(make_args("stats"))
+    assert capsys.readouterr().out == "No suggest runs recorded yet.\n"
+
+    from genie_git.telemetry import RunRecord, record_run
+
+    record_run(RunRecord(time.time(), "staged", "/repo", "ok", 1.5), 100, 0)
+    handle_stats(make_args("stats", json=True))
+
+    report = json.loads(capsys.readouterr().out)
+    assert report["runs"] == 1
+    assert report["latency"]["p95"] == 1.5
+
+
+def test_handle_cache_stats_and_clear(
+    mock_config_instance: MagicMock, mocker: MockerFixture
+) -> None:
+    """Test that handle_cache reports and clears the cache entries."""
+    get_cache("responses", mock_config_instance).set("key", "a" * 2048)
+    mock_print = mocker.patch("builtins.print")
+
+    handle_cache(Namespace(action="stats"))
+    mock_print.assert_called_once_with(
+        "responses: 1 entries, 2.0 KiB (limit 50 MiB, 30 days)"
+    )
+
+    handle_cache(Namespace(action="clear"))
+    mock_print.assert_called_with("Removed 1 cache entries.")
+
+    handle_cache(Namespace(action="stats"))
+    mock_print.assert_called_with(
+        "responses: 0 entries, 0.0 KiB (limit 50 MiB, 30 days)"
+    )
+
+
+def test_handle_circuit_status_and_reset(mocker: MockerFixture) -> None:
+    """Test that handle_circuit reports and closes an open circuit."""
+    mocker.patch("genie_git.cli_handlers.time.time", return_value=1000.0)
+    CircuitBreaker(FAILURE_THRESHOLD, opened_until=1060.0).save()
+    mock_print = mocker.patch("builtins.print")
+
+    handle_circuit(Namespace(action="status"))
+    mock_print.assert_called_once_with(
+        f"The circuit is open for another 60s after {FAILURE_THRESHOLD} "
+        "failed suggestions."
+    )
+
+    handle_circuit(Namespace(action="reset"))
+    mock_print.assert_called_with("Closed the circuit.")
+    assert CircuitBreaker.load() == CircuitBreaker()
+
+
+def test_handle_suggest_starts_the_deadline(
+    mock_config_instance: MagicMock,
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+    make_args: Callable[..., Namespace],
+    mocker: MockerFixture,
+) -> None:
+    """Test that --deadline overrides the configured latency budget."""
+    mock_config_instance.deadline_seconds = 30.0
+    mock_suggest_commit_message = mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message", return_value="test_message"
+    )
+    mocker.patch("builtins.print")
+
+    handle_suggest(make_args("suggest", deadline=5.0, no_cache=True))
+    assert mock_suggest_commit_message.call_args.kwargs["deadline"].seconds == 5.0
+
+    handle_suggest(make_args("suggest", no_cache=True))
+    assert mock_suggest_commit_message.call_args.kwargs["deadline"].seconds == 30.0
+
+
 def test_handle_exclude_files(
     mock_config_instance: MagicMock, mocker: MockerFixture
 ) -> None:
@@ -213,9 +851,281 @@ def test_handle_exclude_files(
     mock_config_instance.save.assert_called_once()
 
 
+def test_handle_exclude_files_with_glob_patterns(
+    mock_config_instance: MagicMock, mocker: MockerFixture
+) -> None:
+    """Test that glob patterns are excluded without matching existing files."""
+    mocker.patch("genie_git.cli_handlers.Path.exists", return_value=False)
+    handle_exclude_files(Namespace(files=["*.snap", "fixtures/*.json"]))
+
+    mock_config_instance.exclude_files.extend.assert_called_once_with(
+        ["*.snap", "fixtures/*.json"]
+    )
+
+
 def test_handle_exclude_files_with_non_existing_files(mocker: MockerFixture) -> None:
     """Test that handle_exclude_files raises an error when files do not exist."""
     mocker.patch("genie_git.cli_handlers.Path.exists", return_value=False)
 
     with pytest.raises(FileNotFoundError, match="File test_file1 does not exist."):
         handle_exclude_files(Namespace(files=["test_file1", "test_file2"]))
+
+
+def test_handle_suggest_with_timings(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that the stages are printed and appended to the trace file."""
+    trace_file = tmp_path / "trace.jsonl"
+    monkeypatch.setenv("GENIE_GIT_TRACE", str(trace_file))
+    mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message", return_value="test_message"
+    )
+
+    handle_suggest(make_args("suggest", timings_json=True))
+
+    captured = capsys.readouterr()
+    assert captured.out == "test_message\n"
+    trace = json.loads(captured.err)
+    assert trace == json.loads(trace_file.read_text())
+    spans = {span["name"]: span for span in trace["spans"]}
+    assert set(spans) == {
+        "config_load",
+        "hunk_clusters",
+        "prompt_fit",
+        "cache_lookup",
+    }
+    assert spans["prompt_fit"]["attributes"] == {"diff_bytes": 12, "diff_tokens": 3}
+    assert spans["cache_lookup"]["attributes"] == {"hit": False}
+
+
+@pytest.fixture
+def staged_repository(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Create a repository with a staged file and run from inside it."""
+    path = tmp_path / "repository"
+    subprocess.run(["git", "init", "-q", str(path)], check=True)
+    (path / "file.txt").write_text("one\n")
+    subprocess.run(["git", "-C", str(path), "add", "file.txt"], check=True)
+    monkeypatch.chdir(path)
+    return path
+
+
+def test_handle_prepare_commit_msg_uses_the_precomputed_message(
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_client_warmup: MagicMock,
+    staged_repository: Path,
+) -> None:
+    """Test that the hook fills in the message precomputed for the tree."""
+    mock_suggest_commit_message = mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message", return_value="Add a file"
+    )
+    handle_precompute(make_args("precompute", debounce=0))
+    handle_precompute(make_args("precompute", debounce=0))
+    mock_suggest_commit_message.assert_called_once()
+
+    message_file = staged_repository / "COMMIT_EDITMSG"
+    message_file.write_text("# Comments\n")
+    args = create_parser().parse_args(["prepare-commit-msg", str(message_file)])
+    handle_prepare_commit_msg(args)
+
+    mock_suggest_commit_message.assert_called_once()
+    assert message_file.read_text() == "Add a file\n# Comments\n"
+
+
+def test_handle_prepare_commit_msg_falls_back_after_the_tree_changed(
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_client_warmup: MagicMock,
+    staged_repository: Path,
+) -> None:
+    """Test that a message precomputed for another tree is not used."""
+    mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message",
+        side_effect=["Add a file", "Add two files"],
+    )
+    handle_precompute(make_args("precompute", debounce=0))
+    (staged_repository / "other.txt").write_text("two\n")
+    subprocess.run(["git", "add", "other.txt"], check=True)
+
+    message_file = staged_repository / "COMMIT_EDITMSG"
+    handle_prepare_commit_msg(
+        create_parser().parse_args(["prepare-commit-msg", str(message_file)])
+    )
+
+    assert message_file.read_text() == "Add two files\n"
+    assert get_cache(PRECOMPUTED_NAMESPACE, Config()).stats().entries == 2
+
+
+def test_handle_prepare_commit_msg_bounds_the_fallback(
+    mocker: MockerFixture, staged_repository: Path
+) -> None:
+    """Test that the message generated by the hook has a deadline by default."""
+    mock_generate = mocker.patch(
+        "genie_git.cli_handlers._generate_staged_message", return_value=None
+    )
+
+    handle_prepare_commit_msg(
+        create_parser().parse_args(
+            ["prepare-commit-msg", str(staged_repository / "COMMIT_EDITMSG")]
+        )
+    )
+
+    deadline = mock_generate.call_args.kwargs["deadline"]
+    assert deadline.seconds == HOOK_DEADLINE_SECONDS
+
+
+@pytest.mark.parametrize("source", ["message", "merge", "commit"])
+def test_handle_prepare_commit_msg_keeps_given_messages(
+    mocker: MockerFixture, tmp_path: Path, source: str
+) -> None:
+    """Test that messages given with -m, merges and amends are left alone."""
+    mock_generate = mocker.patch("genie_git.cli_handlers._generate_staged_message")
+    message_file = tmp_path / "COMMIT_EDITMSG"
+    message_file.write_text("Mine\n")
+
+    handle_prepare_commit_msg(
+        create_parser().parse_args(
+            ["prepare-commit-msg", str(message_file), source, "HEAD"]
+        )
+    )
+
+    mock_generate.assert_not_called()
+    assert message_file.read_text() == "Mine\n"
+
+
+def test_handle_prepare_commit_msg_never_blocks_the_commit(
+    mocker: MockerFixture,
+    mock_client_warmup: MagicMock,
+    staged_repository: Path,
+) -> None:
+    """Test that a failed request leaves the message file untouched."""
+    mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message",
+        side_effect=RuntimeError("offline"),
+    )
+    mock_print = mocker.patch("builtins.print")
+    message_file = staged_repository / "COMMIT_EDITMSG"
+    message_file.write_text("# Comments\n")
+
+    handle_prepare_commit_msg(
+        create_parser().parse_args(["prepare-commit-msg", str(message_file)])
+    )
+
+    assert message_file.read_text() == "# Comments\n"
+    assert "offline" in mock_print.call_args.args[0]
+
+
+def test_handle_suggest_dry_run_sends_nothing(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+) -> None:
+    """Test that --dry-run reports the prompt without creating a client."""
+    mock_warmup_class = mocker.patch("genie_git.pipeline.ClientWarmup")
+    mock_suggest_commit_message = mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message"
+    )
+    mock_print = mocker.patch("builtins.print")
+    mock_config_instance.candidate_models.return_value = ["test_model"]
+
+    handle_suggest(make_args("suggest", dry_run=True, context="test_context"))
+
+    mock_warmup_class.assert_not_called()
+    mock_suggest_commit_message.assert_not_called()
+    report = mock_print.call_args.args[0]
+    assert report.startswith("Prompt for test_model:")
+    assert "context" in report
+
+    handle_suggest(make_args("suggest", dry_run=True, json=True))
+    estimate = json.loads(mock_print.call_args.args[0])
+    assert estimate["cached_response"] is False
+    assert [section["name"] for section in estimate["sections"]] == [
+        "instructions",
+        "log",
+        "changes",
+    ]
+
+
+def test_handle_suggest_dry_run_reports_cached_responses(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+) -> None:
+    """Test that --dry-run knows when no request would be sent."""
+    mocker.patch(
+        "genie_git.ai_handler.suggest_commit_message", return_value="test_message"
+    )
+    mock_print = mocker.patch("builtins.print")
+    mock_config_instance.always_copy = False
+    mock_config_instance.candidate_models.return_value = ["test_model"]
+    handle_suggest(make_args("suggest"))
+
+    handle_suggest(make_args("suggest", dry_run=True))
+
+    assert "no request would be sent" in mock_print.call_args.args[0]
+
+    with pytest.raises(ValueError, match="--dry-run"):
+        handle_suggest(make_args("suggest", dry_run=True, range="main..HEAD"))
+
+
+def test_handle_suggest_with_candidates_picker(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+) -> None:
+    """Test that the picked candidate is printed and copied."""
+    mock_suggest_commit_messages = mocker.patch(
+        "genie_git.ai_handler.suggest_commit_messages",
+        return_value=["feat: one", "feat: two"],
+    )
+    mocker.patch("sys.stdin.isatty", return_value=True)
+    mocker.patch("builtins.input", side_effect=["9", "2"])
+    mock_print = mocker.patch("builtins.print")
+    mock_copy = mocker.patch("pyperclip.copy")
+    mock_config_instance.always_copy = False
+
+    handle_suggest(make_args("suggest", candidates=2, stream=True))
+
+    assert mock_suggest_commit_messages.call_args.kwargs["count"] == 2
+    mock_copy.assert_called_once_with("feat: two")
+    mock_print.assert_called_with("feat: two")
+
+
+def test_handle_suggest_with_candidates_without_a_terminal(
+    mock_config_instance: MagicMock,
+    mocker: MockerFixture,
+    make_args: Callable[..., Namespace],
+    mock_git_inputs: GitInputs,
+    mock_client_warmup: MagicMock,
+) -> None:
+    """Test that the first candidate is taken when nobody can pick."""
+    mocker.patch(
+        "genie_git.ai_handler.suggest_commit_messages",
+        return_value=["feat: one", "feat: two"],
+    )
+    mocker.patch("sys.stdin.isatty", return_value=False)
+    mock_input = mocker.patch("builtins.input")
+    mock_print = mocker.patch("builtins.print")
+    mock_copy = mocker.patch("pyperclip.copy")
+    mock_config_instance.always_copy = False
+
+    handle_suggest(make_args("suggest", candidates=2))
+
+    mock_input.assert_not_called()
+    mock_copy.assert_not_called()
+    mock_print.assert_called_with("feat: one")
+
+    with pytest.raises(ValueError, match="--candidates"):
+        handle_suggest(make_args("suggest", candidates=2, range="main..HEAD"))
@@ -0,0 +1,81 @@
+"""Test the client module."""
+
+import pytest
+from pytest_mock import MockerFixture
+
+from genie_git.client import forward, is_suggestion, main
+
+
+@pytest.mark.parametrize(
+    ("argv", "expected"),
+    [
+        ([], True),
+        (["suggest", "--copy"], True),
+        (["--stream"], True),
+        (["configure", "--show"], False),
+        (["suggest", "--help"], False),
+        (["--startup-profile"], False),
+        (["suggest", "--candidates=3"], False),
+        (["--context", "fix"], False),
+    ],
+)
+def test_is_suggestion(argv: list[str], expected: bool) -> None:
+    """Test which commands are forwarded to the daemon."""
+    assert is_suggestion(argv) is expected
+
+
+def test_forward_without_a_daemon(tmp_path_factory: pytest.TempPathFactory) -> None:
+    """Test that forward reports that no daemon is running."""
+    socket_path = tmp_path_factory.mktemp("run") / "missing.sock"
+
+    assert forward(["suggest"], ".", str(socket_path)) is None
+
+
+def test_main_falls_back_to_in_process(mocker: MockerFixture) -> None:
+    """Test that main runs genie-git in-process without a daemon."""
+    mocker.patch("sys.argv", ["genie-git-client", "suggest"])
+    mocker.patch("genie_git.client.forward", return_value=None)
+    mock_main = mocker.patch("genie_git.main.main")
+
+    main()
+
+    mock_main.assert_called_once_with()
+
+
+def test_main_exits_with_the_daemon_exit_code(mocker: MockerFixture) -> None:
+    """Test that main exits with the exit code of the forwarded command."""
+    mocker.patch("sys.argv", ["genie-git-client"])
+    mock_forward = mocker.patch("genie_git.client.forward", return_value=3)
+    mock_main = mocker.patch("genie_git.main.main")
+
+    with pytest.raises(SystemExit) as error:
+        main()
+
+    assert error.value.code == 3
+    assert mock_forward.call_args.args[0] == []
+    mock_main.assert_not_called()
+
+
+def test_forward_prints_the_reply(
+    mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch, capsys
+) -> None:
+    """Test that forward prints the output of the daemon and returns its code."""
+    monkeypatch.setenv("GENIE_GIT_TRACE", "trace.jsonl")
+    mocker.patch("genie_git.client.connect")
+    mock_send_request = mocker.patch("genie_git.client.send_request")
+    mock_send_request.return_value = iter(
+        [{"stdout": "feat: add daemon\n"}, {"stderr": "warning\n"}, {"exit": 0}]
+    )
+
+    assert forward(["suggest"], "/repo") == 0
+
+    request = mock_send_request.call_args.args[1]
+    assert request == {
+        "command": "run",
+        "argv": ["suggest"],
+        "cwd": "/repo",
+        "env": {"GENIE_GIT_TRACE": "trace.jsonl"},
+    }
+    captured = capsys.readouterr()
+    assert captured.out == "feat: add daemon\n"
+    assert captured.err == "warning\n"
@@ -0,0 +1,92 @@
+"""Test the clustering module."""
+
+from pytest_mock import MockerFixture
+
+from genie_git.clustering import cluster_hunks, hunk_signature
+from genie_git.diff_parser import parse_diff
+
+
+def renamed_import(path: str, caller: str) -> str:
+    """Return the diff of a file whose import of send was renamed."""
+    return (
+        f"diff --git a/{path} b/{path}\n"
+        f"--- a/{path}\n"
+        f"+++ b/{path}\n"
+        "@@ -1,3 +1,3 @@\n"
+        "-from old_package.client import send\n"
+        "+from new_package.client import send\n"
+        f" def {caller}(request):\n"
+        f"     return send(request, name={caller!r})\n"
+    )
+
+
+def test_hunk_signature() -> None:
+    """Test that an edit has the same signature in any surrounding code."""
+    first, second = (
+        parse_diff(renamed_import(path, caller))[0].hunks[0]
+        for path, caller in [("a.py", "handle"), ("b.py", "process")]
+    )
+    call = "@@ -5 +5 @@\n-    x = send(a)\n+    x = dispatch(a)\n"
+    other_call = (
+        "@@ -9 +9 @@\n-    y = send(b, retries=3)\n+    y = dispatch(b, retries=3)\n"
+    )
+    reindented = "@@ -1 +1 @@\n-x = f(1)\n+    x = f(1)\n"
+
+    assert hunk_signature(first) == hunk_signature(second)
+    assert hunk_signature(call) == hunk_signature(other_call)
+    assert hunk_signature(call) != hunk_signature(first)
+    assert hunk_signature(reindented) is not None
+    assert hunk_signature(reindented) != hunk_signature(
+        "@@ -1 +1 @@\n-y = f(1)\n+    y = f(1)\n"
+    )
+    assert hunk_signature("@@ -1,2 +1,2 @@\n context\n-\n+\n") is None
+
+
+def test_cluster_hunks(mocker: MockerFixture) -> None:
+    """Test that a repeated edit is sent once with the list of its files."""
+    mocker.patch("genie_git.clustering.MAX_LISTED_FILES", 2)
+    diff = "".join(renamed_import(f"m{n}.py", f"f{n}") for n in range(4))
+    # A file with an edit of its own besides the repeated one.
+    diff += renamed_import("own.py", "own") + "@@ -10 +10 @@\n-a = 1\n+a = 2\n"
+    diff += "diff --git a/data.bin b/data.bin\n[data.bin: binary file]\n"
+
+    result = cluster_hunks(diff, 3)
+
+    assert (result.clusters, result.collapsed_hunks) == (1, 4)
+    assert [file_diff.path for file_diff in parse_diff(result.diff)] == [
+        "m0.py",
+        "own.py",
+        "data.bin",
+    ]
+    assert (
+        "[The same edit in 4 more hunks, in 4 files: m1.py, m2.py and 2 more]\n"
+        "diff --git a/own.py" in result.diff
+    )
+    assert result.diff.endswith(
+        "@@ -10 +10 @@\n-a = 1\n+a = 2\n"
+        "diff --git a/data.bin b/data.bin\n[data.bin: binary file]\n"
+    )
+
+
+def test_cluster_hunks_keeps_trivial_hunks() -> None:
+    """Test that the same small edit in unrelated places is not collapsed."""
+    hunks = "".join(
+        f"@@ -{n},0 +{n + 1} @@\n+{line}\n"
+        for n, line in enumerate(["import os", "    return None", "}"], 1)
+    )
+    diff = "".join(
+        f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n{hunks}"
+        for path in ("a.py", "b.py", "c.py", "d.py")
+    )
+
+    assert hunk_signature("@@ -1,0 +2 @@\n+    return None\n") is None
+    assert cluster_hunks(diff, 3).diff == diff
+
+
+def test_cluster_hunks_below_the_minimum() -> None:
+    """Test that edits repeated fewer times, or without a minimum, are kept."""
+    diff = "".join(renamed_import(f"m{n}.py", f"f{n}") for n in range(3))
+
+    assert cluster_hunks(diff, 4).diff == diff
+    assert cluster_hunks(diff, 0).diff == diff
+    assert cluster_hunks(diff, 3).collapsed_hunks == 2
@@ -0,0 +1,70 @@
+"""Test the compaction module."""
+
+from genie_git.compaction import compact_diff, is_low_priority
+from genie_git.tokens import estimate_tokens
+
+
+def make_file_diff(path: str, hunk_sizes: list[int]) -> str:
+    """Build the diff of a file with hunks adding the given number of lines."""
+    diff = (
+        f"diff --git a/{path} b/{path}\n"
+        f"index 1111111..2222222 100644\n"
+        f"--- a/{path}\n"
+        f"+++ b/{path}\n"
+    )
+    for number, size in enumerate(hunk_sizes):
+        diff += f"@@ -{number * 100},0 +{number * 100},{size} @@\n"
+        diff += "".join(f"+line {line} of {path}\n" for line in range(size))
+    return diff
+
+
+def test_is_low_priority() -> None:
+    """Test that lockfiles and generated files are low priority."""
+    assert is_low_priority("uv.lock")
+    assert is_low_priority("web/package-lock.json")
+    assert is_low_priority("static/app.min.js")
+    assert not is_low_priority("src/genie_git/cli.py")
+
+
+def test_compact_diff_keeps_diff_within_budget() -> None:
+    """Test that a diff under the budget is returned unchanged."""
+    diff = make_file_diff("src/app.py", [3])
+
+    result = compact_diff(diff, max_tokens=10_000)
+
+    assert result.diff == diff
+    assert result.trimmed == []
+
+
+def test_compact_diff_with_disabled_budget() -> None:
+    """Test that a budget of 0 disables the compaction."""
+    diff = make_file_diff("uv.lock", [5000])
+
+    assert compact_diff(diff, max_tokens=0).diff == diff
+
+
+def test_compact_diff_prefers_source_files_over_lockfiles() -> None:
+    """Test that lockfiles fall back to stat summaries first."""
+    source = make_file_diff("src/app.py", [10])
+    lockfile = make_file_diff("uv.lock", [2000])
+
+    result = compact_diff(lockfile + source, max_tokens=500)
+
+    assert source in result.diff
+    assert "[uv.lock: +2000 -0 lines, content omitted]" in result.diff
+    assert result.trimmed == ["uv.lock (stat summary only)"]
+    assert estimate_tokens(result.diff) <= 500
+
+
+def test_compact_diff_keeps_hunks_that_fit() -> None:
+    """Test that a large file keeps the hunks that fit into the budget."""
+    diff = make_file_diff("src/app.py", [5, 400, 5])
+
+    result = compact_diff(diff, max_tokens=300)
+
+    assert "@@ -0,0 +0,5 @@" in result.diff
+    assert "@@ -200,0 +200,5 @@" in result.diff
+    assert "@@ -100,0 +100,400 @@" not in result.diff
+    assert "[1 of 3 hunks omitted]" in result.diff
+    assert result.trimmed == ["src/app.py (2 of 3 hunks kept)"]
+    assert estimate_tokens(result.diff) <= 300
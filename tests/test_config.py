@@ -4,7 +4,7 @@ from pathlib import Path
 
 from pytest_mock import MockerFixture
 
-from genie_git.config import Config
+from genie_git.config import Config, write_atomically
 
 
 def test_config_save_and_load(tmp_path: Path, mocker: MockerFixture) -> None:
@@ -47,3 +47,23 @@ def test_config_load_without_existing_file(
     assert loaded_config.exclude_files == []
     assert loaded_config.number_of_commits == 5
     assert loaded_config.message_specifications == "concise and clear"
+
+
+def test_candidate_models() -> None:
+    """Test that the configured model comes first and duplicates are dropped."""
+    config = Config(
+        model="gemini-2.5-pro", models=["gemini-2.5-flash", "gemini-2.5-pro"]
+    )
+
+    assert config.candidate_models() == ["gemini-2.5-pro", "gemini-2.5-flash"]
+
+
+def test_write_atomically_replaces_the_file(tmp_path: Path) -> None:
+    """Test that the file is replaced without leaving a temporary file."""
+    path = tmp_path / "state" / "file.json"
+
+    write_atomically(path, "first")
+    write_atomically(path, "second")
+
+    assert path.read_text() == "second"
+    assert [p.name for p in path.parent.iterdir()] == ["file.json"]
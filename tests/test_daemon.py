@@ -0,0 +1,122 @@
+"""Test the daemon module."""
+
+import sys
+import tempfile
+import threading
+import time
+from argparse import Namespace
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from genie_git import daemon
+from genie_git.client import connect, send_request
+from genie_git.config import Config
+
+
+@pytest.fixture
+def socket_path() -> Iterator[str]:
+    """Return a socket path short enough for the Unix socket limit."""
+    with tempfile.TemporaryDirectory() as directory:
+        yield str(Path(directory) / "daemon.sock")
+
+
+@pytest.fixture
+def running_daemon(socket_path: str) -> Iterator[str]:
+    """Run the daemon in a thread and return its socket path."""
+    thread = threading.Thread(target=daemon.serve, args=(socket_path, 0))
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not daemon.is_running(socket_path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield socket_path
+    daemon.stop(socket_path)
+    thread.join(timeout=5)
+
+
+def run(socket_path: str, argv: list[str], cwd: Path) -> list[dict]:
+    """Send a command to the daemon and return the reply messages.
+
+    The messages are not printed, since the daemon redirects the output of the
+    whole process while it runs the command.
+    """
+    connection = connect(socket_path)
+    assert connection is not None
+    request = {"command": "run", "argv": argv, "cwd": str(cwd)}
+    return list(send_request(connection, request))
+
+
+def test_run_replies_with_the_output_of_the_command(
+    running_daemon: str, tmp_path: Path, mocker: MockerFixture
+) -> None:
+    """Test that the daemon runs the command in the directory of the client."""
+    working_directories = []
+
+    def suggest(args: Namespace) -> None:
+        working_directories.append(Path.cwd())
+        print("feat: add daemon")
+        print("warning", file=sys.stderr)
+
+    mocker.patch("genie_git.cli.handle_suggest", side_effect=suggest)
+
+    messages = run(running_daemon, ["suggest", "--copy"], tmp_path)
+
+    assert working_directories == [tmp_path]
+    assert messages == [
+        {"stdout": "feat: add daemon"},
+        {"stdout": "\n"},
+        {"stderr": "warning"},
+        {"stderr": "\n"},
+        {"exit": 0},
+    ]
+
+
+def test_run_replies_with_the_exit_code_of_errors(
+    running_daemon: str, tmp_path: Path, mocker: MockerFixture
+) -> None:
+    """Test that argument errors and exceptions become exit codes."""
+    mocker.patch("genie_git.cli.handle_suggest", side_effect=ValueError("no key"))
+
+    assert run(running_daemon, ["--jobs", "many"], tmp_path)[-1] == {"exit": 2}
+    messages = run(running_daemon, ["suggest"], tmp_path)
+    assert messages[-1] == {"exit": 1}
+    assert "ValueError: no key" in "".join(m.get("stderr", "") for m in messages)
+
+
+def test_status_and_stop(running_daemon: str) -> None:
+    """Test that the daemon reports its status and stops on request."""
+    status = daemon.status(running_daemon)
+
+    assert status is not None
+    assert status["repositories"] == 0
+    assert daemon.stop(running_daemon)
+
+
+def test_serve_exits_when_idle(socket_path: str) -> None:
+    """Test that the daemon exits and removes its socket when idle."""
+    daemon.serve(socket_path, idle_timeout=0.05)
+
+    assert not Path(socket_path).exists()
+    assert daemon.status(socket_path) is None
+
+
+def test_reload_config_if_changed(socket_path: str, mocker: MockerFixture) -> None:
+    """Test that a changed config drops the warm clients and warms a new one."""
+    mock_client_warmup = mocker.patch("genie_git.daemon.ClientWarmup")
+    server = daemon.DaemonServer(socket_path)
+    try:
+        assert server.idle_timeout == 30 * 60
+        mock_client_warmup.assert_not_called()
+
+        server.warm_state.clients["old_key", ""] = "old_client"
+        Config(api_key="new_key", daemon_idle_minutes=5).save()
+        server.reload_config_if_changed()
+        server.reload_config_if_changed()
+    finally:
+        server.server_close()
+
+    assert server.warm_state.clients == {}
+    assert server.idle_timeout == 5 * 60
+    mock_client_warmup.assert_called_once_with("new_key", "gemini-2.5-flash", "")
@@ -0,0 +1,129 @@
+"""Test the diff encoding module."""
+
+import pytest
+
+from genie_git.diff_encoding import encode_diff, git_arguments, parse_encoding
+from genie_git.diff_parser import parse_diff
+
+MOVED_DIFF = """\
+diff --git a/a.py b/a.py
+index 1111111..2222222 100644
+--- a/a.py
++++ b/a.py
+@@ -1,7 +1,2 @@ class A:
+ x = 1
+-def foo():
+-    a = 1
+-    b = 2
+-    return a + b
+-
+ y = 2
+diff --git a/b.py b/b.py
+new file mode 100644
+index 0000000..3333333
+--- /dev/null
++++ b/b.py
+@@ -0,0 +1,5 @@
++def foo():
++    a = 1
++    b = 2
++    return a + b
++z = 3
+"""
+
+
+def test_parse_encoding() -> None:
+    """Test that encodings combine with "+" and are validated."""
+    assert parse_encoding("") == ("unified",)
+    assert parse_encoding("context-1+structured") == ("context-1", "structured")
+    with pytest.raises(ValueError, match="Unknown diff encoding 'tiny'"):
+        parse_encoding("tiny")
+    with pytest.raises(ValueError, match="Only one of"):
+        parse_encoding("context-1+context-0")
+
+
+def test_git_arguments() -> None:
+    """Test that the git options of every name are combined."""
+    assert git_arguments("unified") == []
+    assert git_arguments("context-0+ignore-whitespace") == [
+        "--unified=0",
+        "--ignore-all-space",
+        "--ignore-blank-lines",
+    ]
+
+
+def test_encode_diff_leaves_git_encodings_and_summaries_alone() -> None:
+    """Test that only the rewriting encodings change the text."""
+    assert encode_diff(MOVED_DIFF, "context-1") is MOVED_DIFF
+    summaries = "a.py: Added a function.\n"
+    assert encode_diff(summaries, "structured") == summaries
+
+
+def test_encode_diff_collapses_moves() -> None:
+    """Test that a block moved to another file is replaced on both ends."""
+    encoded = encode_diff(MOVED_DIFF, "moves")
+
+    assert "-[4 lines moved to b.py: def foo(): ...]\n-\n y = 2\n" in encoded
+    assert "+[4 lines moved from a.py: def foo(): ...]\n+z = 3\n" in encoded
+    assert "return a + b" not in encoded
+    # The result is still a diff of the same files.
+    assert [f.path for f in parse_diff(encoded)] == ["a.py", "b.py"]
+
+
+def test_encode_diff_keeps_short_and_reindented_blocks() -> None:
+    """Test that blocks below the minimum or with new indentation are kept."""
+    diff = (
+        "diff --git a/a.py b/a.py\n"
+        "--- a/a.py\n"
+        "+++ b/a.py\n"
+        "@@ -1,4 +1,4 @@\n"
+        "-one\n"
+        "-two\n"
+        "-three\n"
+        "-x = 1\n"
+        "+    one\n"
+        "+    two\n"
+        "+    three\n"
+        "+x = 1\n"
+    )
+
+    assert encode_diff(diff, "moves") == diff
+
+
+def test_encode_diff_structured() -> None:
+    """Test that file headers become titles and hunk headers shrink."""
+    diff = (
+        "diff --git a/old.py b/new.py\n"
+        "similarity index 90%\n"
+        "rename from old.py\n"
+        "rename to new.py\n"
+        "index 1111111..2222222 100644\n"
+        "--- a/old.py\n"
+        "+++ b/new.py\n"
+        "@@ -10,3 +10,3 @@ def main():\n"
+        " a\n"
+        "-b\n"
+        "+c\n"
+        "diff --git a/gone.txt b/gone.txt\n"
+        "deleted file mode 100644\n"
+        "index 3333333..0000000\n"
+        "--- a/gone.txt\n"
+        "+++ /dev/null\n"
+        "@@ -1 +0,0 @@\n"
+        "-bye\n"
+        "diff --git a/package-lock.json b/package-lock.json\n"
+        "[package-lock.json: +10 -2 lines, stat-only file]\n"
+    )
+
+    assert encode_diff(diff, "structured") == (
+        "## new.py (renamed from old.py)\n"
+        "@@ 10 def main():\n"
+        " a\n"
+        "-b\n"
+        "+c\n"
+        "## gone.txt (deleted)\n"
+        "@@ 0\n"
+        "-bye\n"
+        "## package-lock.json\n"
+        "[package-lock.json: +10 -2 lines, stat-only file]\n"
+    )
@@ -0,0 +1,106 @@
+"""Test the diff parser module."""
+
+from collections.abc import Iterator
+
+from genie_git.diff_parser import iter_file_diffs, parse_diff
+
+DIFF = """\
+diff --git a/src/app.py b/src/app.py
+index 1111111..2222222 100644
+--- a/src/app.py
++++ b/src/app.py
+@@ -1,3 +1,3 @@
+ import os
+-import sys
++import json
+@@ -10,2 +10,3 @@ def main():
+     run()
++    stop()
+diff --git a/image.png b/image.png
+new file mode 100644
+index 0000000..3333333
+Binary files /dev/null and b/image.png differ
+diff --git a/old.txt b/old.txt
+deleted file mode 100644
+index 4444444..0000000
+--- a/old.txt
++++ /dev/null
+@@ -1 +0,0 @@
+-gone"""
+
+
+def test_parse_diff_splits_files_and_hunks() -> None:
+    """Test that parse_diff returns a record per file with its hunks."""
+    file_diffs = parse_diff(DIFF)
+
+    assert [file_diff.path for file_diff in file_diffs] == [
+        "src/app.py",
+        "image.png",
+        "old.txt",
+    ]
+    app, image, old = file_diffs
+    assert len(app.hunks) == 2
+    assert app.hunks[1].startswith("@@ -10,2 +10,3 @@")
+    assert (app.additions, app.deletions) == (2, 1)
+    assert image.hunks == []
+    assert "Binary files" in image.header
+    assert (old.additions, old.deletions) == (0, 1)
+
+
+def test_parse_diff_round_trips_text() -> None:
+    """Test that the records add up to the original diff."""
+    assert "".join(f.text for f in parse_diff(DIFF)) == DIFF + "\n"
+
+
+def test_parse_diff_with_empty_diff() -> None:
+    """Test that an empty diff has no files."""
+    assert parse_diff("") == []
+
+
+def test_stat_summary() -> None:
+    """Test that stat_summary keeps the header line and the line counts."""
+    app = parse_diff(DIFF)[0]
+
+    assert app.stat_summary() == (
+        "diff --git a/src/app.py b/src/app.py\n"
+        "[src/app.py: +2 -1 lines, content omitted]\n"
+    )
+
+
+def test_blob_ids() -> None:
+    """Test that blob_ids reads the index line of the header."""
+    app, image, old = parse_diff(DIFF)
+
+    assert app.blob_ids == ("1111111", "2222222")
+    assert image.blob_ids == ("0000000", "3333333")
+    assert parse_diff("diff --git a/a b/a\nold mode 100644\n")[0].blob_ids is None
+
+
+def test_iter_file_diffs_yields_files_as_they_arrive() -> None:
+    """Test that a file is yielded before the lines of the next one are read."""
+    read = []
+
+    def lines() -> Iterator[str]:
+        for line in DIFF.splitlines(keepends=True):
+            read.append(line)
+            yield line
+
+    file_diffs = iter_file_diffs(lines())
+
+    assert next(file_diffs).path == "src/app.py"
+    # Only the header line of the next file was read.
+    assert read[-1] == "diff --git a/image.png b/image.png\n"
+    assert [file_diff.path for file_diff in file_diffs] == ["image.png", "old.txt"]
+
+
+def test_old_path() -> None:
+    """Test that old_path reads the path before a rename."""
+    renamed = parse_diff(
+        "diff --git a/a.txt b/b.txt\n"
+        "similarity index 100%\n"
+        "rename from a.txt\n"
+        "rename to b.txt\n"
+    )[0]
+
+    assert (renamed.old_path, renamed.path) == ("a.txt", "b.txt")
+    assert parse_diff(DIFF)[0].old_path == "src/app.py"
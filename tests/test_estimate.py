@@ -0,0 +1,70 @@
+"""Test the prompt estimates."""
+
+from genie_git.diff_encoding import encode_diff
+from genie_git.estimate import PromptEstimate, estimate_prompt, predict_latency
+from genie_git.latency import LatencyHistory
+from genie_git.prompt import build_prompt
+
+DIFF = (
+    "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-a\n+b\n"
+    "diff --git a/b.py b/b.py\n--- a/b.py\n+++ b/b.py\n@@ -1 +1 @@\n-c\n+d\n"
+)
+
+
+def test_estimate_prompt_measures_every_section() -> None:
+    """Test that the sections add up to the prompt that would be sent."""
+    estimate = estimate_prompt("model", "abc1234 feat: log", DIFF, "short", "why")
+
+    prompt = build_prompt("abc1234 feat: log", DIFF, "short", "why")
+    assert estimate.size_bytes == len(prompt.encode())
+    assert [section.name for section in estimate.sections] == [
+        "instructions",
+        "log",
+        "a.py",
+        "b.py",
+        "context",
+    ]
+    assert sum(s.size_bytes for s in estimate.sections) == estimate.size_bytes
+    assert estimate.sections[1].size_bytes == len("abc1234 feat: log")
+
+
+def test_estimate_prompt_measures_the_encoded_files() -> None:
+    """Test that the sections measure the files as the encoding rewrites them."""
+    estimate = estimate_prompt("model", "", DIFF, "short", encoding="structured")
+
+    encoded = encode_diff(DIFF, "structured")
+    assert estimate.size_bytes == len(build_prompt("", encoded, "short").encode())
+    assert estimate.sections[2].name == "a.py"
+    assert estimate.sections[2].size_bytes == len("## a.py\n@@ 1\n-a\n+b\n")
+
+
+def test_estimate_prompt_measures_summaries_as_one_section() -> None:
+    """Test that changes which are not a diff are still measured."""
+    estimate = estimate_prompt("model", "", "a.py:\nRenames a function.", "short")
+
+    assert [section.name for section in estimate.sections] == [
+        "instructions",
+        "log",
+        "changes",
+    ]
+
+
+def test_predict_latency_adds_the_summary_waves() -> None:
+    """Test that summary requests run in waves before the final request."""
+    history = LatencyHistory()
+    for _ in range(5):
+        history.record("model", 2.0, prompt_tokens=100)
+    estimate = PromptEstimate("model", 400, 100, summary_requests=[100, 100, 100])
+
+    assert predict_latency(history, estimate, concurrency=2) == 6.0
+    assert predict_latency(LatencyHistory(), estimate, concurrency=2) is None
+
+
+def test_format_reports_cached_responses() -> None:
+    """Test that a cached response is reported as costing no request."""
+    estimate = estimate_prompt("model", "", DIFF, "short")
+    assert "Predicted latency: unknown" in estimate.format()
+
+    estimate.cached_response = True
+    assert "no request would be sent" in estimate.format()
+    assert estimate.to_dict()["total_tokens"] == 0
@@ -0,0 +1,86 @@
+"""Test the exclusions module."""
+
+import pytest
+
+from genie_git.config import Config
+from genie_git.exclusions import (
+    ExclusionRules,
+    NumstatEntry,
+    matches,
+    parse_numstat,
+    to_pathspec,
+)
+
+
+@pytest.mark.parametrize(
+    ("path", "pattern", "expected"),
+    [
+        ("uv.lock", "*.lock", True),
+        ("sub/dir/uv.lock", "*.lock", True),
+        ("uv.lock.txt", "*.lock", False),
+        ("dist/app.js", "dist/", True),
+        ("web/dist/app.js", "dist/", True),
+        ("distro/app.js", "dist/", False),
+        ("src/gen/a.py", "src/*/a.py", True),
+        ("src/gen/deep/a.py", "src/*/a.py", False),
+        ("src/gen/deep/a.py", "src/**/a.py", True),
+        ("src/a.py", "/src/a.py", True),
+        ("other/src/a.py", "/src/a.py", False),
+    ],
+)
+def test_matches(path: str, pattern: str, expected: bool) -> None:
+    """Test that patterns match paths like git pathspecs and .gitignore."""
+    assert matches(path, pattern) is expected
+
+
+def test_to_pathspec() -> None:
+    """Test that patterns become git exclude pathspecs with the same meaning."""
+    assert to_pathspec("*.lock") == ":(exclude,glob)**/*.lock"
+    assert to_pathspec("dist/") == ":(exclude,glob)**/dist/**"
+    assert to_pathspec("/src/a.py") == ":(exclude,glob)src/a.py"
+
+
+def test_parse_numstat() -> None:
+    """Test parsing line counts, binary files and renames."""
+    output = "3\t1\ta.py\0-\t-\timage.png\0" + "2\t0\t\0old.py\0new.py\0"
+
+    assert parse_numstat(output) == [
+        NumstatEntry("a.py", 3, 1),
+        NumstatEntry("image.png", None, None),
+        NumstatEntry("new.py", 2, 0, old_path="old.py"),
+    ]
+
+
+def test_stat_only_reason() -> None:
+    """Test which files are sent as line counts only."""
+    rules = ExclusionRules(stat_only=("*.lock",), max_file_lines=100)
+
+    assert rules.stat_only_reason(NumstatEntry("a.py", 60, 40)) is None
+    over_limit = rules.stat_only_reason(NumstatEntry("a.py", 60, 41))
+    assert over_limit is not None
+    assert "100-line limit" in over_limit
+    lock_file = rules.stat_only_reason(NumstatEntry("uv.lock", 1, 0))
+    assert lock_file is not None
+    assert "lock file" in lock_file
+    assert rules.stat_only_reason(NumstatEntry("a.bin", None, None))
+    assert (
+        ExclusionRules(max_file_lines=0).stat_only_reason(
+            NumstatEntry("a.py", 10**6, 0)
+        )
+        is None
+    )
+
+
+def test_from_config_read_limit() -> None:
+    """Test that without map-reduce no more than the prompt budget is read."""
+    config = Config(max_diff_read_tokens=500000, max_prompt_tokens=32000)
+    assert ExclusionRules.from_config(config).max_read_tokens == 500000
+
+    config.map_reduce_threshold_tokens = 0
+    assert ExclusionRules.from_config(config).max_read_tokens == 32000
+
+    config.max_prompt_tokens = 0
+    assert ExclusionRules.from_config(config).max_read_tokens == 500000
+
+    config.max_diff_read_tokens = 0
+    assert ExclusionRules.from_config(config).max_read_tokens == 0
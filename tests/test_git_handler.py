@@ -1,8 +1,39 @@
 """Test the git handler module."""
 
+import subprocess
+from collections.abc import Callable
+from pathlib import Path
+
+import git
+import pytest
 from pytest_mock import MockerFixture
 
-from genie_git.git_handler import get_log, get_repository_changes
+from genie_git.exclusions import ExclusionRules
+from genie_git.git_handler import (
+    GitProcess,
+    GitStream,
+    get_commit_changes,
+    get_log,
+    get_range_changes,
+    get_repository_changes,
+    get_unstaged_paths,
+    list_commits,
+    open_repo,
+    start_log,
+    start_repository_changes,
+)
+from genie_git.tracing import start_tracing, stop_tracing
+
+
+@pytest.fixture
+def repository(tmp_path: Path) -> git.Repo:
+    """Create an empty repository."""
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    repo = open_repo(str(tmp_path))
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "test")
+        config.set_value("user", "email", "test@example.com")
+    return repo
 
 
 def test_get_log(mocker: MockerFixture) -> None:
@@ -19,20 +50,291 @@ def test_get_log(mocker: MockerFixture) -> None:
 def test_get_repository_changes_with_no_exclusions(mocker: MockerFixture) -> None:
     """Test get_repository_changes calls 'git diff' correctly with no exclusions."""
     mock_repo_instance = mocker.MagicMock()
+    mock_repo_instance.git.diff.side_effect = ["1\t0\tfile\0", "test_diff"]
     mocker.patch("genie_git.git_handler.git.Repo", return_value=mock_repo_instance)
 
-    get_repository_changes()
+    assert get_repository_changes() == "test_diff"
 
-    mock_repo_instance.git.diff.assert_called_once_with("--staged")
+    assert mock_repo_instance.git.diff.call_args_list == [
+        mocker.call("--staged", "--numstat", "-z"),
+        mocker.call("--staged"),
+    ]
 
 
 def test_get_repository_changes_with_exclusions(mocker: MockerFixture) -> None:
-    """Test get_repository_changes calls 'git diff' correctly with exclusions."""
+    """Test get_repository_changes passes every exclusion as its own pathspec."""
+    mock_repo_instance = mocker.MagicMock()
+    mock_repo_instance.git.diff.side_effect = ["1\t0\tfile\0", "test_diff"]
+    mocker.patch("genie_git.git_handler.git.Repo", return_value=mock_repo_instance)
+
+    get_repository_changes(ExclusionRules(exclude=("test_file", "docs/*.md")))
+
+    pathspecs = ["--", ":(exclude,glob)**/test_file", ":(exclude,glob)docs/*.md"]
+    assert mock_repo_instance.git.diff.call_args_list == [
+        mocker.call("--staged", "--numstat", "-z", *pathspecs),
+        mocker.call("--staged", *pathspecs),
+    ]
+
+
+def test_get_repository_changes_without_patches(mocker: MockerFixture) -> None:
+    """Test that no patches are read when every file is sent as line counts."""
     mock_repo_instance = mocker.MagicMock()
+    mock_repo_instance.git.diff.return_value = "-\t-\timage.png\0"
     mocker.patch("genie_git.git_handler.git.Repo", return_value=mock_repo_instance)
 
-    get_repository_changes(exclude_files=["test_file", "test_file2"])
+    assert get_repository_changes() == (
+        "diff --git a/image.png b/image.png\n[image.png: binary file, content omitted]"
+    )
+    mock_repo_instance.git.diff.assert_called_once()
+
+
+def test_get_log_with_repo(mocker: MockerFixture) -> None:
+    """Test get_log uses the given repository instead of opening one."""
+    mock_repo_class = mocker.patch("genie_git.git_handler.git.Repo")
+    mock_repo_instance = mocker.MagicMock()
+
+    get_log(3, repo=mock_repo_instance)
+
+    mock_repo_class.assert_not_called()
+    mock_repo_instance.git.log.assert_called_once_with("-3", "--pretty=format:%s")
+
+
+def test_start_repository_changes_and_log(repository: git.Repo) -> None:
+    """Test that the background processes return the diff and the log."""
+    path = Path(repository.working_dir)
+    (path / "file.txt").write_text("first\n")
+    repository.git.add("file.txt")
+    repository.git.commit("-m", "feat: first commit")
+    (path / "file.txt").write_text("second\n")
+    repository.git.add("file.txt")
+
+    diff_process = start_repository_changes(ExclusionRules(), repository)
+    log_process = start_log(5, repository)
+
+    staged_diff = diff_process.result()
+    assert "+second" in staged_diff
+    assert staged_diff == get_repository_changes(ExclusionRules(), repository)
+    assert log_process.result() == "feat: first commit"
+
+
+def test_repository_changes_with_an_encoding(repository: git.Repo) -> None:
+    """Test that the git options of the encoding apply to the patches."""
+    path = Path(repository.working_dir)
+    (path / "file.txt").write_text("".join(f"line {i}\n" for i in range(10)))
+    repository.git.add("file.txt")
+    repository.git.commit("-m", "feat: first commit")
+    (path / "file.txt").write_text(
+        "".join(f"  line {i}\n" if i == 5 else f"line {i}\n" for i in range(10))
+        + "line 10\n"
+    )
+    repository.git.add("file.txt")
+
+    unified = get_repository_changes(ExclusionRules(), repository)
+    assert "\n line 4\n" in unified
+    assert "+  line 5\n" in unified
+
+    no_context = get_repository_changes(ExclusionRules(), repository, "context-0")
+    assert "\n line 4\n" not in no_context
+    assert (
+        start_repository_changes(ExclusionRules(), repository, "context-0").result()
+        == no_context
+    )
+
+    ignored = get_repository_changes(ExclusionRules(), repository, "ignore-whitespace")
+    assert "line 5" not in ignored
+    assert "+line 10" in ignored
+
+
+def test_start_log_without_commits(repository: git.Repo) -> None:
+    """Test that the log of a repository without commits is empty."""
+    assert start_log(5, repository).result() == ""
+
+
+def test_git_process_raises_on_failure(repository: git.Repo) -> None:
+    """Test that a failing git command raises a GitCommandError."""
+    process = GitProcess(repository, "log", "--no-such-option")
+
+    with pytest.raises(git.GitCommandError):
+        process.result()
+
+
+def test_range_helpers(repository: git.Repo, commit_file: Callable[..., str]) -> None:
+    """Test listing, showing and diffing the commits of a range."""
+    base = commit_file(repository.working_dir, "a.txt", "a\n", "feat: base")
+    first = commit_file(repository.working_dir, "b.txt", "b\n", "feat: add b")
+    second = commit_file(repository.working_dir, "c.txt", "c\n", "feat: add c")
+
+    assert list_commits(f"{base}..HEAD", repository) == [
+        (first, "feat: add b"),
+        (second, "feat: add c"),
+    ]
 
-    mock_repo_instance.git.diff.assert_called_once_with(
-        "--staged", ":(exclude)test_file :(exclude)test_file2"
+    commit_changes = get_commit_changes(second, ExclusionRules(), repository)
+    assert "+c" in commit_changes
+    assert "b.txt" not in commit_changes
+
+    range_changes = get_range_changes(
+        f"{base}..HEAD", ExclusionRules(exclude=("c.txt",)), repository
+    )
+    assert "b.txt" in range_changes
+    assert "c.txt" not in range_changes
+
+    assert get_log(5, repository, before=second) == "feat: add b\nfeat: base"
+    assert get_log(5, repository, before=base) == ""
+
+
+def test_commit_changes_of_a_merge(
+    repository: git.Repo, commit_file: Callable[..., str]
+) -> None:
+    """Test that a merge shows the changes it brought into the branch."""
+    commit_file(repository.working_dir, "a.txt", "a\n", "feat: base")
+    repository.git.checkout("-q", "-b", "side")
+    commit_file(repository.working_dir, "b.txt", "b\n", "feat: add b")
+    repository.git.checkout("-q", "-")
+    commit_file(repository.working_dir, "a.txt", "a\nc\n", "feat: add c")
+    repository.git.merge("-q", "--no-edit", "side")
+
+    merge_changes = get_commit_changes("HEAD", ExclusionRules(), repository)
+
+    assert merge_changes.startswith("diff --git a/b.txt b/b.txt\n")
+    assert "diff --cc" not in merge_changes
+    assert "a.txt" not in merge_changes
+
+
+def test_scoped_log_and_unstaged_paths(
+    repository: git.Repo, commit_file: Callable[..., str]
+) -> None:
+    """Test the log of a directory and the paths with unstaged changes."""
+    commit_file(repository.working_dir, "a.txt", "a\n", "feat: add a")
+    (Path(repository.working_dir) / "pkg").mkdir()
+    commit_file(repository.working_dir, "pkg/b.txt", "b\n", "feat(pkg): add b")
+    commit_file(repository.working_dir, "c.txt", "c\n", "feat: add c")
+
+    assert get_log(5, repository, paths=["pkg"]) == "feat(pkg): add b"
+
+    (Path(repository.working_dir) / "a.txt").write_text("changed\n")
+    (Path(repository.working_dir) / "pkg" / "b.txt").write_text("staged\n")
+    repository.git.add("pkg/b.txt")
+    assert get_unstaged_paths(repository) == {"a.txt"}
+
+
+def test_git_process_records_a_span(repository: git.Repo) -> None:
+    """Test that a traced git process records its duration and output size."""
+    tracer = start_tracing("test")
+    try:
+        start_log(5, repository).result()
+    finally:
+        stop_tracing()
+
+    assert [span.name for span in tracer.spans] == ["git_log"]
+    assert tracer.spans[0].attributes == {"log_bytes": 0, "log_tokens": 0}
+
+
+def test_large_generated_and_renamed_files_are_sent_as_line_counts(
+    repository: git.Repo, commit_file: Callable[..., str]
+) -> None:
+    """Test that only the patches of small source files are read."""
+    path = Path(repository.working_dir)
+    commit_file(
+        repository.working_dir, "old.lock", "".join(f"{i}\n" for i in range(20)), "init"
+    )
+    repository.git.mv("old.lock", "new.lock")
+    (path / "main.py").write_text("print('hi')\n")
+    (path / "uv.lock").write_text("lock\n")
+    (path / "big.txt").write_text("line\n" * 11)
+    (path / "snapshot.snap").write_text("snapshot\n")
+    repository.git.add(".")
+
+    rules = ExclusionRules(exclude=("*.snap",), max_file_lines=10)
+    diff = get_repository_changes(rules, repository)
+
+    assert "+print('hi')" in diff
+    # The old path of a summarized rename is not read as a deletion
+    assert "diff --git a/old.lock b/new.lock" in diff
+    assert "deleted file mode" not in diff
+    assert "[uv.lock: +1 -0 lines, generated or lock file, content omitted]" in diff
+    assert "[big.txt: +11 -0 lines, over the 10-line limit, content omitted]" in diff
+    assert "snapshot" not in diff
+    assert start_repository_changes(rules, repository).result() == diff
+
+
+def test_many_summarized_files_are_left_out_of_the_output(
+    repository: git.Repo, mocker: MockerFixture, commit_file: Callable[..., str]
+) -> None:
+    """Test that summarized paths too long for the command line are filtered."""
+    path = Path(repository.working_dir)
+    commit_file(
+        repository.working_dir, "old.lock", "".join(f"{i}\n" for i in range(20)), "init"
     )
+    repository.git.mv("old.lock", "new.lock")
+    (path / "main.py").write_text("print('hi')\n")
+    (path / "uv.lock").write_text("lock\n")
+    (path / "image.png").write_bytes(b"\0\1")
+    (path / "zz.lock").write_text("lock\n")
+    repository.git.add(".")
+    rules = ExclusionRules(max_file_lines=10)
+    diff = get_repository_changes(rules, repository)
+
+    mocker.patch("genie_git.git_handler.MAX_PATHSPEC_CHARACTERS", 0)
+    stream = mocker.spy(GitStream, "__init__")
+
+    assert get_repository_changes(rules, repository) == diff
+    assert start_repository_changes(rules, repository).result() == diff
+    assert not any(
+        ":(exclude,literal)" in argument
+        for call in stream.call_args_list
+        for argument in call.args[2:]
+    )
+    assert stream.call_count == 2
+    limited = ExclusionRules(max_file_lines=10, max_read_tokens=10**6)
+    assert get_repository_changes(limited, repository) == diff
+
+
+def test_patches_past_the_read_limit_are_sent_as_line_counts(
+    repository: git.Repo,
+) -> None:
+    """Test that git is stopped once the patches reach the read limit."""
+    path = Path(repository.working_dir)
+    for name in "abcde":
+        (path / f"{name}.txt").write_text(f"{name * 7}\n" * 100)
+    repository.git.add(".")
+    full_diff = get_repository_changes(ExclusionRules(), repository)
+
+    # Two files of about 250 tokens fit, the third does not.
+    rules = ExclusionRules(max_read_tokens=600)
+    tracer = start_tracing("test")
+    try:
+        diff = get_repository_changes(rules, repository)
+    finally:
+        stop_tracing()
+
+    assert diff.startswith(full_diff[: full_diff.index("diff --git a/c.txt")])
+    assert "+ccccccc" not in diff
+    for name in "cde":
+        assert (
+            f"[{name}.txt: +100 -0 lines, past the 600-token read limit, "
+            "content omitted]"
+        ) in diff
+    stream_span = next(
+        span
+        for span in tracer.spans
+        if span.name == "git_diff" and "stopped" in span.attributes
+    )
+    assert stream_span.attributes["stopped"] is True
+    assert int(stream_span.attributes["diff_bytes"]) < len(full_diff)
+    assert start_repository_changes(rules, repository).result() == diff
+
+    # Under the limit, every patch is read.
+    assert (
+        get_repository_changes(ExclusionRules(max_read_tokens=10**6), repository)
+        == full_diff
+    )
+
+
+def test_git_stream_raises_on_failure(repository: git.Repo) -> None:
+    """Test that a git command failing while streamed raises a GitCommandError."""
+    stream = GitStream(repository, "log", "--no-such-option")
+    assert list(stream.lines()) == []
+
+    with pytest.raises(git.GitCommandError):
+        stream.close()
@@ -0,0 +1,135 @@
+"""Test the history index module."""
+
+import subprocess
+from collections.abc import Callable
+from pathlib import Path
+
+import git
+import pytest
+
+from genie_git.exclusions import ExclusionRules
+from genie_git.git_handler import open_repo
+from genie_git.history_index import (
+    HistoryIndex,
+    commit_type,
+    parse_log,
+    start_reference_log,
+)
+from genie_git.pipeline import start_git_inputs
+
+
+@pytest.fixture
+def repository(tmp_path: Path, commit_file: Callable[..., str]) -> git.Repo:
+    """Create a repository with commits to different directories."""
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    repo = open_repo(str(tmp_path))
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "test")
+        config.set_value("user", "email", "test@example.com")
+    for path, subject in [
+        ("api/routes.py", "feat(api): add routes"),
+        ("web/page.html", "feat(web): add a page"),
+        ("api/models.py", "fix(api): validate models"),
+        ("README.md", "docs: describe the setup"),
+        ("web/style.css", "style(web): tweak colors"),
+    ]:
+        commit_file(repo.working_dir, path, f"{subject}\n", subject)
+    return repo
+
+
+def test_commit_type() -> None:
+    """Test that conventional commit types are recognized."""
+    assert commit_type("feat(api)!: drop v1") == "feat"
+    assert commit_type("Fix: typo") == "fix"
+    assert commit_type("Update the readme") == ""
+
+
+def test_parse_log() -> None:
+    """Test that commits with and without paths are parsed."""
+    output = "\x1eb\x1ffix: two\0\na b.txt\0d/x\0\x1ea\x1fchore: empty\0"
+
+    assert parse_log(output) == [
+        ("b", "fix: two", ["a b.txt", "d/x"]),
+        ("a", "chore: empty", []),
+    ]
+
+
+def test_reference_log_ranks_commits_by_the_staged_paths(
+    repository: git.Repo,
+) -> None:
+    """Test that commits changing the staged paths come before recent ones."""
+    references = start_reference_log(repository)
+
+    log = references.result(["api/models.py"], 3)
+
+    assert log.splitlines() == [
+        "style(web): tweak colors",
+        "fix(api): validate models",
+        "feat(api): add routes",
+    ]
+
+
+def test_reference_log_indexes_only_new_commits(
+    repository: git.Repo, commit_file: Callable[..., str]
+) -> None:
+    """Test that later runs index the commits made since the last one."""
+    start_reference_log(repository).result([], 1)
+    commit_file(
+        repository.working_dir,
+        "api/routes.py",
+        "split\n",
+        "refactor(api): split routes",
+    )
+
+    index = HistoryIndex.for_repo(repository)
+    assert index.last_indexed == repository.head.commit.parents[0].hexsha
+    index.close()
+
+    log = start_reference_log(repository).result(["api/routes.py"], 2)
+    assert log.splitlines() == [
+        "refactor(api): split routes",
+        "feat(api): add routes",
+    ]
+    index = HistoryIndex.for_repo(repository)
+    assert index.last_indexed == repository.head.commit.hexsha
+    assert index.connection.execute("SELECT COUNT(*) FROM commits").fetchone() == (6,)
+    index.close()
+
+
+def test_reference_log_rebuilds_after_the_last_commit_vanished(
+    repository: git.Repo,
+) -> None:
+    """Test that an unknown last indexed commit falls back to a fresh scan."""
+    index = HistoryIndex.for_repo(repository)
+    index.connection.execute(
+        "INSERT INTO state (key, value) VALUES ('last_indexed', ?)", ("0" * 40,)
+    )
+    index.connection.commit()
+    index.close()
+
+    log = start_reference_log(repository).result(["README.md"], 1)
+
+    assert log == "docs: describe the setup"
+
+
+def test_reference_log_of_a_repository_without_commits(tmp_path: Path) -> None:
+    """Test that a new repository has no reference commits."""
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+
+    assert start_reference_log(open_repo(str(tmp_path))).result(["a.py"], 5) == ""
+
+
+def test_start_git_inputs_with_relevant_commits(repository: git.Repo) -> None:
+    """Test that the staged paths pick the reference commits of the prompt."""
+    Path(repository.working_dir, "web", "page.html").write_text("new\n")
+    repository.git.add("web/page.html")
+
+    git_inputs = start_git_inputs(
+        ExclusionRules(), 2, str(repository.working_dir), relevant_commits=True
+    ).result()
+
+    assert "web/page.html" in git_inputs.staged_changes
+    assert git_inputs.git_logs.splitlines() == [
+        "style(web): tweak colors",
+        "feat(web): add a page",
+    ]
@@ -0,0 +1,79 @@
+"""Test the latency module."""
+
+from pathlib import Path
+
+import pytest
+
+from genie_git.latency import MAX_SAMPLES, LatencyHistory
+
+
+def make_history(**latencies: list[float]) -> LatencyHistory:
+    """Return a history with successful samples of the given latencies."""
+    history = LatencyHistory()
+    for model, seconds in latencies.items():
+        for value in seconds:
+            history.record(model, value, prompt_tokens=100)
+    return history
+
+
+def test_quantile_needs_enough_samples() -> None:
+    """Test that quantiles use the nearest rank of successful samples."""
+    history = make_history(fast=[0.1, 0.2, 0.3, 0.4], slow=[1, 2, 3, 4, 5, 6, 7, 8])
+    history.record("slow", 100, prompt_tokens=100, ok=False)
+
+    assert history.quantile("fast", 0.5) is None
+    assert history.quantile("unknown", 0.5) is None
+    assert history.quantile("slow", 0.5) == 4
+    assert history.quantile("slow", 0.95) == 8
+
+
+def test_record_keeps_the_recent_samples() -> None:
+    """Test that only the most recent samples are kept."""
+    history = make_history(model=[float(i) for i in range(MAX_SAMPLES + 10)])
+
+    samples = history.samples["model"]
+    assert len(samples) == MAX_SAMPLES
+    assert samples[0].seconds == 10
+    assert samples[0].prompt_tokens == 100
+
+
+def test_rank_prefers_fast_and_healthy_models() -> None:
+    """Test that healthy models come first, the fastest first."""
+    history = make_history(
+        slow=[2.0] * 5, fast=[0.5] * 5, failing=[0.1] * 5, unknown=[]
+    )
+    for _ in range(6):
+        history.record("failing", 0.1, prompt_tokens=100, ok=False)
+
+    assert not history.is_healthy("failing")
+    assert history.is_healthy("unknown")
+    assert history.rank(["unknown", "slow", "failing", "fast", "new"]) == [
+        "fast",
+        "slow",
+        "unknown",
+        "new",
+        "failing",
+    ]
+
+
+def test_save_and_load(isolated_storage: Path) -> None:
+    """Test that the history survives a round trip and tolerates bad files."""
+    make_history(model=[0.5, 1.5]).save()
+
+    history = LatencyHistory.load()
+
+    assert [sample.seconds for sample in history.samples["model"]] == [0.5, 1.5]
+
+    (isolated_storage / "latency.json").write_text("{not json")
+    assert LatencyHistory.load().samples == {}
+
+
+def test_predict_fits_latency_to_the_prompt_size() -> None:
+    """Test that predictions grow with the prompt size of past requests."""
+    history = LatencyHistory()
+    for tokens in [1000, 2000, 3000, 4000, 5000]:
+        history.record("model", 1 + tokens / 1000, prompt_tokens=tokens)
+
+    assert history.predict("model", 10000) == pytest.approx(11)
+    assert history.predict("unknown", 10000) is None
+    assert make_history(model=[1, 2, 3, 4, 5]).predict("model", 10000) == 3
@@ -1,5 +1,11 @@
 """Test the main module."""
 
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
 from pytest_mock import MockerFixture
 
 from genie_git.main import main
@@ -13,6 +19,7 @@ def test_main(mocker: MockerFixture) -> None:
     mock_create_parser.return_value = mock_parser_instance
 
     mock_parsed_args = mocker.MagicMock()
+    mock_parsed_args.startup_profile = False
     mock_parser_instance.parse_args.return_value = mock_parsed_args
 
     main()
@@ -20,3 +27,67 @@ def test_main(mocker: MockerFixture) -> None:
     mock_create_parser.assert_called_once()
     mock_parser_instance.parse_args.assert_called_once()
     mock_parsed_args.func.assert_called_once_with(mock_parsed_args)
+
+
+def test_main_with_startup_profile(mocker: MockerFixture) -> None:
+    """Test that main profiles the command without the profile flag."""
+    mock_create_parser = mocker.patch("genie_git.main.create_parser")
+    mock_parsed_args = mock_create_parser.return_value.parse_args.return_value
+    mock_parsed_args.startup_profile = True
+    mocker.patch.object(
+        sys, "argv", ["genie-git", "--startup-profile", "configure", "--show"]
+    )
+    mock_profile_startup = mocker.patch(
+        "genie_git.main.profile_startup", return_value=0
+    )
+
+    with pytest.raises(SystemExit):
+        main()
+
+    mock_profile_startup.assert_called_once_with(["configure", "--show"])
+    mock_parsed_args.func.assert_not_called()
+
+
+@pytest.mark.parametrize("argv", [["configure", "--show"], ["--help"]])
+def test_non_network_commands_do_not_import_heavy_modules(
+    tmp_path: Path, argv: list[str]
+) -> None:
+    """Test that commands which never reach the network skip the heavy imports."""
+    code = (
+        "import sys\n"
+        "from genie_git.main import main\n"
+        f"sys.argv = ['genie-git', *{argv!r}]\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "heavy = {'google.genai', 'git', 'pyperclip'} & set(sys.modules)\n"
+        "assert not heavy, heavy\n"
+    )
+    env = {**os.environ, "HOME": str(tmp_path)}
+    env.pop("GENIE_GIT_STARTUP_PROFILE", None)
+
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env
+    )
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_help_without_fcntl(tmp_path: Path) -> None:
+    """Test that the commands load where fcntl is missing, e.g. on Windows."""
+    code = (
+        "import sys\n"
+        "sys.modules['fcntl'] = None\n"
+        "from genie_git.main import main\n"
+        "sys.argv = ['genie-git', '--help']\n"
+        "main()\n"
+    )
+    env = {**os.environ, "HOME": str(tmp_path)}
+
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert "usage" in result.stdout
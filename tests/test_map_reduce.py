@@ -0,0 +1,114 @@
+"""Test the map reduce module."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+from genie_git.cache import DiskCache
+from genie_git.diff_parser import parse_diff
+from genie_git.map_reduce import format_summaries, split_into_chunks, summarize_files
+from genie_git.tokens import estimate_tokens
+
+
+def make_file_diff(path: str, lines: int, blob: str = "1111111") -> str:
+    """Build the diff of a new file with the given number of lines."""
+    return (
+        f"diff --git a/{path} b/{path}\n"
+        f"new file mode 100644\n"
+        f"index 0000000..{blob}\n"
+        f"--- /dev/null\n"
+        f"+++ b/{path}\n"
+        f"@@ -0,0 +1,{lines} @@\n" + "".join(f"+line {n}\n" for n in range(lines))
+    )
+
+
+def test_split_into_chunks_groups_files_under_the_limit() -> None:
+    """Test that files are grouped in diff order without exceeding the limit."""
+    diff = "".join(make_file_diff(f"src/file_{n}.py", 40) for n in range(5))
+
+    chunks = split_into_chunks(parse_diff(diff), max_chunk_tokens=250)
+
+    texts = ["".join(f.text for f in chunk) for chunk in chunks]
+    assert len(chunks) > 1
+    assert "".join(texts) == diff
+    assert all(estimate_tokens(text) <= 250 for text in texts)
+
+
+def test_split_into_chunks_compacts_oversized_files() -> None:
+    """Test that a file larger than the limit is compacted on its own."""
+    diff = make_file_diff("small.py", 2) + make_file_diff("uv.lock", 5000)
+
+    chunks = split_into_chunks(parse_diff(diff), max_chunk_tokens=200)
+
+    texts = ["".join(f.text for f in chunk) for chunk in chunks]
+    assert texts[0].startswith(make_file_diff("small.py", 2))
+    assert "[uv.lock: +5000 -0 lines, content omitted]" in "".join(texts)
+    assert all(estimate_tokens(text) <= 200 for text in texts)
+
+
+def summarize_all(
+    requests: list[str],
+) -> Callable[[str], Awaitable[dict[str, str]]]:
+    """Return a summarizer recording its requests and summarizing every file."""
+
+    async def summarize(changes: str) -> dict[str, str]:
+        requests.append(changes)
+        return {f.path: f"summary of {f.path}" for f in parse_diff(changes)}
+
+    return summarize
+
+
+def test_summarize_files_only_summarizes_changed_blobs(tmp_path: Path) -> None:
+    """Test that a re-run only summarizes the files whose blobs changed."""
+    cache = DiskCache(tmp_path, max_bytes=1024 * 1024, max_age_seconds=60)
+    requests: list[str] = []
+    first_diff = make_file_diff("a.py", 3) + make_file_diff("b.py", 3)
+    # b.py was staged again with other content, and c.py was staged
+    second_diff = (
+        make_file_diff("a.py", 3)
+        + make_file_diff("b.py", 4, blob="2222222")
+        + make_file_diff("c.py", 3)
+    )
+
+    first = asyncio.run(
+        summarize_files(
+            parse_diff(first_diff), summarize_all(requests), cache, "m", 1000
+        )
+    )
+    second = asyncio.run(
+        summarize_files(
+            parse_diff(second_diff), summarize_all(requests), cache, "m", 1000
+        )
+    )
+
+    assert (first.reused, first.summarized, first.requests) == (0, 2, 1)
+    assert (second.reused, second.summarized, second.requests) == (1, 2, 1)
+    assert "a.py" not in requests[1]
+    assert second.summaries == [
+        ("a.py", "summary of a.py"),
+        ("b.py", "summary of b.py"),
+        ("c.py", "summary of c.py"),
+    ]
+
+
+def test_summarize_files_falls_back_to_line_counts() -> None:
+    """Test that a file the model skipped is sent as line counts, uncached."""
+    diff = make_file_diff("a.py", 3) + "diff --git a/img.png b/img.png\nBinary\n"
+
+    async def summarize(changes: str) -> dict[str, str]:
+        return {}
+
+    result = asyncio.run(summarize_files(parse_diff(diff), summarize, None, "m", 1000))
+
+    assert result.summaries == [
+        ("a.py", "diff --git a/a.py b/a.py\n[a.py: +3 -0 lines, no summary]"),
+        ("img.png", "diff --git a/img.png b/img.png\nBinary"),
+    ]
+    assert result.summarized == 1
+
+
+def test_format_summaries() -> None:
+    """Test that every summary follows the path of its file."""
+    changes = format_summaries([("a.py", "- adds a"), ("b.py", "- removes b")])
+
+    assert "a.py:\n- adds a\n\nb.py:\n- removes b" in changes
@@ -0,0 +1,149 @@
+"""Test the pipeline module."""
+
+import time
+
+import pytest
+from pytest_mock import MockerFixture
+
+from genie_git.exclusions import ExclusionRules
+from genie_git.pipeline import (
+    ClientWarmup,
+    WarmState,
+    keep_warm,
+    start_git_inputs,
+    timed,
+)
+from genie_git.resilience import Deadline, DeadlineExceededError
+
+
+def test_timed_records_the_duration() -> None:
+    """Test that timed records a stage even when it raises."""
+    timings: dict[str, float] = {}
+
+    with pytest.raises(RuntimeError), timed(timings, "stage"):
+        raise RuntimeError
+
+    assert timings["stage"] >= 0
+
+
+def test_start_git_inputs_shares_one_repository(mocker: MockerFixture) -> None:
+    """Test that the diff and the log are read from the same repository."""
+    mock_open_repo = mocker.patch("genie_git.git_handler.open_repo")
+    mock_start_repository_changes = mocker.patch(
+        "genie_git.git_handler.start_repository_changes"
+    )
+    mock_start_repository_changes.return_value.result.return_value = "test_changes"
+    mock_start_log = mocker.patch("genie_git.git_handler.start_log")
+    mock_start_log.return_value.result.return_value = "test_log"
+
+    pending_git_inputs = start_git_inputs(ExclusionRules(exclude=("excluded",)), 3)
+
+    # Both processes run before the result is requested
+    mock_open_repo.assert_called_once_with(".")
+    mock_start_repository_changes.assert_called_once_with(
+        ExclusionRules(exclude=("excluded",)), mock_open_repo.return_value, "unified"
+    )
+    mock_start_log.assert_called_once_with(3, mock_open_repo.return_value)
+
+    git_inputs = pending_git_inputs.result()
+
+    assert git_inputs.staged_changes == "test_changes"
+    assert git_inputs.git_logs == "test_log"
+    assert set(git_inputs.timings) == {"open_repo", "git_diff", "git_log"}
+
+
+def test_client_warmup_returns_the_warmed_up_client(mocker: MockerFixture) -> None:
+    """Test that ClientWarmup creates and warms up the client."""
+    mock_create_client = mocker.patch("genie_git.ai_handler.create_client")
+    mock_warm_up_client = mocker.patch("genie_git.ai_handler.warm_up_client")
+
+    warmup = ClientWarmup("test_key", "test_model", "http://localhost")
+    client = warmup.start().connect().result()
+
+    assert client == mock_create_client.return_value
+    mock_create_client.assert_called_once_with("test_key", "http://localhost")
+    mock_warm_up_client.assert_called_once_with(client, "test_model", None)
+
+
+def test_client_warmup_connects_only_when_asked(mocker: MockerFixture) -> None:
+    """Test that creating the client sends nothing until it is connected."""
+    mock_create_client = mocker.patch("genie_git.ai_handler.create_client")
+    mock_warm_up_client = mocker.patch("genie_git.ai_handler.warm_up_client")
+
+    warmup = ClientWarmup("test_key", "test_model")
+    mock_create_client.assert_not_called()
+
+    assert warmup.start().result() == mock_create_client.return_value
+    mock_warm_up_client.assert_not_called()
+    assert warmup.start().result() == mock_create_client.return_value
+    mock_create_client.assert_called_once()
+    assert ClientWarmup("test_key", "test_model").result()
+    assert mock_create_client.call_count == 2
+
+
+def test_client_warmup_waits_until_the_deadline(mocker: MockerFixture) -> None:
+    """Test that the client is not waited for past the deadline."""
+    mocker.patch(
+        "genie_git.ai_handler.create_client", side_effect=lambda *_: time.sleep(1)
+    )
+
+    warmup = ClientWarmup("test_key", "test_model", deadline=Deadline(0.05))
+
+    with pytest.raises(DeadlineExceededError):
+        warmup.start().result()
+
+
+def test_client_warmup_does_not_wait_for_the_connection(
+    mocker: MockerFixture,
+) -> None:
+    """Test that a slow connection is given up on at the deadline."""
+    mock_create_client = mocker.patch("genie_git.ai_handler.create_client")
+    mock_warm_up_client = mocker.patch(
+        "genie_git.ai_handler.warm_up_client", side_effect=lambda *_: time.sleep(1)
+    )
+
+    warmup = ClientWarmup("test_key", "test_model", deadline=Deadline(0.05))
+    started = time.monotonic()
+
+    assert warmup.start().connect().result() == mock_create_client.return_value
+    assert time.monotonic() - started < 0.5
+    timeout = mock_warm_up_client.call_args.args[2]
+    assert timeout is not None and timeout <= 0.05
+
+
+def test_client_warmup_raises_the_creation_error(mocker: MockerFixture) -> None:
+    """Test that ClientWarmup re-raises errors when the client is requested."""
+    mocker.patch("genie_git.ai_handler.create_client", side_effect=ValueError("no key"))
+
+    warmup = ClientWarmup("", "test_model").start()
+
+    with pytest.raises(ValueError, match="no key"):
+        warmup.result()
+
+
+def test_warm_state_reuses_the_client_and_the_repository(
+    mocker: MockerFixture,
+) -> None:
+    """Test that a warm state keeps the client and the repository."""
+    mock_create_client = mocker.patch("genie_git.ai_handler.create_client")
+    mocker.patch("genie_git.ai_handler.warm_up_client")
+    mock_open_repo = mocker.patch("genie_git.git_handler.open_repo")
+    mock_open_repo.return_value.working_dir = "."
+    mocker.patch("genie_git.git_handler.start_repository_changes")
+    mocker.patch("genie_git.git_handler.start_log")
+
+    state = WarmState()
+    keep_warm(state)
+    try:
+        clients = [
+            ClientWarmup("test_key", "test_model").start().result() for _ in range(2)
+        ]
+        start_git_inputs(ExclusionRules(), 5)
+        start_git_inputs(ExclusionRules(), 5)
+    finally:
+        keep_warm(None)
+
+    assert clients == [mock_create_client.return_value] * 2
+    mock_create_client.assert_called_once()
+    mock_open_repo.assert_called_once_with(".")
+    assert state.clients == {("test_key", ""): mock_create_client.return_value}
@@ -0,0 +1,155 @@
+"""Test the precomputation of commit messages."""
+
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import git
+import pytest
+from pytest_mock import MockerFixture
+
+from genie_git.config import Config
+from genie_git.git_handler import open_repo
+from genie_git.precompute import (
+    HOOK_MARKER,
+    LOCK_FILE,
+    fill_in_message,
+    index_path,
+    install_hooks,
+    precompute_lock,
+    staged_tree_key,
+    uninstall_hooks,
+    wait_until_quiet,
+    watch,
+)
+
+
+@pytest.fixture
+def repository(tmp_path: Path) -> git.Repo:
+    """Create an empty repository."""
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    return open_repo(str(tmp_path))
+
+
+def test_staged_tree_key(repository: git.Repo) -> None:
+    """Test that the key follows the staged tree, not the working tree."""
+    path = Path(repository.working_dir) / "file.txt"
+    path.write_text("one\n")
+    repository.git.add("file.txt")
+    config = Config()
+    key = staged_tree_key(repository, config)
+
+    path.write_text("two\n")
+    assert staged_tree_key(repository, config) == key
+
+    repository.git.add("file.txt")
+    assert staged_tree_key(repository, config) != key
+
+    config.model = "other_model"
+    assert staged_tree_key(repository, config) != staged_tree_key(repository, Config())
+
+
+def test_staged_tree_key_leaves_the_index_alone(repository: git.Repo) -> None:
+    """Test that the key is read without writing the index, i.e. its hook."""
+    (Path(repository.working_dir) / "file.txt").write_text("one\n")
+    repository.git.add("file.txt")
+    os.utime(index_path(repository), ns=(1, 1))
+
+    staged_tree_key(repository, Config())
+
+    assert index_path(repository).stat().st_mtime_ns == 1
+
+
+def test_wait_until_quiet_restarts_after_a_change(tmp_path: Path) -> None:
+    """Test that a change during the debounce period extends the wait."""
+    path = tmp_path / "index"
+    path.write_text("one")
+    timer = threading.Timer(0.05, lambda: os.utime(path, ns=(1, 1)))
+    timer.start()
+
+    assert wait_until_quiet(path, debounce=0.1, poll=0.01) == 1
+    timer.join()
+
+
+def test_watch_calls_back_once_per_settled_change(tmp_path: Path) -> None:
+    """Test that the watch runs once at start and once after each change."""
+    path = tmp_path / "index"
+    path.write_text("one")
+    calls = []
+
+    def on_change() -> None:
+        calls.append(path.stat().st_mtime_ns)
+        if len(calls) == 1:
+            os.utime(path, ns=(2, 2))
+
+    watch(path, on_change, debounce=0.02, poll=0.01, should_stop=lambda: len(calls) > 1)
+
+    assert calls[1] == 2
+
+
+def test_index_path_honours_git_index_file(
+    repository: git.Repo, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that the index of a commit with a temporary index is watched."""
+    assert index_path(repository) == Path(repository.git_dir) / "index"
+    monkeypatch.setenv("GIT_INDEX_FILE", "/tmp/other-index")
+    assert index_path(repository) == Path("/tmp/other-index")
+
+
+def test_precompute_lock_is_released(repository: git.Repo) -> None:
+    """Test that the lock can be taken again once released."""
+    with precompute_lock(repository):
+        pass
+    with precompute_lock(repository):
+        pass
+
+
+def test_precompute_lock_without_fcntl(
+    repository: git.Repo, mocker: MockerFixture
+) -> None:
+    """Test that precomputing goes on unlocked where fcntl is missing."""
+    mocker.patch.dict(sys.modules, {"fcntl": None})
+
+    with precompute_lock(repository):
+        pass
+
+    assert not (Path(repository.git_dir) / LOCK_FILE).exists()
+
+
+def test_install_and_uninstall_hooks(repository: git.Repo) -> None:
+    """Test that the hooks are installed, refreshed and removed."""
+    paths = install_hooks(repository)
+
+    assert {path.name for path in paths} == {"post-index-change", "prepare-commit-msg"}
+    for path in paths:
+        assert HOOK_MARKER in path.read_text()
+        assert os.access(path, os.X_OK)
+    assert install_hooks(repository) == paths
+
+    assert uninstall_hooks(repository) == paths
+    assert not any(path.exists() for path in paths)
+    assert uninstall_hooks(repository) == []
+
+
+def test_install_hooks_keeps_foreign_hooks(repository: git.Repo) -> None:
+    """Test that a hook written by someone else is never replaced."""
+    hook = Path(repository.git_dir) / "hooks" / "prepare-commit-msg"
+    hook.parent.mkdir(exist_ok=True)
+    hook.write_text("#!/bin/sh\necho mine\n")
+
+    with pytest.raises(FileExistsError):
+        install_hooks(repository)
+    assert hook.read_text() == "#!/bin/sh\necho mine\n"
+    assert not (hook.parent / "post-index-change").exists()
+
+
+def test_fill_in_message_keeps_the_template(tmp_path: Path) -> None:
+    """Test that the message goes above the comments git wrote."""
+    path = tmp_path / "COMMIT_EDITMSG"
+    path.write_text("\n# Please enter the commit message.\n")
+
+    fill_in_message(path, "Add a feature\n\n")
+
+    assert path.read_text() == ("Add a feature\n\n# Please enter the commit message.\n")
@@ -0,0 +1,63 @@
+"""Test the prefix cache module."""
+
+import time
+
+from pytest_mock import MockerFixture
+
+from genie_git.prefix_cache import MIN_CACHED_TOKENS, CachedPrefix, PrefixCache
+
+PREFIX = "x" * MIN_CACHED_TOKENS * 4
+
+
+def test_is_cacheable() -> None:
+    """Test that prefixes under the API minimum are not cached."""
+    assert PrefixCache.is_cacheable(PREFIX)
+    assert not PrefixCache.is_cacheable("short prefix")
+
+
+def test_maintain_registers_and_saves_the_prefix(mocker: MockerFixture) -> None:
+    """Test that a new prefix is registered once and survives a reload."""
+    client = mocker.MagicMock()
+    client.caches.create.return_value.name = "cachedContents/1"
+    prefix_cache = PrefixCache(client, ttl_seconds=600)
+
+    assert prefix_cache.lookup("model", PREFIX) is None
+    prefix_cache.maintain("model", PREFIX)
+    prefix_cache.maintain("model", PREFIX)
+    prefix_cache.save()
+
+    client.caches.create.assert_called_once()
+    config = client.caches.create.call_args.kwargs["config"]
+    assert config.ttl == "600s"
+    reloaded = PrefixCache.load(client, ttl_seconds=600)
+    assert reloaded.lookup("model", PREFIX) == "cachedContents/1"
+    assert reloaded.lookup("other-model", PREFIX) is None
+    assert reloaded.lookup("model", PREFIX + "changed") is None
+
+
+def test_maintain_refreshes_the_ttl_after_half_of_it(mocker: MockerFixture) -> None:
+    """Test that a prefix used late in its lifetime gets its lifetime extended."""
+    client = mocker.MagicMock()
+    prefix_cache = PrefixCache(client, ttl_seconds=600)
+    prefix_cache.maintain("model", PREFIX)
+    key = next(iter(prefix_cache.entries))
+    prefix_cache.entries[key] = CachedPrefix("cachedContents/1", time.time() + 200)
+
+    prefix_cache.maintain("model", PREFIX)
+
+    client.caches.update.assert_called_once()
+    assert client.caches.update.call_args.kwargs["name"] == "cachedContents/1"
+    assert prefix_cache.entries[key].expires_at > time.time() + 590
+
+
+def test_maintain_remembers_failures(mocker: MockerFixture) -> None:
+    """Test that a rejected prefix is not registered again on every run."""
+    client = mocker.MagicMock()
+    client.caches.create.side_effect = RuntimeError("too small")
+    prefix_cache = PrefixCache(client, ttl_seconds=600)
+
+    prefix_cache.maintain("model", PREFIX)
+    prefix_cache.maintain("model", PREFIX)
+
+    client.caches.create.assert_called_once()
+    assert prefix_cache.lookup("model", PREFIX) is None
@@ -0,0 +1,97 @@
+"""Test the resilience module."""
+
+import time
+from pathlib import Path
+
+import pytest
+from google.genai import errors
+from pytest_mock import MockerFixture
+
+from genie_git.resilience import (
+    BACKOFF_MAX_SECONDS,
+    FAILURE_THRESHOLD,
+    CircuitBreaker,
+    CircuitOpenError,
+    Deadline,
+    backoff_delay,
+    circuit_breaker,
+    is_transient,
+)
+
+
+def test_deadline_counts_down(mocker: MockerFixture) -> None:
+    """Test that the time left shrinks to zero and that 0 disables it."""
+    now = mocker.patch("genie_git.resilience.time.monotonic", return_value=100.0)
+    deadline = Deadline(5)
+    now.return_value = 103.0
+    assert deadline.remaining() == pytest.approx(2.0)
+    assert not deadline.expired()
+    now.return_value = 110.0
+    assert deadline.remaining() == 0
+    assert deadline.expired()
+
+    assert Deadline(0).remaining() is None
+    assert not Deadline(0).expired()
+
+
+def test_is_transient() -> None:
+    """Test that rate limits, server errors and timeouts are retried."""
+    assert is_transient(errors.APIError(429, {}))
+    assert is_transient(errors.APIError(503, {}))
+    assert is_transient(TimeoutError())
+    assert is_transient(ConnectionResetError())
+    assert not is_transient(errors.APIError(400, {}))
+    assert not is_transient(errors.APIError(403, {}))
+    assert not is_transient(ValueError("invalid"))
+
+
+def test_backoff_delay_is_capped() -> None:
+    """Test that the delay grows exponentially up to the cap."""
+    assert all(0 <= backoff_delay(0) <= 0.5 for _ in range(100))
+    assert all(0 <= backoff_delay(20) <= BACKOFF_MAX_SECONDS for _ in range(100))
+
+
+def test_circuit_opens_after_repeated_failures() -> None:
+    """Test that the circuit opens after the threshold and persists."""
+    breaker = CircuitBreaker()
+    for _ in range(FAILURE_THRESHOLD - 1):
+        breaker.record_failure()
+    breaker.check()
+
+    breaker.record_failure()
+    breaker.save()
+
+    with pytest.raises(CircuitOpenError, match="circuit reset"):
+        CircuitBreaker.load().check()
+
+
+def test_circuit_lets_a_call_through_after_the_cooldown() -> None:
+    """Test that an expired cooldown lets the next call try again."""
+    CircuitBreaker(FAILURE_THRESHOLD, opened_until=time.time() - 1).save()
+
+    with circuit_breaker():
+        pass
+
+    assert CircuitBreaker.load() == CircuitBreaker()
+
+
+def test_circuit_breaker_counts_only_transient_errors() -> None:
+    """Test that permanent errors do not open the circuit."""
+    for _ in range(FAILURE_THRESHOLD):
+        with pytest.raises(errors.APIError), circuit_breaker():
+            raise errors.APIError(400, {})
+    assert CircuitBreaker.load().failures == 0
+
+    for _ in range(FAILURE_THRESHOLD):
+        with pytest.raises(TimeoutError), circuit_breaker():
+            raise TimeoutError()
+    with pytest.raises(CircuitOpenError), circuit_breaker():
+        pytest.fail("The call must not run while the circuit is open.")
+
+
+def test_load_ignores_an_invalid_file(isolated_storage: Path) -> None:
+    """Test that a corrupt state file closes the circuit."""
+    isolated_storage.mkdir(parents=True, exist_ok=True)
+    (isolated_storage / "circuit.json").write_text("{")
+
+    assert CircuitBreaker.load() == CircuitBreaker()
@@ -0,0 +1,93 @@
+"""Test the scopes module."""
+
+from genie_git.scopes import Scope, format_plan, scope_root, split_by_scope
+
+DIFF = """\
+diff --git a/packages/api/app.py b/packages/api/app.py
+index 1111111..2222222 100644
+--- a/packages/api/app.py
++++ b/packages/api/app.py
+@@ -1 +1 @@
+-a
++b
+diff --git a/README.md b/README.md
+index 3333333..4444444 100644
+--- a/README.md
++++ b/README.md
+@@ -1 +1 @@
+-old
++new
+diff --git a/packages/web/old.js b/packages/web/new name.js
+similarity index 90%
+rename from packages/web/old.js
+rename to packages/web/new name.js
+diff --git a/packages/api/tests/test_app.py b/packages/api/tests/test_app.py
+new file mode 100644
+index 0000000..5555555
+--- /dev/null
++++ b/packages/api/tests/test_app.py
+@@ -0,0 +1 @@
++assert True
+"""
+
+
+def test_scope_root() -> None:
+    """Test that a path belongs to the deepest directory matching a root."""
+    roots = ["packages/*", "packages/api/plugins/*"]
+    assert scope_root("packages/api/app.py", roots) == "packages/api"
+    assert scope_root("packages/api/plugins/auth/x.py", roots) == (
+        "packages/api/plugins/auth"
+    )
+    assert scope_root("README.md", roots) == ""
+    assert scope_root("docs/index.md", roots) == ""
+    # Without roots, every top-level directory is a package.
+    assert scope_root("docs/index.md", []) == "docs"
+    assert scope_root("README.md", []) == ""
+
+
+def test_split_by_scope() -> None:
+    """Test that the files are grouped by package in the order of the diff."""
+    scopes = split_by_scope(DIFF, ["packages/*"])
+
+    assert [scope.root for scope in scopes] == [
+        "packages/api",
+        "",
+        "packages/web",
+    ]
+    api, root, web = scopes
+    assert api.paths == ["packages/api/app.py", "packages/api/tests/test_app.py"]
+    assert api.diff.startswith("diff --git a/packages/api/app.py")
+    assert "+assert True" in api.diff
+    assert "README.md" not in api.diff
+    assert 'Use "api" as the scope' in api.context()
+    assert root.label == "(root)"
+    assert "outside of every package" in root.context()
+    # A rename commits both the old and the new path.
+    assert web.paths == ["packages/web/old.js", "packages/web/new name.js"]
+
+
+def test_format_plan() -> None:
+    """Test that the plan quotes the messages and warns of unstaged changes."""
+    api, root, web = split_by_scope(DIFF, ["packages/*"])
+
+    plan = format_plan(
+        [(api, "feat(api): it's faster\n"), (web, "refactor(web): rename")],
+        unstaged_paths={"packages/api/app.py", "README.md"},
+    )
+
+    assert plan.splitlines() == [
+        "# Commit every scope of the staged changes on its own:",
+        "# Warning: packages/api/app.py has unstaged changes, which are committed too.",
+        "git commit -m 'feat(api): it'\"'\"'s faster' -- packages/api/app.py"
+        " packages/api/tests/test_app.py",
+        "git commit -m 'refactor(web): rename' -- packages/web/old.js"
+        " 'packages/web/new name.js'",
+    ]
+
+
+def test_scope_without_files() -> None:
+    """Test the name and the diff of an empty scope."""
+    scope = Scope("services/billing")
+    assert scope.name == "billing"
+    assert scope.diff == ""
+    assert scope.paths == []
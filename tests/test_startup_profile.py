@@ -0,0 +1,70 @@
+"""Test the startup profile module."""
+
+import subprocess
+
+from pytest_mock import MockerFixture
+
+from genie_git.startup_profile import (
+    format_breakdown,
+    parse_import_times,
+    profile_startup,
+)
+
+IMPORT_TIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |   json.decoder
+import time:       200 |        300 | json
+import time:      4000 |       4000 |     google.genai.types
+import time:      1000 |       5000 |   google.genai
+import time:       500 |       5500 | genie_git.ai_handler
+some warning printed by the command"""
+
+
+def test_parse_import_times() -> None:
+    """Test that parse_import_times extracts timings and keeps other lines."""
+    timings, remaining = parse_import_times(IMPORT_TIME_OUTPUT)
+
+    assert [t.module for t in timings] == [
+        "json.decoder",
+        "json",
+        "google.genai.types",
+        "google.genai",
+        "genie_git.ai_handler",
+    ]
+    assert timings[2].self_us == 4000
+    assert timings[2].depth == 2
+    assert timings[4].cumulative_us == 5500
+    assert remaining == "some warning printed by the command"
+
+
+def test_format_breakdown() -> None:
+    """Test that format_breakdown groups self time by top-level package."""
+    timings, _ = parse_import_times(IMPORT_TIME_OUTPUT)
+
+    report = format_breakdown(timings)
+
+    assert "Total import time: 5.8 ms" in report
+    assert report.index("google") < report.index("json")
+    assert "5.5 ms  genie_git.ai_handler" in report
+
+
+def test_profile_startup(mocker: MockerFixture) -> None:
+    """Test that profile_startup runs the command with -X importtime."""
+    mock_run = mocker.patch(
+        "genie_git.startup_profile.subprocess.run",
+        return_value=subprocess.CompletedProcess([], 3, stderr=IMPORT_TIME_OUTPUT),
+    )
+    mocker.patch.dict("os.environ", {"GENIE_GIT_STARTUP_PROFILE": "1"})
+
+    assert profile_startup(["configure", "--show"]) == 3
+
+    command = mock_run.call_args.args[0]
+    assert command[1:] == [
+        "-X",
+        "importtime",
+        "-m",
+        "genie_git.main",
+        "configure",
+        "--show",
+    ]
+    assert "GENIE_GIT_STARTUP_PROFILE" not in mock_run.call_args.kwargs["env"]
@@ -0,0 +1,181 @@
+"""Test the submodules module."""
+
+import subprocess
+from collections.abc import Callable
+from pathlib import Path
+
+import git
+import pytest
+from pytest_mock import MockerFixture
+
+from genie_git.cache import DiskCache
+from genie_git.exclusions import ExclusionRules
+from genie_git.git_handler import get_repository_changes
+from genie_git.submodules import (
+    SubmoduleChange,
+    describe_range,
+    parse_raw,
+    read_range,
+    start_submodule_changes,
+    summarize_changes,
+)
+
+OLD = "a" * 40
+NEW = "b" * 40
+
+
+def run_git(directory: Path, *args: str) -> str:
+    """Run a git command as a test user and return its output."""
+    return subprocess.run(
+        [
+            "git",
+            "-c",
+            "user.name=test",
+            "-c",
+            "user.email=test@example.com",
+            "-c",
+            "protocol.file.allow=always",
+            *args,
+        ],
+        cwd=directory,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+@pytest.fixture
+def superproject(tmp_path: Path, commit_file: Callable[..., str]) -> git.Repo:
+    """Create a repository whose submodule has two new commits staged."""
+    library = tmp_path / "library"
+    library.mkdir()
+    run_git(library, "init", "-q")
+    commit_file(library, "a.txt", "a\n", "feat: add a")
+
+    root = tmp_path / "super"
+    root.mkdir()
+    run_git(root, "init", "-q")
+    commit_file(root, "readme.txt", "readme\n", "docs: add readme")
+    run_git(root, "submodule", "add", "-q", str(library), "vendor/library")
+    run_git(root, "commit", "-q", "-m", "build: add the library")
+
+    checkout = root / "vendor" / "library"
+    commit_file(checkout, "b.txt", "b\n", "feat: add b")
+    commit_file(checkout, "c.txt", "c\n", "fix: add c")
+    run_git(root, "add", "vendor/library")
+    return git.Repo(root)
+
+
+def test_parse_raw() -> None:
+    """Test that only the changes of submodules are parsed."""
+    output = "\0".join(
+        [
+            f":160000 160000 {OLD} {NEW} M",
+            "vendor/moved",
+            f":000000 160000 {'0' * 40} {NEW} A",
+            "vendor/added",
+            f":160000 000000 {OLD} {'0' * 40} D",
+            "vendor/removed",
+            f":100644 100644 {OLD} {NEW} R100",
+            "old.txt",
+            "new.txt",
+            "",
+        ]
+    )
+
+    assert parse_raw(output) == [
+        SubmoduleChange("vendor/moved", OLD, NEW),
+        SubmoduleChange("vendor/added", "", NEW),
+        SubmoduleChange("vendor/removed", OLD, ""),
+    ]
+    assert parse_raw("") == []
+
+
+def test_describe_range(mocker: MockerFixture) -> None:
+    """Test the counts and the subjects of a range, the extra ones omitted."""
+    mocker.patch("genie_git.submodules.MAX_SUBJECTS", 2)
+    change = SubmoduleChange("vendor/library", OLD, NEW)
+
+    summary = describe_range(
+        change, ">feat: b\n>fix: c\n<feat: dropped", " 2 files changed\n"
+    )
+
+    assert summary == (
+        "aaaaaaa..bbbbbbb, 2 new commits, 1 commits dropped, 2 files changed\n"
+        "+ feat: b\n"
+        "+ fix: c\n"
+        "[1 more commits]"
+    )
+
+
+def test_expand_staged_submodule(
+    superproject: git.Repo, tmp_path: Path, mocker: MockerFixture
+) -> None:
+    """Test that the pointer change is replaced by its commits, then cached."""
+    rules = ExclusionRules()
+    diff = get_repository_changes(rules, superproject)
+    cache = DiskCache(tmp_path / "cache", max_bytes=10**6, max_age_seconds=3600)
+
+    expanded = start_submodule_changes(superproject, rules, cache).expand(diff)
+
+    assert "Subproject commit" not in expanded
+    assert expanded.startswith("diff --git a/vendor/library b/vendor/library\n")
+    assert "2 new commits, 2 files changed, 2 insertions(+)" in expanded
+    assert expanded.endswith("+ fix: add c\n+ feat: add b")
+    assert cache.stats().entries == 1
+
+    # The cached range is reused without reading the submodule.
+    read = mocker.patch("genie_git.submodules.read_range")
+    assert start_submodule_changes(superproject, rules, cache).expand(diff) == (
+        expanded
+    )
+    read.assert_not_called()
+
+
+def test_expand_several_submodules_concurrently(
+    superproject: git.Repo,
+    tmp_path: Path,
+    mocker: MockerFixture,
+    commit_file: Callable[..., str],
+) -> None:
+    """Test that every submodule is read from its own clone at the same time."""
+    root = Path(superproject.working_dir)
+    run_git(root, "commit", "-q", "-m", "build: bump the library")
+    paths = [f"vendor/copy{n}" for n in range(8)]
+    for n, path in enumerate(paths):
+        run_git(root, "submodule", "add", "-q", str(tmp_path / "library"), path)
+        run_git(root, "commit", "-q", "-m", f"build: add {path}")
+        commit_file(root / path, f"copy{n}.txt", f"copy {n}\n", f"feat: add copy {n}")
+    run_git(root, "add", *paths)
+    changes = parse_raw(run_git(root, "diff", "--staged", "--raw", "-z", "--no-abbrev"))
+    # Every command names its git directory, none runs in the superproject.
+    mocker.patch.object(superproject, "git")
+
+    for _ in range(5):
+        entries = summarize_changes(superproject, changes, None)
+
+        assert list(entries) == paths
+        for n, path in enumerate(paths):
+            assert entries[path].endswith(
+                "1 new commits, 1 file changed, 1 insertion(+)]\n"
+                f"+ feat: add copy {n}\n"
+            )
+    superproject.git.assert_not_called()
+
+
+def test_linked_worktree_reads_the_main_clone(superproject: git.Repo) -> None:
+    """Test that a worktree without a checkout of the submodule is expanded."""
+    root = Path(superproject.working_dir)
+    run_git(root, "commit", "-q", "-m", "build: bump the library")
+    old, new = (
+        run_git(root, "rev-parse", f"{revision}:vendor/library")
+        for revision in ("HEAD~1", "HEAD")
+    )
+    run_git(root, "worktree", "add", "-q", str(root.parent / "worktree"))
+    worktree = git.Repo(root.parent / "worktree")
+
+    summary = read_range(worktree, SubmoduleChange("vendor/library", old, new))
+
+    assert summary is not None
+    assert summary.startswith(f"{old[:7]}..{new[:7]}, 2 new commits")
+    assert read_range(worktree, SubmoduleChange("vendor/library", old, NEW)) is None
@@ -0,0 +1,137 @@
+"""Test the telemetry module."""
+
+import time
+from pathlib import Path
+
+from pytest_mock import MockerFixture
+
+from genie_git import telemetry
+from genie_git.telemetry import (
+    RunRecord,
+    build_report,
+    load_records,
+    percentile,
+    record_run,
+    repository_root,
+)
+from genie_git.tracing import Span, Tracer
+
+
+def make_record(**overrides: object) -> RunRecord:
+    """Return a successful run, with the given fields changed."""
+    fields: dict = {
+        "timestamp": time.time(),
+        "mode": "staged",
+        "repo": "/repo",
+        "outcome": "ok",
+        "seconds": 1.0,
+    }
+    return RunRecord(**(fields | overrides))
+
+
+def test_from_trace() -> None:
+    """Test that the spans of a run are condensed into a record."""
+    tracer = Tracer("suggest")
+    tracer.spans = [
+        Span("git_diff", 0.0, 0.1),
+        Span("git_diff", 0.1, 0.2),
+        Span("cache_lookup", 0.3, 0.01, {"hit": False}),
+        Span("summarize", 0.3, 1.0, {"prompt_tokens": 900, "response_tokens": 50}),
+        Span("prompt_build", 1.3, 0.01, {"prompt_tokens": 400}),
+        Span("generate", 1.3, 2.0, {"model": "m", "response_tokens": 20}),
+    ]
+    tracer.finish()
+
+    record = RunRecord.from_trace(tracer, "staged", "/repo", "ok")
+
+    assert record.stages["git_diff"] == 0.3
+    assert record.cache_hit is False
+    assert record.requests == 2
+    assert record.prompt_tokens == 1300
+    assert record.response_tokens == 70
+    assert record.model == "m"
+
+
+def test_record_and_load_runs() -> None:
+    """Test that runs are appended and loaded, skipping invalid lines."""
+    record_run(make_record(timestamp=time.time() - 3 * 86400), 100, 0)
+    with open(telemetry.TELEMETRY_FILE, "a") as f:
+        f.write('{"timestamp": 1\n')
+    record_run(make_record(outcome="TimeoutError"), 100, 0)
+
+    assert [r.outcome for r in load_records()] == ["ok", "TimeoutError"]
+    assert [r.outcome for r in load_records(max_age_days=2)] == ["TimeoutError"]
+
+
+def test_record_run_compacts_the_file(mocker: MockerFixture) -> None:
+    """Test that old runs are dropped once the file grew past the limits."""
+    mocker.patch("genie_git.telemetry.RECORD_BYTES", 100)
+    for seconds in range(10):
+        record_run(make_record(seconds=seconds), 3, 0)
+
+    recorded: list[float] = [record.seconds for record in load_records()]
+    assert len(recorded) <= 6
+    assert recorded[0] > 0
+    assert recorded[-1] == 9
+
+
+def test_repository_root(tmp_path: Path) -> None:
+    """Test that the repository is found from a subdirectory."""
+    (tmp_path / ".git").mkdir()
+    (tmp_path / "src" / "pkg").mkdir(parents=True)
+
+    assert repository_root(tmp_path / "src" / "pkg") == str(tmp_path)
+
+
+def test_percentile() -> None:
+    """Test the nearest-rank percentile."""
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile([3.0], 0.99) == 3
+
+
+def test_build_report() -> None:
+    """Test the percentiles and the top offenders of the runs."""
+    records = [
+        make_record(
+            seconds=float(seconds),
+            model="m",
+            requests=1,
+            prompt_tokens=100,
+            cache_hit=False,
+            stages={"generate": seconds - 0.5},
+        )
+        for seconds in range(1, 11)
+    ]
+    records += [
+        make_record(repo="/big", prompt_tokens=9000, requests=3, cache_hit=True),
+        make_record(repo="/big", outcome="DeadlineExceededError", seconds=30.0),
+    ]
+
+    report = build_report(records, top=1)
+
+    assert report.runs == 12
+    assert report.outcomes == {"ok": 11, "DeadlineExceededError": 1}
+    assert report.latency["p50"] == 5.0
+    assert report.latency["p95"] == 10.0
+    assert report.prompt_tokens_per_request["p95"] == 3000
+    assert (report.cache_hits, report.cache_lookups) == (1, 11)
+    assert report.stage_p95 == {"generate": 9.5}
+    assert report.models == [{"model": "m", "runs": 10, "p95": 10.0}]
+    assert report.repos == [
+        {
+            "repo": "/big",
+            "runs": 2,
+            "p95_tokens": 9000,
+            "max_tokens": 9000,
+            "errors": 1,
+        }
+    ]
+    assert report.slowest[0]["outcome"] == "DeadlineExceededError"
+
+    text = report.format()
+    assert "12 suggest runs since" in text
+    assert "11 ok, 1 DeadlineExceededError" in text
+    assert "Cached responses: 1 of 11 lookups (9%)" in text
+    assert "/big  2 runs  p95 9000 tokens  max 9000 tokens  1 errors" in text
@@ -0,0 +1,10 @@
+"""Test the tokens module."""
+
+from genie_git.tokens import estimate_tokens
+
+
+def test_estimate_tokens() -> None:
+    """Test that estimate_tokens rounds up to whole tokens."""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
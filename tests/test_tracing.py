@@ -0,0 +1,65 @@
+"""Test the tracing module."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from genie_git.tracing import (
+    Tracer,
+    current_tracer,
+    span,
+    start_tracing,
+    stop_tracing,
+    write_trace,
+)
+
+
+def test_span_is_a_no_op_without_tracing() -> None:
+    """Test that spans record nothing while tracing is off."""
+    with span("stage") as current:
+        assert current is None
+
+    assert current_tracer() is None
+    assert stop_tracing() is None
+
+
+def test_spans_are_recorded_with_their_sizes() -> None:
+    """Test that spans record their duration and attributes."""
+    tracer = start_tracing("suggest")
+    try:
+        with span("git_diff") as current:
+            assert current is not None
+            current.add_text("diff", "é" * 8)
+        with pytest.raises(RuntimeError), span("generate"):
+            raise RuntimeError
+    finally:
+        assert stop_tracing() is tracer
+
+    trace = tracer.to_dict()
+    assert trace["command"] == "suggest"
+    assert trace["total"] >= sum(s["duration"] for s in trace["spans"])
+    assert [s["name"] for s in trace["spans"]] == ["git_diff", "generate"]
+    assert trace["spans"][0]["attributes"] == {"diff_bytes": 16, "diff_tokens": 2}
+    with span("after"):
+        pass
+    assert len(tracer.spans) == 2
+
+
+def test_write_trace(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    """Test that traces are printed and appended to the trace file."""
+    tracer = Tracer("suggest")
+    tracer.record("git_log", tracer.started_at, log_bytes=3)
+    tracer.finish()
+    trace_file = tmp_path / "trace.jsonl"
+
+    write_trace(tracer, "text", str(trace_file))
+    write_trace(tracer, "json", str(trace_file))
+
+    lines = capsys.readouterr().err.splitlines()
+    assert lines[0].startswith("Timings of suggest (total ")
+    assert lines[1].split() == ["git_log", "0.0", "ms", "+", *lines[1].split()[4:]]
+    assert lines[1].endswith("log_bytes=3")
+    assert json.loads(lines[2]) == tracer.to_dict()
+    records = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert records == [tracer.to_dict()] * 2